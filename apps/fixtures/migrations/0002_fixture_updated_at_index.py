@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fixtures', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fixture',
+            index=models.Index(fields=['updated_at'], name='fixtures_fi_updated_660d23_idx'),
+        ),
+    ]
@@ -62,6 +62,11 @@ class Fixture(models.Model):
         ('WO', 'WalkOver'),
     ]
 
+    # Statuses after which a fixture's outcome will not change any more
+    FINISHED_STATUSES = ['FT', 'AET', 'PEN']
+    VOID_STATUSES = ['PST', 'CANC', 'ABD', 'AWD', 'WO']
+    CONCLUDED_STATUSES = FINISHED_STATUSES + VOID_STATUSES
+
     api_id = models.IntegerField(unique=True)
     referee = models.CharField(max_length=200, blank=True, null=True)
     timezone = models.CharField(max_length=100)
@@ -101,6 +106,9 @@ class Fixture(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return f"{self.home_team.name} vs {self.away_team.name} - {self.date.strftime('%Y-%m-%d')}"
@@ -108,7 +116,17 @@ class Fixture(models.Model):
     @property
     def is_finished(self):
         """Check if match is finished"""
-        return self.status_short in ['FT', 'AET', 'PEN']
+        return self.status_short in self.FINISHED_STATUSES
+
+    @property
+    def is_void(self):
+        """Check if match was postponed, cancelled, abandoned or awarded"""
+        return self.status_short in self.VOID_STATUSES
+
+    @property
+    def is_concluded(self):
+        """Check if match outcome is final (finished or voided)"""
+        return self.status_short in self.CONCLUDED_STATUSES
 
     @property
     def is_live(self):
@@ -2,7 +2,8 @@ from datetime import datetime
 import json
 import os
 import time
-import requests
+
+from apps.tips.request_timing import external_call
 
 API_KEY = os.getenv("FOOTBALL_API_KEY", "69db687a2df6b40ad9691d5d08063801")
 API_URL = "https://v3.football.api-sports.io/fixtures"
@@ -11,6 +12,8 @@ CACHE_FILE = ".fixtures_cache.json"
 
 def get_todays_fixtures(api_key: str = API_KEY, cache_ttl_seconds: int = 300):
     """Fetch today's fixtures (live, finished, and upcoming) from API-Football."""
+    import requests  # Imported on first use, not at worker and command startup
+
     today_str = datetime.now().strftime("%Y-%m-%d")
 
     # 1. Read from local cache if fresh (< cache_ttl_seconds)
@@ -30,7 +33,8 @@ def get_todays_fixtures(api_key: str = API_KEY, cache_ttl_seconds: int = 300):
     params = {"date": today_str}
 
     try:
-        response = requests.get(API_URL, headers=headers, params=params, timeout=10)
+        with external_call('api-football'):
+            response = requests.get(API_URL, headers=headers, params=params, timeout=10)
         remaining = response.headers.get("x-ratelimit-requests-remaining", "N/A")
         print(f"📡 API Request OK | Daily Quota Remaining: {remaining}/100")
 
@@ -111,6 +115,8 @@ class APIFootballService:
         }
 
     def fetch_fixtures(self, date=None, use_cache=True, force_refresh=False):
+        import requests
+
         today_str = datetime.now().strftime("%Y-%m-%d")
         date_str = date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else (str(date) if date else today_str)
 
@@ -121,7 +127,8 @@ class APIFootballService:
         headers = {"x-apisports-key": self.api_key}
         params = {"date": date_str}
         try:
-            res = requests.get(API_URL, headers=headers, params=params, timeout=10)
+            with external_call('api-football'):
+                res = requests.get(API_URL, headers=headers, params=params, timeout=10)
             res.raise_for_status()
             return res.json()
         except requests.exceptions.RequestException as err:
@@ -129,10 +136,13 @@ class APIFootballService:
             return {"response": []}
 
     def fetch_live_fixtures(self, use_cache=True):
+        import requests
+
         headers = {"x-apisports-key": self.api_key}
         params = {"live": "all"}
         try:
-            res = requests.get(API_URL, headers=headers, params=params, timeout=10)
+            with external_call('api-football'):
+                res = requests.get(API_URL, headers=headers, params=params, timeout=10)
             res.raise_for_status()
             return res.json()
         except requests.exceptions.RequestException as err:
@@ -156,6 +166,17 @@ class APIFootballService:
         created_count = 0
         updated_count = 0
 
+        # Remember each fixture's status before this batch so transitions into a
+        # finished/void status can be reported once, at the moment they happen
+        incoming_ids = [
+            item["fixture"]["id"] for item in items
+            if isinstance(item, dict) and item.get("fixture", {}).get("id") is not None
+        ]
+        previous_statuses = dict(
+            Fixture.objects.filter(api_id__in=incoming_ids).values_list("api_id", "status_short")
+        )
+        concluded_ids = []
+
         for fixture_data in items:
             try:
                 fixture_info = fixture_data["fixture"]
@@ -234,10 +255,18 @@ class APIFootballService:
                     created_count += 1
                 else:
                     updated_count += 1
+
+                previous_status = previous_statuses.get(fixture.api_id)
+                if fixture.is_concluded and previous_status not in Fixture.CONCLUDED_STATUSES:
+                    concluded_ids.append(fixture.api_id)
             except Exception as e:
                 print(f"Error saving fixture {fixture_data.get('fixture', {}).get('id')}: {e}")
                 continue
 
+        if concluded_ids:
+            from .signals import fixtures_concluded
+            fixtures_concluded.send(sender=self.__class__, fixture_ids=concluded_ids)
+
         return created_count, updated_count
 
 
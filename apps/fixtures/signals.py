@@ -0,0 +1,9 @@
+"""
+Signals sent by fixture ingestion
+"""
+from django.dispatch import Signal
+
+# Sent by APIFootballService.save_fixtures after a batch is saved, with
+# `fixture_ids`: API ids of fixtures that moved into a finished or void
+# status (see Fixture.CONCLUDED_STATUSES) during that batch.
+fixtures_concluded = Signal()
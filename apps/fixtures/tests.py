@@ -1,3 +1,62 @@
 from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from apps.fixtures.models import Fixture
+from apps.fixtures.services import APIFootballService
+from apps.fixtures.signals import fixtures_concluded
+
+
+def make_fixture_payload(api_id, status_short, home_goals=None, away_goals=None):
+    """Build a single API-Football /fixtures response item"""
+    return {
+        "fixture": {
+            "id": api_id,
+            "timezone": "UTC",
+            "date": "2026-07-23T18:00:00+00:00",
+            "timestamp": 1784829600,
+            "status": {"long": status_short, "short": status_short, "elapsed": 90},
+        },
+        "league": {"id": 39, "name": "Premier League", "country": "England", "season": 2026},
+        "teams": {
+            "home": {"id": 42, "name": "Arsenal"},
+            "away": {"id": 49, "name": "Chelsea"},
+        },
+        "goals": {"home": home_goals, "away": away_goals},
+        "score": {},
+    }
+
+
+@patch('apps.tips.task_queue.enqueue_task')
+class SaveFixturesSignalTests(TestCase):
+    def setUp(self):
+        self.service = APIFootballService(api_key='test')
+        self.received = []
+        fixtures_concluded.connect(self._receiver)
+        self.addCleanup(fixtures_concluded.disconnect, self._receiver)
+
+    def _receiver(self, sender, fixture_ids, **kwargs):
+        self.received.append(list(fixture_ids))
+
+    def test_signal_sent_once_on_transition_to_finished(self, mock_enqueue):
+        self.service.save_fixtures([make_fixture_payload(1001, '2H', 1, 0)])
+        self.assertEqual(self.received, [])
+
+        self.service.save_fixtures([make_fixture_payload(1001, 'FT', 2, 0)])
+        self.assertEqual(self.received, [[1001]])
+
+        # Re-ingesting a finished fixture is not a new transition
+        self.service.save_fixtures([make_fixture_payload(1001, 'FT', 2, 0)])
+        self.assertEqual(self.received, [[1001]])
+
+        self.assertTrue(Fixture.objects.get(api_id=1001).is_finished)
+        # The tips app queued grading for exactly the concluded fixture
+        self.assertEqual(mock_enqueue.call_count, 1)
+        self.assertEqual(mock_enqueue.call_args[0][1], [1001])
+
+    def test_signal_sent_for_void_statuses(self, mock_enqueue):
+        self.service.save_fixtures([
+            make_fixture_payload(2001, 'NS'),
+            make_fixture_payload(2002, 'PST'),
+        ])
+
+        self.assertEqual(self.received, [[2002]])
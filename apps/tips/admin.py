@@ -1,10 +1,12 @@
 from django.contrib import admin
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import csv
-from .models import Tip, TipMatch, OCRProviderSettings
+from .models import Tip, TipMatch, OCRProviderSettings, VerificationCheckpoint, QueuedTask, ExtractionCacheEntry
 
 
 class MissingApiMatchIdFilter(admin.SimpleListFilter):
@@ -28,6 +30,7 @@ class MissingApiMatchIdFilter(admin.SimpleListFilter):
 class TipMatchInline(admin.TabularInline):
     model = TipMatch
     extra = 0
+    readonly_fields = ('market_spec',)
 
 
 @admin.register(Tip)
@@ -77,50 +80,44 @@ class TipMatchAdmin(admin.ModelAdmin):
     list_editable = ('is_resulted', 'is_won', 'actual_result')
     list_filter = ('is_resulted', 'is_won', MissingApiMatchIdFilter, 'match_date', 'market')
     search_fields = ('home_team', 'away_team', 'league', 'tip__bet_code')
-    readonly_fields = ('tip', 'api_match_id')
+    readonly_fields = ('tip', 'api_match_id', 'market_spec')
     actions = ['mark_as_won', 'mark_as_lost']
 
-    def _recalculate_tip_result(self, tip):
-        """Recalculate tip-level result when all matches are resulted"""
-        matches = tip.matches.all()
-        total = matches.count()
-        resulted = matches.filter(is_resulted=True).count()
-        
-        if total > 0 and resulted == total:
-            from decimal import Decimal
-            all_won = not matches.filter(is_won=False).exists()
-            
-            tip.is_resulted = True
-            tip.is_won = all_won
-            tip.result_verified_at = timezone.now()
-            tip.status = 'archived'
-            
-            # Recalculate odds
-            total_odds = Decimal('1.00')
-            for m in matches:
-                total_odds *= m.odds
-            tip.odds = round(total_odds, 2)
-            
-            tip.save()
+    def _grade_selected(self, queryset, is_won, default_result):
+        """
+        Result the selected legs and roll up their tips, writing everything
+        with one bulk update per model.
+
+        Returns:
+            Number of legs graded
+        """
+        from .services.grading import GradingBatch, rollup_tip
+
+        selected = dict(queryset.values_list('id', 'tip_id'))
+        batch = GradingBatch()
+
+        for tip in Tip.objects.filter(id__in=set(selected.values())).prefetch_related('matches'):
+            legs = list(tip.matches.all())
+            for leg in legs:
+                if leg.id in selected:
+                    leg.is_resulted = True
+                    leg.is_won = is_won
+                    leg.actual_result = leg.actual_result or default_result
+                    batch.add_leg(leg)
+            if rollup_tip(tip, legs):
+                batch.add_tip(tip)
+
+        batch.flush()
+        return len(selected)
 
     def mark_as_won(self, request, queryset):
-        for match in queryset:
-            match.is_resulted = True
-            match.is_won = True
-            match.actual_result = match.actual_result or 'Manually verified (Won)'
-            match.save()
-            self._recalculate_tip_result(match.tip)
-        self.message_user(request, f'{queryset.count()} matches marked as WON.')
+        graded = self._grade_selected(queryset, True, 'Manually verified (Won)')
+        self.message_user(request, f'{graded} matches marked as WON.')
     mark_as_won.short_description = '✅ Mark selected matches as WON'
 
     def mark_as_lost(self, request, queryset):
-        for match in queryset:
-            match.is_resulted = True
-            match.is_won = False
-            match.actual_result = match.actual_result or 'Manually verified (Lost)'
-            match.save()
-            self._recalculate_tip_result(match.tip)
-        self.message_user(request, f'{queryset.count()} matches marked as LOST.')
+        graded = self._grade_selected(queryset, False, 'Manually verified (Lost)')
+        self.message_user(request, f'{graded} matches marked as LOST.')
     mark_as_lost.short_description = '❌ Mark selected matches as LOST'
 
 
@@ -145,3 +142,101 @@ class OCRProviderSettingsAdmin(admin.ModelAdmin):
     def get_provider_display(self, obj):
         return obj.get_provider_display()
     get_provider_display.short_description = 'Active OCR Provider'
+
+
+@admin.register(VerificationCheckpoint)
+class VerificationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'fixture_watermark', 'last_sweep_at', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ExtractionCacheEntry)
+class ExtractionCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('bet_code', 'tipster', 'content_md5', 'hits', 'created_at', 'last_hit_at')
+    search_fields = ('bet_code', 'content_md5')
+    readonly_fields = ('created_at', 'last_hit_at', 'hits')
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'func_path', 'task_type', 'priority', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task_type', 'func_path')
+    change_list_template = 'admin/tips/queuedtask/change_list.html'
+    search_fields = ('func_path', 'last_error')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+    actions = ['requeue_tasks']
+
+    def requeue_tasks(self, request, queryset):
+        updated = queryset.filter(status='dead').update(
+            status='queued', attempts=0, run_after=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{updated} dead task(s) requeued.')
+    requeue_tasks.short_description = 'Requeue selected dead tasks'
+
+    def get_urls(self):
+        custom_urls = [
+            path('metrics/', self.admin_site.admin_view(self.metrics_view), name='tips_queuedtask_metrics'),
+            path('memory/', self.admin_site.admin_view(self.memory_view), name='tips_queuedtask_memory'),
+            path('slow-requests/', self.admin_site.admin_view(self.slow_requests_view), name='tips_queuedtask_slow_requests'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def metrics_view(self, request):
+        """Per task type queue depth, wait and run times, Gemini model health and queue wait"""
+        from .betslip_extractor import model_status
+        from .task_queue import get_queue_metrics
+
+        try:
+            window = int(request.GET.get('window', 60))
+        except ValueError:
+            window = 60
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Task queue metrics',
+            'opts': self.model._meta,
+            'metrics': get_queue_metrics(window),
+            'models': model_status(),
+            'windows': [15, 60, 360, 1440],
+        }
+        return TemplateResponse(request, 'admin/tips/queuedtask/metrics.html', context)
+
+    def memory_view(self, request):
+        """Start and stop tracemalloc runs in the web workers and show their allocation reports"""
+        from . import memory_diagnostics
+
+        if request.method == 'POST':
+            if request.POST.get('action') == 'stop':
+                memory_diagnostics.stop()
+                self.message_user(request, 'Memory diagnostics stopped; tracing workers report what they have.')
+            else:
+                try:
+                    options = {name: int(request.POST.get(name, default)) for name, default in
+                               (('requests', 100), ('frames', 1), ('top', 25))}
+                except ValueError:
+                    options = {}
+                control = memory_diagnostics.start(user=request.user, **options)
+                self.message_user(request, f"Memory diagnostics run {control['run']} started.")
+            return HttpResponseRedirect(request.path)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Memory diagnostics',
+            'opts': self.model._meta,
+            **memory_diagnostics.status(),
+        }
+        return TemplateResponse(request, 'admin/tips/queuedtask/memory.html', context)
+
+    def slow_requests_view(self, request):
+        """Sampled slow requests with their timing breakdown and queries (see request_timing)"""
+        from django.conf import settings
+        from .request_timing import slow_requests
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Slow requests',
+            'opts': self.model._meta,
+            'samples': slow_requests(),
+            'slow_ms': getattr(settings, 'SLOW_REQUEST_MS', 1000),
+        }
+        return TemplateResponse(request, 'admin/tips/queuedtask/slow_requests.html', context)
+
@@ -11,14 +11,17 @@ class TipsConfig(AppConfig):
     def ready(self):
         """
         Called when Django starts.
-        Start the background task queue.
+        Connect signal receivers and start the background task queue.
         """
+        from . import signals  # noqa: F401
+
         # Only start in main process (avoid running in migrations, management commands, etc.)
+        # The database backend needs no threads here: run_task_worker executes its tasks
         import sys
         if 'runserver' in sys.argv or 'gunicorn' in sys.argv[0]:
             try:
                 from .task_queue import get_task_queue
                 queue = get_task_queue()
-                logger.info("Background task queue started successfully")
+                logger.info(f"Background task queue ready ({type(queue).__name__})")
             except Exception as e:
                 logger.error(f"Failed to start task queue: {str(e)}")
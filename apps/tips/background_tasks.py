@@ -1,32 +1,112 @@
 """
-Background tasks for betslip processing and enrichment
+Background tasks for betslip processing, enrichment and result grading
 """
 import logging
 import hashlib
-import copy
 from typing import Optional
 from django.utils import timezone
-from django.core.cache import cache
 
 from .models import Tip, TipMatch, OCRProviderSettings
-from .betslip_extractor import process_betslip_image
-from .enrichment_service import DataEnrichmentService
+from .services.tip_ingestion import (
+    INVALID_DATES_MESSAGE, BetslipRejected, ExtractionUnavailable, IngestionBatch, ingest_tip,
+    validate_extraction
+)
 
 logger = logging.getLogger(__name__)
 
 
+def process_betslip_image(image_file, model_input: Optional[list] = None) -> dict:
+    """
+    betslip_extractor.process_betslip_image, imported on first call
+
+    The extractor pulls in google.genai, pydantic and Pillow, which the task
+    worker and scheduler would otherwise load at startup whether or not they
+    ever extract a slip.
+    """
+    from .betslip_extractor import process_betslip_image as extract
+    return extract(image_file, model_input=model_input)
+
+
 def get_file_hash(file_data: bytes) -> str:
     """Generate MD5 hash of file for caching (from langextract)"""
     return hashlib.md5(file_data).hexdigest()
 
 
-def process_betslip_async(tip_id: int):
+def extract_betslip(tip: Tip, model_input: Optional[list] = None) -> dict:
+    """
+    Extract a tip's compressed screenshot, reusing a prior extraction of the
+    same slip from the extraction cache when there is one.
+
+    Only extractions that ingestion accepts are cached: a tipster
+    re-uploading after a rejection (say, missing kickoff dates) usually sends
+    a better screenshot, which must be extracted again.
+
+    Shared by the synchronous submission view and process_betslip_async.
+
+    Args:
+        tip: Tip with tipster, bet_code and a compressed screenshot
+        model_input: Model-input JPEG tiles from compress_screenshot, if at hand
+
+    Returns:
+        Result of process_betslip_image ('cached': True on a cache hit)
+    """
+    from .image_processing import perceptual_hash, run_image_job
+    from .services import ExtractionCache
+
+    file_data = tip._read_screenshot()
+    image_hash = tip.screenshot_hash
+    if not image_hash:
+        try:
+            image_hash = run_image_job(perceptual_hash, file_data)
+        except Exception as e:
+            logger.warning(f"Could not hash screenshot of Tip {tip.id}: {str(e)}")
+
+    key = {
+        'content_md5': get_file_hash(file_data),
+        'image_hash': image_hash,
+        'tipster_id': tip.tipster_id,
+        'bet_code': tip.bet_code,
+    }
+    extraction_cache = ExtractionCache()
+
+    cached_result = extraction_cache.lookup(**key)
+    if cached_result and _accepted(cached_result):
+        logger.info(f"✓ Cache hit ({cached_result['cache_match']}) for Tip {tip.id}, skipping Gemini")
+        return cached_result
+
+    logger.info(f"Cache miss for Tip {tip.id}. Processing with Gemini...")
+    # Without model input the extractor decodes the screenshot, already read
+    # (and closed) above
+    result = process_betslip_image(tip.screenshot if model_input else file_data, model_input=model_input)
+    if _accepted(result):
+        extraction_cache.store(result, **key)
+    return result
+
+
+def _accepted(extraction_result: dict) -> bool:
+    """Whether ingestion would turn the extraction into a tip"""
+    try:
+        validate_extraction(extraction_result)
+        return True
+    except BetslipRejected:
+        return False
+
+
+def process_betslip_async(tip_id: int, enrich: bool = True):
     """
     Background task to process betslip (OCR/scraping + enrichment)
 
+    A rejected slip fails the tip. Other errors (Gemini busy, rate limited or
+    unreachable, database) are raised again for the task queue to retry with
+    backoff; the tip is only marked failed on the task's final attempt.
+
     Args:
         tip_id: ID of the Tip to process
+        enrich: Also match legs to API-Football fixtures (slow: several API calls)
     """
+    from .task_queue import is_final_attempt
+
+    tip = None
     try:
         logger.info(f"Starting background processing for Tip {tip_id}")
 
@@ -37,113 +117,48 @@ def process_betslip_async(tip_id: int):
         tip.processing_status = 'processing'
         tip.save(update_fields=['processing_status', 'updated_at'])
 
-        # Step 1: OCR/Scraping (if not already done)
-        if not tip.ocr_processed:
+        # Step 1: OCR/Scraping and TipMatch creation (if not already done)
+        if not tip.ocr_processed or not TipMatch.objects.filter(tip=tip).exists():
             logger.info(f"Processing betslip data for Tip {tip_id}")
 
             if not tip.screenshot:
-                raise ValueError("No screenshot available for processing")
-
-            # Read screenshot data for hashing
-            tip.screenshot.seek(0)
-            file_data = tip.screenshot.read()
-            tip.screenshot.seek(0)  # Reset for processing
-
-            # Check cache first (MD5 hash-based caching from langextract)
-            file_hash = get_file_hash(file_data)
-            cache_key = f'betslip_{file_hash}'
-
-            cached_result = cache.get(cache_key)
-            if cached_result:
-                logger.info(f"✓ Cache hit for Tip {tip_id}! Using cached extraction result.")
-                ocr_result = copy.deepcopy(cached_result)
-                ocr_result['cached'] = True
-            else:
-                logger.info(f"Cache miss for Tip {tip_id}. Processing with Gemini...")
-
-                # Process screenshot with new fast extractor
-                ocr_result = process_betslip_image(tip.screenshot)
-
-                # Cache successful results for 24 hours (86400 seconds)
-                if ocr_result.get('success'):
-                    cache.set(cache_key, ocr_result, 86400)
-                    logger.info(f"✓ Cached extraction result for future use")
-
-            # Check if processing was successful
-            if not ocr_result or not ocr_result.get('success'):
-                error_msg = ocr_result.get('error', 'Unknown error') if ocr_result else 'Processing failed'
-                raise ValueError(f"Extraction failed: {error_msg}")
-
-            # Extract data from result
-            match_data = ocr_result['data']
-            confidence = ocr_result.get('confidence', 95.0)
+                raise BetslipRejected("No screenshot available for processing")
 
-            # Update tip with OCR data
-            tip.match_details = match_data
-            tip.ocr_processed = True
-            tip.ocr_confidence = confidence
+            # create_tip stores the raw upload; compress it here, off the request
+            # thread, reusing the decode for the model input. The new screenshot
+            # is written together with the extraction.
+            model_input = None
+            if not tip.screenshot_compressed:
+                model_input = tip.compress_screenshot()
 
-            # Extract bet code and odds if not set
-            if tip.bet_code.startswith('TEMP_'):
-                tip.bet_code = match_data.get('bet_code', tip.bet_code)
+            ocr_result = extract_betslip(tip, model_input=model_input)
+            update_fields = list(Tip.SCREENSHOT_FIELDS)
 
-            if not tip.odds or tip.odds == 0:
-                tip.odds = match_data.get('total_odds', 1.00)
+            # Extract bet code if not set
+            if tip.bet_code.startswith('TEMP_') and ocr_result and ocr_result.get('success'):
+                tip.bet_code = ocr_result['data'].get('bet_code', tip.bet_code)
+                update_fields.append('bet_code')
 
-            tip.save()
+            # Validates the slip, then writes the tip and its legs in one transaction
+            ingest_tip(tip, ocr_result, update_fields=update_fields)
 
             if ocr_result.get('cached'):
                 logger.info(f"OCR processing complete for Tip {tip_id} (from cache)")
             else:
                 logger.info(f"OCR processing complete for Tip {tip_id}")
 
-        # Step 2: Create TipMatch records (if not already created)
-        existing_matches = TipMatch.objects.filter(tip=tip).count()
-        if existing_matches == 0:
-            logger.info(f"Creating TipMatch records for Tip {tip_id}")
-
-            from datetime import timedelta
-            matches = tip.match_details.get('matches', [])
-
-            for match_data in matches:
-                # Try to get match date from data, otherwise default to current time (for live/today's slips)
-                match_date = match_data.get('match_date')
-                if not match_date:
-                    match_date = timezone.now()
-
-                TipMatch.objects.create(
-                    tip=tip,
-                    home_team=match_data.get('home_team', ''),
-                    away_team=match_data.get('away_team', ''),
-                    league=match_data.get('league', 'Unknown'),
-                    match_date=match_date,
-                    market=match_data.get('market', ''),
-                    selection=match_data.get('selection', ''),
-                    odds=match_data.get('odds', 1.00)
-                )
-
-            logger.info(f"Created {len(matches)} TipMatch records for Tip {tip_id}")
+        if not enrich:
+            if tip.processing_status != 'completed':
+                tip.processing_status = 'completed'
+                tip.save(update_fields=['processing_status', 'updated_at'])
+            logger.info(f"Background processing completed for Tip {tip_id} (enrichment skipped)")
+            return
 
-            # Generate preview data for buyers (show first 2 matches)
-            preview_matches = matches[:2]
-            tip.preview_data = {
-                'matches': [
-                    {
-                        'home_team': match.get('home_team', ''),
-                        'away_team': match.get('away_team', ''),
-                        'league': match.get('league', 'Unknown'),
-                        'market': match.get('market', ''),
-                    }
-                    for match in preview_matches
-                ],
-                'total_matches': len(matches)
-            }
-            tip.save(update_fields=['preview_data', 'updated_at'])
-            logger.info(f"Generated preview data for {len(preview_matches)} matches")
-
-        # Step 3: Data Enrichment with API-Football
+        # Step 2: Data Enrichment with API-Football
         logger.info(f"Starting API-Football enrichment for Tip {tip_id}")
 
+        from .enrichment_service import DataEnrichmentService
+
         enrichment_service = DataEnrichmentService()
         tip_matches = TipMatch.objects.filter(tip=tip)
 
@@ -185,17 +200,184 @@ def process_betslip_async(tip_id: int):
 
         logger.info(f"Background processing completed successfully for Tip {tip_id}")
 
+    except Tip.DoesNotExist:
+        # Replaced by a resubmission, or deleted, before the task ran
+        logger.warning(f"Tip {tip_id} no longer exists, nothing to process")
+
     except Exception as e:
-        logger.error(f"Background processing failed for Tip {tip_id}: {str(e)}", exc_info=True)
+        retry = _retryable(e) and not is_final_attempt()
+        if retry:
+            logger.warning(f"Background processing failed for Tip {tip_id}, leaving it to the retry: {str(e)}")
+        elif not _retryable(e):
+            logger.warning(f"Betslip rejected for Tip {tip_id}: {str(e)}")
+        else:
+            logger.error(f"Background processing failed for Tip {tip_id}: {str(e)}", exc_info=True)
 
         # Update tip with error
         try:
-            tip = Tip.objects.get(id=tip_id)
+            if tip is None:
+                tip = Tip.objects.get(id=tip_id)
+            update_fields = ['updated_at'] + Tip.SCREENSHOT_FIELDS
+            if not retry:
+                tip.processing_status = 'failed'
+                tip.processing_error = str(e)
+                update_fields += ['processing_status', 'processing_error']
+            # A screenshot compressed before the failure has replaced the stored upload
+            tip.save(update_fields=update_fields, compress_screenshot=False)
+        except Exception as save_error:
+            logger.error(f"Failed to save error status: {str(save_error)}")
+
+        if retry:
+            raise
+
+
+def _retryable(error: Exception) -> bool:
+    """Whether an extraction may succeed when its task is tried again"""
+    return isinstance(error, ExtractionUnavailable) or not isinstance(error, BetslipRejected)
+
+
+BATCH_PROGRESS_KEY = 'tip_batch_progress:{batch}'
+BATCH_PROGRESS_TTL = 3600  # seconds
+
+
+def batch_progress(batch: str) -> dict:
+    """Results of a batch upload's slips so far: {tip_id: {'status', 'legs', 'error'}}"""
+    from django.core.cache import cache
+    return cache.get(BATCH_PROGRESS_KEY.format(batch=batch)) or {}
+
+
+def _extract_batch_slip(tip: Tip) -> dict:
+    """
+    Compress one slip of a batch and extract it
+
+    The compressed screenshot is written at once: compress_screenshot deleted
+    the raw upload, and a retry of the batch after a crash reads the
+    screenshot from the row.
+    """
+    model_input = None
+    if not tip.screenshot_compressed:
+        model_input = tip.compress_screenshot()
+        if tip.screenshot_compressed:
+            tip.save(update_fields=Tip.SCREENSHOT_FIELDS, compress_screenshot=False)
+    return extract_betslip(tip, model_input=model_input)
+
+
+def process_betslip_batch(tip_ids: list):
+    """
+    Background task extracting the slips of a batch upload.
+
+    Up to GEMINI_MAX_CONCURRENCY slips are extracted at once (each Gemini call
+    still goes through the cluster-wide limiter). Each slip's outcome is
+    published to the batch progress as soon as it completes, and the tips and
+    the legs of every successful slip are written in bulk, in one transaction
+    (IngestionBatch), once all of them are done.
+
+    Slips that couldn't be extracted for a passing reason (Gemini busy, rate
+    limited or unreachable) are left 'processing' and the task raises for the
+    queue to retry them; so does any other error of the batch. A retry (also
+    after the worker died, or its lease expired) resumes the slips left
+    'processing'. On the task's final attempt they are failed instead.
+
+    Args:
+        tip_ids: Pending draft tips created by the batch upload view
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import transaction
+    from .task_queue import is_final_attempt, run_bounded
+
+    tips = list(Tip.objects.filter(id__in=tip_ids, processing_status__in=('pending', 'processing')))
+    if not tips:
+        return
+
+    batch = tips[0].upload_batch
+    progress_key = BATCH_PROGRESS_KEY.format(batch=batch)
+    progress = {}
+    ingestion = IngestionBatch(update_fields=Tip.SCREENSHOT_FIELDS)
+    failed, unavailable = [], []
+    final_attempt = is_final_attempt()
+
+    try:
+        Tip.objects.filter(id__in=[tip.id for tip in tips]).update(
+            processing_status='processing', updated_at=timezone.now()
+        )
+        concurrency = getattr(settings, 'GEMINI_MAX_CONCURRENCY', 4)
+        logger.info(f"Extracting batch {batch}: {len(tips)} slips, {concurrency} at a time")
+
+        for tip, result, error in run_bounded(_extract_batch_slip, tips, concurrency):
+            tip.updated_at = timezone.now()
+            try:
+                if error:
+                    raise error
+                legs = ingestion.add(tip, result)
+                progress[str(tip.id)] = {'status': 'completed', 'legs': len(legs)}
+            except Exception as e:
+                if _retryable(e) and not final_attempt:
+                    logger.warning(f"Batch extraction failed for Tip {tip.id}, leaving it to the retry: {str(e)}")
+                    unavailable.append(tip)
+                    progress[str(tip.id)] = {'status': 'processing'}
+                else:
+                    if not _retryable(e):
+                        logger.warning(f"Betslip rejected for Tip {tip.id}: {str(e)}")
+                    else:
+                        logger.error(f"Batch extraction failed for Tip {tip.id}: {str(e)}", exc_info=e)
+                    tip.processing_status = 'failed'
+                    tip.processing_error = str(e)
+                    failed.append(tip)
+                    progress[str(tip.id)] = {'status': 'failed', 'error': str(e)}
+            try:
+                cache.set(progress_key, progress, BATCH_PROGRESS_TTL)
+            except Exception as e:
+                logger.warning(f"Could not publish progress of batch {batch}: {str(e)}")
+
+        extracted = len(ingestion)
+        with transaction.atomic():
+            ingestion.flush()
+            if failed:
+                Tip.objects.bulk_update(
+                    failed, ['processing_status', 'processing_error', 'updated_at'] + Tip.SCREENSHOT_FIELDS
+                )
+
+        logger.info(
+            f"Batch {batch} done: {extracted} extracted, {len(failed)} failed, {len(unavailable)} left to the retry"
+        )
+
+    except Exception as e:
+        if not final_attempt:
+            # Nothing was written: the retry resumes every slip
+            logger.warning(f"Batch {batch} failed, leaving it to the retry: {str(e)}")
+            raise
+        logger.error(f"Batch {batch} failed: {str(e)}", exc_info=True)
+        for tip in tips:
             tip.processing_status = 'failed'
             tip.processing_error = str(e)
-            tip.save(update_fields=['processing_status', 'processing_error', 'updated_at'])
+            tip.updated_at = timezone.now()
+        try:
+            # Screenshots compressed before the failure have replaced the stored uploads
+            Tip.objects.bulk_update(
+                tips, ['processing_status', 'processing_error', 'updated_at'] + Tip.SCREENSHOT_FIELDS
+            )
         except Exception as save_error:
-            logger.error(f"Failed to save error status: {str(save_error)}")
+            logger.error(f"Failed to save error status of batch {batch}: {str(save_error)}")
+        return
+
+    if unavailable:
+        # Compressed screenshots were written as they were made (_extract_batch_slip)
+        raise ExtractionUnavailable(f"{len(unavailable)} slips of batch {batch} could not be extracted yet")
+
+
+def grade_fixtures_async(fixture_ids: list):
+    """
+    Background task to grade the legs of fixtures that just concluded
+
+    Args:
+        fixture_ids: API-Football fixture ids that moved to a finished or void status
+    """
+    from .services import ResultVerifier
+
+    stats = ResultVerifier().verify_fixtures(fixture_ids)
+    logger.info(f"Event-driven grading for fixtures {fixture_ids}: {stats}")
+    return stats
 
 
 def processing_callback(task_id: str, result: Optional[any], error: Optional[Exception]):
@@ -1,95 +1,186 @@
 """
 Fast betslip extraction - Strictly following /home/walter/langextract/betslip_fast_extractor.py
 Uses only libraries from langextract: google-genai, Pillow, python-dotenv
+
+google.genai, pydantic and Pillow are imported on first extraction (see
+get_client), so web workers, the task worker and management commands that
+never extract a slip don't pay for them at startup.
 """
 import os
 import json
+import threading
 import time
-import io
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from PIL import Image
-import google.genai as genai
-from google.genai import types
-from pydantic import BaseModel, Field
+
+from .model_health import ModelHealth, is_quota_error
+from .rate_limit import GeminiLimiter, PermitTimeout, RateLimitTimeout
+from .request_timing import external_call
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
 # --- CONFIGURATION FOR ULTRA-LOW LATENCY ---
+# Model input preprocessing (800px grayscale tiles, JPEG q60): see image_processing
 MODEL_ID = 'gemini-2.0-flash-lite'
 FALLBACK_MODELS = ['gemini-2.0-flash-lite', 'gemini-2.0-flash', 'gemini-flash-lite-latest', 'gemini-flash-latest']
-MAX_DIMENSION = 800   # 800px is the sweet spot for speed/readability
-JPEG_QUALITY = 60     # Lower quality (60) is fine for high-contrast text
 RETRY_DELAY = 0.5     # Start retries quicker
 
-# Initialize Client ONCE (Global Scope) to save setup time
-api_key = os.getenv('GEMINI_API_KEY')
-if not api_key:
-    logger.error("No API key found. Set GEMINI_API_KEY in your .env file")
+# One client per process, created on first use
+_client = None
+_client_lock = threading.Lock()
 
-client = genai.Client(api_key=api_key) if api_key else None
+# Threads for hedged requests (settings.GEMINI_HEDGE_REQUESTS)
+HEDGE_WORKERS = 4
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='gemini-hedge')
 
+RATE_LIMIT_MESSAGE = (
+    "Gemini AI daily rate limit exceeded. Please wait a moment or upgrade your Google AI Studio API key quota."
+)
+BUSY_MESSAGE = "Prediction slip extraction is busy right now. Please try again in a minute."
 
-# --- PYDANTIC SCHEMAS FOR STRUCTURED OUTPUT ---
-class Match(BaseModel):
-    match_date: str = Field(description="Date of the match (e.g. DD/MM/YY or DD/MM/YYYY). Must be empty string if date is not explicitly shown on the slip.")
-    match_time: str = Field(description="Kickoff time (e.g. HH:MM). Must be empty string if time is not explicitly shown.")
-    home_team: str
-    away_team: str
-    bet_type: str = Field(description="Betting market or type (e.g. 3 Way, Over/Under)")
-    pick: str = Field(description="The user's pick or selection")
-    odds: float = Field(description="The multiplier/odds for this selection")
 
-class PredictionSlipSummary(BaseModel):
-    total_odds: float = Field(description="The total multiplier/odds for the entire slip")
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether a failed Gemini call may succeed if tried again later: our queue
+    was full, the model is rate limited or overloaded, or it was unreachable
+    """
+    import httpx
+    from google.genai import errors
 
-class PredictionSlip(BaseModel):
-    is_placed_slip: bool = Field(description="True ONLY if the screenshot is a PLACED bet slip from bet history containing match dates/times for each selection. False if it is an unplaced draft or bet builder selection without match dates.")
-    matches: list[Match]
-    summary: PredictionSlipSummary
+    if isinstance(error, (RateLimitTimeout, ConnectionError, TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, errors.ServerError):
+        return True
+    return is_quota_error(str(error))
 
 
-def _optimize_image_turbo(image_path_or_bytes) -> tuple[bytes, str]:
+def get_client():
     """
-    Aggressive optimization: Grayscale + Resize + Low Q JPEG
-    (Exactly from langextract/betslip_fast_extractor.py)
+    The process-wide genai.Client, created (and google.genai imported) on
+    first use
+
+    Returns:
+        genai.Client, or None without GEMINI_API_KEY
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv('GEMINI_API_KEY')
+                if not api_key:
+                    logger.error("No API key found. Set GEMINI_API_KEY in your .env file")
+                    return None
+                import google.genai as genai
+                _client = genai.Client(api_key=api_key)
+    return _client
+
+
+def model_status() -> list:
+    """Breaker state, latency and queue wait of each fallback model"""
+    health, limiter = ModelHealth(), GeminiLimiter()
+    rows = health.snapshot(FALLBACK_MODELS)
+    for row in rows:
+        row.update(limiter.stats(row['model']))
+    return rows
+
+
+def _optimize_image_turbo(image_path_or_bytes) -> tuple[list, str]:
+    """
+    Aggressive optimization: Grayscale + Crop to content + Resize + Low Q JPEG
+    (Based on langextract/betslip_fast_extractor.py)
+
+    Runs in the image process pool; JPEGs are decoded straight to grayscale
+    at reduced size. Tall slips come back as several tiles, top to bottom.
     """
+    from .image_processing import model_input_tiles, run_image_job
+
     try:
         # Handle both file path and bytes
         if isinstance(image_path_or_bytes, bytes):
-            img = Image.open(io.BytesIO(image_path_or_bytes))
+            data = image_path_or_bytes
         else:
-            img = Image.open(image_path_or_bytes)
-
-        # 1. Convert to Grayscale ('L').
-        # This removes color data, reducing payload size by ~66%.
-        img = img.convert('L')
-
-        # 2. Resize if larger than limit
-        if max(img.size) > MAX_DIMENSION:
-            img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+            with open(image_path_or_bytes, 'rb') as f:
+                data = f.read()
 
-        # 3. Save to buffer with lower quality
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=False)
-        return buffer.getvalue(), 'image/jpeg'
+        return run_image_job(model_input_tiles, data), 'image/jpeg'
     except Exception as e:
         raise ValueError(f"Image processing failed: {e}")
 
 
-def extract_betslip_turbo(image_path_or_bytes) -> dict:
+def _hedging_enabled() -> bool:
+    from django.conf import settings
+    return getattr(settings, 'GEMINI_HEDGE_REQUESTS', False)
+
+
+def _call_with_hedge(call, model: str, backup: str = None, hedge_after: float = None):
+    """
+    Call a model, and if it hasn't answered after hedge_after seconds (its
+    p95 latency) also call the backup model; the first success wins.
+
+    Yields (model, (result, latency)) or (model, exception) per finished call,
+    stopping after the first success. A losing call is left to finish in the
+    background.
+    """
+    if not hedge_after:
+        try:
+            yield model, call(model)
+        except Exception as e:
+            yield model, e
+        return
+
+    def run(target_model):
+        from django.db import connection
+        try:
+            return call(target_model)
+        finally:
+            # The limiter may have used a database cache connection in this thread
+            connection.close()
+
+    futures = {_hedge_pool.submit(run, model): model}
+    done, pending = wait(futures, timeout=hedge_after)
+    if not done:
+        logger.info(f"{model} slower than its p95 ({hedge_after:.2f}s), hedging with {backup}")
+        futures[_hedge_pool.submit(run, backup)] = backup
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                yield futures[future], future.result()
+                return
+            except Exception as e:
+                yield futures[future], e
+
+
+def extract_betslip_turbo(image_path_or_bytes, model_input=None) -> dict:
     """
     Fast betslip extraction with model fallback support.
+
+    Args:
+        image_path_or_bytes: Screenshot file path or bytes
+        model_input: Already optimized JPEG tile(s) (from Tip.compress_screenshot), skips re-decoding
     """
     start_total = time.time()
 
+    client = get_client()
     if not client:
         return {"success": False, "error": "API client not initialized. Check API key."}
 
+    from google.genai import types
+    from .betslip_schema import PredictionSlip
+
     # 1. Prepare Image (CPU Bound - very fast)
     try:
-        image_data, mime_type = _optimize_image_turbo(image_path_or_bytes)
+        if model_input is not None:
+            tiles, mime_type = model_input, 'image/jpeg'
+        else:
+            tiles, mime_type = _optimize_image_turbo(image_path_or_bytes)
+        if isinstance(tiles, bytes):
+            tiles = [tiles]
+        image_parts = [types.Part.from_bytes(data=tile, mime_type=mime_type) for tile in tiles]
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -101,47 +192,85 @@ def extract_betslip_turbo(image_path_or_bytes) -> dict:
         "2. Set is_placed_slip to TRUE ONLY if this image is a placed bet history statement containing explicit dates (e.g. DD/MM/YY HH:MM) for every match.\n"
         "3. For match_date: extract ONLY the date string printed on that match row (e.g. '23/07/26'). If no date is printed for a match, set match_date to an empty string \"\"."
     )
+    if len(image_parts) > 1:
+        prompt += (
+            f"\nThe slip is split into {len(image_parts)} images, in order from top to bottom. "
+            "Consecutive images may repeat a few pixel rows; list every match exactly once."
+        )
 
     # 3. API Call with Fallback Model Support
+    # Models whose breaker is open (quota exhausted, failing) are skipped
+    # without a request; see model_health
+    # Every call also waits for a cluster-wide rate slot; see rate_limit.
+    # The whole chain shares one queue wait, so trying the fallbacks never
+    # waits longer than GEMINI_MAX_QUEUE_WAIT in total
+    health, limiter = ModelHealth(), GeminiLimiter()
+    admit_deadline = time.monotonic() + limiter.max_wait
+    models = health.available_models(FALLBACK_MODELS)
     result_dict = None
-    last_error = ""
-
-    for target_model in FALLBACK_MODELS:
-        try:
+    last_error = "" if models else health.last_error(FALLBACK_MODELS) or "No Gemini model available"
+    busy = out_of_permits = False
+    # Every breaker open (they reopen after a cooldown) or any model failing
+    # for a passing reason: worth extracting again later
+    transient = not models
+
+    def call(target_model):
+        with limiter.admit(target_model, deadline=admit_deadline):
             t_req_start = time.time()
             response = client.models.generate_content(
                 model=target_model,
-                contents=[prompt, types.Part.from_bytes(data=image_data, mime_type=mime_type)],
+                contents=[prompt, *image_parts],
                 config=types.GenerateContentConfig(
                     temperature=0.0,
                     response_mime_type='application/json',
                     response_schema=PredictionSlip,
                 )
             )
-            if hasattr(response, 'parsed') and response.parsed:
-                result_dict = response.parsed.model_dump()
-            else:
-                result_dict = json.loads(response.text)
-                
-            logger.info(f"✓ Gemini Model ({target_model}) API Call Time: {time.time() - t_req_start:.2f}s")
-            break
-        except Exception as e:
-            err_str = str(e)
-            last_error = err_str
-            logger.warning(f"Model {target_model} failed: {err_str[:150]}")
-            if "RESOURCE_EXHAUSTED" in err_str or "429" in err_str:
-                # Quota hit on this model, try fallback
-                continue
-            elif "NOT_FOUND" in err_str or "404" in err_str:
+        if hasattr(response, 'parsed') and response.parsed:
+            parsed = response.parsed.model_dump()
+        else:
+            parsed = json.loads(response.text)
+        return parsed, time.time() - t_req_start
+
+    tried = set()
+    # Hedged calls run on other threads: time the wait for them here
+    with external_call('gemini'):
+        for index, target_model in enumerate(models):
+            if target_model in tried:
                 continue
+            backup = next((m for m in models[index + 1:] if m not in tried), None)
+            hedge_after = health.p95_latency(target_model) if backup and _hedging_enabled() else None
+
+            for model, outcome in _call_with_hedge(call, target_model, backup, hedge_after):
+                tried.add(model)
+                if isinstance(outcome, RateLimitTimeout):
+                    # Our own queue is full: not the model's fault, keep its breaker closed
+                    busy, last_error = True, str(outcome)
+                    logger.warning(f"Model {model} skipped: {last_error}")
+                    # Permits are shared by every model: the next one would wait in vain
+                    out_of_permits = out_of_permits or isinstance(outcome, PermitTimeout)
+                    transient = True
+                elif isinstance(outcome, Exception):
+                    last_error = str(outcome)
+                    busy = False
+                    transient = transient or is_transient_error(outcome)
+                    logger.warning(f"Model {model} failed: {last_error[:150]}")
+                    health.record_failure(model, last_error)
+                else:
+                    result_dict, latency = outcome
+                    health.record_success(model, latency)
+                    logger.info(f"✓ Gemini Model ({model}) API Call Time: {latency:.2f}s")
+                    break
+            if result_dict or out_of_permits:
+                break
 
     if not result_dict:
-        if "RESOURCE_EXHAUSTED" in last_error or "429" in last_error:
-            return {
-                "success": False,
-                "error": "Gemini AI daily rate limit exceeded. Please wait a moment or upgrade your Google AI Studio API key quota."
-            }
-        return {"success": False, "error": f"Extraction failed: {last_error}"}
+        # 'retryable': the slip itself is fine, the task queue may try again
+        if busy:
+            return {"success": False, "error": BUSY_MESSAGE, "retryable": True}
+        if is_quota_error(last_error):
+            return {"success": False, "error": RATE_LIMIT_MESSAGE, "retryable": True}
+        return {"success": False, "error": f"Extraction failed: {last_error}", "retryable": transient}
 
     # 4. Fast Parsing & Math Check
     # Quick Math Validation
@@ -167,27 +296,31 @@ def extract_betslip_turbo(image_path_or_bytes) -> dict:
 
 
 
-def process_betslip_image(image_file) -> dict:
+def process_betslip_image(image_file, model_input=None) -> dict:
     """
     Django-compatible wrapper for extract_betslip_turbo
     Maintains compatibility with existing background_tasks.py
 
     Args:
         image_file: Django UploadedFile or file-like object
+        model_input: Optimized JPEG tile(s) already produced with the archival
+            WebP (Tip.compress_screenshot); the screenshot is then not read again
 
     Returns:
         dict: Compatible with existing OCR interface
     """
     try:
         # Read image bytes
-        if hasattr(image_file, 'read'):
+        if model_input is not None:
+            image_bytes = None
+        elif hasattr(image_file, 'read'):
             image_bytes = image_file.read()
             image_file.seek(0)  # Reset file pointer
         else:
             image_bytes = image_file
 
         # Extract using turbo method
-        result = extract_betslip_turbo(image_bytes)
+        result = extract_betslip_turbo(image_bytes, model_input=model_input)
 
         if not result['success']:
             return result
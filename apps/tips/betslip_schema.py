@@ -0,0 +1,27 @@
+"""
+Structured output schema of the Gemini betslip extraction
+
+Imported by betslip_extractor on first extraction only (pydantic is slow to
+import).
+"""
+from pydantic import BaseModel, Field
+
+
+class Match(BaseModel):
+    match_date: str = Field(description="Date of the match (e.g. DD/MM/YY or DD/MM/YYYY). Must be empty string if date is not explicitly shown on the slip.")
+    match_time: str = Field(description="Kickoff time (e.g. HH:MM). Must be empty string if time is not explicitly shown.")
+    home_team: str
+    away_team: str
+    bet_type: str = Field(description="Betting market or type (e.g. 3 Way, Over/Under)")
+    pick: str = Field(description="The user's pick or selection")
+    odds: float = Field(description="The multiplier/odds for this selection")
+
+
+class PredictionSlipSummary(BaseModel):
+    total_odds: float = Field(description="The total multiplier/odds for the entire slip")
+
+
+class PredictionSlip(BaseModel):
+    is_placed_slip: bool = Field(description="True ONLY if the screenshot is a PLACED bet slip from bet history containing match dates/times for each selection. False if it is an unplaced draft or bet builder selection without match dates.")
+    matches: list[Match]
+    summary: PredictionSlipSummary
@@ -3,16 +3,8 @@ Service to enrich betslip data with accurate match information from API-Football
 """
 import logging
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, List, Dict
-try:
-    from fuzzywuzzy import fuzz
-except ImportError:
-    from difflib import SequenceMatcher
-    class FuzzFallback:
-        @staticmethod
-        def ratio(s1, s2):
-            return int(SequenceMatcher(None, str(s1), str(s2)).ratio() * 100)
-    fuzz = FuzzFallback()
 from django.db.models import Q
 
 from apps.fixtures.models import Fixture, Team
@@ -22,6 +14,21 @@ from .models import TipMatch
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _fuzz():
+    """fuzzywuzzy's fuzz module, imported on first team-name comparison"""
+    try:
+        from fuzzywuzzy import fuzz
+    except ImportError:
+        from difflib import SequenceMatcher
+        class FuzzFallback:
+            @staticmethod
+            def ratio(s1, s2):
+                return int(SequenceMatcher(None, str(s1), str(s2)).ratio() * 100)
+        fuzz = FuzzFallback()
+    return fuzz
+
+
 class DataEnrichmentService:
     """Service to enrich scraped betslip data with API-Football data"""
 
@@ -73,6 +80,7 @@ class DataEnrichmentService:
         norm2 = self._normalize_team_name(team2)
 
         # Use multiple fuzzy matching algorithms
+        fuzz = _fuzz()
         ratio = fuzz.ratio(norm1.lower(), norm2.lower())
         partial_ratio = fuzz.partial_ratio(norm1.lower(), norm2.lower())
         token_sort_ratio = fuzz.token_sort_ratio(norm1.lower(), norm2.lower())
@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -6,16 +7,43 @@ from datetime import timedelta
 from .models import Tip, TipMatch
 
 
+def validate_screenshot(screenshot):
+    """Reject uploads that are too large or not images"""
+    # Check file size (max 5MB)
+    if screenshot.size > 5 * 1024 * 1024:
+        raise ValidationError(f"{screenshot.name}: image file too large (max 5MB)")
+
+    # Check file type
+    if not screenshot.content_type.startswith('image/'):
+        raise ValidationError(f"{screenshot.name}: file must be an image")
+
+
+def failed_drafts(tipster, bet_codes):
+    """
+    The tipster's own drafts whose extraction failed, among bet_codes
+
+    A resubmission replaces them, so they don't hold on to their bet codes.
+    """
+    return Tip.objects.filter(
+        tipster=tipster, bet_code__in=bet_codes, status='draft', processing_status='failed'
+    )
+
+
+def taken_bet_codes(tipster, bet_codes):
+    """bet_codes already used by a tip other than the tipster's failed drafts"""
+    return Tip.objects.filter(bet_code__in=bet_codes).exclude(
+        pk__in=failed_drafts(tipster, bet_codes).values('pk')
+    ).values_list('bet_code', flat=True)
+
 
 class TipSubmissionForm(forms.ModelForm):
     """Form for initial tip submission with betslip upload or sharing link"""
 
-    # MVP1: Only SportPesa available
     # To enable more bookmakers, uncomment the ones below:
     AVAILABLE_BOOKMAKERS = [
         ('sportpesa', 'SportPesa'),
-        # ('betika', 'Betika'),      # Coming soon
-        # ('odibets', 'Odibets'),    # Coming soon
+        ('betika', 'Betika'),        # Share links parsed directly
+        ('odibets', 'Odibets'),      # Share links parsed directly
         # ('mozzart', 'Mozzart'),    # Coming soon
         # ('betin', 'Betin'),        # Coming soon
         # ('other', 'Other'),        # Coming soon
@@ -34,43 +62,54 @@ class TipSubmissionForm(forms.ModelForm):
 
     class Meta:
         model = Tip
-        fields = ['bookmaker', 'bet_code', 'screenshot']
+        fields = ['bookmaker', 'bet_code', 'bet_sharing_link', 'screenshot']
         widgets = {
             'bookmaker': forms.Select(attrs={
                 'class': 'form-select',
                 'required': True
             }),
+            'bet_sharing_link': forms.URLInput(attrs={
+                'class': 'form-input',
+                'placeholder': 'https://... (optional)'
+            }),
             'screenshot': forms.FileInput(attrs={
                 'class': 'form-input',
                 'accept': 'image/*',
                 'required': True
             })
         }
+        help_texts = {
+            # Bookmakers with a slip extractor skip the Gemini call
+            'bet_sharing_link': 'Placed Betika and Odibets bets are read directly from their share link, without waiting for image extraction',
+        }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, tipster=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.tipster = tipster
         # Override bookmaker choices to only show available ones
         self.fields['bookmaker'].choices = self.AVAILABLE_BOOKMAKERS
     
     def clean_bet_code(self):
         bet_code = self.cleaned_data.get('bet_code', '').strip().upper()
         if bet_code:
-            # Check if bet code already exists
-            if Tip.objects.filter(bet_code=bet_code).exists():
+            # Check if bet code already exists (the tipster's failed drafts are replaced)
+            if taken_bet_codes(self.tipster, [bet_code]).exists():
                 raise ValidationError("A tip with this bet code already exists. Please check your bet code.")
         return bet_code
 
+    def validate_unique(self):
+        # clean_bet_code checks bet_code, letting through the failed drafts the submission replaces
+        exclude = self._get_validation_exclusions()
+        exclude.add('bet_code')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as e:
+            self._update_errors(e)
+
     def clean_screenshot(self):
         screenshot = self.cleaned_data.get('screenshot')
         if screenshot:
-            # Check file size (max 5MB)
-            if screenshot.size > 5 * 1024 * 1024:
-                raise ValidationError("Image file too large (max 5MB)")
-
-            # Check file type
-            if not screenshot.content_type.startswith('image/'):
-                raise ValidationError("File must be an image")
-
+            validate_screenshot(screenshot)
         return screenshot
 
     def clean(self):
@@ -86,6 +125,91 @@ class TipSubmissionForm(forms.ModelForm):
         return cleaned_data
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """File field accepting several files, cleaned to a list"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)) and data:
+            return [single_file_clean(item, initial) for item in data]
+        return [single_file_clean(data, initial)]
+
+
+class BatchTipSubmissionForm(forms.Form):
+    """Form for submitting several betslip screenshots at once"""
+
+    bookmaker = forms.ChoiceField(
+        choices=TipSubmissionForm.AVAILABLE_BOOKMAKERS,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    screenshots = MultipleFileField(
+        widget=MultipleFileInput(attrs={'class': 'form-input', 'accept': 'image/*'}),
+        help_text='Select all your prediction slip screenshots'
+    )
+
+    bet_codes = forms.CharField(
+        widget=forms.Textarea(attrs={
+            'class': 'form-input',
+            'rows': 5,
+            'placeholder': 'One bet code per line, in the same order as the screenshots',
+            'style': 'text-transform: uppercase;'
+        }),
+        help_text='One bet code per line, in the same order as the screenshots'
+    )
+
+    def __init__(self, *args, tipster=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tipster = tipster
+
+    @staticmethod
+    def split_bet_codes(text):
+        return [line.strip().upper() for line in (text or '').splitlines() if line.strip()]
+
+    def clean_screenshots(self):
+        screenshots = self.cleaned_data.get('screenshots', [])
+        max_slips = getattr(settings, 'BATCH_UPLOAD_MAX_SLIPS', 20)
+        if len(screenshots) > max_slips:
+            raise ValidationError(f"Upload at most {max_slips} prediction slips at once.")
+        for screenshot in screenshots:
+            validate_screenshot(screenshot)
+        return screenshots
+
+    def clean_bet_codes(self):
+        bet_codes = self.split_bet_codes(self.cleaned_data.get('bet_codes'))
+        duplicates = sorted({code for code in bet_codes if bet_codes.count(code) > 1})
+        if duplicates:
+            raise ValidationError(f"Bet codes listed more than once: {', '.join(duplicates)}")
+        # The tipster's failed drafts are replaced by the batch
+        taken = list(taken_bet_codes(self.tipster, bet_codes))
+        if taken:
+            raise ValidationError(f"Tips with these bet codes already exist: {', '.join(sorted(taken))}")
+        return bet_codes
+
+    def clean(self):
+        cleaned_data = super().clean()
+        screenshots = cleaned_data.get('screenshots')
+        bet_codes = cleaned_data.get('bet_codes')
+
+        if screenshots and bet_codes is not None and len(screenshots) != len(bet_codes):
+            raise ValidationError(
+                f"{len(screenshots)} screenshots but {len(bet_codes)} bet codes: "
+                "enter one bet code per screenshot."
+            )
+        if screenshots and bet_codes:
+            cleaned_data['slips'] = list(zip(bet_codes, screenshots))
+
+        return cleaned_data
+
+
 class TipVerificationForm(forms.Form):
     """Form for verifying and editing OCR-extracted data"""
     
@@ -0,0 +1,404 @@
+"""
+Betslip screenshot processing off the request thread
+
+The transforms are CPU-bound Pillow work that holds the GIL, so in the task
+worker they run in a small process pool (settings.IMAGE_PROCESS_WORKERS; 0
+runs them inline). Web workers always run them inline: a forkserver and pool
+process per gunicorn worker would not fit in memory, and the heavy work is
+enqueued for the task worker anyway.
+Each screenshot is decoded once: the archival WebP and the grayscale JPEG
+tiles sent to Gemini are both produced from the same decoded image, and JPEG
+uploads are decoded at reduced size with Image.draft().
+
+The model input is cropped to the slip content (blank margins, solid bars
+and the phone status bar are trimmed). Tall slips are cut into tiles at the
+blank gaps between legs instead of being shrunk to fit 800px, which would
+leave the text unreadable.
+
+The job functions only take and return bytes, and this module imports
+nothing from Django at import time, so pool workers start quickly.
+"""
+import io
+import logging
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageChops, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Archival copy kept in media storage
+ARCHIVE_MAX_WIDTH = 1080
+ARCHIVE_QUALITY = 80
+ARCHIVE_METHOD = 4
+
+# Downscaled copies for srcset: marketplace cards and the tip detail page
+SCREENSHOT_VARIANT_WIDTHS = (320, 640)
+VARIANT_QUALITY = 75
+
+# Model input: grayscale, small, low quality JPEG is plenty for high-contrast slip text
+MODEL_MAX_DIMENSION = 800
+MODEL_JPEG_QUALITY = 60
+
+# Tall slips (height / width above MODEL_TALL_ASPECT after cropping) are sent
+# as up to MODEL_MAX_TILES tiles of MODEL_TILE_WIDTH x MODEL_MAX_DIMENSION
+MODEL_TALL_ASPECT = 2.0
+MODEL_TILE_WIDTH = 480
+MODEL_MAX_TILES = 4
+TILE_OVERLAP = 32  # px repeated across a cut that found no blank gap
+
+# Content detection: a pixel is "ink" when it differs from its right or lower
+# neighbour by more than INK_THRESHOLD (text, icons, borders; not flat fills)
+INK_THRESHOLD = 24
+CONTENT_PADDING = 8
+# A block of ink ending within the top STATUS_BAR_MAX_SHARE of a phone
+# screenshot, followed by a blank gap, is the status bar (clock, battery)
+STATUS_BAR_MAX_SHARE = 0.035
+PHONE_ASPECT = 1.6
+
+# dHash grid for the extraction cache: fine enough for text lines to register,
+# 2048 bits stored as 512 hex characters
+HASH_WIDTH = 32
+HASH_HEIGHT = 64
+
+IMAGE_JOB_TIMEOUT = 60  # seconds
+
+
+def _decode(data: bytes, mode: str, **fit) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode image bytes, at reduced size for JPEGs
+
+    draft() makes the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding,
+    keeping the result at least the target size, so a 3000px photo of a slip
+    isn't fully decoded just to be shrunk to 1080px.
+
+    Args:
+        fit: max_width / max_dimension bounds of the wanted output
+
+    Returns:
+        (decoded image, target size within the bounds)
+    """
+    img = Image.open(io.BytesIO(data))
+    target = _scaled_size(img.size, **fit)
+    if img.format == 'JPEG':
+        img.draft(mode, target)
+    img.load()
+    return img, target
+
+
+def _scaled_size(size: Tuple[int, int], max_width: int = None, max_dimension: int = None) -> Tuple[int, int]:
+    """Size after fitting within max_width and/or max_dimension, never upscaled"""
+    width, height = size
+    scale = 1.0
+    if max_width and width > max_width:
+        scale = min(scale, max_width / width)
+    if max_dimension and max(width, height) > max_dimension:
+        scale = min(scale, max_dimension / max(width, height))
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to RGB"""
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img.convert('RGBA'), mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _model_jpeg(img: Image.Image, max_dimension: int, quality: int) -> bytes:
+    img = img.convert('L') if img.mode != 'L' else img
+    if max(img.size) > max_dimension:
+        img = img.resize(_scaled_size(img.size, max_dimension=max_dimension), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=False)
+    return buffer.getvalue()
+
+
+def _variants(img: Image.Image, widths: Tuple[int, ...]) -> Dict[int, bytes]:
+    """WebP copies at each width narrower than the image"""
+    variants = {}
+    for width in sorted(widths):
+        if width >= img.width:
+            continue
+        buffer = io.BytesIO()
+        img.resize(_scaled_size(img.size, max_width=width), Image.Resampling.LANCZOS).save(
+            buffer, format='WEBP', quality=VARIANT_QUALITY, method=ARCHIVE_METHOD
+        )
+        variants[width] = buffer.getvalue()
+    return variants
+
+
+def _ink_map(gray: Image.Image) -> Image.Image:
+    """1.0 where a grayscale pixel is ink, 0.0 elsewhere (mode F)"""
+    width, height = gray.size
+    horizontal = ImageChops.difference(gray, ImageChops.offset(gray, 1, 0))
+    vertical = ImageChops.difference(gray, ImageChops.offset(gray, 0, 1))
+    # offset() wraps around: the first column/row compares with the last one
+    horizontal.paste(0, (0, 0, 1, height))
+    vertical.paste(0, (0, 0, width, 1))
+    return ImageChops.lighter(horizontal, vertical).point(lambda v: 1 if v > INK_THRESHOLD else 0).convert('F')
+
+
+def _row_profile(ink: Image.Image) -> List[float]:
+    """Share of ink pixels in each row"""
+    return list(ink.resize((1, ink.height), Image.Resampling.BOX).getdata())
+
+
+def _column_profile(ink: Image.Image) -> List[float]:
+    """Share of ink pixels in each column"""
+    return list(ink.resize((ink.width, 1), Image.Resampling.BOX).getdata())
+
+
+def _ink_runs(profile: List[float], min_gap: int) -> List[Tuple[int, int]]:
+    """(start, end) of the stretches with ink, merging those closer than min_gap"""
+    runs = []
+    for index, value in enumerate(profile):
+        if not value:
+            continue
+        if runs and index - runs[-1][1] <= min_gap:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+    return [tuple(run) for run in runs]
+
+
+def content_box(gray: Image.Image) -> Tuple[int, int, int, int]:
+    """
+    Bounding box of the slip content in a grayscale screenshot
+
+    Trims blank margins and flat bars on every side, and a phone status bar
+    at the top. The bottom is never trimmed past ink: 'POSSIBLE WIN' bars
+    tell unplaced slips apart.
+    """
+    width, height = gray.size
+    # Detected at about 540px wide; the padding absorbs the lost precision
+    factor = max(1, width // 540)
+    ink = _ink_map(gray.reduce(factor) if factor > 1 else gray)
+    row_runs = _ink_runs(_row_profile(ink), min_gap=max(1, ink.height // 100))
+    if not row_runs:
+        return 0, 0, width, height
+
+    first = row_runs[0]
+    if len(row_runs) > 1 and height / width >= PHONE_ASPECT and first[1] <= ink.height * STATUS_BAR_MAX_SHARE:
+        row_runs = row_runs[1:]
+    top, bottom = row_runs[0][0], row_runs[-1][1]
+
+    # Columns only over the kept rows: the status bar spans the full width
+    col_runs = _ink_runs(_column_profile(ink.crop((0, top, ink.width, bottom))), min_gap=ink.width)
+    return (
+        max(0, col_runs[0][0] * factor - CONTENT_PADDING),
+        max(0, top * factor - CONTENT_PADDING),
+        min(width, col_runs[-1][1] * factor + CONTENT_PADDING),
+        min(height, bottom * factor + CONTENT_PADDING),
+    )
+
+
+def _tile_bounds(rows: List[float], tile_height: int) -> List[Tuple[int, int]]:
+    """
+    (top, bottom) of each tile, as even as possible and at most tile_height
+    tall. Cuts go through a blank gap between legs where there is one,
+    else the tiles overlap by TILE_OVERLAP.
+    """
+    height = len(rows)
+    bounds = []
+    top = 0
+    while height - top > tile_height:
+        remaining = height - top
+        target = math.ceil(remaining / math.ceil(remaining / tile_height))
+        cut = next((y for y in range(top + target, top + target * 3 // 5, -1) if not rows[y]), None)
+        if cut is not None:
+            bounds.append((top, cut))
+            top = cut
+        else:
+            bounds.append((top, top + target))
+            top = top + target - TILE_OVERLAP
+    bounds.append((top, height))
+    return bounds
+
+
+def _model_tiles(img: Image.Image) -> List[bytes]:
+    """Grayscale JPEG(s) of the slip content for the extraction model"""
+    gray = img.convert('L') if img.mode != 'L' else img
+    gray = gray.crop(content_box(gray))
+    width, height = gray.size
+    if height / width <= MODEL_TALL_ASPECT:
+        return [_model_jpeg(gray, MODEL_MAX_DIMENSION, MODEL_JPEG_QUALITY)]
+
+    # Keep the text legible: fix the width and split the height, unless that
+    # takes more than MODEL_MAX_TILES tiles
+    max_height = MODEL_MAX_TILES * (MODEL_MAX_DIMENSION - TILE_OVERLAP)
+    tile_width = min(width, MODEL_TILE_WIDTH, math.floor(max_height * width / height))
+    gray = gray.resize(_scaled_size(gray.size, max_width=tile_width), Image.Resampling.LANCZOS)
+    rows = _row_profile(_ink_map(gray))
+
+    tiles = []
+    for top, bottom in _tile_bounds(rows, MODEL_MAX_DIMENSION):
+        buffer = io.BytesIO()
+        gray.crop((0, top, gray.width, bottom)).save(buffer, format='JPEG', quality=MODEL_JPEG_QUALITY, optimize=False)
+        tiles.append(buffer.getvalue())
+    return tiles
+
+
+def _dhash(img: Image.Image) -> str:
+    """
+    Difference hash of the normalized image (grayscale, contrast stretched)
+
+    Each bit says whether a cell of the grid is brighter than its right
+    neighbour, so re-encoding, rescaling or brightness changes barely move it.
+    """
+    gray = ImageOps.autocontrast(img.convert('L'))
+    pixels = gray.resize((HASH_WIDTH + 1, HASH_HEIGHT), Image.Resampling.BOX).tobytes()
+    bits = 0
+    for row in range(HASH_HEIGHT):
+        offset = row * (HASH_WIDTH + 1)
+        for col in range(HASH_WIDTH):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{HASH_WIDTH * HASH_HEIGHT // 4}x}"
+
+
+def hash_distance(first: str, second: str) -> float:
+    """Share of differing bits between two perceptual hashes (0.0 - 1.0)"""
+    if len(first) != len(second):
+        return 1.0
+    return (int(first, 16) ^ int(second, 16)).bit_count() / (len(first) * 4)
+
+
+def perceptual_hash(data: bytes) -> str:
+    """Perceptual hash of image bytes (see _dhash)"""
+    img, _ = _decode(data, 'L', max_width=ARCHIVE_MAX_WIDTH)
+    return _dhash(_to_rgb(img) if img.mode in ('RGBA', 'LA', 'P') else img)
+
+
+def process_screenshot(data: bytes) -> Dict:
+    """
+    Produce the archival WebP and the model-input JPEG from one decode
+
+    Args:
+        data: Uploaded screenshot bytes (any format Pillow reads)
+
+    Returns:
+        dict with 'archive' (WebP bytes), 'size' (archive width, height),
+        'variants' ({width: WebP bytes}), 'model_input' (list of grayscale
+        JPEG tiles, see model_input_tiles) and 'dhash' (perceptual hash, hex)
+    """
+    img, archive_size = _decode(data, 'RGB', max_width=ARCHIVE_MAX_WIDTH)
+    img = _to_rgb(img)
+    if img.size != archive_size:
+        img = img.resize(archive_size, Image.Resampling.LANCZOS)
+
+    archive = io.BytesIO()
+    img.save(archive, format='WEBP', quality=ARCHIVE_QUALITY, method=ARCHIVE_METHOD)
+
+    return {
+        'archive': archive.getvalue(),
+        'size': img.size,
+        'variants': _variants(img, SCREENSHOT_VARIANT_WIDTHS),
+        'dhash': _dhash(img),
+        # The archive is at most 1080px wide, a cheap starting point for the model input
+        'model_input': _model_tiles(img),
+    }
+
+
+def model_input_jpeg(data: bytes, max_dimension: int = MODEL_MAX_DIMENSION, quality: int = MODEL_JPEG_QUALITY) -> bytes:
+    """
+    Grayscale, downscaled JPEG for the extraction model
+
+    JPEG inputs are decoded straight to grayscale at reduced size.
+    """
+    img, _ = _decode(data, 'L', max_dimension=max_dimension)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = _to_rgb(img)
+    return _model_jpeg(img, max_dimension, quality)
+
+
+def model_input_tiles(data: bytes) -> List[bytes]:
+    """
+    Content-cropped grayscale JPEG tiles for the extraction model, top to
+    bottom (a single image unless the slip is tall)
+    """
+    img, _ = _decode(data, 'L', max_width=ARCHIVE_MAX_WIDTH)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = _to_rgb(img)
+    return _model_tiles(img)
+
+
+def screenshot_variants(data: bytes) -> Dict:
+    """
+    Variants of an already archived screenshot, without re-encoding it
+
+    Returns:
+        dict with 'size' (archive width, height) and 'variants' ({width: WebP bytes})
+    """
+    img, _ = _decode(data, 'RGB')
+    img = _to_rgb(img)
+    return {'size': img.size, 'variants': _variants(img, SCREENSHOT_VARIANT_WIDTHS)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set by the task worker; every other process runs image jobs inline
+_pool_enabled = False
+
+
+def enable_pool():
+    """Run image jobs of this process in the pool (called by the task worker)"""
+    global _pool_enabled
+    _pool_enabled = True
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: never fork a process that may be running request/queue threads
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the worker processes (they are recreated on the next job)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_image_job(func, *args):
+    """
+    Run an image job in the process pool
+
+    Runs inline outside the task worker, when the pool is disabled, and when
+    the pool is broken or the job times out there.
+    """
+    from django.conf import settings
+
+    workers = getattr(settings, 'IMAGE_PROCESS_WORKERS', 1)
+    if not _pool_enabled or workers <= 0:
+        return func(*args)
+
+    future = _get_pool(workers).submit(func, *args)
+    try:
+        return future.result(timeout=IMAGE_JOB_TIMEOUT)
+    except BrokenProcessPool:
+        logger.warning("Image process pool broke, restarting it and processing inline")
+        shutdown_pool()
+        return func(*args)
+    except FutureTimeoutError:
+        # A stuck job keeps its pool process busy: let it finish in the old pool
+        logger.warning(f"{func.__name__} took over {IMAGE_JOB_TIMEOUT}s in the pool, restarting it and processing inline")
+        future.cancel()
+        shutdown_pool()
+        return func(*args)
@@ -0,0 +1,49 @@
+"""
+Django management command to create screenshot variants for existing tips.
+
+Tips uploaded before responsive variants existed only have the archival
+WebP; this adds the card/detail sized copies used in srcset. Screenshots
+that were never compressed are compressed once.
+
+Usage:
+    python manage.py backfill_screenshot_variants
+    python manage.py backfill_screenshot_variants --limit 500
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.tips.models import Tip
+
+
+class Command(BaseCommand):
+    help = 'Create srcset screenshot variants for tips that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum number of tips to process')
+
+    def handle(self, *args, **options):
+        tips = Tip.objects.exclude(screenshot='').exclude(screenshot__isnull=True).filter(
+            screenshot_variants={}
+        ).only('id', 'screenshot', 'screenshot_compressed', 'screenshot_variants').order_by('id')
+        if options['limit']:
+            tips = tips[:options['limit']]
+
+        processed = failed = 0
+        for tip in tips.iterator():
+            if tip.screenshot_compressed:
+                ok = tip.generate_screenshot_variants()
+            else:
+                ok = tip.compress_screenshot() is not None
+
+            if ok:
+                # Only the screenshot fields: no updated_at bump, no other side effects
+                Tip.objects.filter(id=tip.id).update(
+                    screenshot=tip.screenshot.name,
+                    screenshot_compressed=True,
+                    screenshot_variants=tip.screenshot_variants,
+                )
+                processed += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Variants created for {processed} tip(s), {failed} failed"))
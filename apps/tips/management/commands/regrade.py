@@ -0,0 +1,117 @@
+"""
+Django management command to backtest the grading rules over stored results.
+
+Grades every historical TipMatch linked to a concluded Fixture with the current
+market rules, offline and in parallel, and reports what would change.
+
+Usage:
+    python manage.py regrade
+    python manage.py regrade --since 2025-01-01 --until 2025-06-30
+    python manage.py regrade --workers 8 --report regrade.csv
+    python manage.py regrade --apply
+"""
+
+import csv
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tips.services.regrader import Regrader
+
+
+class Command(BaseCommand):
+    help = 'Regrade historical tips against stored fixture scores (no network) and report changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, default=None, help='First match date, YYYY-MM-DD')
+        parser.add_argument('--until', type=str, default=None, help='Last match date, YYYY-MM-DD')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Grading processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write changed results (default: report only)',
+        )
+        parser.add_argument(
+            '--include-manual',
+            action='store_true',
+            help='Also regrade legs whose result was entered by hand',
+        )
+        parser.add_argument('--report', type=str, default=None, help='Write every changed leg to this CSV file')
+        parser.add_argument('--show', type=int, default=20, help='Changed legs to print (default: 20)')
+
+    def handle(self, *args, **options):
+        since = self._parse_date(options['since'])
+        until = self._parse_date(options['until'])
+
+        report = Regrader(workers=options['workers']).run(
+            since=since,
+            until=until,
+            apply=options['apply'],
+            include_manual=options['include_manual'],
+        )
+
+        leg_changes = report['leg_changes']
+
+        self.stdout.write("\n" + "="*60)
+        self.stdout.write(self.style.SUCCESS("REGRADE COMPLETE" + (" (APPLIED)" if report['applied'] else " (DRY RUN)")))
+        self.stdout.write("="*60)
+        self.stdout.write(f"Legs regraded:        {report['legs_checked']}")
+        self.stdout.write(f"Legs skipped (manual): {report['legs_skipped_manual']}")
+        self.stdout.write(f"Legs not concluded:   {report['legs_not_concluded']}")
+        self.stdout.write(f"Market specs changed: {report['spec_changes']}")
+        self.stdout.write(f"Leg outcomes changed: {len(leg_changes)}")
+        self.stdout.write(f"Tip outcomes changed: {len(report['tip_changes'])}")
+
+        if leg_changes:
+            self.stdout.write("\nChanged legs:")
+            for change in leg_changes[:options['show']]:
+                self.stdout.write(
+                    f"  #{change['leg_id']} {change['match']} | {change['market']} / {change['selection']} | "
+                    f"{change['result']}: {change['old']} -> {change['new']}"
+                )
+            if len(leg_changes) > options['show']:
+                self.stdout.write(f"  ... and {len(leg_changes) - options['show']} more")
+
+        if report['tip_changes']:
+            self.stdout.write("\nChanged tips:")
+            for change in report['tip_changes'][:options['show']]:
+                self.stdout.write(
+                    f"  {change['bet_code'] or change['tip_id']} ({change['tipster']}): "
+                    f"{change['old']} -> {change['new']}"
+                )
+
+        if report['tipster_deltas']:
+            self.stdout.write("\nTipster win rate:")
+            for delta in report['tipster_deltas']:
+                self.stdout.write(
+                    f"  {delta['tipster']}: {delta['before']}% -> {delta['after']}% ({delta['delta']:+.1f})"
+                )
+
+        self.stdout.write("="*60 + "\n")
+
+        if options['report']:
+            self._write_csv(options['report'], leg_changes)
+            self.stdout.write(f"Diff report written to {options['report']}")
+
+        if leg_changes and not report['applied']:
+            self.stdout.write(self.style.WARNING("Dry run: re-run with --apply to write these changes"))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    def _write_csv(self, path, leg_changes):
+        fields = ['leg_id', 'tip_id', 'match', 'market', 'selection', 'result', 'old', 'new']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(leg_changes)
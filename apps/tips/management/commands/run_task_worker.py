@@ -0,0 +1,122 @@
+"""
+Django management command to run the database task queue worker.
+
+Executes tasks queued with enqueue_task when TASK_QUEUE_BACKEND='database'.
+Runs until SIGTERM/SIGINT; a task in progress is finished before exiting.
+
+Usage:
+    python manage.py run_task_worker
+    python manage.py run_task_worker --concurrency 2
+    python manage.py run_task_worker --burst
+"""
+
+import logging
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.tips import image_processing
+from apps.tips.task_queue import DatabaseTaskQueue, default_worker_name
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 3600  # seconds between purges of old succeeded tasks
+
+
+class Command(BaseCommand):
+    help = 'Run the database-backed background task worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Worker threads (default: TASK_QUEUE_WORKERS setting)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when no task is due (default: 2)',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Execute the tasks that are due, then exit',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or getattr(settings, 'TASK_QUEUE_WORKERS', 3)
+        if not connection.features.has_select_for_update_skip_locked and concurrency > 1:
+            logger.warning(f"{connection.vendor} can't skip locked rows, running a single worker thread")
+            concurrency = 1
+
+        task_queue = DatabaseTaskQueue()
+        stop = threading.Event()
+        # Screenshots are decoded here, not in the web workers
+        image_processing.enable_pool()
+
+        if options['burst']:
+            executed = task_queue.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Executed {executed} task(s)"))
+            return
+
+        def request_stop(signum, frame):
+            logger.info(f"Received signal {signum}, finishing current tasks")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(task_queue, stop, options['poll_interval']),
+                name=f"TaskWorker-{i + 1}",
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(self.style.SUCCESS(f"Task worker started with {concurrency} thread(s)"))
+
+        last_purge = 0.0
+        retention_days = getattr(settings, 'TASK_QUEUE_RETENTION_DAYS', 7)
+        while not stop.is_set():
+            if time.monotonic() - last_purge > PURGE_INTERVAL:
+                purged = task_queue.purge(retention_days)
+                if purged:
+                    logger.info(f"Purged {purged} succeeded task(s) older than {retention_days} days")
+                close_old_connections()
+                last_purge = time.monotonic()
+            stop.wait(1)
+
+        for thread in threads:
+            thread.join()
+        image_processing.shutdown_pool()
+        self.stdout.write("Task worker stopped")
+
+    def _work(self, task_queue, stop, poll_interval):
+        """Claim and execute tasks until asked to stop"""
+        worker_name = default_worker_name()
+        try:
+            while not stop.is_set():
+                try:
+                    task = task_queue.claim(worker_name)
+                    if task is None:
+                        stop.wait(poll_interval)
+                        continue
+                    task_queue.execute(task)
+                except Exception as e:
+                    # Database unavailable or similar: back off and keep the worker alive
+                    logger.error(f"Worker {worker_name} error: {str(e)}", exc_info=True)
+                    stop.wait(poll_interval)
+                finally:
+                    close_old_connections()
+        finally:
+            connection.close()
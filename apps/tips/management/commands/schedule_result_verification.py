@@ -30,11 +30,11 @@ class Command(BaseCommand):
         logger.info("="*60)
 
         try:
-            # Verify today's tips
+            # Only revisit legs whose fixture changed since the last run
             verifier = ResultVerifier()
-            stats = verifier.verify_tips()
+            stats = verifier.verify_tips(incremental=True)
 
-            logger.info("VERIFICATION STATS:")
+            logger.info(f"VERIFICATION STATS (sweep: {stats['sweep']}):")
             logger.info(f"  Tips checked: {stats['tips_checked']}")
             logger.info(f"  Tips verified: {stats['tips_verified']}")
             logger.info(f"  Tips WON: {stats['tips_won']}")
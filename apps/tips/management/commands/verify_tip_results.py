@@ -4,6 +4,8 @@ Django management command to verify tip results using livescore data.
 Usage:
     python manage.py verify_tip_results
     python manage.py verify_tip_results --date 2025-11-07
+    python manage.py verify_tip_results --incremental
+    python manage.py verify_tip_results --workers 4
 """
 
 from django.core.management.base import BaseCommand
@@ -21,6 +23,17 @@ class Command(BaseCommand):
             help='Date to verify in format YYYY-MM-DD (default: today)',
             default=None
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only revisit legs whose fixture changed since the last incremental run',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Parallel grading workers (default: RESULT_VERIFICATION_WORKERS setting)',
+        )
 
     def handle(self, *args, **options):
         date = options['date']
@@ -32,7 +45,11 @@ class Command(BaseCommand):
 
         # Run verification
         verifier = ResultVerifier()
-        stats = verifier.verify_tips(date=date)
+        stats = verifier.verify_tips(
+            date=date,
+            incremental=options['incremental'],
+            workers=options['workers']
+        )
 
         # Display results
         self.stdout.write("\n" + "="*60)
@@ -46,6 +63,12 @@ class Command(BaseCommand):
         self.stdout.write(f"Tips pending:        {stats['tips_pending']}")
         self.stdout.write(f"Matches verified:    {stats['matches_verified']}")
         self.stdout.write(f"Matches not found:   {stats['matches_not_found']}")
+        self.stdout.write(f"Tips skipped:        {stats['tips_skipped']} (claimed by another worker)")
+        for worker in stats['workers']:
+            self.stdout.write(
+                f"  {worker['worker']}: {worker['tips_checked']} tips in {worker['batches']} batch(es), "
+                f"{worker['tips_per_second']} tips/s"
+            )
 
         self.stdout.write("="*60 + "\n")
 
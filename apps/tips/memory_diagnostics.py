@@ -0,0 +1,244 @@
+"""
+Allocation and leak diagnostics for long-lived web workers
+
+Staff start a run from the admin (or the staff JSON endpoint). The run is a
+control record in the Django cache, because each gunicorn worker is its own
+process and the start request only reaches one of them. Every worker polls
+the record from MemoryDiagnosticsMiddleware and:
+
+- on a new run, starts tracemalloc, takes a baseline snapshot and counts the
+  live objects of suspicious types (PIL images, BeautifulSoup trees,
+  QuerySets, User instances);
+- after the run's number of requests (or when staff stop it), diffs a new
+  snapshot against the baseline, publishes the top allocation sites by file
+  and line with the object count deltas, and stops tracing again.
+
+Reports go to the cache under one key per worker slot (claimed with
+cache.add), so every worker's report of a run can be read back from any
+worker. tracemalloc slows a worker down noticeably, so it only runs while a
+run is in progress.
+"""
+import gc
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONTROL_KEY = 'memory_diagnostics:control'
+REPORT_KEY = 'memory_diagnostics:report:{run}:{slot}'
+REPORT_SLOTS = 16  # most workers reporting on one run
+REPORT_TTL = 24 * 3600  # seconds
+CONTROL_POLL_INTERVAL = 5  # seconds between a worker's control checks
+
+# Live object counts by label: (module, attribute). Only modules the worker
+# already imported are looked at; the user model is added at count time.
+SUSPECT_TYPES = {
+    'PIL Image': ('PIL.Image', 'Image'),
+    'BeautifulSoup tree': ('bs4', 'BeautifulSoup'),
+    'QuerySet': ('django.db.models.query', 'QuerySet'),
+}
+
+# Allocations of the profiler and the import system aren't the app's
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def object_counts() -> Dict[str, int]:
+    """Live instances of each SUSPECT_TYPES type (and the user model) in this process"""
+    from django.contrib.auth import get_user_model
+
+    types = {'User': get_user_model()}
+    for label, (module_name, attribute) in SUSPECT_TYPES.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            types[label] = getattr(module, attribute)
+
+    counts = dict.fromkeys(types, 0)
+    for obj in gc.get_objects():
+        for label, cls in types.items():
+            if isinstance(obj, cls):
+                counts[label] += 1
+    return counts
+
+
+def _short_path(filename: str) -> str:
+    """File path relative to the project, site-packages or the standard library"""
+    marker = f"{os.sep}site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    for root in (str(settings.BASE_DIR), sysconfig.get_paths()['stdlib']):
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+class _Run:
+    """This worker's part of a run: baseline and requests seen"""
+
+    def __init__(self, control: dict):
+        self.control = control
+        self.requests = 0
+        self.started = time.monotonic()
+        # tracemalloc may already be on (PYTHONTRACEMALLOC); leave it on then
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(control['frames'])
+        self.baseline = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        self.baseline_counts = object_counts()
+
+    def report(self, reason: str) -> dict:
+        """Diff against the baseline, then stop tracing if this run started it"""
+        from config.prefork import process_memory
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        stats = snapshot.compare_to(self.baseline, 'lineno')
+        counts = object_counts()
+
+        return {
+            'run': self.control['run'],
+            'pid': os.getpid(),
+            'reason': reason,
+            'requests': self.requests,
+            'seconds': round(time.monotonic() - self.started, 1),
+            'finished_at': timezone.now().isoformat(),
+            'traced_kb': round(current / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'growth_kb': round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            'memory': process_memory(),
+            'top': [
+                {
+                    'file': _short_path(stat.traceback[0].filename),
+                    'line': stat.traceback[0].lineno,
+                    'size_diff_kb': round(stat.size_diff / 1024, 1),
+                    'count_diff': stat.count_diff,
+                    'size_kb': round(stat.size / 1024, 1),
+                }
+                for stat in stats[:self.control['top']]
+            ],
+            'objects': [
+                {
+                    'type': label,
+                    'before': self.baseline_counts.get(label, 0),
+                    'after': count,
+                    'diff': count - self.baseline_counts.get(label, 0),
+                }
+                for label, count in counts.items()
+            ],
+        }
+
+
+_run: Optional[_Run] = None
+_finished_runs = set()
+_next_poll = 0.0
+_lock = threading.Lock()
+
+
+def start(requests: int = 100, frames: int = 1, top: int = 25, user=None) -> dict:
+    """
+    Start a run in every worker (each picks it up within CONTROL_POLL_INTERVAL)
+
+    Args:
+        requests: Requests each worker serves between the two snapshots
+        frames: Traceback depth tracemalloc records (1 = the allocating line)
+        top: Allocation sites to report
+
+    Returns:
+        The control record
+    """
+    global _next_poll
+    control = {
+        'run': uuid.uuid4().hex[:12],
+        'active': True,
+        'requests': max(1, requests),
+        'frames': max(1, frames),
+        'top': max(1, top),
+        'started_at': timezone.now().isoformat(),
+        'started_by': getattr(user, 'username', None),
+    }
+    cache.set(CONTROL_KEY, control, REPORT_TTL)
+    _next_poll = 0.0  # this worker picks it up after the current request
+    return control
+
+
+def stop() -> Optional[dict]:
+    """Stop the run; workers still tracing report what they have so far"""
+    global _next_poll
+    control = cache.get(CONTROL_KEY)
+    if control and control['active']:
+        control['active'] = False
+        cache.set(CONTROL_KEY, control, REPORT_TTL)
+    _next_poll = 0.0
+    return control
+
+
+def status() -> dict:
+    """The current run and the reports of its workers so far"""
+    control = cache.get(CONTROL_KEY)
+    reports = []
+    if control:
+        keys = [REPORT_KEY.format(run=control['run'], slot=slot) for slot in range(REPORT_SLOTS)]
+        reports = sorted(cache.get_many(keys).values(), key=lambda report: report['pid'])
+    return {'control': control, 'reports': reports}
+
+
+def _publish(report: dict):
+    for slot in range(REPORT_SLOTS):
+        if cache.add(REPORT_KEY.format(run=report['run'], slot=slot), report, REPORT_TTL):
+            logger.info(
+                f"Memory diagnostics run {report['run']}: worker {report['pid']} grew "
+                f"{report['growth_kb']} KB over {report['requests']} requests"
+            )
+            return
+    logger.warning(f"No free report slot for memory diagnostics run {report['run']}")
+
+
+def on_request():
+    """
+    Called after every response by MemoryDiagnosticsMiddleware: follow the
+    control record and advance this worker's run
+    """
+    global _run, _next_poll
+    now = time.monotonic()
+    if _run is None and now < _next_poll:
+        return
+
+    with _lock:
+        if _run is not None:
+            _run.requests += 1
+        if now >= _next_poll:
+            _next_poll = now + CONTROL_POLL_INTERVAL
+            control = cache.get(CONTROL_KEY)
+        else:
+            control = _run.control
+
+        running = _run.control['run'] if _run else None
+        wanted = control['run'] if control and control['active'] else None
+
+        if _run is not None and (running != wanted or _run.requests >= _run.control['requests']):
+            reason = 'completed' if _run.requests >= _run.control['requests'] else 'stopped'
+            report = _run.report(reason)
+            _finished_runs.add(running)
+            _run = None
+            _publish(report)
+        elif _run is None and wanted and wanted not in _finished_runs:
+            logger.info(f"Memory diagnostics run {wanted}: tracing {control['requests']} requests in worker {os.getpid()}")
+            _run = _Run(control)
@@ -0,0 +1,71 @@
+"""
+Request middleware of the tips app
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """
+    Server-Timing header, structured timing log line and slow request
+    sampling for every request (see request_timing)
+
+    Goes first in MIDDLEWARE so the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        from django.conf import settings
+
+        self.get_response = get_response
+        self.audience = getattr(settings, 'SERVER_TIMING', 'staff')
+        if settings.DEBUG and self.audience == 'staff':
+            self.audience = 'all'
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 1000)
+
+    def __call__(self, request):
+        from . import request_timing
+
+        with request_timing.track() as timing:
+            response = self.get_response(request)
+
+        try:
+            user = getattr(request, 'user', None)
+            if self.audience == 'all' or (self.audience == 'staff' and user is not None and user.is_staff):
+                response['Server-Timing'] = timing.server_timing()
+
+            fields = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **timing.fields(),
+            }
+            slow = timing.total_ms >= self.slow_ms
+            logger.log(
+                logging.WARNING if slow else logging.INFO,
+                'request ' + ' '.join(f'{key}={value}' for key, value in fields.items()),
+                extra={'request_timing': fields},
+            )
+            if slow:
+                request_timing.record_slow_request(request, response, timing)
+        except Exception as e:
+            # Instrumentation must never fail a request
+            logger.warning(f"Request timing failed: {str(e)}")
+        return response
+
+
+class MemoryDiagnosticsMiddleware:
+    """Lets each worker follow staff-started memory diagnostics runs (see memory_diagnostics)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        try:
+            from . import memory_diagnostics
+            memory_diagnostics.on_request()
+        except Exception as e:
+            # Diagnostics must never fail a request
+            logger.warning(f"Memory diagnostics failed: {str(e)}")
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0003_alter_tip_preview_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('fixture_watermark', models.DateTimeField(blank=True, help_text='Fixture.updated_at high-water mark reached by the last run', null=True)),
+                ('last_sweep_at', models.DateTimeField(blank=True, help_text='When legs without a fixture were last swept', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0004_verificationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tipmatch',
+            name='api_match_id',
+            field=models.CharField(blank=True, db_index=True, help_text='API-Football match ID', max_length=50),
+        ),
+    ]
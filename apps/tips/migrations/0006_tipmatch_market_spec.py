@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 08:33
+
+from django.db import migrations, models
+
+
+def compile_existing_specs(apps, schema_editor):
+    from apps.tips.services.market_spec import compile_market
+
+    TipMatch = apps.get_model('tips', 'TipMatch')
+    batch = []
+    for leg in TipMatch.objects.only('id', 'market', 'selection', 'home_team', 'away_team').iterator():
+        leg.market_spec = compile_market(leg.market, leg.selection, home_team=leg.home_team, away_team=leg.away_team)
+        batch.append(leg)
+        if len(batch) >= 500:
+            TipMatch.objects.bulk_update(batch, ['market_spec'])
+            batch = []
+    if batch:
+        TipMatch.objects.bulk_update(batch, ['market_spec'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0005_tipmatch_api_match_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tipmatch',
+            name='market_spec',
+            field=models.JSONField(blank=True, default=dict, help_text='Pre-compiled market/selection spec used for grading'),
+        ),
+        migrations.RunPython(compile_existing_specs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-19 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0007_queuedtask'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='queuedtask',
+            name='tips_queued_status_e80435_idx',
+        ),
+        migrations.AddField(
+            model_name='queuedtask',
+            name='priority',
+            field=models.SmallIntegerField(default=10, help_text='Higher priority tasks are claimed first'),
+        ),
+        migrations.AddField(
+            model_name='queuedtask',
+            name='task_type',
+            field=models.CharField(default='default', help_text='Key of settings.TASK_QUEUE_TYPES', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='queuedtask',
+            index=models.Index(fields=['status', 'priority', 'run_after'], name='tips_queued_status_9593df_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='queuedtask',
+            index=models.Index(fields=['status', 'task_type'], name='tips_queued_status_96f97a_idx'),
+        ),
+    ]
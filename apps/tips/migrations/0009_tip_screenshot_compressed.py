@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+def mark_webp_screenshots_compressed(apps, schema_editor):
+    # Tip.save always re-encoded uploads to WebP, so these never need it again
+    Tip = apps.get_model('tips', 'Tip')
+    Tip.objects.filter(screenshot__iendswith='.webp').update(screenshot_compressed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0008_queuedtask_task_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tip',
+            name='screenshot_compressed',
+            field=models.BooleanField(default=False, help_text='Screenshot already re-encoded to WebP; it is never compressed again'),
+        ),
+        migrations.AddField(
+            model_name='tip',
+            name='screenshot_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Width -> storage name of the WebP copies used in srcset (including the archive itself)'),
+        ),
+        migrations.RunPython(mark_webp_screenshots_compressed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-19 09:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0009_tip_screenshot_compressed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tip',
+            name='screenshot_hash',
+            field=models.CharField(blank=True, default='', help_text='Perceptual hash of the screenshot, for the extraction cache', max_length=512),
+        ),
+        migrations.CreateModel(
+            name='ExtractionCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bet_code', models.CharField(blank=True, default='', max_length=50)),
+                ('content_md5', models.CharField(db_index=True, max_length=32)),
+                ('image_hash', models.CharField(blank=True, default='', max_length=512)),
+                ('result', models.JSONField(help_text='process_betslip_image result')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+                ('tipster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Extraction cache entries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['tipster', 'bet_code'], name='tips_extrac_tipster_5a1ec6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tips', '0010_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tip',
+            name='upload_batch',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Batch upload this tip was submitted in, if any', max_length=32),
+        ),
+    ]
@@ -0,0 +1,187 @@
+"""
+Circuit breaker and latency tracking for the Gemini fallback chain
+
+Per-model health lives in the Django cache (Redis in production) so every
+gunicorn worker and task worker skips a model as soon as one of them sees it
+fail:
+
+- closed: the model is used in FALLBACK_MODELS order
+- open: the model is skipped until open_until. Quota errors open it until
+  the reset time parsed from the error (daily quotas: midnight Pacific);
+  other errors after GEMINI_BREAKER_FAILURES consecutive failures, for
+  GEMINI_BREAKER_COOLDOWN seconds.
+- half-open: once open_until has passed, a single request (whoever wins the
+  atomic probe key) tries the model; success closes it, failure reopens it.
+
+Successful call latencies are kept per model for the p95 used to decide
+when to hedge a slow request.
+"""
+import logging
+import math
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = 'gemini_health:{model}'
+PROBE_KEY = 'gemini_health_probe:{model}'
+LATENCY_KEY = 'gemini_latency:{model}'
+
+STATE_TTL = 2 * 86400  # seconds; longer than any quota window
+LATENCY_SAMPLES = 100
+MIN_LATENCY_SAMPLES = 20  # before a p95 is trusted
+QUOTA_COOLDOWN = 60  # seconds, when the error doesn't say when the quota resets
+NOT_FOUND_COOLDOWN = 3600  # seconds; retired or misspelled model
+
+# Gemini daily quotas reset at midnight Pacific time
+QUOTA_RESET_TZ = ZoneInfo('America/Los_Angeles')
+
+RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s"),
+]
+
+
+def is_quota_error(error: str) -> bool:
+    return 'RESOURCE_EXHAUSTED' in error or '429' in error
+
+
+def is_not_found_error(error: str) -> bool:
+    return 'NOT_FOUND' in error or '404' in error
+
+
+def quota_reset_delay(error: str, now: float = None) -> float:
+    """
+    Seconds until the quota behind a RESOURCE_EXHAUSTED error resets
+
+    Uses the retry delay Gemini reports; daily quotas without one reset at
+    midnight Pacific.
+    """
+    for pattern in RETRY_DELAY_PATTERNS:
+        match = pattern.search(error)
+        if match:
+            return float(match.group(1))
+
+    if 'PerDay' in error:
+        now = datetime.fromtimestamp(now or time.time(), QUOTA_RESET_TZ)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), QUOTA_RESET_TZ)
+        return (midnight - now).total_seconds()
+
+    return QUOTA_COOLDOWN
+
+
+class ModelHealth:
+    """Shared circuit breaker state of the extraction models"""
+
+    def __init__(self, failure_threshold: int = None, cooldown: int = None):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+                (default: settings.GEMINI_BREAKER_FAILURES)
+            cooldown: Seconds a breaker stays open after failures
+                (default: settings.GEMINI_BREAKER_COOLDOWN)
+        """
+        self.failure_threshold = failure_threshold or getattr(settings, 'GEMINI_BREAKER_FAILURES', 3)
+        self.cooldown = cooldown or getattr(settings, 'GEMINI_BREAKER_COOLDOWN', 30)
+
+    def state(self, model: str) -> Dict:
+        """{'failures', 'open_until', 'reason', 'error'}, all empty for a healthy model"""
+        return cache.get(STATE_KEY.format(model=model)) or {
+            'failures': 0, 'open_until': 0, 'reason': '', 'error': ''
+        }
+
+    def _set_state(self, model: str, state: Dict):
+        cache.set(STATE_KEY.format(model=model), state, STATE_TTL)
+
+    def status(self, model: str, now: float = None) -> str:
+        """'closed', 'open' or 'half_open'"""
+        open_until = self.state(model)['open_until']
+        if not open_until:
+            return 'closed'
+        return 'open' if open_until > (now or time.time()) else 'half_open'
+
+    def available_models(self, models: List[str]) -> List[str]:
+        """
+        Models to try, in order: closed ones, plus half-open ones whose probe
+        this caller won. Open models are skipped without a request.
+        """
+        now = time.time()
+        available = []
+        for model in models:
+            status = self.status(model, now)
+            if status == 'closed':
+                available.append(model)
+            elif status == 'half_open':
+                # cache.add is atomic: one probe per model across all workers
+                if cache.add(PROBE_KEY.format(model=model), True, self.cooldown):
+                    logger.info(f"Probing half-open model {model}")
+                    available.append(model)
+        return available
+
+    def last_error(self, models: List[str]) -> str:
+        """Error that opened the first of these models, for the user-facing message"""
+        for model in models:
+            error = self.state(model)['error']
+            if error:
+                return error
+        return ''
+
+    def record_success(self, model: str, latency: float):
+        if self.state(model)['failures'] or self.status(model) != 'closed':
+            logger.info(f"Model {model} healthy again, closing breaker")
+            cache.delete(STATE_KEY.format(model=model))
+            cache.delete(PROBE_KEY.format(model=model))
+
+        key = LATENCY_KEY.format(model=model)
+        samples = cache.get(key) or []
+        samples.append(round(latency, 3))
+        cache.set(key, samples[-LATENCY_SAMPLES:], STATE_TTL)
+
+    def record_failure(self, model: str, error: str):
+        now = time.time()
+        state = self.state(model)
+        state['failures'] += 1
+        state['error'] = error[:500]
+
+        if is_quota_error(error):
+            delay, state['reason'] = quota_reset_delay(error, now), 'quota'
+        elif is_not_found_error(error):
+            delay, state['reason'] = NOT_FOUND_COOLDOWN, 'not_found'
+        elif state['failures'] >= self.failure_threshold or state['open_until']:
+            # A failed half-open probe reopens straight away
+            delay, state['reason'] = self.cooldown, 'errors'
+        else:
+            delay = 0
+
+        if delay:
+            state['open_until'] = now + delay
+            logger.warning(f"Opening breaker for {model} for {delay:.0f}s ({state['reason']})")
+        self._set_state(model, state)
+        cache.delete(PROBE_KEY.format(model=model))
+
+    def p95_latency(self, model: str) -> Optional[float]:
+        """95th percentile of recent successful call latencies, None with too few samples"""
+        samples = sorted(cache.get(LATENCY_KEY.format(model=model)) or [])
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+
+    def snapshot(self, models: List[str]) -> List[Dict]:
+        """Health of each model, for the task queue metrics view"""
+        now = time.time()
+        return [
+            {
+                'model': model,
+                'status': self.status(model, now),
+                'reason': self.state(model)['reason'],
+                'reopens_in': max(0, round(self.state(model)['open_until'] - now)),
+                'p95_latency': self.p95_latency(model),
+            }
+            for model in models
+        ]
@@ -4,8 +4,6 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import json
-from io import BytesIO
-from PIL import Image
 from django.core.files.base import ContentFile
 import logging
 
@@ -38,6 +36,21 @@ class Tip(models.Model):
     odds = models.DecimalField(max_digits=10, decimal_places=2)
     # Screenshot and OCR data
     screenshot = models.ImageField(upload_to='betslips/', null=True, blank=True)
+    screenshot_compressed = models.BooleanField(
+        default=False,
+        help_text='Screenshot already re-encoded to WebP; it is never compressed again'
+    )
+    screenshot_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Width -> storage name of the WebP copies used in srcset (including the archive itself)'
+    )
+    screenshot_hash = models.CharField(
+        max_length=512,
+        blank=True,
+        default='',
+        help_text='Perceptual hash of the screenshot, for the extraction cache'
+    )
     bet_sharing_link = models.URLField(max_length=500, null=True, blank=True, help_text='SportPesa bet sharing/referral link')
     match_details = models.JSONField(default=dict, help_text='OCR extracted match details')
     preview_data = models.JSONField(default=dict, help_text='Preview data for non-Pro users')
@@ -67,6 +80,10 @@ class Tip(models.Model):
     )
     processing_error = models.TextField(null=True, blank=True, help_text='Error message if processing failed')
     enrichment_completed = models.BooleanField(default=False, help_text='Whether API-Football enrichment is complete')
+    upload_batch = models.CharField(
+        max_length=32, blank=True, default='', db_index=True,
+        help_text='Batch upload this tip was submitted in, if any'
+    )
 
     # Results tracking
     is_resulted = models.BooleanField(default=False)
@@ -110,56 +127,149 @@ class Tip(models.Model):
             return first_match_date - timezone.now()
         return timedelta(0)
 
-    def save(self, *args, **kwargs):
-        # Image compression logic
-        if self.screenshot and not getattr(self, '_image_compressed', False):
+    # Written together whenever the screenshot is (re)processed
+    SCREENSHOT_FIELDS = ['screenshot', 'screenshot_compressed', 'screenshot_variants', 'screenshot_hash']
+
+    def _read_screenshot(self) -> bytes:
+        self.screenshot.open('rb')
+        try:
+            return self.screenshot.read()
+        finally:
+            if self.screenshot._committed:
+                self.screenshot.close()
+
+    def _store_variants(self, size, variants):
+        """Replace the stored variants with new ones ({width: WebP bytes})"""
+        storage = self.screenshot.storage
+        for name in self.screenshot_variants.values():
+            if name != self.screenshot.name:
+                storage.delete(name)
+
+        base_name = self.screenshot.name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        self.screenshot_variants = {
+            str(width): storage.save(f"betslips/variants/{base_name}_{width}w.webp", ContentFile(content))
+            for width, content in variants.items()
+        }
+        self.screenshot_variants[str(size[0])] = self.screenshot.name
+
+    def compress_screenshot(self):
+        """
+        Re-encode the screenshot as a width-capped WebP plus its downscaled
+        variants, in the image process pool, and mark it compressed.
+
+        Returns:
+            list: Grayscale JPEG tile(s) for the extraction model, produced
+            from the same decode, or None if the image could not be processed
+        """
+        from .image_processing import process_screenshot, run_image_job
+
+        try:
+            result = run_image_job(process_screenshot, self._read_screenshot())
+
+            # Update the file name and content
+            # Split original name to get basename without extension
+            original_name = self.screenshot.name.split('.')[0]
+            if '/' in original_name:
+                original_name = original_name.split('/')[-1]
+
+            new_filename = f"{original_name}.webp"
+
+            # A raw upload saved earlier (deferred compression) is replaced
+            stored_name = self.screenshot.name if self.screenshot._committed else None
+
+            # Use save=False to avoid infinite recursion
+            self.screenshot.save(
+                new_filename,
+                ContentFile(result['archive']),
+                save=False
+            )
+            if stored_name:
+                self.screenshot.storage.delete(stored_name)
+
+            self._store_variants(result['size'], result['variants'])
+            self.screenshot_hash = result['dhash']
+
+            # Persisted, so later loads and saves of the tip never re-encode it
+            self.screenshot_compressed = True
+            return result['model_input']
+
+        except Exception as e:
+            logger.error(f"Failed to compress betslip image: {e}")
+            return None
+
+    def generate_screenshot_variants(self) -> bool:
+        """
+        Create the srcset variants of an already compressed screenshot
+        (tips archived before variants existed), leaving the archive as is.
+
+        Returns:
+            bool: True if the variants were stored
+        """
+        from .image_processing import run_image_job, screenshot_variants
+
+        try:
+            result = run_image_job(screenshot_variants, self._read_screenshot())
+            self._store_variants(result['size'], result['variants'])
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create variants for Tip {self.id}: {e}")
+            return False
+
+    def delete_screenshot_files(self):
+        """
+        Remove the stored screenshot and its variants, for a tip whose row was
+        never written (rejected slip, rolled back insert)
+        """
+        storage = self.screenshot.storage
+        names = set(self.screenshot_variants.values())
+        if self.screenshot and self.screenshot._committed:
+            names.add(self.screenshot.name)
+        for name in names:
             try:
-                # Open the uploaded image
-                img = Image.open(self.screenshot)
-                
-                # Convert to RGB if necessary (e.g. RGBA or P)
-                if img.mode in ('RGBA', 'LA'):
-                    background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
-                    background.paste(img, img.split()[-1])
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                    
-                # Resize if wider than 1080px
-                max_width = 1080
-                if img.width > max_width:
-                    ratio = max_width / img.width
-                    new_height = int(img.height * ratio)
-                    img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Save as WebP to a BytesIO object
-                output = BytesIO()
-                img.save(output, format='WEBP', quality=80, method=4)
-                output.seek(0)
-                
-                # Update the file name and content
-                # Split original name to get basename without extension
-                original_name = self.screenshot.name.split('.')[0]
-                if '/' in original_name:
-                    original_name = original_name.split('/')[-1]
-                    
-                new_filename = f"{original_name}.webp"
-                
-                # Use save=False to avoid infinite recursion
-                self.screenshot.save(
-                    new_filename, 
-                    ContentFile(output.read()), 
-                    save=False
-                )
-                
-                # Mark as compressed to avoid re-compressing
-                self._image_compressed = True
-                
+                storage.delete(name)
             except Exception as e:
-                logger.error(f"Failed to compress betslip image: {e}")
-                
+                logger.warning(f"Could not delete screenshot file {name}: {e}")
+
+    def save(self, *args, compress_screenshot=True, **kwargs):
+        """
+        Args:
+            compress_screenshot: False stores the upload as is, for callers that
+                compress it later off the request thread (see compress_screenshot)
+        """
+        update_fields = kwargs.get('update_fields')
+        writes_screenshot = update_fields is None or 'screenshot' in update_fields
+
+        # A newly assigned upload is always compressed, a stored one only once
+        needs_compression = self.screenshot and (
+            not self.screenshot._committed or not self.screenshot_compressed
+        )
+        if compress_screenshot and writes_screenshot and needs_compression:
+            if self.compress_screenshot() is not None and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.SCREENSHOT_FIELDS)
+
         super().save(*args, **kwargs)
 
+    @property
+    def screenshot_srcset(self):
+        """srcset of the screenshot variants, empty if it has none"""
+        if not self.screenshot or not self.screenshot_variants:
+            return ''
+        storage = self.screenshot.storage
+        return ', '.join(
+            f"{storage.url(name)} {width}w"
+            for width, name in sorted(self.screenshot_variants.items(), key=lambda item: int(item[0]))
+        )
+
+    @property
+    def screenshot_card_url(self):
+        """URL of the smallest screenshot variant, for cards and thumbnails"""
+        if not self.screenshot:
+            return ''
+        if not self.screenshot_variants:
+            return self.screenshot.url
+        width = min(self.screenshot_variants, key=int)
+        return self.screenshot.storage.url(self.screenshot_variants[width])
+
     @property
     def is_live(self):
         """Check if any match in the tip is live"""
@@ -231,6 +341,7 @@ class TipMatch(models.Model):
     market = models.CharField(max_length=100)  # e.g., "Over 2.5", "1X2", "Both Teams to Score"
     selection = models.CharField(max_length=100)  # e.g., "Over", "1", "Yes"
     odds = models.DecimalField(max_digits=6, decimal_places=2)
+    market_spec = models.JSONField(default=dict, blank=True, help_text='Pre-compiled market/selection spec used for grading')
     
     # Result tracking
     is_resulted = models.BooleanField(default=False)
@@ -238,7 +349,7 @@ class TipMatch(models.Model):
     actual_result = models.CharField(max_length=100, blank=True)
     
     # API tracking
-    api_match_id = models.CharField(max_length=50, blank=True, help_text='API-Football match ID')
+    api_match_id = models.CharField(max_length=50, blank=True, db_index=True, help_text='API-Football match ID')
     
     class Meta:
         ordering = ['match_date']
@@ -246,32 +357,69 @@ class TipMatch(models.Model):
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} - {self.market}"
 
+    # Fields the market spec is compiled from
+    MARKET_SPEC_SOURCE_FIELDS = {'market', 'selection', 'home_team', 'away_team'}
+
+    def compile_market_spec(self):
+        """Parse market/selection once into the structured spec used for grading"""
+        from apps.tips.services.market_spec import compile_market
+        self.market_spec = compile_market(
+            self.market,
+            self.selection,
+            home_team=self.home_team,
+            away_team=self.away_team
+        )
+        return self.market_spec
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.compile_market_spec()
+        elif self.MARKET_SPEC_SOURCE_FIELDS.intersection(update_fields):
+            self.compile_market_spec()
+            kwargs['update_fields'] = set(update_fields) | {'market_spec'}
+        super().save(*args, **kwargs)
+
     @property
     def live_data(self):
         """Get live match data if available and not yet resulted"""
         if self.is_resulted:
             return None
-            
-        if self.api_match_id:
-            from apps.fixtures.models import Fixture
-            try:
-                fixture = Fixture.objects.get(api_id=int(self.api_match_id))
-                if not fixture.is_finished:
-                    h_goals = fixture.home_goals if fixture.home_goals is not None else 0
-                    a_goals = fixture.away_goals if fixture.away_goals is not None else 0
-                    return {
-                        'home_goals': h_goals,
-                        'away_goals': a_goals,
-                        'elapsed': fixture.elapsed,
-                        'status': fixture.status_short,
-                        'source': 'api_football'
-                    }
-            except (Fixture.DoesNotExist, ValueError):
-                pass
+        return self.fixture_live_data() or self.livescore_live_data()
 
-        # Fallback to livescore.cz for ongoing matches without api_match_id
+    def fixture_live_data(self):
+        """Live data from the leg's API-Football fixture, if linked and not finished"""
+        if not self.api_match_id:
+            return None
+
+        from apps.fixtures.models import Fixture
+        try:
+            fixture = Fixture.objects.get(api_id=int(self.api_match_id))
+        except (Fixture.DoesNotExist, ValueError):
+            return None
+        if fixture.is_finished:
+            return None
+
+        h_goals = fixture.home_goals if fixture.home_goals is not None else 0
+        a_goals = fixture.away_goals if fixture.away_goals is not None else 0
+        return {
+            'home_goals': h_goals,
+            'away_goals': a_goals,
+            'elapsed': fixture.elapsed,
+            'status': fixture.status_short,
+            'source': 'api_football'
+        }
+
+    def livescore_live_data(self, livescore_matches=None):
+        """
+        Fallback to livescore.cz for ongoing matches without api_match_id.
+
+        Args:
+            livescore_matches: Rows of the livescore.cz page of the leg's day,
+                fetched once for several legs (default: fetched here)
+        """
         try:
-            from apps.tips.services.livescore_cz_scraper import LivescoreCzScraper
+            from apps.tips.services.livescore_cz_scraper import LivescoreCzScraper, day_offset
             try:
                 from fuzzywuzzy import fuzz
                 calc_ratio = fuzz.ratio
@@ -280,13 +428,15 @@ class TipMatch(models.Model):
                 def calc_ratio(s1: str, s2: str) -> float:
                     return SequenceMatcher(None, s1, s2).ratio() * 100
 
-            scraper = LivescoreCzScraper()
-            live_matches = scraper.fetch_scores(day_offset=0, status_filter='all')
-            
+            if livescore_matches is None:
+                livescore_matches = LivescoreCzScraper().fetch_scores(
+                    day_offset=day_offset(self.match_date), status_filter='all'
+                )
+
             home_tip = self.home_team.lower().strip()
             away_tip = self.away_team.lower().strip()
 
-            for m in live_matches:
+            for m in livescore_matches:
                 home_scraped = m['home_team'].lower().strip()
                 away_scraped = m['away_team'].lower().strip()
 
@@ -316,6 +466,103 @@ class TipMatch(models.Model):
 
 
 
+class VerificationCheckpoint(models.Model):
+    """Persisted progress of incremental result verification runs"""
+    name = models.CharField(max_length=50, unique=True)
+    fixture_watermark = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Fixture.updated_at high-water mark reached by the last run'
+    )
+    last_sweep_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When legs without a fixture were last swept'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.fixture_watermark}"
+
+
+class QueuedTask(models.Model):
+    """
+    A background task persisted by the database task queue backend.
+
+    Claimed rows are leased until locked_until, renewed while the task runs;
+    a worker that dies mid-task lets the lease expire and the attempt counts
+    as failed (retried after the backoff, or dead-lettered).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('dead', 'Dead (retries exhausted)'),
+    ]
+
+    func_path = models.CharField(max_length=200, help_text='Dotted path of the task function')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    callback_path = models.CharField(max_length=200, blank=True, default='')
+    task_type = models.CharField(max_length=30, default='default', help_text='Key of settings.TASK_QUEUE_TYPES')
+    priority = models.SmallIntegerField(default=10, help_text='Higher priority tasks are claimed first')
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now, help_text='Not claimed before this time (retry backoff)')
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True, help_text='Visibility timeout of the current attempt')
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_after']),
+            models.Index(fields=['status', 'task_type']),
+        ]
+
+    def __str__(self):
+        return f"task_{self.id} {self.func_path} [{self.task_type}] ({self.status})"
+
+
+class ExtractionCacheEntry(models.Model):
+    """
+    A successful betslip extraction, reused for re-uploads of the same slip.
+
+    Looked up by the MD5 of the stored screenshot (identical bytes, any
+    tipster) or by perceptual hash distance for the same tipster and bet code.
+    """
+    tipster = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    bet_code = models.CharField(max_length=50, blank=True, default='')
+    content_md5 = models.CharField(max_length=32, db_index=True)
+    image_hash = models.CharField(max_length=512, blank=True, default='')
+    result = models.JSONField(help_text='process_betslip_image result')
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tipster', 'bet_code']),
+        ]
+        verbose_name_plural = 'Extraction cache entries'
+
+    def __str__(self):
+        return f"{self.bet_code or self.content_md5} ({self.hits} hits)"
+
+
 class OCRProviderSettings(models.Model):
     """Settings for OCR provider selection"""
     OCR_PROVIDER_CHOICES = [
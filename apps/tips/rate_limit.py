@@ -0,0 +1,234 @@
+"""
+Cluster-wide admission control for Gemini calls
+
+Every gunicorn worker, task queue thread and management command goes
+through GeminiLimiter.admit() before calling generate_content, so a burst of
+uploads is spread out at the quota instead of failing together with 429s.
+
+- Rate: time is cut into slots of 60 / GEMINI_RPM seconds per model (Gemini
+  quotas are per model). A caller reserves the first free slot from now on
+  with an atomic cache.add and sleeps until it starts. Earlier callers hold
+  earlier slots, so excess work is served in arrival order and calls are
+  admitted evenly at the quota ceiling.
+- Concurrency: at most GEMINI_MAX_CONCURRENCY calls in flight across all
+  processes, as leased permit keys (a crashed holder's lease expires). The
+  permit is taken after the slot's sleep, so waiting callers don't keep
+  permits idle; a caller that gets no permit gives its slot back.
+
+Both live in the Django cache (Redis in production). If the cache fails the
+limiter falls back to a per-process limiter with the same settings.
+Callers that would wait longer than GEMINI_MAX_QUEUE_WAIT get RateLimitTimeout
+(PermitTimeout when it is the shared permits that ran out, not the model's
+slots).
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SLOT_KEY = 'gemini_rpm:{model}:{slot}'
+NEXT_SLOT_KEY = 'gemini_rpm_next:{model}'
+PERMIT_KEY = 'gemini_permit:{index}'
+WAIT_KEY = 'gemini_wait:{model}:{index}'
+
+PERMIT_LEASE = 120  # seconds; longer than any generate_content call
+PERMIT_POLL = 0.1  # seconds between attempts to take a permit
+WAIT_SAMPLES = 100
+
+
+class RateLimitTimeout(Exception):
+    """The call would have waited longer than GEMINI_MAX_QUEUE_WAIT"""
+
+
+class PermitTimeout(RateLimitTimeout):
+    """No concurrency permit in time; permits are shared by all models"""
+
+
+class LocalLimiter:
+    """Per-process fallback: the same slots and permits, in memory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_slot = {}
+        self._semaphores = {}
+
+    def reserve_slot(self, model: str, interval: float, deadline: float) -> float:
+        """Returns the time.time() the slot starts at"""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_slot.get(model, 0))
+            if start - now > deadline - time.monotonic():
+                raise RateLimitTimeout(f"No {model} slot within the queue wait")
+            self._next_slot[model] = start + interval
+        return start
+
+    def release_slot(self, model: str, start: float, interval: float):
+        """Give back an unused slot, unless a later one was reserved since"""
+        with self._lock:
+            if self._next_slot.get(model) == start + interval:
+                self._next_slot[model] = start
+
+    def acquire_permit(self, concurrency: int, deadline: float):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(concurrency, threading.BoundedSemaphore(concurrency))
+        if not semaphore.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise PermitTimeout("No Gemini permit within the queue wait")
+        return semaphore
+
+    def release_permit(self, permit):
+        permit.release()
+
+
+_local = LocalLimiter()
+
+
+class GeminiLimiter:
+    """Distributed token slots and semaphore around Gemini calls"""
+
+    def __init__(self, rpm: int = None, concurrency: int = None, max_wait: float = None):
+        """
+        Args:
+            rpm: Calls per minute admitted per model (default: settings.GEMINI_RPM)
+            concurrency: Calls in flight across processes (default: settings.GEMINI_MAX_CONCURRENCY)
+            max_wait: Longest queue wait in seconds (default: settings.GEMINI_MAX_QUEUE_WAIT)
+        """
+        self.rpm = rpm or getattr(settings, 'GEMINI_RPM', 15)
+        self.concurrency = concurrency or getattr(settings, 'GEMINI_MAX_CONCURRENCY', 4)
+        self.max_wait = max_wait if max_wait is not None else getattr(settings, 'GEMINI_MAX_QUEUE_WAIT', 60)
+        self.interval = 60.0 / self.rpm
+
+    def _reserve_slot(self, model: str, deadline: float) -> Tuple[int, float]:
+        """Reserve the first free slot, returns it and the seconds until it starts"""
+        now = time.time()
+        first = int(now // self.interval)
+        last = int((now + max(0, deadline - time.monotonic())) // self.interval)
+
+        # Start from the hint left by the previous reservation instead of
+        # probing every taken slot
+        hint = cache.get(NEXT_SLOT_KEY.format(model=model)) or first
+        for slot in range(max(first, min(hint, last + 1)), last + 1):
+            ttl = int((slot - first) * self.interval) + 60
+            if cache.add(SLOT_KEY.format(model=model, slot=slot), 1, ttl):
+                cache.set(NEXT_SLOT_KEY.format(model=model), slot + 1, ttl)
+                return slot, max(0.0, slot * self.interval - now)
+        raise RateLimitTimeout(f"No {model} slot within {self.max_wait}s")
+
+    def _release_slot(self, model: str, slot: int):
+        """Give back a reserved slot, for the next caller if it hasn't passed yet"""
+        try:
+            cache.delete(SLOT_KEY.format(model=model, slot=slot))
+            # Only a hint: a stale or lowered one costs a few extra cache.add probes
+            next_slot_key = NEXT_SLOT_KEY.format(model=model)
+            if (cache.get(next_slot_key) or 0) > slot:
+                cache.set(next_slot_key, slot, int(max(0, slot * self.interval - time.time())) + 60)
+        except Exception as e:
+            logger.warning(f"Could not release {model} slot {slot}: {str(e)}")
+
+    def _acquire_permit(self, deadline: float):
+        token = uuid.uuid4().hex
+        while True:
+            for index in range(self.concurrency):
+                key = PERMIT_KEY.format(index=index)
+                if cache.add(key, token, PERMIT_LEASE):
+                    return key, token
+            if time.monotonic() >= deadline:
+                raise PermitTimeout("No Gemini permit within the queue wait")
+            time.sleep(PERMIT_POLL)
+
+    def _release_permit(self, permit):
+        key, token = permit
+        # Only our own lease: after expiry the key may belong to another caller
+        if cache.get(key) == token:
+            cache.delete(key)
+
+    @contextmanager
+    def admit(self, model: str, deadline: float = None):
+        """
+        Wait for a rate slot and a concurrency permit for one call to model
+
+        Args:
+            model: Gemini model to call
+            deadline: time.monotonic() by which to be admitted (default: max_wait
+                from now); callers trying several models share one deadline
+
+        Yields:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: The wait would pass the deadline (PermitTimeout if
+                no permit freed up in time)
+        """
+        started = time.monotonic()
+        if deadline is None:
+            deadline = started + self.max_wait
+        try:
+            slot, delay = self._reserve_slot(model, deadline)
+            time.sleep(delay)
+            try:
+                permit = self._acquire_permit(deadline)
+            except PermitTimeout:
+                self._release_slot(model, slot)
+                raise
+            release = self._release_permit
+        except RateLimitTimeout:
+            raise
+        except Exception as e:
+            logger.warning(f"Shared Gemini limiter unavailable, limiting per process: {str(e)}")
+            slot = None  # Waits are sampled in the cache, which is what failed
+            start = _local.reserve_slot(model, self.interval, deadline)
+            time.sleep(max(0.0, start - time.time()))
+            try:
+                permit = _local.acquire_permit(self.concurrency, deadline)
+            except PermitTimeout:
+                _local.release_slot(model, start, self.interval)
+                raise
+            release = _local.release_permit
+
+        waited = time.monotonic() - started
+        if slot is not None:
+            self._record_wait(model, slot, waited)
+        if waited >= 1:
+            logger.info(f"Waited {waited:.1f}s for a {model} slot")
+        try:
+            yield waited
+        finally:
+            try:
+                release(permit)
+            except Exception as e:
+                logger.warning(f"Could not release Gemini permit: {str(e)}")
+
+    def _record_wait(self, model: str, slot: int, waited: float):
+        """
+        Keep the wait of the call admitted in slot, in a ring of WAIT_SAMPLES keys
+
+        Slots are unique per model, so concurrent callers write different keys
+        and no sample is lost to a read-modify-write race.
+        """
+        try:
+            cache.set(WAIT_KEY.format(model=model, index=slot % WAIT_SAMPLES), (slot, round(waited, 3)), 86400)
+        except Exception:
+            pass
+
+    def _recent_waits(self, model: str) -> List[float]:
+        """Waits recorded for the last WAIT_SAMPLES slots up to the latest admitted call"""
+        samples = cache.get_many([WAIT_KEY.format(model=model, index=index) for index in range(WAIT_SAMPLES)])
+        latest = max((slot for slot, _ in samples.values()), default=0)
+        return [waited for slot, waited in samples.values() if slot > latest - WAIT_SAMPLES]
+
+    def stats(self, model: str) -> Dict:
+        """Queue wait avg / p95 of recent calls and the current backlog in seconds"""
+        from .task_queue import summarize_durations
+
+        next_slot = cache.get(NEXT_SLOT_KEY.format(model=model))
+        backlog = max(0.0, next_slot * self.interval - time.time()) if next_slot else 0.0
+        return {
+            'wait_seconds': summarize_durations(self._recent_waits(model)),
+            'backlog_seconds': round(backlog, 1),
+        }
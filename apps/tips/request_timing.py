@@ -0,0 +1,284 @@
+"""
+Per-request performance instrumentation
+
+RequestTimingMiddleware tracks every request (track()) and, once the
+response is ready:
+
+- adds a Server-Timing header (db, cache, tpl, ext-<service>, app) for staff,
+  or for everyone with settings.SERVER_TIMING = 'all' (or DEBUG);
+- logs one line of structured fields (logfmt, and the same dict as
+  extra['request_timing'] for a structured formatter);
+- samples requests slower than settings.SLOW_REQUEST_MS, with their query
+  list, into a ring buffer in the cache, shown in the admin (Queued tasks >
+  Slow requests).
+
+What is measured:
+- SQL: count and time of every query on every database (execute_wrapper).
+- Cache: reads as hits and misses, and time of all cache calls, through the
+  Timed*Cache backends configured in CACHES.
+- Templates: render time of top-level templates, through the
+  TimedDjangoTemplates backend configured in TEMPLATES.
+- External calls: time per service of the call sites wrapped in
+  external_call() (Gemini, API-Football, livescore.cz, M-Pesa, bookmaker
+  links).
+
+The figures overlap (a cache call made while rendering counts for both) and
+only cover work done on the request's thread; work handed to other threads
+is timed where the request waits for it.
+"""
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERIES = 200  # queries kept per request for the slow request sample
+MAX_SQL_LENGTH = 1000
+SLOW_REQUESTS_KEY = 'slow_requests:{slot}'
+SLOW_REQUESTS_NEXT_KEY = 'slow_requests:next'
+SLOW_REQUESTS_TTL = 7 * 24 * 3600  # seconds
+
+_current: ContextVar[Optional['RequestTiming']] = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """What one request spent its time on"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_ms = None
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.durations = defaultdict(float)  # 'cache', 'template', 'ext:<service>' -> ms
+        self._active = set()
+
+    @contextmanager
+    def measure(self, name: str):
+        """Add the block's duration to name, unless it is nested in another name block"""
+        if name in self._active:
+            yield
+            return
+        self._active.add(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active.discard(name)
+            self.durations[name] += (time.perf_counter() - started) * 1000
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += elapsed
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({'sql': sql[:MAX_SQL_LENGTH], 'ms': round(elapsed, 2), 'many': many})
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    @property
+    def external(self) -> Dict[str, float]:
+        return {name[4:]: ms for name, ms in self.durations.items() if name.startswith('ext:')}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value"""
+        metrics = [
+            f'db;dur={self.sql_ms:.1f};desc="{self.sql_count} queries"',
+            f'cache;dur={self.durations["cache"]:.1f};desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'tpl;dur={self.durations["template"]:.1f}',
+        ]
+        metrics += [f'ext-{service};dur={ms:.1f}' for service, ms in sorted(self.external.items())]
+        metrics.append(f'app;dur={self.total_ms:.1f};desc="total"')
+        return ', '.join(metrics)
+
+    def fields(self) -> Dict:
+        """Flat fields for the structured log line"""
+        fields = {
+            'total_ms': round(self.total_ms, 1),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_ms, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.durations['cache'], 1),
+            'template_ms': round(self.durations['template'], 1),
+            'external_ms': round(sum(self.external.values()), 1),
+        }
+        for service, ms in sorted(self.external.items()):
+            fields[f'ext_{re.sub(r"[^a-z0-9]+", "_", service)}_ms'] = round(ms, 1)
+        return fields
+
+
+def current() -> Optional[RequestTiming]:
+    """The RequestTiming of the request running on this thread, if any"""
+    return _current.get()
+
+
+@contextmanager
+def track():
+    """Time the block as one request: SQL on every database, cache, templates, external calls"""
+    from django.db import connections
+
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing.sql_wrapper))
+            yield timing
+    finally:
+        _current.reset(token)
+        timing.finish()
+
+
+@contextmanager
+def external_call(service: str):
+    """Time an outbound call of the current request (a no-op outside requests)"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    with timing.measure(f'ext:{service}'):
+        yield
+
+
+# --- Cache backends ---------------------------------------------------------
+
+_MISSING = object()
+
+
+def _timed(method_name: str):
+    """A TimedCacheMixin method timing the backend's method_name"""
+    def method(self, *args, **kwargs):
+        backend_method = getattr(super(TimedCacheMixin, self), method_name)
+        timing = _current.get()
+        if timing is None:
+            return backend_method(*args, **kwargs)
+        with timing.measure('cache'):
+            return backend_method(*args, **kwargs)
+    method.__name__ = method_name
+    return method
+
+
+class TimedCacheMixin:
+    """
+    Counts reads as hits and misses of the current request and times every
+    call. A backend method calling another (DatabaseCache.get calls get_many)
+    counts once.
+    """
+    def get(self, key, default=None, version=None):
+        timing = _current.get()
+        if timing is None or 'cache' in timing._active:
+            return super().get(key, default, version)
+        with timing.measure('cache'):
+            value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            timing.cache_misses += 1
+            return default
+        timing.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        timing = _current.get()
+        if timing is None or 'cache' in timing._active:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        with timing.measure('cache'):
+            found = super().get_many(keys, version)
+        timing.cache_hits += len(found)
+        timing.cache_misses += len(keys) - len(found)
+        return found
+
+    add = _timed('add')
+    set = _timed('set')
+    touch = _timed('touch')
+    delete = _timed('delete')
+    incr = _timed('incr')
+    set_many = _timed('set_many')
+    delete_many = _timed('delete_many')
+    has_key = _timed('has_key')
+
+
+class TimedDatabaseCache(TimedCacheMixin, DatabaseCache):
+    pass
+
+
+class TimedRedisCache(TimedCacheMixin, RedisCache):
+    pass
+
+
+class TimedLocMemCache(TimedCacheMixin, LocMemCache):
+    pass
+
+
+# --- Template backend -------------------------------------------------------
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        with timing.measure('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates timing the render of every template it hands out"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --- Slow requests ----------------------------------------------------------
+
+def record_slow_request(request, response, timing: RequestTiming):
+    """Add a slow request, with its queries, to the ring buffer in the cache"""
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.utils import timezone
+
+    size = getattr(settings, 'SLOW_REQUEST_BUFFER', 50)
+    unique_queries = {query['sql'] for query in timing.queries}
+    sample = {
+        'at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path()[:500],
+        'status': response.status_code,
+        'user': getattr(getattr(request, 'user', None), 'username', None) or None,
+        **timing.fields(),
+        'external': {service: round(ms, 1) for service, ms in timing.external.items()},
+        'duplicate_queries': len(timing.queries) - len(unique_queries),
+        'queries': timing.queries,
+    }
+    cache.add(SLOW_REQUESTS_NEXT_KEY, 0, None)
+    slot = cache.incr(SLOW_REQUESTS_NEXT_KEY) % size
+    cache.set(SLOW_REQUESTS_KEY.format(slot=slot), sample, SLOW_REQUESTS_TTL)
+
+
+def slow_requests() -> List[Dict]:
+    """Sampled slow requests in the ring buffer, most recent first"""
+    from django.conf import settings
+    from django.core.cache import cache
+
+    size = getattr(settings, 'SLOW_REQUEST_BUFFER', 50)
+    samples = cache.get_many([SLOW_REQUESTS_KEY.format(slot=slot) for slot in range(size)]).values()
+    return sorted(samples, key=lambda sample: sample['at'], reverse=True)
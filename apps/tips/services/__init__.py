@@ -1,5 +1,12 @@
 from .result_verifier import ResultVerifier
 from .livescore_cz_scraper import LivescoreCzScraper
+from .grading import GradingBatch, rollup_tip
+from .market_spec import compile_market, evaluate_spec, grade_scores
+from .extraction_cache import ExtractionCache
+from .tip_ingestion import BetslipRejected, ExtractionUnavailable, IngestionBatch, ingest_tip, prepare_tip, validate_extraction
+from .slip_extractors import SLIP_EXTRACTORS, SlipExtractor, extract_slip, register_extractor
 
-__all__ = ['ResultVerifier', 'LivescoreCzScraper']
+__all__ = ['ResultVerifier', 'LivescoreCzScraper', 'GradingBatch', 'rollup_tip', 'compile_market', 'evaluate_spec', 'grade_scores', 'ExtractionCache',
+           'BetslipRejected', 'ExtractionUnavailable', 'IngestionBatch', 'ingest_tip', 'prepare_tip', 'validate_extraction',
+           'SLIP_EXTRACTORS', 'SlipExtractor', 'extract_slip', 'register_extractor']
 
@@ -0,0 +1,123 @@
+"""
+Extraction Cache
+
+Reuses a successful betslip extraction when the same slip is uploaded again,
+so a re-upload returns instantly and costs no Gemini call.
+
+Two lookups, in order:
+- Exact: MD5 of the stored screenshot. Identical bytes are the same slip,
+  whoever uploads them.
+- Perceptual: dHash distance of the screenshot, for recropped, rescaled or
+  re-encoded copies. Slips from the same bookmaker share their layout and
+  differ only in text, so two different slips can hash closer than two
+  encodings of one slip; near matches are therefore only accepted for the
+  same tipster and bet code (the tipster re-submitting a slip after a
+  validation error).
+"""
+
+import copy
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """Database-backed cache of process_betslip_image results"""
+
+    def __init__(self, max_distance: float = None, ttl_days: int = None):
+        """
+        Args:
+            max_distance: Largest share of differing hash bits for a perceptual
+                match (default: settings.EXTRACTION_CACHE_MAX_DISTANCE)
+            ttl_days: Age after which entries are ignored and purged
+                (default: settings.EXTRACTION_CACHE_DAYS)
+        """
+        if max_distance is None:
+            max_distance = getattr(settings, 'EXTRACTION_CACHE_MAX_DISTANCE', 0.1)
+        if ttl_days is None:
+            ttl_days = getattr(settings, 'EXTRACTION_CACHE_DAYS', 7)
+        self.max_distance = max_distance
+        self.ttl_days = ttl_days
+
+    def _cutoff(self):
+        return timezone.now() - timedelta(days=self.ttl_days)
+
+    def lookup(self, content_md5: str, image_hash: str = '', tipster_id: int = None,
+               bet_code: str = '') -> Optional[dict]:
+        """
+        Find a prior extraction of this slip.
+
+        Args:
+            content_md5: MD5 of the stored screenshot bytes
+            image_hash: Perceptual hash of the screenshot ('' skips the near lookup)
+            tipster_id: Uploading tipster
+            bet_code: Bet code the slip was submitted with
+
+        Returns:
+            Copy of the cached result with 'cached': True and 'cache_match'
+            ('exact' or 'perceptual'), or None on a miss
+        """
+        from ..image_processing import hash_distance
+        from ..models import ExtractionCacheEntry
+
+        fresh = ExtractionCacheEntry.objects.filter(created_at__gte=self._cutoff())
+
+        entry = fresh.filter(content_md5=content_md5).first()
+        match = 'exact'
+
+        if entry is None and image_hash and tipster_id and bet_code:
+            match = 'perceptual'
+            candidates = fresh.filter(tipster_id=tipster_id, bet_code=bet_code).exclude(image_hash='')
+            best_distance = None
+            for candidate in candidates.only('id', 'image_hash', 'result'):
+                distance = hash_distance(image_hash, candidate.image_hash)
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    entry, best_distance = candidate, distance
+            if entry is not None:
+                logger.info(f"Perceptual cache match for {bet_code} (distance {best_distance:.3f})")
+
+        if entry is None:
+            return None
+
+        ExtractionCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_hit_at=timezone.now())
+
+        result = copy.deepcopy(entry.result)
+        result['cached'] = True
+        result['cache_match'] = match
+        return result
+
+    def store(self, result: dict, content_md5: str, image_hash: str = '', tipster_id: int = None,
+              bet_code: str = ''):
+        """
+        Cache a successful extraction and drop expired entries.
+
+        Args:
+            result: process_betslip_image result (ignored unless successful)
+            content_md5, image_hash, tipster_id, bet_code: As for lookup
+        """
+        from ..models import ExtractionCacheEntry
+
+        if not result or not result.get('success'):
+            return None
+
+        self.purge()
+        return ExtractionCacheEntry.objects.create(
+            tipster_id=tipster_id,
+            bet_code=bet_code or '',
+            content_md5=content_md5,
+            image_hash=image_hash or '',
+            result=result,
+        )
+
+    def purge(self) -> int:
+        """Delete entries older than the TTL, returns how many"""
+        from ..models import ExtractionCacheEntry
+
+        deleted, _ = ExtractionCacheEntry.objects.filter(created_at__lt=self._cutoff()).delete()
+        return deleted
@@ -0,0 +1,130 @@
+"""
+Grading Engine
+
+Applies leg results and the tip-level won/lost rollup in memory, then writes
+them with set-based bulk updates, so grading many tips costs a handful of
+statements instead of several saves and re-queries per tip.
+"""
+
+import logging
+from decimal import Decimal
+from typing import Iterable, List, Union
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LEG_RESULT_FIELDS = ['is_resulted', 'is_won', 'actual_result', 'odds', 'api_match_id']
+TIP_RESULT_FIELDS = ['is_resulted', 'is_won', 'result_verified_at', 'status', 'odds', 'updated_at']
+
+
+def apply_leg_result(leg, outcome: Union[bool, str], actual_result: str):
+    """
+    Record a graded outcome on a TipMatch in memory.
+
+    Args:
+        leg: TipMatch instance
+        outcome: True (won), False (lost) or 'void'
+        actual_result: Human readable result shown to users
+    """
+    leg.is_resulted = True
+    leg.actual_result = actual_result
+    if outcome == 'void':
+        leg.is_won = True  # Treat void as won so accumulator continues
+        leg.odds = Decimal('1.00')  # Reset odds to 1.0
+    else:
+        leg.is_won = bool(outcome)
+
+
+def combined_odds(legs: Iterable) -> Decimal:
+    """Product of leg odds (voided legs count as 1.00), rounded to 2 places"""
+    total_odds = Decimal('1.00')
+    for leg in legs:
+        total_odds *= leg.odds
+    return round(total_odds, 2)
+
+
+def is_decided(legs: Iterable) -> bool:
+    """An accumulator is decided as soon as any leg has lost"""
+    return any(leg.is_resulted and not leg.is_won for leg in legs)
+
+
+def rollup_tip(tip, legs: List, now=None) -> bool:
+    """
+    Resolve a tip from its already-loaded legs.
+
+    The tip is resulted as lost as soon as one leg loses, without waiting for
+    the remaining legs; otherwise it is resulted once every leg is resulted.
+
+    Args:
+        tip: Tip instance
+        legs: All TipMatch instances of the tip, with current in-memory results
+        now: Timestamp to record as result_verified_at (default: now)
+
+    Returns:
+        True if the tip was resulted by this call
+    """
+    if not legs:
+        return False
+
+    lost = is_decided(legs)
+    if not lost and not all(leg.is_resulted for leg in legs):
+        return False
+
+    now = now or timezone.now()
+    tip.is_resulted = True
+    tip.is_won = not lost  # All must win for betslip to win
+    tip.result_verified_at = now
+    tip.status = 'archived'  # Mark as archived after verification
+    tip.odds = combined_odds(legs)  # Recalculate in case of any voided matches
+    tip.updated_at = now
+    return True
+
+
+class GradingBatch:
+    """
+    Accumulates graded legs and resolved tips and flushes them together.
+
+    Usage:
+        batch = GradingBatch()
+        batch.add_leg(leg)
+        batch.add_tip(tip)
+        batch.flush()  # one transaction, one bulk_update per model
+    """
+
+    def __init__(self):
+        self._legs = {}
+        self._tips = {}
+
+    def __len__(self):
+        return len(self._legs) + len(self._tips)
+
+    def add_leg(self, leg):
+        self._legs[leg.pk] = leg
+
+    def add_tip(self, tip):
+        self._tips[tip.pk] = tip
+
+    def retain(self, tip_ids: Iterable[int]):
+        """Drop the pending updates of tips outside tip_ids, and of their legs"""
+        tip_ids = set(tip_ids)
+        self._legs = {pk: leg for pk, leg in self._legs.items() if leg.tip_id in tip_ids}
+        self._tips = {pk: tip for pk, tip in self._tips.items() if pk in tip_ids}
+
+    def flush(self):
+        """Write all pending leg and tip updates in one transaction"""
+        from apps.tips.models import Tip, TipMatch
+
+        if not self._legs and not self._tips:
+            return
+
+        with transaction.atomic():
+            if self._legs:
+                TipMatch.objects.bulk_update(list(self._legs.values()), LEG_RESULT_FIELDS)
+            if self._tips:
+                Tip.objects.bulk_update(list(self._tips.values()), TIP_RESULT_FIELDS)
+
+        logger.info(f"Flushed {len(self._legs)} leg(s) and {len(self._tips)} tip(s)")
+        self._legs.clear()
+        self._tips.clear()
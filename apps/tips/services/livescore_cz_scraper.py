@@ -1,10 +1,207 @@
+import hashlib
 import logging
-import urllib.request
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from apps.tips.request_timing import external_call
 
 logger = logging.getLogger(__name__)
 
+# Start of the <div id="score-data"> block; everything before it is skipped
+SCORE_DATA_RE = re.compile(r"""<div\b[^>]*\bid\s*=\s*["']?score-data\b""", re.IGNORECASE)
+
+# Elements that never have an end tag, so they must not change the nesting depth
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+})
+
+PARSERS = ("stream", "soup")
+
+# One pooled keep-alive session per process, shared by all scraper instances
+_session = None
+_session_lock = threading.Lock()
+
+# Last response per URL: validators (ETag / Last-Modified), body digest and parsed matches
+_responses = {}
+_responses_lock = threading.Lock()
+
+# Rows last returned by fetch_changes per (consumer, URL), shared by all scraper instances
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide HTTP session used for livescore.cz"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=LivescoreCzScraper.MAX_CONCURRENT_FETCHES)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": LivescoreCzScraper.USER_AGENT,
+                "Accept-Encoding": "gzip, deflate",
+            })
+            _session = session
+        return _session
+
+
+def day_offset(kickoff) -> int:
+    """Page offset (?d=) of the day a kickoff falls on: 0 today, -1 yesterday, ..."""
+    from django.utils import timezone
+    return (kickoff.date() - timezone.now().date()).days
+
+
+def match_key(match: Dict[str, Any]):
+    """Stable identity of a row across snapshots"""
+    return (match["match_path"], match["league"], match["home_team"], match["away_team"])
+
+
+def build_match(league: str, time_str: str, teams_raw: str, score_str: str,
+                match_path: str, status_class: str) -> Dict[str, Any]:
+    """Build a match dict from the raw fields of one score-data row."""
+    home_team, away_team = [t.strip() for t in teams_raw.split(" - ", 1)]
+
+    # Status mapping
+    # 'fin' -> Finished, 'live' -> In Progress, 'sched' -> Scheduled
+    status = "finished" if status_class == "fin" else ("live" if status_class == "live" else "scheduled")
+
+    home_goals = None
+    away_goals = None
+    if "-" in score_str and score_str != "-":
+        parts = score_str.split("-")
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            home_goals = int(parts[0])
+            away_goals = int(parts[1])
+
+    return {
+        "league": league,
+        "time": time_str,
+        "home_team": home_team,
+        "away_team": away_team,
+        "score": score_str,
+        "home_goals": home_goals,
+        "away_goals": away_goals,
+        "status": status,
+        "status_raw": status_class,
+        "match_path": match_path,
+    }
+
+
+class ScoreDataParser(HTMLParser):
+    """
+    Single-pass tokenizer for the <div id="score-data"> block.
+
+    Only direct children of the block are interpreted, mirroring the tree walk:
+    an <h4> sets the league, a <span> holds the kick-off time and the text right
+    after it the teams, and the next sibling <a> carries score, link and status.
+    Completed matches are queued on ``matches``; ``done`` is set once the block
+    closes so the caller can stop feeding input.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.matches = deque()
+        self.done = False
+        self._depth = 0
+        self._league = "Unknown League"
+        self._capture = None  # 'h4', 'span' or 'a' while collecting a child's text
+        self._text = []
+        self._a_attrs = {}
+        self._time_str = None  # time of the span just closed, until its sibling text ends
+        self._teams_text = []
+        self._pending = []  # (league, time, teams) rows waiting for their <a>
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self._depth == 0:
+            # The fed input starts at the score-data div itself
+            self._depth = 1
+            return
+
+        if self._depth == 1:
+            self._end_sibling_text()
+            if tag in ("h4", "span", "a"):
+                self._capture = tag
+                self._text = []
+                if tag == "a":
+                    self._a_attrs = dict(attrs)
+        if tag not in VOID_ELEMENTS:
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._depth == 1:
+            self._end_sibling_text()
+
+    def handle_endtag(self, tag):
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        if self._depth == 1:
+            self._end_sibling_text()
+        self._depth -= 1
+        if self._depth <= 0:
+            self.finish()
+            return
+        if self._depth != 1 or self._capture != tag:
+            return
+
+        text = "".join(self._text).strip()
+        self._capture = None
+        if tag == "h4":
+            # Clean league header, removing 'Standings' link text if attached
+            header_text = text.split("Standings")[0].strip()
+            if header_text:
+                self._league = header_text
+        elif tag == "span":
+            self._time_str = text
+            self._teams_text = []
+        else:
+            classes = (self._a_attrs.get("class") or "").split()
+            self._flush_pending(text, self._a_attrs.get("href") or "", classes[0] if classes else "")
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        if self._capture:
+            self._text.append(data)
+        elif self._depth == 1 and self._time_str is not None:
+            # Text may arrive in several pieces when it spans fed chunks
+            self._teams_text.append(data)
+
+    def handle_comment(self, data):
+        if self._depth == 1:
+            self._end_sibling_text()
+
+    def finish(self):
+        """Close the block; rows still waiting for an <a> get no score"""
+        self._end_sibling_text()
+        self._flush_pending("-", "", "sched")
+        self.done = True
+
+    def _end_sibling_text(self):
+        if self._time_str is not None:
+            teams_raw = "".join(self._teams_text).strip()
+            if " - " in teams_raw:
+                self._pending.append((self._league, self._time_str, teams_raw))
+        self._time_str = None
+        self._teams_text = []
+
+    def _flush_pending(self, score_str, match_path, status_class):
+        for league, time_str, teams_raw in self._pending:
+            self.matches.append(build_match(league, time_str, teams_raw, score_str, match_path, status_class))
+        self._pending = []
+
+
 class LivescoreCzScraper:
     """
     Lightweight, reliable HTML scraper for https://www.livescore.cz/
@@ -17,35 +214,171 @@ class LivescoreCzScraper:
         "(KHTML, Gecko) Chrome/120.0.0.0 Safari/537.36"
     )
 
-    def __init__(self, timeout: int = 15):
+    # Characters fed to the streaming parser at a time
+    STREAM_CHUNK_SIZE = 16384
+
+    # Pages fetched in parallel by fetch_many (and pooled connections kept)
+    MAX_CONCURRENT_FETCHES = 4
+
+    def __init__(self, timeout: int = 15, parser: Optional[str] = None):
+        """
+        :param timeout: HTTP timeout in seconds
+        :param parser: 'stream' (single-pass tokenizer over #score-data) or 'soup'
+                       (BeautifulSoup tree); defaults to the LIVESCORE_PARSER setting
+        """
+        if parser is None:
+            from django.conf import settings
+            parser = getattr(settings, "LIVESCORE_PARSER", "stream")
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown livescore parser '{parser}', expected one of {PARSERS}")
         self.timeout = timeout
+        self.parser = parser
 
     def fetch_scores(self, day_offset: int = 0, status_filter: str = "all") -> List[Dict[str, Any]]:
         """
         Fetch and parse match results from livescore.cz.
 
+        Requests are conditional (If-None-Match / If-Modified-Since) over a pooled
+        keep-alive session; an unchanged page is not downloaded or parsed again.
+
         :param day_offset: 0 for Today, -1 for Yesterday, 1 for Tomorrow, etc.
         :param status_filter: 'all' (s=1), 'live' (s=2), 'finished' (s=3)
         :return: List of dicts with keys: league, time, home_team, away_team, score, home_goals, away_goals, status
+                 (copies: the parsed page stays cached for other callers)
+        """
+        matches = self._fetch(self.build_url(day_offset, status_filter))
+        return matches if matches is not None else []
+
+    def fetch_many(self, day_offsets: Iterable[int], status_filter: str = "all") -> Dict[int, List[Dict[str, Any]]]:
         """
+        Fetch several days concurrently.
+
+        :return: Mapping of day_offset to its list of matches
+        """
+        day_offsets = list(day_offsets)
+        workers = max(1, min(self.MAX_CONCURRENT_FETCHES, len(day_offsets)))
+        # The fetch threads aren't the request's: time the wait for them here
+        with external_call("livescore"), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="livescore") as executor:
+            results = executor.map(lambda offset: self.fetch_scores(offset, status_filter), day_offsets)
+            return dict(zip(day_offsets, results))
+
+    def fetch_changes(self, day_offset: int = 0, status_filter: str = "all",
+                      consumer: str = "default") -> List[Dict[str, Any]]:
+        """
+        Fetch a page and return only rows that are new or changed since the
+        consumer's previous fetch_changes() call for the same page.
+
+        Snapshots are kept per process and consumer, not per scraper instance,
+        so a consumer sees each change once however many scrapers it creates,
+        and different consumers don't take each other's changes.
+
+        A failed fetch returns no changes and keeps the previous snapshot.
+        """
+        url = self.build_url(day_offset, status_filter)
+        matches = self._fetch(url)
+        if matches is None:
+            return []
+
+        current = {match_key(match): match for match in matches}
+        with _snapshots_lock:
+            previous = _snapshots.get((consumer, url), {})
+            _snapshots[(consumer, url)] = current
+
+        changed = [dict(match) for key, match in current.items() if previous.get(key) != match]
+        logger.info(f"livescore.cz {url}: {len(changed)} of {len(current)} rows changed for {consumer}")
+        return changed
+
+    def build_url(self, day_offset: int = 0, status_filter: str = "all") -> str:
         status_map = {"all": 1, "live": 2, "finished": 3}
         s_val = status_map.get(status_filter, 1)
+        return f"{self.BASE_URL}?d={day_offset}&s={s_val}"
 
-        url = f"{self.BASE_URL}?d={day_offset}&s={s_val}"
-        logger.info(f"Fetching scores from {url}")
+    def _fetch(self, url: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Conditionally fetch and parse a page.
+
+        :return: Copies of the parsed matches, or None if the request failed
+        """
+        with _responses_lock:
+            cached = _responses.get(url)
+
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
 
-        req = urllib.request.Request(url, headers={"User-Agent": self.USER_AGENT})
+        logger.info(f"Fetching scores from {url}")
         try:
-            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
-                html = resp.read().decode("utf-8")
+            with external_call("livescore"):
+                resp = get_session().get(url, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304 and cached:
+                logger.info(f"{url} not modified, reusing {len(cached['matches'])} parsed matches")
+                return [dict(match) for match in cached["matches"]]
+            resp.raise_for_status()
         except Exception as e:
             logger.error(f"Failed to fetch {url}: {e}")
-            return []
+            return None
+
+        digest = hashlib.md5(resp.content).hexdigest()
+        if cached and cached["digest"] == digest:
+            # Server ignored the validators but the page is byte-identical
+            matches = cached["matches"]
+        else:
+            matches = self.parse_html(resp.content.decode("utf-8"))
 
-        return self.parse_html(html)
+        with _responses_lock:
+            _responses[url] = {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "digest": digest,
+                "matches": matches,
+            }
+        return [dict(match) for match in matches]
 
     def parse_html(self, html: str) -> List[Dict[str, Any]]:
-        """Parse raw HTML string from livescore.cz."""
+        """Parse raw HTML string from livescore.cz with the configured parser."""
+        if self.parser == "soup":
+            matches = self._parse_html_soup(html)
+        else:
+            matches = list(self.iter_matches(html))
+
+        logger.info(f"Successfully scraped {len(matches)} matches from livescore.cz")
+        return matches
+
+    def iter_matches(self, html: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield matches from the #score-data block as they are tokenized.
+
+        Only the block itself is scanned: the page before it is skipped and
+        tokenizing stops as soon as the block closes.
+        """
+        start = SCORE_DATA_RE.search(html)
+        if not start:
+            logger.warning("Could not find <div id='score-data'> in HTML content")
+            return
+
+        parser = ScoreDataParser()
+        position = start.start()
+        while position < len(html) and not parser.done:
+            parser.feed(html[position:position + self.STREAM_CHUNK_SIZE])
+            position += self.STREAM_CHUNK_SIZE
+            while parser.matches:
+                yield parser.matches.popleft()
+
+        if not parser.done:
+            # Truncated page: close the block so rows waiting for a score are kept
+            parser.close()
+            parser.finish()
+        while parser.matches:
+            yield parser.matches.popleft()
+
+    def _parse_html_soup(self, html: str) -> List[Dict[str, Any]]:
+        """Parse with a full BeautifulSoup tree (reference implementation)."""
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, "html.parser")
         score_div = soup.find("div", id="score-data")
         if not score_div:
@@ -67,37 +400,13 @@ class LivescoreCzScraper:
                 if next_sibling and isinstance(next_sibling, str):
                     teams_raw = next_sibling.strip()
                     if " - " in teams_raw:
-                        home_team, away_team = [t.strip() for t in teams_raw.split(" - ", 1)]
-                        
                         a_tag = elem.find_next_sibling("a")
                         score_str = a_tag.get_text().strip() if a_tag else "-"
                         match_path = a_tag.get("href", "") if a_tag else ""
-                        status_class = a_tag.get("class", [""])[0] if a_tag else "sched"
-
-                        # Status mapping
-                        # 'fin' -> Finished, 'live' -> In Progress, 'sched' -> Scheduled
-                        status = "finished" if status_class == "fin" else ("live" if status_class == "live" else "scheduled")
-
-                        home_goals = None
-                        away_goals = None
-                        if "-" in score_str and score_str != "-":
-                            parts = score_str.split("-")
-                            if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-                                home_goals = int(parts[0])
-                                away_goals = int(parts[1])
-
-                        matches.append({
-                            "league": current_league,
-                            "time": time_str,
-                            "home_team": home_team,
-                            "away_team": away_team,
-                            "score": score_str,
-                            "home_goals": home_goals,
-                            "away_goals": away_goals,
-                            "status": status,
-                            "status_raw": status_class,
-                            "match_path": match_path,
-                        })
+                        status_class = (a_tag.get("class") or [""])[0] if a_tag else "sched"
+
+                        matches.append(build_match(
+                            current_league, time_str, teams_raw, score_str, match_path, status_class
+                        ))
 
-        logger.info(f"Successfully scraped {len(matches)} matches from livescore.cz")
         return matches
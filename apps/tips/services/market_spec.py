@@ -0,0 +1,365 @@
+"""
+Market Spec Compiler
+
+Parses the free-text `market` / `selection` of a TipMatch once into a small
+structured spec (market kind, line, side/outcomes) so grading a leg is a table
+lookup against the final score instead of re-running string and regex checks
+on every verification pass.
+
+The rules mirror the historic ResultVerifier._check_market_result cascade
+exactly, including which markets fall through to later checks.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a rule below changes so stored specs are recompiled
+MARKET_SPEC_VERSION = 1
+
+HOME, DRAW, AWAY = 'H', 'D', 'A'
+
+GOAL_LINE_RE = re.compile(r'(\d+\.?\d*)')
+SCORE_RE = re.compile(r'(\d+)[:-](\d+)')
+HANDICAP_RE = re.compile(r'([+-]?\d+\.?\d*)')
+
+
+def extract_goal_line(text: str) -> Optional[float]:
+    """Extract goal line from market string (e.g., "Over 2.5" -> 2.5)"""
+    match = GOAL_LINE_RE.search(text)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def extract_score(selection: str) -> Optional[Tuple[int, int]]:
+    """Extract score from selection string (e.g., "2-1" -> (2, 1))"""
+    match = SCORE_RE.search(selection)
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    return None
+
+
+def extract_handicap(selection: str) -> Optional[float]:
+    """Extract handicap value from selection (e.g., "[+0.50]" -> 0.5)"""
+    match = HANDICAP_RE.search(selection)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def _names_match(selection_lower: str, name: str) -> bool:
+    """Exact or substring match of a team name in a selection"""
+    return (
+        selection_lower == name or
+        (len(name) > 3 and name in selection_lower) or
+        (len(selection_lower) > 3 and selection_lower in name)
+    )
+
+
+# --- Compilers: each returns a spec, or None to fall through to the next ---
+
+def _compile_over_under(market, selection, market_lower, selection_lower, home_team, away_team):
+    if not ('over' in market_lower or 'under' in market_lower or
+            'total goals' in market_lower or 'goals total' in market_lower):
+        return None
+
+    # Extract goal line from market or selection
+    goal_line = extract_goal_line(market)
+    if not goal_line:
+        goal_line = extract_goal_line(selection)
+    if not goal_line:
+        return None
+
+    side = None
+    if 'over' in selection_lower or '+' in selection_lower or '>' in selection_lower:
+        side = 'over'
+    elif 'under' in selection_lower or '-' in selection_lower or '<' in selection_lower:
+        side = 'under'
+    elif 'yes' in selection_lower:
+        if 'over' in market_lower:
+            side = 'over'
+        elif 'under' in market_lower:
+            side = 'under'
+    elif 'no' in selection_lower:
+        if 'over' in market_lower:
+            side = 'under'
+        elif 'under' in market_lower:
+            side = 'over'
+    else:
+        if 'over' in market_lower:
+            side = 'over'
+        elif 'under' in market_lower:
+            side = 'under'
+
+    if side is None:
+        return None
+    return {'kind': 'over_under', 'side': side, 'line': goal_line}
+
+
+def _compile_match_result(market, selection, market_lower, selection_lower, home_team, away_team):
+    if not ('1x2' in market_lower or 'match result' in market_lower or
+            'full time result' in market_lower or '3 way' in market_lower):
+        return None
+
+    # Check team names first if provided
+    if home_team and away_team:
+        if _names_match(selection_lower, home_team.lower().strip()):
+            return {'kind': 'result', 'outcomes': [HOME], 'team': 'home'}
+        elif _names_match(selection_lower, away_team.lower().strip()):
+            return {'kind': 'result', 'outcomes': [AWAY], 'team': 'away'}
+
+    if selection_lower in ['1x', 'home/draw', 'home or draw']:
+        return {'kind': 'result', 'outcomes': [HOME, DRAW]}
+    elif selection_lower in ['x2', 'draw/away', 'away or draw']:
+        return {'kind': 'result', 'outcomes': [DRAW, AWAY]}
+    elif selection_lower in ['12', 'home/away', 'home or away']:
+        return {'kind': 'result', 'outcomes': [HOME, AWAY]}
+    elif selection_lower in ['1', 'home'] or selection.strip() == '1':
+        return {'kind': 'result', 'outcomes': [HOME]}
+    elif selection_lower in ['x', 'draw'] or selection.strip().upper() == 'X':
+        return {'kind': 'result', 'outcomes': [DRAW]}
+    elif selection_lower in ['2', 'away'] or selection.strip() == '2':
+        return {'kind': 'result', 'outcomes': [AWAY]}
+    return None
+
+
+def _compile_draw_no_bet(market, selection, market_lower, selection_lower, home_team, away_team):
+    if not ('draw no bet' in market_lower or 'dnb' in market_lower):
+        return None
+
+    side = None
+    if home_team and away_team:
+        if _names_match(selection_lower, home_team.lower().strip()):
+            side = HOME
+        elif _names_match(selection_lower, away_team.lower().strip()):
+            side = AWAY
+
+    if side is None:
+        if selection_lower in ['1', 'home'] or selection.strip() == '1':
+            side = HOME
+        elif selection_lower in ['2', 'away'] or selection.strip() == '2':
+            side = AWAY
+
+    spec = {'kind': 'draw_no_bet', 'side': side}
+    if side is None:
+        # A draw still voids the bet; otherwise later rules decide
+        spec['fallback'] = _compile_chain(
+            _COMPILERS_AFTER_DNB, market, selection, market_lower, selection_lower, home_team, away_team
+        )
+    return spec
+
+
+def _compile_btts(market, selection, market_lower, selection_lower, home_team, away_team):
+    if not ('both teams' in market_lower or 'btts' in market_lower or 'gg' in market_lower):
+        return None
+
+    if 'yes' in selection_lower or 'gg' in selection_lower or selection_lower == '1' or selection_lower == 'y':
+        return {'kind': 'btts', 'both_score': True}
+    elif 'no' in selection_lower or 'ng' in selection_lower or selection_lower == '2' or selection_lower == 'n':
+        return {'kind': 'btts', 'both_score': False}
+    return None
+
+
+def _compile_double_chance(market, selection, market_lower, selection_lower, home_team, away_team):
+    if 'double chance' not in market_lower:
+        return None
+
+    # Check team names first if provided
+    if home_team and away_team:
+        h_name = home_team.lower().strip()
+        a_name = away_team.lower().strip()
+        if h_name in selection_lower and ('draw' in selection_lower or 'x' in selection_lower or '1' in selection_lower):
+            return {'kind': 'result', 'outcomes': [HOME, DRAW], 'team': 'home'}
+        elif a_name in selection_lower and ('draw' in selection_lower or 'x' in selection_lower or '2' in selection_lower):
+            return {'kind': 'result', 'outcomes': [DRAW, AWAY], 'team': 'away'}
+        elif h_name in selection_lower and a_name in selection_lower:
+            return {'kind': 'result', 'outcomes': [HOME, AWAY]}
+
+    if ('1x' in selection_lower or 'home or draw' in selection_lower or 'home/draw' in selection_lower or
+            '1 or x' in selection_lower or 'draw or home' in selection_lower):
+        return {'kind': 'result', 'outcomes': [HOME, DRAW]}
+    elif ('x2' in selection_lower or 'away or draw' in selection_lower or 'draw/away' in selection_lower or
+            'x or 2' in selection_lower or '2 or x' in selection_lower):
+        return {'kind': 'result', 'outcomes': [DRAW, AWAY]}
+    elif ('12' in selection_lower or 'home or away' in selection_lower or 'home/away' in selection_lower or
+            '1 or 2' in selection_lower or 'away or home' in selection_lower):
+        return {'kind': 'result', 'outcomes': [HOME, AWAY]}
+    return None
+
+
+def _compile_correct_score(market, selection, market_lower, selection_lower, home_team, away_team):
+    if 'correct score' not in market_lower:
+        return None
+
+    # Extract score from selection (e.g., "2-1", "0:0")
+    predicted_score = extract_score(selection)
+    if predicted_score:
+        return {'kind': 'correct_score', 'home': predicted_score[0], 'away': predicted_score[1]}
+    return None
+
+
+def _compile_handicap(market, selection, market_lower, selection_lower, home_team, away_team):
+    if not ('asian handicap' in market_lower or 'handicap' in market_lower):
+        return None
+
+    handicap = extract_handicap(selection)
+    if handicap is None:
+        return None
+
+    # Determine which team has handicap
+    side = AWAY
+    if home_team and home_team.lower().strip() in selection_lower:
+        side = HOME
+    elif away_team and away_team.lower().strip() in selection_lower:
+        side = AWAY
+    elif 'home' in selection_lower or '1' in selection_lower:
+        side = HOME
+    return {'kind': 'handicap', 'side': side, 'line': handicap}
+
+
+_COMPILERS_AFTER_DNB = [
+    _compile_btts,
+    _compile_double_chance,
+    _compile_correct_score,
+    _compile_handicap,
+]
+
+_COMPILERS = [
+    _compile_over_under,
+    _compile_match_result,
+    _compile_draw_no_bet,
+] + _COMPILERS_AFTER_DNB
+
+
+def _compile_chain(compilers, market, selection, market_lower, selection_lower, home_team, away_team) -> Dict:
+    for compiler in compilers:
+        spec = compiler(market, selection, market_lower, selection_lower, home_team, away_team)
+        if spec is not None:
+            return spec
+    return {'kind': 'unknown'}
+
+
+def compile_market(market: str, selection: str, home_team: str = "", away_team: str = "") -> Dict:
+    """
+    Compile a market/selection pair into a structured spec.
+
+    Args:
+        market: Betting market (e.g., "Over 2.5", "1X2", "BTTS")
+        selection: The bet selection (e.g., "Over", "1", "Yes")
+        home_team: Home team name
+        away_team: Away team name
+
+    Returns:
+        JSON-serializable spec dict with at least 'kind' and 'v' keys
+    """
+    market = market or ''
+    selection = selection or ''
+    spec = _compile_chain(
+        _COMPILERS,
+        market,
+        selection,
+        market.lower().strip(),
+        selection.lower().strip(),
+        home_team,
+        away_team
+    )
+    spec['v'] = MARKET_SPEC_VERSION
+    return spec
+
+
+def is_current_spec(spec) -> bool:
+    """Check if a stored spec was compiled by the current rules"""
+    return bool(spec) and spec.get('v') == MARKET_SPEC_VERSION
+
+
+# --- Evaluators: spec + final score -> True / False / 'void' ---
+
+def _outcome(home_score: int, away_score: int) -> str:
+    if home_score > away_score:
+        return HOME
+    if home_score == away_score:
+        return DRAW
+    return AWAY
+
+
+def _eval_over_under(spec, home_score, away_score):
+    total_goals = home_score + away_score
+    if spec['side'] == 'over':
+        return total_goals > spec['line']
+    return total_goals < spec['line']
+
+
+def _eval_result(spec, home_score, away_score):
+    return _outcome(home_score, away_score) in spec['outcomes']
+
+
+def _eval_draw_no_bet(spec, home_score, away_score):
+    if home_score == away_score:
+        return 'void'
+    if spec['side'] is None:
+        return evaluate_spec(spec['fallback'], home_score, away_score)
+    return _outcome(home_score, away_score) == spec['side']
+
+
+def _eval_btts(spec, home_score, away_score):
+    both_scored = (home_score > 0 and away_score > 0)
+    return both_scored if spec['both_score'] else not both_scored
+
+
+def _eval_correct_score(spec, home_score, away_score):
+    return spec['home'] == home_score and spec['away'] == away_score
+
+
+def _eval_handicap(spec, home_score, away_score):
+    if spec['side'] == HOME:
+        return home_score + spec['line'] > away_score
+    return away_score + spec['line'] > home_score
+
+
+def _eval_unknown(spec, home_score, away_score):
+    return False
+
+
+EVALUATORS = {
+    'over_under': _eval_over_under,
+    'result': _eval_result,
+    'draw_no_bet': _eval_draw_no_bet,
+    'btts': _eval_btts,
+    'correct_score': _eval_correct_score,
+    'handicap': _eval_handicap,
+    'unknown': _eval_unknown,
+}
+
+
+def evaluate_spec(spec: Dict, home_score: Optional[int], away_score: Optional[int]) -> Union[bool, str]:
+    """
+    Grade a compiled spec against a final score.
+
+    Returns:
+        True if bet won, False if lost, 'void' if bet is push/voided
+    """
+    if home_score is None or away_score is None:
+        return False
+    return EVALUATORS[spec['kind']](spec, home_score, away_score)
+
+
+def grade_scores(spec: Dict, home_scores: Sequence[Optional[int]], away_scores: Sequence[Optional[int]]) -> List[Union[bool, str]]:
+    """
+    Grade one spec against many final scores (e.g. for backtests).
+
+    Args:
+        spec: Compiled market spec
+        home_scores: Home team final scores
+        away_scores: Away team final scores, aligned with home_scores
+
+    Returns:
+        List of True / False / 'void', one per score pair
+    """
+    evaluator = EVALUATORS[spec['kind']]
+    return [
+        False if home is None or away is None else evaluator(spec, home, away)
+        for home, away in zip(home_scores, away_scores)
+    ]
@@ -0,0 +1,278 @@
+"""
+Offline Regrade Service
+
+Re-grades historical TipMatch records against the Fixture scores already in the
+database, using the current market rules. Grading runs in a process pool over
+plain tuples and never touches the network, so a rule change can be backtested
+over months of history before (optionally) applying the corrected results.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connections, transaction
+from django.db.models import Count, Q
+
+from .grading import GradingBatch, apply_leg_result, rollup_tip
+from .market_spec import compile_market, evaluate_spec
+
+logger = logging.getLogger(__name__)
+
+
+def grade_rows(rows: List[Tuple]) -> List[Tuple]:
+    """
+    Grade legs from plain values. Runs in pool worker processes.
+
+    Args:
+        rows: (leg_id, market, selection, home_team, away_team, is_void,
+               home_goals, away_goals) tuples
+
+    Returns:
+        (leg_id, outcome, spec) tuples, outcome being True, False or 'void'
+    """
+    graded = []
+    for leg_id, market, selection, home_team, away_team, is_void, home_goals, away_goals in rows:
+        spec = compile_market(market, selection, home_team=home_team, away_team=away_team)
+        outcome = 'void' if is_void else evaluate_spec(spec, home_goals, away_goals)
+        graded.append((leg_id, outcome, spec))
+    return graded
+
+
+def is_manual_result(actual_result: str) -> bool:
+    """Results entered through manual_resolution or the admin actions"""
+    return actual_result.startswith('Manual') or actual_result == 'Void / Push'
+
+
+def outcome_label(is_resulted: bool, is_won: bool, actual_result: str = '') -> str:
+    if not is_resulted:
+        return 'pending'
+    if actual_result.startswith('Void'):
+        return 'void'
+    return 'won' if is_won else 'lost'
+
+
+class Regrader:
+    """
+    Backtests the current grading rules over stored fixtures.
+
+    Usage:
+        report = Regrader(workers=4).run(since=date(2025, 1, 1))
+        report = Regrader().run(apply=True)
+    """
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, since=None, until=None, apply: bool = False, include_manual: bool = False) -> Dict:
+        """
+        Regrade legs linked to a concluded fixture.
+
+        Args:
+            since: Only legs with match_date on/after this date
+            until: Only legs with match_date on/before this date
+            apply: Write changed leg and tip results (and refreshed market specs)
+            include_manual: Also regrade legs whose result was entered by hand
+
+        Returns:
+            Report with counts, leg and tip changes and tipster win-rate deltas
+        """
+        from apps.tips.models import TipMatch
+        from apps.fixtures.models import Fixture
+
+        legs = TipMatch.objects.filter(tip__status__in=['active', 'archived']).exclude(api_match_id='')
+        if since:
+            legs = legs.filter(match_date__date__gte=since)
+        if until:
+            legs = legs.filter(match_date__date__lte=until)
+
+        leg_values = list(legs.values_list(
+            'id', 'tip_id', 'api_match_id', 'market', 'selection', 'home_team', 'away_team',
+            'market_spec', 'odds', 'is_resulted', 'is_won', 'actual_result'
+        ))
+
+        fixtures = {
+            row[0]: row for row in Fixture.objects.filter(
+                api_id__in={int(v[2]) for v in leg_values if v[2].isdigit()},
+                status_short__in=Fixture.CONCLUDED_STATUSES
+            ).values_list(
+                'api_id', 'status_short', 'home_goals', 'away_goals', 'home_goals_penalty', 'away_goals_penalty'
+            )
+        }
+
+        report = {
+            'legs_checked': 0,
+            'legs_skipped_manual': 0,
+            'legs_not_concluded': 0,
+            'spec_changes': 0,
+            'leg_changes': [],
+            'tip_changes': [],
+            'tipster_deltas': [],
+            'applied': False,
+        }
+
+        rows = []
+        current = {}
+        for leg_id, tip_id, api_match_id, market, selection, home_team, away_team, spec, odds, is_resulted, is_won, actual in leg_values:
+            fixture = fixtures.get(int(api_match_id)) if api_match_id.isdigit() else None
+            if fixture is None:
+                report['legs_not_concluded'] += 1
+                continue
+            if not include_manual and is_manual_result(actual):
+                # Legs graded by hand are left alone unless explicitly included
+                report['legs_skipped_manual'] += 1
+                continue
+            status_short, home_goals, away_goals = fixture[1], fixture[2], fixture[3]
+            rows.append((leg_id, market, selection, home_team, away_team,
+                         status_short in Fixture.VOID_STATUSES, home_goals, away_goals))
+            current[leg_id] = (tip_id, fixture, spec, odds, is_resulted, is_won, actual, market, selection,
+                               home_team, away_team)
+
+        report['legs_checked'] = len(rows)
+        graded = self._grade(rows)
+
+        changes = {}  # leg_id -> (outcome, actual_result)
+        spec_updates = []
+        for leg_id, outcome, spec in graded:
+            tip_id, fixture, stored_spec, odds, is_resulted, is_won, actual, market, selection, home, away = current[leg_id]
+            if spec != stored_spec:
+                spec_updates.append(TipMatch(id=leg_id, market_spec=spec))
+
+            fixture_obj = Fixture(
+                status_short=fixture[1], home_goals=fixture[2], away_goals=fixture[3],
+                home_goals_penalty=fixture[4], away_goals_penalty=fixture[5]
+            )
+            if outcome == 'void':
+                new_result = f"Void / Push ({fixture[1]})"
+                unchanged = is_resulted and is_won and odds == Decimal('1.00')
+            else:
+                new_result = fixture_obj.get_result_string()
+                unchanged = is_resulted and is_won == outcome and not actual.startswith('Void')
+            if unchanged:
+                continue
+
+            changes[leg_id] = (outcome, new_result)
+            report['leg_changes'].append({
+                'leg_id': leg_id,
+                'tip_id': tip_id,
+                'match': f"{home} vs {away}",
+                'market': market,
+                'selection': selection,
+                'result': new_result,
+                'old': outcome_label(is_resulted, is_won, actual),
+                'new': 'void' if outcome == 'void' else ('won' if outcome else 'lost'),
+            })
+
+        report['spec_changes'] = len(spec_updates)
+        batch = self._rollup_changes(changes, report)
+
+        if apply:
+            with transaction.atomic():
+                batch.flush()
+                if spec_updates:
+                    TipMatch.objects.bulk_update(spec_updates, ['market_spec'], batch_size=500)
+            report['applied'] = True
+            logger.info(
+                f"Regrade applied: {len(report['leg_changes'])} leg(s), "
+                f"{len(report['tip_changes'])} tip(s), {len(spec_updates)} spec(s)"
+            )
+
+        return report
+
+    def _grade(self, rows: List[Tuple]) -> List[Tuple]:
+        """Grade rows in chunks, in a process pool when more than one worker is configured"""
+        chunks = [rows[i:i + self.CHUNK_SIZE] for i in range(0, len(rows), self.CHUNK_SIZE)]
+        if self.workers <= 1 or len(chunks) <= 1:
+            return [graded for chunk in chunks for graded in grade_rows(chunk)]
+
+        # Workers never use the database; don't let them inherit open connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return [graded for result in executor.map(grade_rows, chunks) for graded in result]
+
+    def _rollup_changes(self, changes: Dict[int, Tuple], report: Dict) -> GradingBatch:
+        """
+        Apply leg changes to their tips in memory and roll the tips up again.
+
+        Returns:
+            GradingBatch holding every changed leg and tip, ready to flush
+        """
+        from apps.tips.models import Tip
+
+        batch = GradingBatch()
+        if not changes:
+            return batch
+
+        tip_ids = {change['tip_id'] for change in report['leg_changes']}
+        tips = Tip.objects.filter(id__in=tip_ids).select_related('tipster').prefetch_related('matches')
+
+        tipster_changes = {}
+        for tip in tips:
+            before = (tip.is_resulted, tip.is_won)
+            legs = list(tip.matches.all())
+            for leg in legs:
+                if leg.id in changes:
+                    apply_leg_result(leg, *changes[leg.id])
+                    batch.add_leg(leg)
+
+            if not rollup_tip(tip, legs) and tip.is_resulted:
+                # A leg that decided the slip no longer loses: reopen it for verification
+                tip.is_resulted = False
+                tip.is_won = False
+                tip.result_verified_at = None
+                tip.status = 'active'
+            after = (tip.is_resulted, tip.is_won)
+            batch.add_tip(tip)
+
+            if after != before:
+                report['tip_changes'].append({
+                    'tip_id': tip.id,
+                    'bet_code': tip.bet_code,
+                    'tipster': str(tip.tipster),
+                    'old': outcome_label(*before),
+                    'new': outcome_label(*after),
+                })
+                resulted, won = tipster_changes.get(tip.tipster_id, (0, 0))
+                tipster_changes[tip.tipster_id] = (
+                    resulted + after[0] - before[0],
+                    won + (after[0] and after[1]) - (before[0] and before[1]),
+                )
+
+        report['tipster_deltas'] = self._tipster_deltas(tipster_changes)
+        return batch
+
+    @staticmethod
+    def _tipster_deltas(tipster_changes: Dict[int, Tuple[int, int]]) -> List[Dict]:
+        """Win rate before and after the regrade for each tipster with a changed tip"""
+        from apps.tips.models import Tip
+
+        totals = Tip.objects.filter(
+            tipster_id__in=tipster_changes.keys(),
+            is_resulted=True
+        ).values('tipster_id', 'tipster__username', 'tipster__phone_number').annotate(
+            resulted=Count('id'),
+            won=Count('id', filter=Q(is_won=True))
+        )
+        totals = {row['tipster_id']: row for row in totals}
+
+        def rate(won, resulted):
+            return round(won / resulted * 100, 1) if resulted > 0 else 0.0
+
+        deltas = []
+        for tipster_id, (resulted_change, won_change) in tipster_changes.items():
+            row = totals.get(tipster_id, {'resulted': 0, 'won': 0})
+            before = rate(row['won'], row['resulted'])
+            after = rate(row['won'] + won_change, row['resulted'] + resulted_change)
+            deltas.append({
+                'tipster_id': tipster_id,
+                'tipster': row.get('tipster__username') or row.get('tipster__phone_number') or f"User {tipster_id}",
+                'before': before,
+                'after': after,
+                'delta': round(after - before, 1),
+            })
+
+        return sorted(deltas, key=lambda d: abs(d['delta']), reverse=True)
@@ -6,11 +6,16 @@ and determining if each bet won or lost based on the market.
 """
 
 import logging
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from django.utils import timezone
 from django.db.models import Q
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time as dt_time, timezone as dt_timezone
+
+from .grading import GradingBatch, apply_leg_result, rollup_tip
+from .market_spec import compile_market, evaluate_spec, is_current_spec
 
 logger = logging.getLogger(__name__)
 
@@ -20,32 +25,54 @@ class ResultVerifier:
     Service to verify tip results using API-Football data.
     """
 
+    CHECKPOINT_NAME = 'result_verification'
+
+    # Re-read fixtures changed shortly before the stored watermark, so rows saved
+    # while the previous run was selecting are not skipped.
+    WATERMARK_OVERLAP = timedelta(minutes=2)
+
+    # Legs this long past kickoff are included in the sweep even if linked to a
+    # fixture, in case their fixture concluded before the tip became active.
+    OVERDUE_AFTER = timedelta(hours=3)
+
+    # Tips claimed per batch; each batch is graded, then its results flushed together
+    GRADING_BATCH_SIZE = 100
+
     def __init__(self):
         from apps.fixtures.models import Fixture
         from apps.fixtures.services import APIFootballService
         self.api_service = APIFootballService()
 
-    def verify_tips(self, date: str = None, fetch_from_api: bool = False) -> Dict:
+    def verify_tips(self, date: str = None, fetch_from_api: bool = False, incremental: bool = False,
+                    workers: int = None) -> Dict:
         """
         Verify all unverified tips for a given date.
 
         Args:
             date: Date in format 'YYYY-MM-DD' (default: today)
             fetch_from_api: Whether to fetch fresh fixtures from API (default: False, use DB only)
+            incremental: Only revisit legs whose fixture concluded since the last
+                incremental run, plus a periodic sweep of legs without a fixture
+            workers: Number of parallel grading workers
+                (default: RESULT_VERIFICATION_WORKERS setting)
 
         Returns:
             Dictionary with verification statistics
         """
+        from django.conf import settings
         from apps.tips.models import Tip, TipMatch
         from apps.fixtures.models import Fixture
 
+        if workers is None:
+            workers = getattr(settings, 'RESULT_VERIFICATION_WORKERS', 1)
+
         # Get all active tips with unverified results
         tips_to_verify = Tip.objects.filter(
             status='active',
             is_resulted=False
         ).prefetch_related('matches')
 
-        logger.info(f"Found {tips_to_verify.count()} tips to verify")
+        run_started = timezone.now()
 
         # Optionally fetch fresh fixtures from API
         if fetch_from_api:
@@ -67,54 +94,424 @@ class ResultVerifier:
                     logger.warning("API limit reached, using database fixtures only")
                     break
 
-        stats = {
+        checkpoint = None
+        sweep = use_livescore = True
+        if incremental:
+            checkpoint, tips_to_verify, sweep, use_livescore = self._select_incremental(tips_to_verify, run_started)
+
+        logger.info(f"Found {tips_to_verify.count()} tips to verify")
+
+        stats = self._verify_tip_set(tips_to_verify, use_livescore=use_livescore, workers=workers)
+        stats['incremental'] = incremental
+        stats['sweep'] = sweep
+
+        if checkpoint is not None:
+            checkpoint.fixture_watermark = run_started
+            update_fields = ['fixture_watermark', 'updated_at']
+            if sweep:
+                checkpoint.last_sweep_at = run_started
+                update_fields.append('last_sweep_at')
+            checkpoint.save(update_fields=update_fields)
+
+        return stats
+
+    def verify_fixtures(self, fixture_ids: List[int]) -> Dict:
+        """
+        Grade only the legs that depend on the given fixtures, and their tips.
+
+        Used when ingestion sees fixtures conclude, so tips resolve right after
+        full time instead of waiting for the next scheduled run.
+
+        Args:
+            fixture_ids: API-Football fixture ids that just concluded
+
+        Returns:
+            Dictionary with verification statistics
+        """
+        from apps.tips.models import Tip
+
+        legs_by_fixture = self.dependent_legs(fixture_ids)
+        tip_ids = {tip_id for legs in legs_by_fixture.values() for _, tip_id in legs}
+
+        tips_to_verify = Tip.objects.filter(
+            id__in=tip_ids,
+            status='active',
+            is_resulted=False
+        ).prefetch_related('matches')
+
+        logger.info(
+            f"{len(fixture_ids)} fixture(s) concluded, "
+            f"{sum(len(legs) for legs in legs_by_fixture.values())} dependent leg(s) "
+            f"across {len(tip_ids)} tip(s)"
+        )
+
+        stats = self._verify_tip_set(tips_to_verify, use_livescore=False)
+        stats['display_legs_graded'] = self._grade_decided_legs(fixture_ids)
+        return stats
+
+    def _grade_decided_legs(self, fixture_ids: List[int]) -> int:
+        """
+        Fill in results of legs whose tip was already decided by a lost leg.
+
+        These results are for display only: the tip is not touched, and legs
+        are only graded when their fixture concludes anyway (no lookups,
+        fuzzy matching or scraping).
+
+        Returns:
+            Number of legs graded
+        """
+        from apps.tips.models import TipMatch
+        from apps.fixtures.models import Fixture
+
+        legs = list(TipMatch.objects.filter(
+            api_match_id__in=[str(fixture_id) for fixture_id in fixture_ids],
+            is_resulted=False,
+            tip__is_resulted=True
+        ))
+        if not legs:
+            return 0
+
+        fixtures = Fixture.objects.in_bulk([int(leg.api_match_id) for leg in legs], field_name='api_id')
+        batch = GradingBatch()
+        for leg in legs:
+            fixture = fixtures.get(int(leg.api_match_id))
+            if fixture and fixture.is_concluded:
+                self._apply_fixture_result(leg, fixture)
+                batch.add_leg(leg)
+
+        graded = len(batch)
+        batch.flush()
+        return graded
+
+    @staticmethod
+    def dependent_legs(fixture_ids: List[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """
+        Reverse index from fixture id to the unresulted legs that reference it.
+
+        Returns:
+            Mapping of fixture id to a list of (TipMatch id, Tip id) tuples
+        """
+        from apps.tips.models import TipMatch
+
+        legs = TipMatch.objects.filter(
+            api_match_id__in=[str(fixture_id) for fixture_id in fixture_ids],
+            is_resulted=False
+        ).values_list('api_match_id', 'id', 'tip_id')
+
+        index = {}
+        for api_match_id, leg_id, tip_id in legs:
+            index.setdefault(int(api_match_id), []).append((leg_id, tip_id))
+        return index
+
+    def _verify_tip_set(self, tips_to_verify, use_livescore: bool = True, workers: int = 1) -> Dict:
+        """
+        Verify each tip of a queryset and aggregate the results.
+
+        The selected tip ids are split into batches of GRADING_BATCH_SIZE that
+        workers claim one at a time with SELECT ... FOR UPDATE SKIP LOCKED, so
+        parallel workers (threads here, or other scheduler processes) never
+        write the same tip's result twice. Each batch's results are flushed in
+        one transaction (see _grade_batch).
+
+        Args:
+            tips_to_verify: Tip queryset to grade
+            use_livescore: Fall back to scraping livescore.cz for legs without a fixture
+            workers: Number of worker threads claiming batches
+
+        Returns:
+            Dictionary with verification statistics, including per-worker
+            throughput under 'workers'
+        """
+        from django.db import connection
+
+        tip_ids = list(tips_to_verify.prefetch_related(None).order_by('id').values_list('id', flat=True))
+        batches = iter([
+            tip_ids[start:start + self.GRADING_BATCH_SIZE]
+            for start in range(0, len(tip_ids), self.GRADING_BATCH_SIZE)
+        ])
+        batches_lock = threading.Lock()
+
+        def claim_next():
+            with batches_lock:
+                return next(batches, None)
+
+        if workers > 1 and not connection.features.has_select_for_update_skip_locked:
+            logger.warning(f"{connection.vendor} does not support SKIP LOCKED, verifying with a single worker")
+            workers = 1
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='verify') as executor:
+                futures = [
+                    executor.submit(self._run_worker, f"worker-{n + 1}", claim_next, use_livescore, True)
+                    for n in range(workers)
+                ]
+                worker_stats = [future.result() for future in futures]
+        else:
+            worker_stats = [self._run_worker("worker-1", claim_next, use_livescore)]
+
+        stats = self._empty_stats()
+        for result in worker_stats:
+            for key in stats:
+                stats[key] += result[key]
+        stats['workers'] = [
+            {key: result[key] for key in ('worker', 'batches', 'tips_checked', 'seconds', 'tips_per_second')}
+            for result in worker_stats
+        ]
+        return stats
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
             'tips_checked': 0,
             'tips_verified': 0,
             'tips_won': 0,
             'tips_lost': 0,
             'tips_pending': 0,
+            'tips_skipped': 0,
             'matches_verified': 0,
-            'matches_not_found': 0
+            'matches_not_found': 0,
         }
 
-        for tip in tips_to_verify:
-            stats['tips_checked'] += 1
+    def _run_worker(self, name: str, claim_next, use_livescore: bool, close_connection: bool = False) -> Dict:
+        """
+        Claim and grade batches until none are left.
 
-            try:
-                result = self._verify_tip(tip)
+        Args:
+            name: Worker name used in logs and stats
+            claim_next: Callable returning the next list of tip ids, or None when done
+            use_livescore: Fall back to scraping livescore.cz for legs without a fixture
+            close_connection: Close this thread's database connection when done
 
-                if result['status'] == 'verified':
-                    stats['tips_verified'] += 1
-                    if result['is_won']:
-                        stats['tips_won'] += 1
-                    else:
-                        stats['tips_lost'] += 1
+        Returns:
+            The worker's verification statistics and throughput
+        """
+        from django.db import connection
 
-                    stats['matches_verified'] += result['matches_verified']
-                    stats['matches_not_found'] += result['matches_not_found']
+        stats = self._empty_stats()
+        batches = 0
+        started = time.monotonic()
 
-                elif result['status'] == 'pending':
-                    stats['tips_pending'] += 1
-                    stats['matches_not_found'] += result['matches_not_found']
+        try:
+            while True:
+                tip_ids = claim_next()
+                if tip_ids is None:
+                    break
+                self._grade_batch(tip_ids, use_livescore, stats)
+                batches += 1
+        finally:
+            if close_connection:
+                connection.close()
+
+        elapsed = time.monotonic() - started
+        stats['worker'] = name
+        stats['batches'] = batches
+        stats['seconds'] = round(elapsed, 2)
+        stats['tips_per_second'] = round(stats['tips_checked'] / elapsed, 1) if elapsed > 0 else 0.0
+
+        logger.info(
+            f"{name}: {stats['tips_checked']} tips in {batches} batch(es), "
+            f"{stats['seconds']}s ({stats['tips_per_second']} tips/s), "
+            f"{stats['tips_skipped']} skipped"
+        )
+        return stats
+
+    def _grade_batch(self, tip_ids: List[int], use_livescore: bool, stats: Dict):
+        """
+        Claim a batch of tips, grade it, and write the results together.
 
+        The tips are claimed in a short SELECT ... FOR UPDATE SKIP LOCKED
+        transaction and graded outside of it, so fixture lookups and
+        livescore.cz scraping hold neither row locks nor a transaction. The
+        results are written after locking the tips again, only for those
+        still unresulted.
+
+        Tips locked by another worker, or resulted since they were selected,
+        are skipped; whoever holds them grades them. A tip whose grading
+        fails is left for the next run without affecting the rest.
+        """
+        from django.db import transaction
+        from apps.tips.models import Tip
+
+        with transaction.atomic():
+            claimed = list(
+                Tip.objects.select_for_update(skip_locked=True).filter(
+                    id__in=tip_ids,
+                    status='active',
+                    is_resulted=False
+                ).values_list('id', flat=True)
+            )
+
+        tips = list(Tip.objects.filter(id__in=claimed).prefetch_related('matches'))
+        fixtures = self._load_fixtures(tips)
+        scraped = {}  # livescore.cz pages by day offset, fetched once for the whole batch
+        batch = GradingBatch()
+        results = {}
+
+        for tip in tips:
+            try:
+                results[tip.id] = self._verify_tip(
+                    tip, use_livescore=use_livescore, batch=batch, fixtures=fixtures, scraped=scraped
+                )
             except Exception as e:
                 logger.error(f"Error verifying tip {tip.id}: {str(e)}", exc_info=True)
+                results[tip.id] = None
+
+        with transaction.atomic():
+            unresulted = set(
+                Tip.objects.select_for_update(skip_locked=True).filter(
+                    id__in=claimed,
+                    is_resulted=False
+                ).values_list('id', flat=True)
+            )
+            # Updates of failed tips may be partial: leave them for the next run
+            batch.retain(tip_id for tip_id in unresulted if results.get(tip_id))
+            batch.flush()
+
+        stats['tips_skipped'] += len(tip_ids) - len(unresulted)
+
+        for tip_id in unresulted:
+            stats['tips_checked'] += 1
+            result = results.get(tip_id)
+            if not result:
                 continue
 
-        return stats
+            if result['status'] == 'verified':
+                stats['tips_verified'] += 1
+                if result['is_won']:
+                    stats['tips_won'] += 1
+                else:
+                    stats['tips_lost'] += 1
+
+                stats['matches_verified'] += result['matches_verified']
+                stats['matches_not_found'] += result['matches_not_found']
+
+            elif result['status'] == 'pending':
+                stats['tips_pending'] += 1
+                stats['matches_not_found'] += result['matches_not_found']
+
+    @staticmethod
+    def _load_fixtures(tips) -> Dict[int, 'Fixture']:
+        """Load the fixtures referenced by the unresulted legs of some tips, keyed by api_id"""
+        from apps.fixtures.models import Fixture
+
+        api_ids = set()
+        for tip in tips:
+            for tip_match in tip.matches.all():
+                if not tip_match.is_resulted and tip_match.api_match_id.isdigit():
+                    api_ids.add(int(tip_match.api_match_id))
+
+        if not api_ids:
+            return {}
+        return Fixture.objects.select_related('home_team', 'away_team').in_bulk(api_ids, field_name='api_id')
+
+    def _select_incremental(self, tips_to_verify, run_started):
+        """
+        Narrow the pending tips to those with a leg worth revisiting.
+
+        A leg is revisited when its fixture concluded since the stored watermark.
+        Every RESULT_VERIFICATION_SWEEP_MINUTES the selection also includes legs
+        without a linked fixture and legs long past kickoff. The first run (no
+        watermark yet) is a full pass.
+
+        Between sweeps, legs without a linked fixture are revisited (with the
+        livescore.cz fallback) when livescore.cz lists newly finished matches
+        for yesterday or today, since the last incremental run.
+
+        Returns:
+            Tuple of (checkpoint, narrowed queryset, whether this run sweeps,
+            whether it falls back to livescore.cz)
+        """
+        from django.conf import settings
+        from apps.tips.models import VerificationCheckpoint
+        from apps.fixtures.models import Fixture
+
+        checkpoint, _ = VerificationCheckpoint.objects.get_or_create(name=self.CHECKPOINT_NAME)
+        if checkpoint.fixture_watermark is None:
+            logger.info("No verification watermark yet, running a full pass")
+            return checkpoint, tips_to_verify, True, True
+
+        sweep_interval = timedelta(minutes=getattr(settings, 'RESULT_VERIFICATION_SWEEP_MINUTES', 120))
+        sweep = (
+            checkpoint.last_sweep_at is None or
+            run_started - checkpoint.last_sweep_at >= sweep_interval
+        )
+
+        changed_fixture_ids = [
+            str(api_id) for api_id in Fixture.objects.filter(
+                updated_at__gt=checkpoint.fixture_watermark - self.WATERMARK_OVERLAP,
+                status_short__in=Fixture.CONCLUDED_STATUSES
+            ).values_list('api_id', flat=True)
+        ]
+
+        # Polled every run, sweep or not, so the next run only sees newer changes
+        finished_days = self._livescore_finished_days()
+
+        leg_filter = Q(matches__is_resulted=False, matches__api_match_id__in=changed_fixture_ids)
+        if sweep:
+            leg_filter |= Q(matches__is_resulted=False) & (
+                Q(matches__api_match_id='') |
+                Q(matches__match_date__lte=run_started - self.OVERDUE_AFTER)
+            )
+        elif finished_days:
+            leg_filter |= Q(
+                matches__is_resulted=False,
+                matches__api_match_id='',
+                matches__match_date__gte=datetime.combine(min(finished_days), dt_time.min, tzinfo=dt_timezone.utc),
+                matches__match_date__lte=run_started
+            )
 
-    def _verify_tip(self, tip) -> Dict:
+        logger.info(
+            f"Incremental verification since {checkpoint.fixture_watermark}: "
+            f"{len(changed_fixture_ids)} concluded fixture(s) changed, "
+            f"livescore.cz finished matches on {finished_days}, sweep={sweep}"
+        )
+
+        use_livescore = sweep or bool(finished_days)
+        return checkpoint, tips_to_verify.filter(leg_filter).distinct(), sweep, use_livescore
+
+    def _livescore_finished_days(self) -> List:
+        """
+        Days (yesterday, today) with matches that finished on livescore.cz since
+        the previous call, from the pages' deltas
+        """
+        from .livescore_cz_scraper import LivescoreCzScraper
+
+        scraper = LivescoreCzScraper()
+        today = timezone.now().date()
+        return [
+            today + timedelta(days=offset)
+            for offset in (-1, 0)
+            if scraper.fetch_changes(offset, status_filter='finished', consumer=self.CHECKPOINT_NAME)
+        ]
+
+    def _verify_tip(self, tip, use_livescore: bool = True, batch: GradingBatch = None, fixtures: Dict = None,
+                    scraped: Dict = None) -> Dict:
         """
         Verify a single tip by checking all its matches against API-Football data.
 
+        Results are applied to the loaded legs in memory and queued on the batch;
+        nothing is written until the batch is flushed.
+
+        Args:
+            tip: Tip instance
+            use_livescore: Fall back to scraping livescore.cz for legs without a fixture
+            batch: GradingBatch to queue updates on (default: a private batch
+                flushed before returning)
+            fixtures: Preloaded fixtures keyed by api_id (default: look up per leg)
+            scraped: livescore.cz finished matches keyed by day offset, shared by
+                the tips of a batch (default: fetch per leg)
+
         Returns:
             Dictionary with verification result
         """
-        from apps.tips.models import TipMatch
         from apps.fixtures.models import Fixture
 
-        matches = tip.matches.all()
-        total_matches = matches.count()
+        own_batch = batch is None
+        if own_batch:
+            batch = GradingBatch()
+
+        matches = list(tip.matches.all())
+        total_matches = len(matches)
 
         if total_matches == 0:
             return {
@@ -134,15 +531,21 @@ class ResultVerifier:
                 verified_matches += 1
                 if tip_match.is_won:
                     won_matches += 1
-                continue
+                    continue
+                break  # A lost leg decides the slip; skip the remaining legs
 
             # Try to find fixture by api_match_id first (if enriched)
             fixture = None
 
             if tip_match.api_match_id:
-                try:
-                    fixture = Fixture.objects.get(api_id=int(tip_match.api_match_id))
-                except (Fixture.DoesNotExist, ValueError):
+                if fixtures is not None and tip_match.api_match_id.isdigit():
+                    fixture = fixtures.get(int(tip_match.api_match_id))
+                else:
+                    try:
+                        fixture = Fixture.objects.get(api_id=int(tip_match.api_match_id))
+                    except (Fixture.DoesNotExist, ValueError):
+                        pass
+                if not fixture:
                     logger.warning(f"Fixture with api_id {tip_match.api_match_id} not found")
 
             # If not found by API ID, try fuzzy matching
@@ -150,49 +553,18 @@ class ResultVerifier:
                 fixture = self._find_matching_fixture(tip_match)
 
             if fixture:
-                # Save api_match_id early so we can track live scores
+                # Record api_match_id early so we can track live scores
                 if not tip_match.api_match_id:
                     tip_match.api_match_id = str(fixture.api_id)
-                    tip_match.save(update_fields=['api_match_id'])
-                    
+                    batch.add_leg(tip_match)
+
                 # Check if match is finished or concluded (postponed, cancelled, abandoned, etc.)
-                is_concluded = fixture.is_finished or fixture.status_short in ['PST', 'CANC', 'ABD', 'AWD', 'WO']
-                if not is_concluded:
+                if not fixture.is_concluded:
                     logger.info(f"Match {tip_match.home_team} vs {tip_match.away_team} not yet finished (Status: {fixture.status_short})")
                     continue
 
-                # Check if the match is voided (postponed, cancelled, abandoned, etc.)
-                is_void = fixture.status_short in ['PST', 'CANC', 'ABD', 'AWD', 'WO']
-                match_won = False
-
-                if not is_void:
-                    # Verify this specific match
-                    match_result = self._check_market_result(
-                        tip_match.market,
-                        tip_match.selection,
-                        fixture.home_goals,
-                        fixture.away_goals,
-                        home_team=tip_match.home_team,
-                        away_team=tip_match.away_team
-                    )
-                    
-                    if match_result == 'void':
-                        is_void = True
-                    else:
-                        match_won = bool(match_result)
-
-                # Update tip match
-                tip_match.is_resulted = True
-                if is_void:
-                    from decimal import Decimal
-                    tip_match.is_won = True  # Treat void as won so accumulator continues
-                    tip_match.actual_result = f"Void / Push ({fixture.status_short})"
-                    tip_match.odds = Decimal('1.00')  # Reset odds to 1.0
-                else:
-                    tip_match.is_won = match_won
-                    tip_match.actual_result = fixture.get_result_string()
-                
-                tip_match.save()
+                is_void = self._apply_fixture_result(tip_match, fixture)
+                batch.add_leg(tip_match)
 
                 verified_matches += 1
                 if tip_match.is_won:
@@ -204,52 +576,46 @@ class ResultVerifier:
                     f"Market: {tip_match.market} Selection: {tip_match.selection} "
                     f"Won: {tip_match.is_won} (Void: {is_void})"
                 )
+                if not tip_match.is_won:
+                    break  # Decided: no more fixture lookups or scraping for this slip
             else:
                 # Try fallback via livescore.cz scraper for matches absent from API-Football
-                livescore_verified = self._verify_via_livescore_cz(tip_match)
+                livescore_verified = use_livescore and self._verify_via_livescore_cz(tip_match, scraped)
                 if livescore_verified:
+                    batch.add_leg(tip_match)
                     verified_matches += 1
                     if tip_match.is_won:
                         won_matches += 1
+                    else:
+                        break
                 else:
                     not_found_matches += 1
                     logger.warning(
                         f"No fixture found in API-Football or livescore.cz for: {tip_match.home_team} vs {tip_match.away_team}"
                     )
 
-
-        # Determine overall tip result
-        if verified_matches == total_matches:
-            # All matches verified
-            tip_won = (won_matches == total_matches)  # All must win for betslip to win
-
-            tip.is_resulted = True
-            tip.is_won = tip_won
-            tip.result_verified_at = timezone.now()
-            tip.status = 'archived'  # Mark as archived after verification
-            
-            # Recalculate tip odds in case of any voided matches
-            from decimal import Decimal
-            total_odds = Decimal('1.00')
-            for m in tip.matches.all():
-                total_odds *= m.odds
-            tip.odds = round(total_odds, 2)
-            
-            tip.save()
+        # Determine overall tip result from the legs already in memory
+        if rollup_tip(tip, matches):
+            batch.add_tip(tip)
+            if own_batch:
+                batch.flush()
 
             logger.info(
-                f"Tip {tip.id} verified: "
+                f"Tip {tip.id} verified{' early (decided by a lost leg)' if verified_matches < total_matches else ''}: "
                 f"Won {won_matches}/{total_matches} matches - "
-                f"Betslip {'WON' if tip_won else 'LOST'} - New Odds: {tip.odds}"
+                f"Betslip {'WON' if tip.is_won else 'LOST'} - New Odds: {tip.odds}"
             )
 
             return {
                 'status': 'verified',
-                'is_won': tip_won,
+                'is_won': tip.is_won,
                 'matches_verified': verified_matches,
                 'matches_not_found': not_found_matches
             }
         else:
+            if own_batch:
+                batch.flush()
+
             # Not all matches verified yet
             return {
                 'status': 'pending',
@@ -258,6 +624,23 @@ class ResultVerifier:
                 'matches_not_found': not_found_matches
             }
 
+    def _apply_fixture_result(self, tip_match, fixture) -> bool:
+        """
+        Grade a leg in memory against its concluded fixture.
+
+        Returns:
+            True if the leg was voided
+        """
+        # Check if the match is voided (postponed, cancelled, abandoned, etc.)
+        if not fixture.is_void:
+            match_result = self._grade_leg(tip_match, fixture.home_goals, fixture.away_goals)
+            if match_result != 'void':
+                apply_leg_result(tip_match, match_result, fixture.get_result_string())
+                return False
+
+        apply_leg_result(tip_match, 'void', f"Void / Push ({fixture.status_short})")
+        return True
+
     def _find_matching_fixture(self, tip_match) -> Optional['Fixture']:
         """
         Find matching fixture using fuzzy team name matching
@@ -341,186 +724,47 @@ class ResultVerifier:
         Returns:
             True if bet won, False if lost, 'void' if bet is push/voided
         """
-        if home_score is None or away_score is None:
-            return False
-
-        market_lower = market.lower().strip()
-        selection_lower = selection.lower().strip()
+        spec = compile_market(market, selection, home_team=home_team, away_team=away_team)
+        return self._evaluate(spec, market, selection, home_score, away_score)
 
-        total_goals = home_score + away_score
-
-        # Over/Under Goals (including "Total Goals" market)
-        if ('over' in market_lower or 'under' in market_lower or 
-            'total goals' in market_lower or 'goals total' in market_lower):
-            
-            # Extract goal line from market or selection
-            goal_line = self._extract_goal_line(market)
-            if not goal_line:
-                goal_line = self._extract_goal_line(selection)
-
-            if goal_line:
-                is_over = False
-                is_under = False
-                
-                if 'over' in selection_lower or '+' in selection_lower or '>' in selection_lower:
-                    is_over = True
-                elif 'under' in selection_lower or '-' in selection_lower or '<' in selection_lower:
-                    is_under = True
-                elif 'yes' in selection_lower:
-                    if 'over' in market_lower:
-                        is_over = True
-                    elif 'under' in market_lower:
-                        is_under = True
-                elif 'no' in selection_lower:
-                    if 'over' in market_lower:
-                        is_under = True
-                    elif 'under' in market_lower:
-                        is_over = True
-                else:
-                    if 'over' in market_lower:
-                        is_over = True
-                    elif 'under' in market_lower:
-                        is_under = True
-                
-                if is_over:
-                    return total_goals > goal_line
-                elif is_under:
-                    return total_goals < goal_line
-
-        # 1X2 / Match Result
-        if '1x2' in market_lower or 'match result' in market_lower or 'full time result' in market_lower or '3 way' in market_lower:
-            # Check team names first if provided
-            if home_team and away_team:
-                h_name = home_team.lower().strip()
-                a_name = away_team.lower().strip()
-                # Check for exact or substring match of team names in selection
-                if selection_lower == h_name or (len(h_name) > 3 and h_name in selection_lower) or (len(selection_lower) > 3 and selection_lower in h_name):
-                    return home_score > away_score
-                elif selection_lower == a_name or (len(a_name) > 3 and a_name in selection_lower) or (len(selection_lower) > 3 and selection_lower in a_name):
-                    return away_score > home_score
-
-            if selection_lower in ['1x', 'home/draw', 'home or draw']:
-                return home_score >= away_score
-            elif selection_lower in ['x2', 'draw/away', 'away or draw']:
-                return away_score >= home_score
-            elif selection_lower in ['12', 'home/away', 'home or away']:
-                return home_score != away_score
-            elif selection_lower in ['1', 'home'] or selection.strip() == '1':
-                return home_score > away_score
-            elif selection_lower in ['x', 'draw'] or selection.strip().upper() == 'X':
-                return home_score == away_score
-            elif selection_lower in ['2', 'away'] or selection.strip() == '2':
-                return away_score > home_score
-
-        # Draw No Bet (DNB)
-        if 'draw no bet' in market_lower or 'dnb' in market_lower:
-            if home_score == away_score:
-                return 'void'
-            
-            if home_team and away_team:
-                h_name = home_team.lower().strip()
-                a_name = away_team.lower().strip()
-                if selection_lower == h_name or (len(h_name) > 3 and h_name in selection_lower) or (len(selection_lower) > 3 and selection_lower in h_name):
-                    return home_score > away_score
-                elif selection_lower == a_name or (len(a_name) > 3 and a_name in selection_lower) or (len(selection_lower) > 3 and selection_lower in a_name):
-                    return away_score > home_score
-
-            if selection_lower in ['1', 'home'] or selection.strip() == '1':
-                return home_score > away_score
-            elif selection_lower in ['2', 'away'] or selection.strip() == '2':
-                return away_score > home_score
-
-        # Both Teams to Score (BTTS/GG)
-        if 'both teams' in market_lower or 'btts' in market_lower or 'gg' in market_lower:
-            both_scored = (home_score > 0 and away_score > 0)
-
-            if 'yes' in selection_lower or 'gg' in selection_lower or selection_lower == '1' or selection_lower == 'y':
-                return both_scored
-            elif 'no' in selection_lower or 'ng' in selection_lower or selection_lower == '2' or selection_lower == 'n':
-                return not both_scored
-
-        # Double Chance
-        if 'double chance' in market_lower:
-            # Check team names first if provided
-            if home_team and away_team:
-                h_name = home_team.lower().strip()
-                a_name = away_team.lower().strip()
-                if h_name in selection_lower and ('draw' in selection_lower or 'x' in selection_lower or '1' in selection_lower):
-                    return home_score >= away_score
-                elif a_name in selection_lower and ('draw' in selection_lower or 'x' in selection_lower or '2' in selection_lower):
-                    return away_score >= home_score
-                elif h_name in selection_lower and a_name in selection_lower:
-                    return home_score != away_score
-
-            if '1x' in selection_lower or 'home or draw' in selection_lower or 'home/draw' in selection_lower or '1 or x' in selection_lower or 'draw or home' in selection_lower:
-                return home_score >= away_score
-            elif 'x2' in selection_lower or 'away or draw' in selection_lower or 'draw/away' in selection_lower or 'x or 2' in selection_lower or '2 or x' in selection_lower:
-                return away_score >= home_score
-            elif '12' in selection_lower or 'home or away' in selection_lower or 'home/away' in selection_lower or '1 or 2' in selection_lower or 'away or home' in selection_lower:
-                return home_score != away_score
-
-        # Correct Score
-        if 'correct score' in market_lower:
-            # Extract score from selection (e.g., "2-1", "0:0")
-            predicted_score = self._extract_score(selection)
-            if predicted_score:
-                return (predicted_score[0] == home_score and predicted_score[1] == away_score)
-
-        # Asian Handicap
-        if 'asian handicap' in market_lower or 'handicap' in market_lower:
-            handicap = self._extract_handicap(selection)
-            if handicap is not None:
-                # Determine which team has handicap
-                is_home_handicap = False
-                if home_team and home_team.lower().strip() in selection_lower:
-                    is_home_handicap = True
-                elif away_team and away_team.lower().strip() in selection_lower:
-                    is_home_handicap = False
-                elif 'home' in selection_lower or '1' in selection_lower:
-                    is_home_handicap = True
-                
-                if is_home_handicap:
-                    adjusted_home = home_score + handicap
-                    return adjusted_home > away_score
-                else:
-                    adjusted_away = away_score + handicap
-                    return adjusted_away > home_score
+    def _grade_leg(self, tip_match, home_score: int, away_score: int):
+        """
+        Grade a TipMatch against a final score using its pre-compiled market spec.
 
-        # If we can't determine, log it and return False
-        logger.warning(
-            f"Unknown market type: {market} with selection: {selection}. "
-            f"Score: {home_score}-{away_score}"
-        )
-        return False
+        Returns:
+            True if bet won, False if lost, 'void' if bet is push/voided
+        """
+        spec = tip_match.market_spec
+        if not is_current_spec(spec):
+            spec = compile_market(
+                tip_match.market,
+                tip_match.selection,
+                home_team=tip_match.home_team,
+                away_team=tip_match.away_team
+            )
+        return self._evaluate(spec, tip_match.market, tip_match.selection, home_score, away_score)
+
+    def _evaluate(self, spec: Dict, market: str, selection: str, home_score: int, away_score: int):
+        """Evaluate a compiled spec, logging markets the compiler could not classify"""
+        if spec['kind'] == 'unknown' and home_score is not None and away_score is not None:
+            # If we can't determine, log it and return False
+            logger.warning(
+                f"Unknown market type: {market} with selection: {selection}. "
+                f"Score: {home_score}-{away_score}"
+            )
+        return evaluate_spec(spec, home_score, away_score)
 
-    def _extract_goal_line(self, market: str) -> Optional[float]:
-        """Extract goal line from market string (e.g., "Over 2.5" -> 2.5)"""
-        match = re.search(r'(\d+\.?\d*)', market)
-        if match:
-            return float(match.group(1))
-        return None
-
-    def _extract_score(self, selection: str) -> Optional[Tuple[int, int]]:
-        """Extract score from selection string (e.g., "2-1" -> (2, 1))"""
-        match = re.search(r'(\d+)[:-](\d+)', selection)
-        if match:
-            return (int(match.group(1)), int(match.group(2)))
-        return None
-
-    def _extract_handicap(self, selection: str) -> Optional[float]:
-        """Extract handicap value from selection (e.g., "[+0.50]" -> 0.5)"""
-        match = re.search(r'([+-]?\d+\.?\d*)', selection)
-        if match:
-            return float(match.group(1))
-        return None
-
-    def _verify_via_livescore_cz(self, tip_match) -> bool:
+    def _verify_via_livescore_cz(self, tip_match, scraped: Dict = None) -> bool:
         """
         Fallback verification for matches absent from API-Football.
         Scrapes livescore.cz for finished matches and attempts fuzzy team matching.
+
+        Args:
+            scraped: Finished matches keyed by day offset; pages missing from
+                it are fetched and added, for the next legs of the same day
         """
         try:
-            from .livescore_cz_scraper import LivescoreCzScraper
+            from .livescore_cz_scraper import LivescoreCzScraper, day_offset
         except ImportError:
             logger.error("Could not import LivescoreCzScraper")
             return False
@@ -533,14 +777,14 @@ class ResultVerifier:
             def calc_ratio(s1: str, s2: str) -> float:
                 return SequenceMatcher(None, s1, s2).ratio() * 100
 
-        scraper = LivescoreCzScraper()
-        # Fetch finished games for the tip_match's date
-        from django.utils import timezone
-        today = timezone.now().date()
-        match_date = tip_match.match_date.date()
-        offset = (match_date - today).days
-        
-        scraped_matches = scraper.fetch_scores(day_offset=offset, status_filter='finished')
+        # Finished games for the tip_match's date
+        offset = day_offset(tip_match.match_date)
+        if scraped is not None and offset in scraped:
+            scraped_matches = scraped[offset]
+        else:
+            scraped_matches = LivescoreCzScraper().fetch_scores(day_offset=offset, status_filter='finished')
+            if scraped is not None:
+                scraped[offset] = scraped_matches
         
         home_tip = tip_match.home_team.lower().strip()
         away_tip = tip_match.away_team.lower().strip()
@@ -563,26 +807,14 @@ class ResultVerifier:
                 if m['home_goals'] is None or m['away_goals'] is None:
                     continue
 
-                match_result = self._check_market_result(
-                    tip_match.market,
-                    tip_match.selection,
-                    m['home_goals'],
-                    m['away_goals'],
-                    home_team=tip_match.home_team,
-                    away_team=tip_match.away_team
-                )
-                
-                tip_match.is_resulted = True
+                match_result = self._grade_leg(tip_match, m['home_goals'], m['away_goals'])
+
+                # Applied in memory; the caller queues the leg on its grading batch
                 if match_result == 'void':
-                    from decimal import Decimal
-                    tip_match.is_won = True
-                    tip_match.actual_result = f"Void / Push ({m['score']})"
-                    tip_match.odds = Decimal('1.00')
+                    apply_leg_result(tip_match, 'void', f"Void / Push ({m['score']})")
                 else:
-                    tip_match.is_won = bool(match_result)
-                    tip_match.actual_result = f"{m['home_goals']}-{m['away_goals']} (livescore.cz)"
-                
-                tip_match.save()
+                    apply_leg_result(tip_match, match_result, f"{m['home_goals']}-{m['away_goals']} (livescore.cz)")
+
                 logger.info(
                     f"Match verified via livescore.cz: {tip_match.home_team} vs {tip_match.away_team} "
                     f"Result: {m['home_goals']}-{m['away_goals']} Won: {tip_match.is_won}"
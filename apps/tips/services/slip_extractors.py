@@ -0,0 +1,271 @@
+"""
+Deterministic Slip Extractors
+
+Bookmaker slip pages are structured HTML, so a slip shared as a link can be
+parsed directly in milliseconds instead of going through a Gemini vision
+call. Extractors are registered per Tip.BOOKMAKER_CHOICES key and return the
+same result shape as process_betslip_image; when none matches (unknown
+bookmaker, unrecognised markup, link page without the slip) the caller falls
+back to Gemini.
+
+Only pages fetched from the bookmaker itself are parsed: links are fetched
+from the hosts an extractor declares, without following redirects, and up to
+MAX_FETCH_BYTES. Markup the tipster supplies is never trusted, it would let
+anyone publish made-up legs and odds.
+
+Results pass the same placed-slip gate as process_betslip_image: the page
+must be placed bet-history markup (a bet id and none of the betslip's
+editing controls) and every leg needs its kickoff date. Anything else goes
+to Gemini with the screenshot.
+"""
+
+import logging
+import re
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from django.utils import timezone
+
+from apps.tips.request_timing import external_call
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = 5  # seconds
+MAX_FETCH_BYTES = 2 * 1024 * 1024
+FETCH_CHUNK_BYTES = 64 * 1024
+DATE_TIME_RE = re.compile(r'(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?,?\s+(\d{1,2}:\d{2})')
+# Bet history pages show the placed bet's id; the betslip being built doesn't
+PLACED_BET_RE = re.compile(r'(?i)\bbet\s*(?:id|no\.?|number)\b')
+# Text of a betslip still being built (the markers the Gemini prompt rejects)
+UNPLACED_SLIP_RE = re.compile(r'(?i)\b(?:place\s+bet|bet\s+amount|odds\s+have\s+changed|live\s+multi\s*bet)\b')
+
+# Registered extractors by bookmaker key, in registration order
+SLIP_EXTRACTORS: Dict[str, 'SlipExtractor'] = {}
+
+
+def register_extractor(cls):
+    """Class decorator adding an extractor to the registry under its bookmaker"""
+    SLIP_EXTRACTORS[cls.bookmaker] = cls()
+    return cls
+
+
+def kickoff(text: str, today: date = None):
+    """
+    ('DD/MM/YYYY', 'HH:MM') from slip text such as 'Starts 08/11, 23:00'
+
+    Slips often leave out the year: it is the next occurrence of the date,
+    allowing for matches that kicked off earlier this season.
+    """
+    match = DATE_TIME_RE.search(text or '')
+    if not match:
+        return '', ''
+    day, month, year, time_str = match.groups()
+    day, month = int(day), int(month)
+    if year:
+        year = int(year) + (2000 if len(year) == 2 else 0)
+    else:
+        today = today or timezone.localdate()
+        year = today.year
+        try:
+            if date(year, month, day) < today - timedelta(days=180):
+                year += 1
+        except ValueError:
+            return '', ''
+    return f"{day:02d}/{month:02d}/{year}", time_str
+
+
+def _odds(text: str) -> Optional[float]:
+    try:
+        return float((text or '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+def _text(node) -> str:
+    return ' '.join(node.get_text(' ', strip=True).split()) if node is not None else ''
+
+
+class SlipExtractor:
+    """
+    Parses one bookmaker's slip markup.
+
+    Subclasses set bookmaker (a Tip.BOOKMAKER_CHOICES key), link_hosts and
+    unplaced_selectors (editing controls only an unplaced betslip has), and
+    implement parse_legs.
+    """
+    bookmaker = None
+    link_hosts = ()
+    unplaced_selectors = ()
+
+    def handles_link(self, link: str) -> bool:
+        parsed = urlparse(link or '')
+        host = (parsed.hostname or '').lower()
+        return parsed.scheme == 'https' and any(
+            host == allowed or host.endswith(f'.{allowed}') for allowed in self.link_hosts
+        )
+
+    def fetch(self, link: str) -> str:
+        """
+        The share page, from the link's host only: a redirect could lead
+        anywhere, so it is not followed
+        """
+        import requests
+
+        with external_call(self.bookmaker):
+            response = requests.get(
+                link,
+                timeout=FETCH_TIMEOUT,
+                headers={'User-Agent': 'Mozilla/5.0 (Linux; Android 13) AppleWebKit/537.36 Mobile Safari/537.36'},
+                allow_redirects=False,
+                stream=True,
+            )
+            try:
+                if response.is_redirect:
+                    raise ValueError(f"{link} redirects to {response.headers.get('Location')}, not following it")
+                response.raise_for_status()
+                body = b''
+                for chunk in response.iter_content(FETCH_CHUNK_BYTES):
+                    body += chunk
+                    if len(body) > MAX_FETCH_BYTES:
+                        raise ValueError(f"{link} is larger than {MAX_FETCH_BYTES} bytes")
+            finally:
+                response.close()
+        return body.decode(response.encoding or 'utf-8', errors='replace')
+
+    def is_placed(self, soup) -> bool:
+        """Placed bet-history markup: a bet id and none of the unplaced betslip's controls"""
+        if any(soup.select_one(selector) for selector in self.unplaced_selectors):
+            return False
+        text = _text(soup)
+        return bool(PLACED_BET_RE.search(text)) and not UNPLACED_SLIP_RE.search(text)
+
+    def parse_legs(self, soup) -> List[Dict]:
+        """Legs as process_betslip_image match dicts, [] if the markup has none"""
+        raise NotImplementedError
+
+    def parse_html(self, html: str) -> List[Dict]:
+        """Legs of the slip markup, [] unless it passes the placed-slip gate"""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+        if not self.is_placed(soup):
+            logger.info(f"{self.bookmaker} slip markup is not a placed bet, not using it")
+            return []
+
+        legs = self.parse_legs(soup)
+        # A leg without teams or odds means the markup isn't what we expect
+        if any(not (leg['home_team'] and leg['away_team'] and leg['odds']) for leg in legs):
+            logger.warning(f"Incomplete legs in {self.bookmaker} slip markup, not using it")
+            return []
+        # Same rule as process_betslip_image: every leg needs its kickoff date
+        if any(not leg['match_date'] for leg in legs):
+            logger.info(f"{self.bookmaker} slip markup lacks kickoff dates, not using it")
+            return []
+        return legs
+
+    def _leg(self, teams: str, separator: str, market: str, selection: str, when: str, odds: str) -> Dict:
+        sides = re.split(separator, teams, maxsplit=1)
+        home, away = (sides[0].strip(), sides[1].strip()) if len(sides) == 2 else ('', '')
+        match_date, match_time = kickoff(when)
+        return {
+            'home_team': home,
+            'away_team': away,
+            'league': 'Unknown League',  # Will be enriched later
+            'market': market,
+            'selection': selection,
+            'odds': _odds(odds),
+            'match_date': match_date,
+            'match_time': match_time,
+        }
+
+
+@register_extractor
+class BetikaExtractor(SlipExtractor):
+    """Betika betslip: div.stacked rows ('Chelsea Vs. Wolves', '1x2 • Chelsea', 'Starts 08/11, 23:00')"""
+    bookmaker = 'betika'
+    link_hosts = ('betika.com',)
+    unplaced_selectors = ('.stacked__remove', 'input')
+
+    def parse_legs(self, soup) -> List[Dict]:
+        legs = []
+        for row in soup.select('div.stacked'):
+            market_row = row.select_one('.stacked__market')
+            market = _text(market_row.find('span')) if market_row else ''
+            legs.append(self._leg(
+                teams=_text(row.select_one('.stacked__link')),
+                separator=r'(?i)\s+vs\.?\s+',
+                market=market,
+                selection=_text(row.select_one('.stacked__market--odd')),
+                when=_text(row.select_one('.stacked__marker--starttime')),
+                odds=_text(row.select_one('.stacked__odd__value')),
+            ))
+        return legs
+
+
+@register_extractor
+class OdibetsExtractor(SlipExtractor):
+    """Odibets betslip: div.bet rows (pick, market, 'Home - Away', '08/11 13:30', odds)"""
+    bookmaker = 'odibets'
+    link_hosts = ('odibets.com',)
+    unplaced_selectors = ('.bet-close', 'input')
+
+    def parse_legs(self, soup) -> List[Dict]:
+        legs = []
+        for row in soup.select('div.bet'):
+            details = row.select('.bet-details .t-3')
+            legs.append(self._leg(
+                teams=_text(details[0]) if details else '',
+                separator=r'\s+-\s+',
+                market=_text(row.select_one('.bet-details .t-2')),
+                selection=_text(row.select_one('.bet-details .t-1')),
+                when=_text(details[1]) if len(details) > 1 else '',
+                odds=_text(row.select_one('.bet-odds .s')),
+            ))
+        return legs
+
+
+def extract_slip(bookmaker: str, link: str = None) -> Optional[Dict]:
+    """
+    Parse a slip deterministically, from its share link.
+
+    Args:
+        bookmaker: Tip.BOOKMAKER_CHOICES key
+        link: Bet sharing link (only fetched from the bookmaker's hosts)
+
+    Returns:
+        process_betslip_image-shaped result, or None when no extractor
+        matches and the slip should go to Gemini
+    """
+    extractor = SLIP_EXTRACTORS.get(bookmaker)
+    if extractor is None or not link or not extractor.handles_link(link):
+        return None
+
+    started = time.perf_counter()
+    try:
+        legs = extractor.parse_html(extractor.fetch(link))
+    except Exception as e:
+        logger.warning(f"{bookmaker} slip extractor failed, falling back to Gemini: {str(e)}")
+        return None
+
+    if not legs:
+        return None
+
+    total_odds = 1.0
+    for leg in legs:
+        total_odds *= leg['odds']
+    logger.info(f"Parsed {len(legs)} {bookmaker} legs without Gemini in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    return {
+        'success': True,
+        'data': {
+            'bet_code': 'EXTRACTED',  # Will be updated by user
+            'total_odds': round(total_odds, 2),
+            'matches': legs,
+            'confidence': 100.0,
+            'num_matches': len(legs),
+        },
+        'confidence': 100.0,
+        'extractor': bookmaker,
+    }
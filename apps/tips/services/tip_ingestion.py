@@ -0,0 +1,240 @@
+"""
+Tip Ingestion
+
+Turns betslip extractions (process_betslip_image results) into draft tips
+and their legs. Each slip is validated and normalized once in memory (every
+kickoff parsed a single time, every leg's market spec compiled), then the
+tips and all legs are written in one transaction: a single write per tip and
+one bulk INSERT of the legs. Screenshots are compressed before the
+transaction. A rejected slip or a failed write leaves no partial draft
+behind, nor the stored screenshot files of a new tip.
+
+Shared by the synchronous and background submission paths and the batch
+upload, so all of them accept and reject slips the same way.
+"""
+
+import logging
+from typing import Iterable, List
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+INVALID_DATES_MESSAGE = (
+    'Invalid Prediction Slip: The uploaded image is missing match kickoff dates and times. '
+    'Please upload a prediction slip screenshot from your account history that clearly displays '
+    'match dates and kickoff times.'
+)
+NO_MATCHES_MESSAGE = 'No matches found in the prediction slip. Please upload a clear image.'
+
+# Tip fields written from an extraction
+EXTRACTION_FIELDS = [
+    'odds', 'match_details', 'ocr_processed', 'ocr_confidence', 'expires_at', 'status',
+    'processing_status', 'processing_error', 'preview_data', 'updated_at',
+]
+
+
+class BetslipRejected(ValueError):
+    """The betslip could not be turned into a tip; the message is shown to the tipster"""
+
+
+class ExtractionUnavailable(BetslipRejected):
+    """
+    Extraction failed for a passing reason (Gemini busy, rate limited or
+    unreachable), not because of the slip: background tasks retry it
+    """
+
+
+def validate_extraction(extraction_result: dict) -> List:
+    """
+    Check that an extraction can become a tip, without touching any tip.
+
+    Args:
+        extraction_result: Result of process_betslip_image
+
+    Returns:
+        The kickoff datetime of each match
+
+    Raises:
+        BetslipRejected: Extraction failed, found no matches or lacks kickoff times
+        ExtractionUnavailable: Extraction failed, but may succeed later ('retryable')
+    """
+    from apps.tips.utils import parse_match_date
+
+    if not extraction_result or not extraction_result.get('success'):
+        error = (extraction_result or {}).get('error', 'Failed to extract prediction slip data')
+        if (extraction_result or {}).get('retryable'):
+            raise ExtractionUnavailable(error)
+        raise BetslipRejected(error)
+
+    betslip_data = extraction_result['data']
+    matches = betslip_data.get('matches', [])
+    if not matches:
+        raise BetslipRejected(NO_MATCHES_MESSAGE)
+
+    # Expiry is the latest kickoff, so every match needs a date and time
+    match_dates = [
+        parse_match_date(match_data.get('match_date'), match_data.get('match_time'))
+        for match_data in matches
+    ]
+    if not all(match_dates):
+        raise BetslipRejected(INVALID_DATES_MESSAGE)
+    return match_dates
+
+
+def prepare_tip(tip, extraction_result: dict) -> List:
+    """
+    Validate an extraction and fill the draft tip from it, in memory.
+
+    Args:
+        tip: Tip with tipster, bookmaker, bet_code and screenshot set
+        extraction_result: Result of process_betslip_image
+
+    Returns:
+        The tip's unsaved TipMatch records, market specs compiled
+
+    Raises:
+        BetslipRejected: See validate_extraction
+    """
+    from apps.tips.models import TipMatch
+
+    match_dates = validate_extraction(extraction_result)
+    betslip_data = extraction_result['data']
+    matches = betslip_data['matches']
+
+    tip.odds = betslip_data.get('total_odds', 1.0)
+    tip.match_details = betslip_data
+    tip.ocr_processed = True
+    tip.ocr_confidence = extraction_result.get('confidence', 95.0)
+    tip.expires_at = max(match_dates)
+    tip.status = 'draft'  # Draft status for verification step
+    tip.processing_status = 'completed'
+    tip.processing_error = None
+    tip.updated_at = timezone.now()
+
+    # Create preview data
+    tip.preview_data = {
+        'matches': [
+            {
+                'home_team': match.get('home_team'),
+                'away_team': match.get('away_team'),
+                'league': 'Unknown League',
+                'market': match.get('market'),
+            }
+            for match in matches[:2]
+        ],
+        'total_matches': len(matches)
+    }
+
+    legs = []
+    for match_data, match_date in zip(matches, match_dates):
+        leg = TipMatch(
+            tip=tip,
+            home_team=match_data.get('home_team', 'Unknown'),
+            away_team=match_data.get('away_team', 'Unknown'),
+            league='Unknown League',
+            match_date=match_date,
+            market=match_data.get('market', 'Unknown'),
+            selection=match_data.get('selection', 'Unknown'),
+            odds=float(match_data.get('odds', 1.0))
+        )
+        # bulk_create skips TipMatch.save, which compiles it
+        leg.compile_market_spec()
+        legs.append(leg)
+    return legs
+
+
+class IngestionBatch:
+    """
+    Accumulates prepared tips and their legs and writes them together.
+
+    Usage:
+        batch = IngestionBatch()
+        batch.add(tip, extraction_result)  # raises BetslipRejected
+        batch.flush()  # one transaction: tip writes plus one leg bulk_create
+    """
+
+    def __init__(self, update_fields: Iterable[str] = ()):
+        """
+        Args:
+            update_fields: Tip fields written along with EXTRACTION_FIELDS for
+                tips that already exist (new tips are inserted whole)
+        """
+        self.update_fields = list(EXTRACTION_FIELDS) + [
+            field for field in update_fields if field not in EXTRACTION_FIELDS
+        ]
+        self._tips = []
+        self._legs = []
+
+    def __len__(self):
+        return len(self._tips)
+
+    def add(self, tip, extraction_result: dict) -> List:
+        """
+        Validate and prepare a slip; nothing is kept if it is rejected.
+
+        Returns:
+            The tip's unsaved legs
+
+        Raises:
+            BetslipRejected: See prepare_tip
+        """
+        legs = prepare_tip(tip, extraction_result)
+        self._tips.append(tip)
+        self._legs.extend(legs)
+        return legs
+
+    def flush(self):
+        """Write all prepared tips and their legs in one transaction"""
+        from apps.tips.models import Tip, TipMatch
+
+        if not self._tips:
+            return
+
+        new_tips = [tip for tip in self._tips if tip._state.adding]
+        existing_tips = [tip for tip in self._tips if not tip._state.adding]
+
+        try:
+            # Image work stays out of the transaction
+            for tip in new_tips:
+                if tip.screenshot and not tip.screenshot_compressed:
+                    tip.compress_screenshot()
+
+            with transaction.atomic():
+                for tip in new_tips:
+                    tip.save(compress_screenshot=False)
+                if existing_tips:
+                    # Legs of an earlier, interrupted attempt
+                    TipMatch.objects.filter(tip__in=existing_tips).delete()
+                    Tip.objects.bulk_update(existing_tips, self.update_fields)
+                TipMatch.objects.bulk_create(self._legs)
+        except Exception:
+            # The new tips' rows are gone: so are the files stored for them
+            for tip in new_tips:
+                tip.delete_screenshot_files()
+            raise
+
+        logger.info(f"Ingested {len(self._tips)} tips with {len(self._legs)} legs")
+        self._tips, self._legs = [], []
+
+
+def ingest_tip(tip, extraction_result: dict, update_fields: Iterable[str] = ()):
+    """
+    Fill a draft tip from an extraction and write it with its legs atomically.
+
+    Args:
+        tip: New or existing Tip with tipster, bookmaker, bet_code and screenshot set
+        extraction_result: Result of process_betslip_image
+        update_fields: Further fields to write for an existing tip
+
+    Returns:
+        The saved tip
+
+    Raises:
+        BetslipRejected: Extraction failed, found no matches or lacks kickoff times
+    """
+    batch = IngestionBatch(update_fields)
+    batch.add(tip, extraction_result)
+    batch.flush()
+    return tip
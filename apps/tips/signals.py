@@ -0,0 +1,19 @@
+"""
+Signal receivers for the tips app
+"""
+import logging
+from django.dispatch import receiver
+
+from apps.fixtures.signals import fixtures_concluded
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(fixtures_concluded)
+def grade_concluded_fixtures(sender, fixture_ids, **kwargs):
+    """Queue grading of the legs that depend on fixtures which just concluded"""
+    from .task_queue import enqueue_task
+    from .background_tasks import grade_fixtures_async
+
+    logger.info(f"Fixtures concluded {list(fixture_ids)}, queueing dependent leg grading")
+    enqueue_task(grade_fixtures_async, list(fixture_ids), task_type='grading')
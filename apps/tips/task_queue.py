@@ -1,14 +1,125 @@
 """
 Background task queue for asynchronous betslip processing
+
+Two backends, selected by settings.TASK_QUEUE_BACKEND:
+- 'database': tasks are persisted as QueuedTask rows and executed by the
+  run_task_worker management command, so they survive gunicorn worker
+  recycling and restarts, and are retried with exponential backoff.
+- 'memory': a per-process queue.Queue served by daemon threads (development).
+
+Every task has a type (settings.TASK_QUEUE_TYPES): higher priority types are
+served first and each type may cap how many of its tasks run at once, so a
+burst of betslip extractions can't starve grading or notifications.
 """
+import itertools
+import math
+import os
 import queue
+import socket
 import threading
 import logging
-from typing import Callable, Any, Dict
-from datetime import datetime
+import time
+import traceback
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Any, Dict, List, Optional
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TASK_TYPE = 'default'
+
+# QueuedTask being executed by this thread (database backend)
+_current_task = ContextVar('current_task', default=None)
+
+# Used when settings.TASK_QUEUE_TYPES doesn't override them.
+# concurrency None means uncapped (bounded only by the worker threads)
+DEFAULT_TASK_TYPES = {
+    'extraction': {'priority': 30, 'concurrency': 2},
+    'notifications': {'priority': 20, 'concurrency': 2},
+    'grading': {'priority': 10, 'concurrency': 2},
+    'images': {'priority': 0, 'concurrency': 1},
+    DEFAULT_TASK_TYPE: {'priority': 10, 'concurrency': None},
+}
+
+
+def task_types() -> Dict[str, Dict]:
+    """Task types with their priority and concurrency cap"""
+    from django.conf import settings
+    return getattr(settings, 'TASK_QUEUE_TYPES', DEFAULT_TASK_TYPES)
+
+
+def get_task_type(name: str) -> Dict:
+    """
+    Configuration of a task type
+
+    Raises:
+        ValueError: Unknown task type
+    """
+    types = task_types()
+    if name not in types:
+        raise ValueError(f"Unknown task type '{name}', expected one of {', '.join(types)}")
+    return types[name]
+
+
+def is_final_attempt() -> bool:
+    """
+    Whether the running task won't be retried if it raises
+
+    True on the task's last attempt, and outside the database backend (the
+    in-memory queue and direct calls never retry), so tasks can tell a
+    failure to report from one to leave to the retry.
+    """
+    task = _current_task.get()
+    return task is None or task.attempts >= task.max_attempts
+
+
+def summarize_durations(durations: List[float]) -> Dict:
+    """Average and 95th percentile of durations in seconds"""
+    if not durations:
+        return {'avg': None, 'p95': None}
+    ordered = sorted(durations)
+    p95 = ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+    return {'avg': round(sum(ordered) / len(ordered), 3), 'p95': round(p95, 3)}
+
+
+def run_bounded(func: Callable, items: List, concurrency: int):
+    """
+    Run func over items with at most concurrency calls at once
+
+    With a concurrency of 1 (or a single item) everything runs in the calling
+    thread.
+
+    Yields:
+        (item, result, error) tuples in completion order
+    """
+    if concurrency <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from django.db import connection
+
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            # Each pool thread opened its own database connection
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bounded') as pool:
+        futures = {pool.submit(run, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
 
 class TaskQueue:
     """Simple task queue using threading for background processing"""
@@ -30,10 +141,19 @@ class TaskQueue:
         if self._initialized:
             return
 
-        self.task_queue = queue.Queue()
+        # Entries are (-priority, sequence, task): highest priority first, FIFO within a priority
+        self.task_queue = queue.PriorityQueue()
         self.workers = []
         self.running = False
         self.num_workers = 3  # Number of worker threads
+        self._sequence = itertools.count()
+
+        # Per-type state, guarded by _state_lock
+        self._state_lock = threading.Lock()
+        self._queued = Counter()
+        self._running = Counter()
+        self._deferred = defaultdict(deque)  # tasks held back while their type is at its cap
+        self._history = deque(maxlen=5000)  # (finished_at, task_type, wait, run, succeeded)
         self._initialized = True
 
         logger.info("TaskQueue initialized")
@@ -60,7 +180,7 @@ class TaskQueue:
         self.running = False
         # Add sentinel values to wake up workers
         for _ in range(self.num_workers):
-            self.task_queue.put(None)
+            self.task_queue.put((-math.inf, next(self._sequence), None))
 
         # Wait for workers to finish
         for worker in self.workers:
@@ -74,17 +194,31 @@ class TaskQueue:
         while self.running:
             try:
                 # Get task from queue with timeout
-                task = self.task_queue.get(timeout=1)
+                entry = self.task_queue.get(timeout=1)
+                task = entry[2]
 
                 if task is None:  # Sentinel value to stop
                     break
 
                 # Unpack task
-                task_id, func, args, kwargs, callback = task
-
+                task_id, func, args, kwargs, callback, task_type, enqueued_at = task
+
+                with self._state_lock:
+                    cap = get_task_type(task_type)['concurrency']
+                    if cap is not None and self._running[task_type] >= cap:
+                        # Type at its cap: park it until one of its tasks finishes
+                        self._deferred[task_type].append(entry)
+                        self.task_queue.task_done()
+                        continue
+                    self._queued[task_type] -= 1
+                    self._running[task_type] += 1
+
+                started = time.monotonic()
+                succeeded = False
                 try:
-                    logger.info(f"Processing task {task_id}: {func.__name__}")
+                    logger.info(f"Processing task {task_id}: {func.__name__} ({task_type})")
                     result = func(*args, **kwargs)
+                    succeeded = True
 
                     # Call callback if provided
                     if callback:
@@ -100,6 +234,14 @@ class TaskQueue:
                         callback(task_id, None, e)
 
                 finally:
+                    finished = time.monotonic()
+                    with self._state_lock:
+                        self._running[task_type] -= 1
+                        self._history.append(
+                            (finished, task_type, started - enqueued_at, finished - started, succeeded)
+                        )
+                        if self._deferred[task_type]:
+                            self.task_queue.put(self._deferred[task_type].popleft())
                     self.task_queue.task_done()
 
             except queue.Empty:
@@ -112,6 +254,7 @@ class TaskQueue:
         func: Callable,
         *args,
         callback: Callable = None,
+        task_type: str = DEFAULT_TASK_TYPE,
         **kwargs
     ) -> str:
         """
@@ -121,55 +264,481 @@ class TaskQueue:
             func: Function to execute
             *args: Positional arguments for the function
             callback: Optional callback function(task_id, result, error)
+            task_type: Task type, sets the priority and concurrency cap
             **kwargs: Keyword arguments for the function
 
         Returns:
             str: Task ID
         """
+        priority = get_task_type(task_type)['priority']
+
         # Generate unique task ID
         task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
 
         # Add task to queue
-        self.task_queue.put((task_id, func, args, kwargs, callback))
+        with self._state_lock:
+            self._queued[task_type] += 1
+        task = (task_id, func, args, kwargs, callback, task_type, time.monotonic())
+        self.task_queue.put((-priority, next(self._sequence), task))
 
-        logger.info(f"Task {task_id} enqueued: {func.__name__}")
+        logger.info(f"Task {task_id} enqueued: {func.__name__} ({task_type})")
 
         return task_id
 
     def get_queue_size(self) -> int:
         """Get current queue size"""
-        return self.task_queue.qsize()
+        with self._state_lock:
+            return sum(self._queued.values())
 
     def is_empty(self) -> bool:
         """Check if queue is empty"""
-        return self.task_queue.empty()
+        return self.get_queue_size() == 0
+
+    def metrics(self, window_minutes: int = 60) -> Dict:
+        """
+        Queue depth, wait and run times per task type
+
+        Args:
+            window_minutes: Wait/run times and counts cover tasks finished in this window
+        """
+        cutoff = time.monotonic() - window_minutes * 60
+        with self._state_lock:
+            queued = dict(self._queued)
+            running = dict(self._running)
+            history = [entry for entry in self._history if entry[0] >= cutoff]
+
+        types = []
+        for name, config in task_types().items():
+            finished = [entry for entry in history if entry[1] == name]
+            types.append({
+                'type': name,
+                'priority': config['priority'],
+                'concurrency': config['concurrency'],
+                'queued': queued.get(name, 0),
+                'running': running.get(name, 0),
+                'succeeded': sum(1 for entry in finished if entry[4]),
+                'failed': sum(1 for entry in finished if not entry[4]),
+                'wait_seconds': summarize_durations([entry[2] for entry in finished]),
+                'run_seconds': summarize_durations([entry[3] for entry in finished]),
+            })
+
+        return {'backend': 'memory', 'window_minutes': window_minutes, 'types': types}
+
+
+def callable_path(func: Callable) -> str:
+    """
+    Dotted import path of a module-level function
+
+    Raises:
+        ValueError: func can't be imported back by path (lambda, closure, method)
+    """
+    from django.utils.module_loading import import_string
+
+    path = f"{func.__module__}.{func.__qualname__}"
+    try:
+        if import_string(path) is func:
+            return path
+    except ImportError:
+        pass
+    raise ValueError(f"Task {path} must be a module-level function to be queued")
+
+
+class DatabaseTaskQueue:
+    """
+    Durable task queue backed by the QueuedTask table
+
+    Tasks are stored by dotted function path with JSON arguments. Workers
+    claim the highest priority due task with SELECT ... FOR UPDATE SKIP LOCKED
+    and lease it for the visibility timeout, renewing the lease while the task
+    runs (a heartbeat every third of it). Failed attempts, including workers
+    that died mid-task and let the lease expire, are retried with exponential
+    backoff and dead-lettered after max_attempts.
+
+    Concurrency caps are enforced exactly between the threads of one worker
+    process; with several worker processes a type may briefly exceed its cap
+    by one task per extra process.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[int] = None,
+        max_retry_delay: Optional[int] = None
+    ):
+        from django.conf import settings
+
+        self.visibility_timeout = visibility_timeout or getattr(settings, 'TASK_QUEUE_VISIBILITY_TIMEOUT', 300)
+        self.max_attempts = max_attempts or getattr(settings, 'TASK_QUEUE_MAX_ATTEMPTS', 5)
+        self.retry_backoff = retry_backoff or getattr(settings, 'TASK_QUEUE_RETRY_BACKOFF', 10)
+        self.max_retry_delay = max_retry_delay or getattr(settings, 'TASK_QUEUE_MAX_RETRY_DELAY', 3600)
+        self._claim_lock = threading.Lock()
+
+    def enqueue(
+        self,
+        func: Callable,
+        *args,
+        callback: Callable = None,
+        task_type: str = DEFAULT_TASK_TYPE,
+        **kwargs
+    ) -> str:
+        """
+        Persist a task for the workers
+
+        Args:
+            func: Module-level function to execute
+            *args: JSON-serializable positional arguments
+            callback: Optional module-level callback function(task_id, result, error)
+            task_type: Task type, sets the priority and concurrency cap
+            **kwargs: JSON-serializable keyword arguments
+
+        Returns:
+            str: Task ID
+        """
+        from .models import QueuedTask
+
+        task = QueuedTask.objects.create(
+            func_path=callable_path(func),
+            args=list(args),
+            kwargs=kwargs,
+            callback_path=callable_path(callback) if callback else '',
+            task_type=task_type,
+            priority=get_task_type(task_type)['priority'],
+            max_attempts=self.max_attempts,
+        )
+        task_id = f"task_{task.id}"
+        logger.info(f"Task {task_id} enqueued: {task.func_path} ({task_type})")
+        return task_id
+
+    def retry_delay(self, attempts: int) -> int:
+        """Seconds before the next attempt of a task that failed attempts times"""
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_delay)
+
+    def _expire_leases(self, now) -> list:
+        """
+        Fail the attempts of running tasks whose lease expired
+
+        Their worker died mid-task (OOM, a crash in native code, SIGKILL):
+        the task is retried after the backoff like any failed attempt, or
+        dead-lettered once it has used up max_attempts, so a task that keeps
+        killing its worker doesn't run again and again.
+
+        Returns:
+            The dead-lettered tasks
+        """
+        from .models import QueuedTask
+
+        dead = []
+        for task in QueuedTask.objects.select_for_update(skip_locked=True).filter(
+            status='running', locked_until__lt=now
+        ):
+            task.last_error = f"Lease held by {task.locked_by} expired during attempt {task.attempts}: the worker died mid-task"
+            task.locked_by = ''
+            task.locked_until = None
+            if task.attempts >= task.max_attempts:
+                task.status = 'dead'
+                task.finished_at = now
+                dead.append(task)
+                logger.error(f"Task task_{task.id} lease expired on its last attempt ({task.attempts}), dead-lettering")
+            else:
+                delay = self.retry_delay(task.attempts)
+                task.status = 'queued'
+                task.run_after = now + timedelta(seconds=delay)
+                logger.warning(f"Task task_{task.id} lease expired (attempt {task.attempts}), retrying in {delay}s")
+            task.save(update_fields=['status', 'run_after', 'locked_by', 'locked_until', 'last_error', 'finished_at'])
+        return dead
+
+    def claim(self, worker_name: str):
+        """
+        Lease the next due task to a worker
+
+        Queued tasks whose run_after has passed are claimed highest priority
+        first. Types already running at their concurrency cap are skipped.
+        Running tasks whose lease expired are first failed (_expire_leases).
+
+        Returns:
+            QueuedTask or None if nothing is due
+        """
+        from django.db import transaction
+        from django.db.models import Count
+        from django.utils import timezone
+        from django.utils.module_loading import import_string
+        from .models import QueuedTask
+
+        with self._claim_lock, transaction.atomic():
+            now = timezone.now()
+            dead = self._expire_leases(now)
+            running = dict(
+                QueuedTask.objects.filter(status='running', locked_until__gte=now)
+                .values_list('task_type').annotate(count=Count('id'))
+            )
+            saturated = [
+                name for name, config in task_types().items()
+                if config['concurrency'] is not None and running.get(name, 0) >= config['concurrency']
+            ]
+
+            task = QueuedTask.objects.select_for_update(skip_locked=True).filter(
+                status='queued', run_after__lte=now
+            ).exclude(task_type__in=saturated).order_by('-priority', 'run_after', 'id').first()
+
+            if task is not None:
+                task.status = 'running'
+                task.attempts += 1
+                task.locked_by = worker_name
+                task.locked_until = now + timedelta(seconds=self.visibility_timeout)
+                task.started_at = now
+                task.save(update_fields=['status', 'attempts', 'locked_by', 'locked_until', 'started_at'])
+
+        for dead_task in dead:
+            if dead_task.callback_path:
+                import_string(dead_task.callback_path)(
+                    f"task_{dead_task.id}", None, RuntimeError(dead_task.last_error)
+                )
+        return task
+
+    @contextmanager
+    def _lease_heartbeat(self, task):
+        """Renew the task's lease from a background thread while the block runs"""
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._renew_lease, args=(task, stop), name=f"task_{task.id}-lease", daemon=True
+        )
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            heartbeat.join()
+
+    def _renew_lease(self, task, stop: threading.Event):
+        """
+        Extend a running task's lease every third of the visibility timeout
+        until stop is set, so a task that outlives the timeout isn't claimed
+        a second time while it still runs
+        """
+        from django.db import connection
+        from django.utils import timezone
+        from .models import QueuedTask
+
+        interval = max(1, self.visibility_timeout / 3)
+        try:
+            while not stop.wait(interval):
+                renewed = QueuedTask.objects.filter(
+                    id=task.id, status='running', locked_by=task.locked_by
+                ).update(locked_until=timezone.now() + timedelta(seconds=self.visibility_timeout))
+                if not renewed:
+                    logger.warning(f"Task task_{task.id} lost its lease, no longer renewing it")
+                    return
+        except Exception as e:
+            logger.error(f"Could not renew the lease of task task_{task.id}: {str(e)}")
+        finally:
+            connection.close()
+
+    def execute(self, task) -> bool:
+        """
+        Run a claimed task and record the outcome
+
+        Returns:
+            bool: True if the task succeeded
+        """
+        from django.utils import timezone
+        from django.utils.module_loading import import_string
+
+        task_id = f"task_{task.id}"
+        callback = import_string(task.callback_path) if task.callback_path else None
+
+        try:
+            logger.info(f"Processing task {task_id}: {task.func_path} (attempt {task.attempts}/{task.max_attempts})")
+            token = _current_task.set(task)
+            try:
+                with self._lease_heartbeat(task):
+                    result = import_string(task.func_path)(*task.args, **task.kwargs)
+            finally:
+                _current_task.reset(token)
+
+        except Exception as e:
+            task.last_error = traceback.format_exc()
+            task.locked_by = ''
+            task.locked_until = None
+
+            if task.attempts >= task.max_attempts:
+                # Dead-letter: kept for inspection and manual requeue from the admin
+                task.status = 'dead'
+                task.finished_at = timezone.now()
+                logger.error(f"Task {task_id} failed permanently after {task.attempts} attempts: {str(e)}")
+            else:
+                delay = self.retry_delay(task.attempts)
+                task.status = 'queued'
+                task.run_after = timezone.now() + timedelta(seconds=delay)
+                logger.warning(f"Task {task_id} failed (attempt {task.attempts}), retrying in {delay}s: {str(e)}")
+
+            task.save(update_fields=['status', 'run_after', 'locked_by', 'locked_until', 'last_error', 'finished_at'])
+
+            if callback and task.status == 'dead':
+                callback(task_id, None, e)
+            return False
+
+        task.status = 'succeeded'
+        task.locked_by = ''
+        task.locked_until = None
+        task.finished_at = timezone.now()
+        task.save(update_fields=['status', 'locked_by', 'locked_until', 'finished_at'])
+        logger.info(f"Task {task_id} completed successfully")
+
+        if callback:
+            callback(task_id, result, None)
+        return True
+
+    def run_pending(self, worker_name: str = None, limit: Optional[int] = None) -> int:
+        """
+        Execute due tasks until none are left (or limit is reached)
+
+        Returns:
+            int: Number of tasks executed
+        """
+        worker_name = worker_name or default_worker_name()
+        executed = 0
+        while limit is None or executed < limit:
+            task = self.claim(worker_name)
+            if task is None:
+                break
+            self.execute(task)
+            executed += 1
+        return executed
+
+    def purge(self, older_than_days: int) -> int:
+        """Delete succeeded tasks finished more than older_than_days ago"""
+        from django.utils import timezone
+        from .models import QueuedTask
+
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        deleted, _ = QueuedTask.objects.filter(status='succeeded', finished_at__lt=cutoff).delete()
+        return deleted
+
+    def get_queue_size(self) -> int:
+        """Get number of tasks waiting to run"""
+        from .models import QueuedTask
+        return QueuedTask.objects.filter(status='queued').count()
+
+    def is_empty(self) -> bool:
+        """Check if no task is waiting or running"""
+        from .models import QueuedTask
+        return not QueuedTask.objects.filter(status__in=['queued', 'running']).exists()
+
+    def metrics(self, window_minutes: int = 60) -> Dict:
+        """
+        Queue depth, wait and run times per task type
+
+        Wait time is from when a task became due (enqueued, or its retry
+        backoff elapsed) until a worker claimed it.
+
+        Args:
+            window_minutes: Wait/run times and counts cover tasks finished in this window
+        """
+        from django.db.models import Count, Min, Q
+        from django.utils import timezone
+        from .models import QueuedTask
+
+        now = timezone.now()
+        backlog = {
+            row['task_type']: row for row in QueuedTask.objects.filter(
+                status__in=['queued', 'running']
+            ).values('task_type').annotate(
+                queued=Count('id', filter=Q(status='queued')),
+                retrying=Count('id', filter=Q(status='queued', attempts__gt=0)),
+                running=Count('id', filter=Q(status='running', locked_until__gte=now)),
+                oldest_due=Min('run_after', filter=Q(status='queued', run_after__lte=now)),
+            )
+        }
+
+        finished = defaultdict(list)
+        for task_type, status, run_after, started_at, finished_at in QueuedTask.objects.filter(
+            finished_at__gte=now - timedelta(minutes=window_minutes)
+        ).values_list('task_type', 'status', 'run_after', 'started_at', 'finished_at'):
+            finished[task_type].append((status, run_after, started_at, finished_at))
+
+        types = []
+        for name, config in task_types().items():
+            row = backlog.get(name, {})
+            done = finished.get(name, [])
+            oldest_due = row.get('oldest_due')
+            types.append({
+                'type': name,
+                'priority': config['priority'],
+                'concurrency': config['concurrency'],
+                'queued': row.get('queued', 0),
+                'retrying': row.get('retrying', 0),
+                'running': row.get('running', 0),
+                'oldest_due_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else None,
+                'succeeded': sum(1 for entry in done if entry[0] == 'succeeded'),
+                'dead': sum(1 for entry in done if entry[0] == 'dead'),
+                'wait_seconds': summarize_durations([
+                    (started_at - run_after).total_seconds()
+                    for _, run_after, started_at, _ in done if started_at
+                ]),
+                'run_seconds': summarize_durations([
+                    (finished_at - started_at).total_seconds()
+                    for _, _, started_at, finished_at in done if started_at
+                ]),
+            })
+
+        return {'backend': 'database', 'window_minutes': window_minutes, 'types': types}
+
+
+def default_worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
 
 
 # Global task queue instance
 _task_queue = None
 
 
-def get_task_queue() -> TaskQueue:
-    """Get or create the global task queue instance"""
+def get_task_queue():
+    """
+    Get or create the global task queue instance
+
+    The in-memory queue starts its worker threads here; the database queue
+    only enqueues, its tasks are executed by the run_task_worker command.
+    """
     global _task_queue
     if _task_queue is None:
-        _task_queue = TaskQueue()
-        _task_queue.start()
+        from django.conf import settings
+
+        if getattr(settings, 'TASK_QUEUE_BACKEND', 'memory') == 'database':
+            _task_queue = DatabaseTaskQueue()
+        else:
+            _task_queue = TaskQueue()
+            _task_queue.start()
     return _task_queue
 
 
-def enqueue_task(func: Callable, *args, callback: Callable = None, **kwargs) -> str:
+def enqueue_task(
+    func: Callable,
+    *args,
+    callback: Callable = None,
+    task_type: str = DEFAULT_TASK_TYPE,
+    **kwargs
+) -> str:
     """
     Convenience function to enqueue a task
 
+    With the database backend, func and callback must be module-level
+    functions and the arguments JSON-serializable.
+
     Args:
         func: Function to execute
         *args: Positional arguments
         callback: Optional callback function(task_id, result, error)
+        task_type: Task type from settings.TASK_QUEUE_TYPES (priority and concurrency cap)
         **kwargs: Keyword arguments
 
     Returns:
         str: Task ID
     """
     queue = get_task_queue()
-    return queue.enqueue(func, *args, callback=callback, **kwargs)
+    return queue.enqueue(func, *args, callback=callback, task_type=task_type, **kwargs)
+
+
+def get_queue_metrics(window_minutes: int = 60) -> Dict:
+    """Per-type queue metrics of the configured backend"""
+    return get_task_queue().metrics(window_minutes)
@@ -1,22 +1,56 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.utils import timezone
 from unittest.mock import patch, MagicMock
 import os
 import io
 import json
+import shutil
+import tempfile
 from decimal import Decimal
 from datetime import timedelta
 
 from apps.tips.models import OCRProviderSettings, Tip, TipMatch
 from apps.tips.betslip_extractor import process_betslip_image
 from apps.tips.services.result_verifier import ResultVerifier
+from apps.tips.services.market_spec import compile_market, evaluate_spec, grade_scores
+from apps.tips.services.livescore_cz_scraper import LivescoreCzScraper
 from apps.fixtures.models import Fixture, League, Team
 
+# Module-level so the database task queue can import them by path
+EXECUTED_TASKS = []
+
+
+def record_task(value, label=''):
+    EXECUTED_TASKS.append((value, label))
+    return value
+
+
+def failing_task():
+    raise RuntimeError('upstream unavailable')
+
+
+def record_task_outcome(task_id, result, error):
+    EXECUTED_TASKS.append((task_id, result, str(error) if error else None))
+
+
 # Dummy PNG image (1x1 transparent PNG)
 DUMMY_PNG_BYTES = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0cIDATx\xda\xed\xc1\x01\x01\x00\x00\x00\xc2\xa0\xf7Om\x00\x00\x00\x00IEND\xaeB`\x82'
 
 
+class TemporaryMediaRootMixin:
+    """Store the uploads a test class saves in a throwaway MEDIA_ROOT, not the project's media/"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+
 class BetslipFastExtractorTests(TestCase):
     def setUp(self):
         super().setUp()
@@ -261,6 +295,18 @@ class ResultVerifierTests(TestCase):
             }
         ]
 
+        unmatched_tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="NPLOTHER",
+            odds=Decimal("2.10"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        TipMatch.objects.create(
+            tip=unmatched_tip, home_team="Nowhere Rovers", away_team="Nobody Athletic", market="1X2",
+            selection="1", odds=Decimal("2.10"), match_date=timezone.now() - timedelta(hours=2)
+        )
+
         tip = Tip.objects.create(
             tipster=self.tipster,
             bet_code="NPLSOUTH",
@@ -285,6 +331,9 @@ class ResultVerifierTests(TestCase):
 
         self.assertEqual(stats['tips_verified'], 1)
         self.assertEqual(stats['tips_won'], 1)
+        self.assertEqual(stats['tips_pending'], 1)
+        # Both legs fall back to the same day's page, fetched once for the batch
+        mock_fetch_scores.assert_called_once()
 
         tip.refresh_from_db()
         match.refresh_from_db()
@@ -293,4 +342,2192 @@ class ResultVerifierTests(TestCase):
         self.assertTrue(tip.is_won)
         self.assertTrue(match.is_resulted)
         self.assertTrue(match.is_won)
-        self.assertEqual(match.actual_result, "3-1 (livescore.cz)")
\ No newline at end of file
+        self.assertEqual(match.actual_result, "3-1 (livescore.cz)")
+
+    @patch('apps.tips.services.livescore_cz_scraper.LivescoreCzScraper.fetch_changes', return_value=[])
+    def test_incremental_verification_only_revisits_changed_fixtures(self, mock_fetch_changes):
+        verifier = ResultVerifier()
+
+        # First incremental run has no watermark and performs a full pass
+        stats = verifier.verify_tips(incremental=True)
+        self.assertTrue(stats['sweep'])
+
+        tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="INCREMENTAL",
+            odds=Decimal("1.50"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=2)
+        )
+        match = TipMatch.objects.create(
+            tip=tip,
+            home_team="Arsenal",
+            away_team="Chelsea",
+            market="1X2",
+            selection="1",
+            odds=Decimal("1.50"),
+            match_date=timezone.now() - timedelta(hours=2),
+            api_match_id="300"
+        )
+        fixture = Fixture.objects.create(
+            api_id=300,
+            timezone="UTC",
+            date=match.match_date,
+            timestamp=int(match.match_date.timestamp()),
+            status_long="Second Half",
+            status_short="2H",
+            league=self.league,
+            home_team=self.team_home,
+            away_team=self.team_away,
+            home_goals=1,
+            away_goals=0
+        )
+
+        # Fixture has not concluded: nothing to revisit, no sweep due yet
+        stats = verifier.verify_tips(incremental=True)
+        self.assertEqual(stats['tips_checked'], 0)
+        self.assertFalse(stats['sweep'])
+
+        # Full time is ingested: only now is the tip picked up and graded
+        fixture.status_short = "FT"
+        fixture.status_long = "Match Finished"
+        fixture.save()
+
+        stats = verifier.verify_tips(incremental=True)
+        self.assertEqual(stats['tips_checked'], 1)
+        self.assertEqual(stats['tips_won'], 1)
+
+        tip.refresh_from_db()
+        self.assertTrue(tip.is_resulted)
+
+    @patch('apps.tips.services.livescore_cz_scraper.LivescoreCzScraper.fetch_scores')
+    @patch('apps.tips.services.livescore_cz_scraper.LivescoreCzScraper.fetch_changes')
+    def test_incremental_verification_revisits_legs_livescore_reports_finished(self, mock_fetch_changes,
+                                                                              mock_fetch_scores):
+        finished = {
+            "league": "AUSTRALIA: NPL NSW", "time": "15:00", "home_team": "South Coast Flame FC",
+            "away_team": "Bankstown City FC", "score": "0-2", "home_goals": 0, "away_goals": 2,
+            "status": "finished", "status_raw": "fin", "match_path": "/match/test1234/",
+        }
+        mock_fetch_changes.return_value = []
+        mock_fetch_scores.return_value = [finished]
+        verifier = ResultVerifier()
+        verifier.verify_tips(incremental=True)
+
+        tip = Tip.objects.create(
+            tipster=self.tipster, bet_code="NPLDELTA", odds=Decimal("1.80"), status="active",
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        TipMatch.objects.create(
+            tip=tip, home_team="South Coast Flame", away_team="Bankstown City", market="1X2", selection="1",
+            odds=Decimal("1.80"), match_date=timezone.now() - timedelta(hours=2)
+        )
+
+        # No sweep due and nothing new on livescore.cz: the leg is left alone
+        stats = verifier.verify_tips(incremental=True)
+        self.assertFalse(stats['sweep'])
+        self.assertEqual(stats['tips_checked'], 0)
+
+        # livescore.cz lists a newly finished match: fixture-less legs are revisited
+        mock_fetch_changes.return_value = [finished]
+        stats = verifier.verify_tips(incremental=True)
+        self.assertFalse(stats['sweep'])
+        self.assertEqual(stats['tips_lost'], 1)
+        self.assertEqual(
+            mock_fetch_changes.call_args.kwargs, {'status_filter': 'finished', 'consumer': verifier.CHECKPOINT_NAME}
+        )
+
+        tip.refresh_from_db()
+        self.assertTrue(tip.is_resulted)
+
+    @patch('apps.tips.services.livescore_cz_scraper.LivescoreCzScraper.fetch_scores')
+    def test_live_scores_fetch_the_fallback_page_once(self, mock_fetch_scores):
+        mock_fetch_scores.return_value = [{
+            "league": "ENGLAND: Premier League", "time": "67'", "home_team": "Arsenal FC",
+            "away_team": "Chelsea FC", "score": "1-0", "home_goals": 1, "away_goals": 0,
+            "status": "live", "status_raw": "live", "match_path": "/match/live1/",
+        }]
+        tip = Tip.objects.create(
+            tipster=self.tipster, bet_code="LIVEPAGE", odds=Decimal("3.00"), status="active",
+            expires_at=timezone.now() + timedelta(hours=2)
+        )
+        for home, away in (("Arsenal", "Chelsea"), ("Nowhere Rovers", "Nobody Athletic")):
+            TipMatch.objects.create(
+                tip=tip, home_team=home, away_team=away, market="1X2", selection="1",
+                odds=Decimal("1.50"), match_date=timezone.now() - timedelta(minutes=70)
+            )
+
+        response = self.client.get(f'/tips/{tip.id}/live-scores/')
+
+        mock_fetch_scores.assert_called_once()
+        self.assertEqual([m['score'] for m in response.json()['matches']], ['1-0'])
+
+    def test_verify_fixtures_grades_only_dependent_legs(self):
+        tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="EVENTDRIVEN",
+            odds=Decimal("3.00"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=2)
+        )
+        finished_leg = TipMatch.objects.create(
+            tip=tip,
+            home_team="Arsenal",
+            away_team="Chelsea",
+            market="Over 2.5",
+            selection="Over",
+            odds=Decimal("1.50"),
+            match_date=timezone.now() - timedelta(hours=2),
+            api_match_id="400"
+        )
+        later_leg = TipMatch.objects.create(
+            tip=tip,
+            home_team="Man Utd",
+            away_team="Liverpool",
+            market="1X2",
+            selection="1",
+            odds=Decimal("2.00"),
+            match_date=timezone.now() + timedelta(hours=1),
+            api_match_id="401"
+        )
+        Fixture.objects.create(
+            api_id=400,
+            timezone="UTC",
+            date=finished_leg.match_date,
+            timestamp=int(finished_leg.match_date.timestamp()),
+            status_long="Match Finished",
+            status_short="FT",
+            league=self.league,
+            home_team=self.team_home,
+            away_team=self.team_away,
+            home_goals=2,
+            away_goals=2
+        )
+
+        self.assertEqual(
+            ResultVerifier.dependent_legs([400]),
+            {400: [(finished_leg.id, tip.id)]}
+        )
+
+        stats = ResultVerifier().verify_fixtures([400])
+        self.assertEqual(stats['tips_checked'], 1)
+        self.assertEqual(stats['tips_pending'], 1)
+
+        finished_leg.refresh_from_db()
+        later_leg.refresh_from_db()
+        self.assertTrue(finished_leg.is_resulted)
+        self.assertTrue(finished_leg.is_won)
+        self.assertFalse(later_leg.is_resulted)
+
+    def _create_graded_tips(self, count, first_api_id):
+        """Active tips whose two legs both have a finished fixture"""
+        fixture_ids = []
+        for i in range(count):
+            tip = Tip.objects.create(
+                tipster=self.tipster,
+                bet_code=f"BULK{first_api_id + i}",
+                odds=Decimal("3.00"),
+                status="active",
+                expires_at=timezone.now() + timedelta(hours=2)
+            )
+            for leg, (market, selection) in enumerate([("Over 2.5", "Over"), ("1X2", "1")]):
+                api_id = first_api_id + i * 2 + leg
+                match_date = timezone.now() - timedelta(hours=3)
+                TipMatch.objects.create(
+                    tip=tip, home_team="Arsenal", away_team="Chelsea",
+                    market=market, selection=selection, odds=Decimal("1.50"),
+                    match_date=match_date, api_match_id=str(api_id)
+                )
+                Fixture.objects.create(
+                    api_id=api_id, timezone="UTC", date=match_date,
+                    timestamp=int(match_date.timestamp()), status_long="Match Finished",
+                    status_short="FT", league=self.league, home_team=self.team_home,
+                    away_team=self.team_away, home_goals=3, away_goals=1
+                )
+                fixture_ids.append(api_id)
+        return fixture_ids
+
+    def test_grading_writes_are_batched(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        one_tip = self._create_graded_tips(1, 500)
+        many_tips = self._create_graded_tips(6, 600)
+
+        with CaptureQueriesContext(connection) as single:
+            ResultVerifier().verify_fixtures(one_tip)
+        with CaptureQueriesContext(connection) as several:
+            stats = ResultVerifier().verify_fixtures(many_tips)
+
+        self.assertEqual(stats['tips_won'], 6)
+        self.assertEqual(len(several), len(single))
+
+        tip = Tip.objects.get(bet_code="BULK600")
+        self.assertTrue(tip.is_resulted)
+        self.assertTrue(tip.is_won)
+        self.assertEqual(tip.status, 'archived')
+        self.assertEqual(tip.odds, Decimal("2.25"))
+        self.assertTrue(all(m.is_resulted and m.actual_result == "FT 3-1" for m in tip.matches.all()))
+
+
+    def test_parallel_workers_claim_each_batch_once(self):
+        from django.db import connection
+
+        tips = [
+            Tip.objects.create(
+                tipster=self.tipster,
+                bet_code=f"PAR{i}",
+                odds=Decimal("2.00"),
+                status="active",
+                expires_at=timezone.now() + timedelta(hours=2)
+            )
+            for i in range(7)
+        ]
+        claimed = []
+
+        def fake_grade_batch(tip_ids, use_livescore, stats):
+            claimed.extend(tip_ids)
+            stats['tips_checked'] += len(tip_ids)
+
+        verifier = ResultVerifier()
+        with patch.object(ResultVerifier, 'GRADING_BATCH_SIZE', 2), \
+                patch.object(verifier, '_grade_batch', side_effect=fake_grade_batch), \
+                patch.object(connection.features, 'has_select_for_update_skip_locked', True):
+            stats = verifier._verify_tip_set(Tip.objects.all(), workers=3)
+
+        self.assertEqual(sorted(claimed), sorted(tip.id for tip in tips))
+        self.assertEqual(stats['tips_checked'], 7)
+        self.assertEqual(len(stats['workers']), 3)
+        self.assertEqual(sum(worker['batches'] for worker in stats['workers']), 4)
+
+    def test_claimed_batch_skips_tips_resulted_elsewhere(self):
+        tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="RACED",
+            odds=Decimal("2.00"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=2)
+        )
+        stale_ids = [tip.id]
+        Tip.objects.filter(id=tip.id).update(is_resulted=True, status='archived')
+
+        stats = ResultVerifier()._empty_stats()
+        ResultVerifier()._grade_batch(stale_ids, use_livescore=False, stats=stats)
+
+        self.assertEqual(stats['tips_checked'], 0)
+        self.assertEqual(stats['tips_skipped'], 1)
+
+
+    def test_batch_is_graded_outside_the_claim_transaction(self):
+        from django.db import connection
+
+        fixture_ids = self._create_graded_tips(3, 800)
+        tips = list(Tip.objects.filter(matches__api_match_id__in=[str(i) for i in fixture_ids]).distinct().order_by('id'))
+        raced, broken, graded = tips
+        verifier = ResultVerifier()
+        verify_tip = verifier._verify_tip
+        outer_blocks = len(connection.atomic_blocks)
+        grading_blocks = []
+
+        def verify(tip, **kwargs):
+            grading_blocks.append(len(connection.atomic_blocks))
+            if tip.id == raced.id:
+                # Another process results the tip while this one grades it
+                Tip.objects.filter(id=tip.id).update(is_resulted=True, is_won=False, status='archived')
+            if tip.id == broken.id:
+                raise RuntimeError('unexpected fixture data')
+            return verify_tip(tip, **kwargs)
+
+        stats = verifier._empty_stats()
+        with patch.object(verifier, '_verify_tip', side_effect=verify):
+            verifier._grade_batch([tip.id for tip in tips], use_livescore=False, stats=stats)
+
+        # No transaction (or row lock) is held while grading
+        self.assertEqual(grading_blocks, [outer_blocks] * 3)
+        self.assertEqual((stats['tips_skipped'], stats['tips_checked'], stats['tips_won']), (1, 2, 1))
+
+        raced.refresh_from_db()
+        self.assertFalse(raced.is_won)
+        self.assertFalse(raced.matches.filter(is_resulted=True).exists())
+        self.assertFalse(Tip.objects.get(id=broken.id).is_resulted)
+        graded.refresh_from_db()
+        self.assertTrue(graded.is_resulted and graded.is_won)
+
+    def test_lost_leg_decides_tip_early(self):
+        tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="EARLYLOSS",
+            odds=Decimal("6.00"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=5)
+        )
+        lost_leg = TipMatch.objects.create(
+            tip=tip, home_team="Arsenal", away_team="Chelsea", market="1X2", selection="2",
+            odds=Decimal("2.00"), match_date=timezone.now() - timedelta(hours=2), api_match_id="700"
+        )
+        TipMatch.objects.create(
+            tip=tip, home_team="Unknown FC", away_team="Nobody United", market="1X2", selection="1",
+            odds=Decimal("1.50"), match_date=timezone.now() - timedelta(hours=2)
+        )
+        later_leg = TipMatch.objects.create(
+            tip=tip, home_team="Man Utd", away_team="Liverpool", market="Over 2.5", selection="Over",
+            odds=Decimal("2.00"), match_date=timezone.now() + timedelta(hours=1), api_match_id="701"
+        )
+        fixture_kwargs = dict(
+            timezone="UTC", status_long="Match Finished", status_short="FT", league=self.league,
+            home_team=self.team_home, away_team=self.team_away, home_goals=2, away_goals=1
+        )
+        Fixture.objects.create(
+            api_id=700, date=lost_leg.match_date, timestamp=int(lost_leg.match_date.timestamp()), **fixture_kwargs
+        )
+
+        verifier = ResultVerifier()
+        with patch.object(verifier, '_find_matching_fixture') as mock_find, \
+                patch.object(verifier, '_verify_via_livescore_cz') as mock_livescore:
+            stats = verifier.verify_tips()
+
+        mock_find.assert_not_called()
+        mock_livescore.assert_not_called()
+        self.assertEqual(stats['tips_lost'], 1)
+
+        tip.refresh_from_db()
+        self.assertTrue(tip.is_resulted)
+        self.assertFalse(tip.is_won)
+        self.assertEqual(tip.status, 'archived')
+        self.assertEqual(tip.matches.filter(is_resulted=False).count(), 2)
+
+        # The remaining leg is graded for display once its fixture concludes
+        Fixture.objects.create(
+            api_id=701, date=later_leg.match_date, timestamp=int(later_leg.match_date.timestamp()), **fixture_kwargs
+        )
+        stats = ResultVerifier().verify_fixtures([701])
+        self.assertEqual(stats['tips_checked'], 0)
+        self.assertEqual(stats['display_legs_graded'], 1)
+
+        later_leg.refresh_from_db()
+        self.assertTrue(later_leg.is_resulted)
+        self.assertTrue(later_leg.is_won)
+
+
+    def test_regrade_reports_and_applies_corrections(self):
+        from django.core.management import call_command
+        from apps.tips.services.regrader import Regrader
+
+        tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="REGRADE",
+            odds=Decimal("3.00"),
+            status="archived",
+            is_resulted=True,
+            is_won=False,
+            expires_at=timezone.now() - timedelta(days=30)
+        )
+        wrong_leg = TipMatch.objects.create(
+            tip=tip, home_team="Arsenal", away_team="Chelsea", market="1X2", selection="1",
+            odds=Decimal("1.50"), match_date=timezone.now() - timedelta(days=30), api_match_id="800",
+            is_resulted=True, is_won=False, actual_result="FT 2-1"
+        )
+        TipMatch.objects.create(
+            tip=tip, home_team="Arsenal", away_team="Chelsea", market="Over 2.5", selection="Over",
+            odds=Decimal("2.00"), match_date=timezone.now() - timedelta(days=30), api_match_id="801",
+            is_resulted=True, is_won=True, actual_result="FT 2-1"
+        )
+        manual_leg = TipMatch.objects.create(
+            tip=tip, home_team="Arsenal", away_team="Chelsea", market="1X2", selection="2",
+            odds=Decimal("1.00"), match_date=timezone.now() - timedelta(days=30), api_match_id="802",
+            is_resulted=True, is_won=True, actual_result="Manual Win"
+        )
+        for api_id in (800, 801, 802):
+            Fixture.objects.create(
+                api_id=api_id, timezone="UTC", date=wrong_leg.match_date,
+                timestamp=int(wrong_leg.match_date.timestamp()), status_long="Match Finished",
+                status_short="FT", league=self.league, home_team=self.team_home,
+                away_team=self.team_away, home_goals=2, away_goals=1
+            )
+
+        with patch.object(Regrader, 'CHUNK_SIZE', 1):
+            report = Regrader(workers=2).run()
+
+        self.assertEqual(report['legs_checked'], 2)
+        self.assertEqual(report['legs_skipped_manual'], 1)
+        self.assertEqual([(c['leg_id'], c['old'], c['new']) for c in report['leg_changes']], [(wrong_leg.id, 'lost', 'won')])
+        self.assertEqual([(c['old'], c['new']) for c in report['tip_changes']], [('lost', 'won')])
+        self.assertEqual(report['tipster_deltas'][0]['before'], 0.0)
+        self.assertEqual(report['tipster_deltas'][0]['after'], 100.0)
+
+        # Dry run writes nothing
+        wrong_leg.refresh_from_db()
+        self.assertFalse(wrong_leg.is_won)
+
+        call_command('regrade', '--apply', '--workers', '1', stdout=io.StringIO())
+
+        wrong_leg.refresh_from_db()
+        manual_leg.refresh_from_db()
+        tip.refresh_from_db()
+        self.assertTrue(wrong_leg.is_won)
+        self.assertEqual(manual_leg.actual_result, "Manual Win")
+        self.assertTrue(tip.is_won)
+        self.assertEqual(tip.odds, Decimal("3.00"))
+
+
+class MarketSpecTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        self.tipster = User.objects.create_user(username='spec_tipster', password='password123')
+        self.tip = Tip.objects.create(
+            tipster=self.tipster,
+            bet_code="SPECS",
+            odds=Decimal("1.90"),
+            status="active",
+            expires_at=timezone.now() + timedelta(hours=2)
+        )
+
+    def test_spec_compiled_on_create_and_edit(self):
+        match = TipMatch.objects.create(
+            tip=self.tip,
+            home_team="Arsenal",
+            away_team="Chelsea",
+            market="Total Goals Over 2.5",
+            selection="+2.5",
+            odds=Decimal("1.90"),
+            match_date=timezone.now()
+        )
+        match.refresh_from_db()
+        self.assertEqual(match.market_spec['kind'], 'over_under')
+        self.assertEqual(match.market_spec['side'], 'over')
+        self.assertEqual(match.market_spec['line'], 2.5)
+
+        match.market = "1X2"
+        match.selection = "Chelsea"
+        match.save(update_fields=['market', 'selection'])
+        match.refresh_from_db()
+        self.assertEqual(match.market_spec['kind'], 'result')
+        self.assertEqual(match.market_spec['outcomes'], ['A'])
+        self.assertEqual(match.market_spec['team'], 'away')
+
+    def test_team_reference_and_handicap_specs(self):
+        spec = compile_market("Asian Handicap", "Chelsea [-1.5]", "Arsenal", "Chelsea")
+        self.assertEqual((spec['kind'], spec['side'], spec['line']), ('handicap', 'A', -1.5))
+        self.assertTrue(evaluate_spec(spec, 0, 2))
+        self.assertFalse(evaluate_spec(spec, 1, 2))
+
+    def test_draw_no_bet_falls_through_when_side_unknown(self):
+        spec = compile_market("DNB / BTTS", "Yes")
+        self.assertEqual(spec['kind'], 'draw_no_bet')
+        self.assertEqual(evaluate_spec(spec, 1, 1), 'void')
+        self.assertTrue(evaluate_spec(spec, 2, 1))
+        self.assertFalse(evaluate_spec(spec, 2, 0))
+
+    def test_grade_scores_bulk(self):
+        spec = compile_market("Both Teams to Score", "No")
+        self.assertEqual(
+            grade_scores(spec, [2, 1, 0, None], [0, 1, 0, 3]),
+            [True, False, True, False]
+        )
+
+
+SCORE_DATA_PAGE = """<html><body><div class="nav"><span>18:00</span>Nav - Link</div>
+<div id="score-data"><h4>England - Premier League<a href="/standings/1">Standings</a></h4>
+<span>FT</span>Arsenal - Chelsea<a href="/match/1" class="fin">2-1</a><br>
+<span><img src="/i.png">67'</span>Brighton &amp; Hove - Liverpool<a href="/match/2" class="live">0-0</a><br>
+<span>18:00</span>Everton - Fulham<a href="/match/3" class="sched">-</a><br>
+<div class="ad"><span>1</span>Sponsored - Row<a class="fin">1-1</a></div>
+<h4>Spain - LaLiga</h4><span>20:00</span>Real Madrid - Barcelona<span>21:00</span>Betis - Sevilla<a href="/match/5" class="fin">3-3</a>
+<span>22:00</span>Valencia - Girona</div>
+<div><span>FT</span>After - Block<a class="fin">1-0</a></div></body></html>"""
+
+
+class LivescoreParserTests(TestCase):
+    def test_stream_parser_matches_soup_parser(self):
+        expected = LivescoreCzScraper(parser='soup').parse_html(SCORE_DATA_PAGE)
+        self.assertEqual(len(expected), 6)
+
+        stream = LivescoreCzScraper(parser='stream')
+        self.assertEqual(stream.parse_html(SCORE_DATA_PAGE), expected)
+
+        # Same result when tags and text are split across fed chunks
+        with patch.object(LivescoreCzScraper, 'STREAM_CHUNK_SIZE', 7):
+            self.assertEqual(list(stream.iter_matches(SCORE_DATA_PAGE)), expected)
+
+        self.assertEqual(expected[1]['home_team'], 'Brighton & Hove')
+        self.assertEqual((expected[0]['status'], expected[0]['home_goals']), ('finished', 2))
+        self.assertEqual(expected[5]['score'], '-')
+
+    def test_parity_on_saved_page(self):
+        path = os.path.join(settings.BASE_DIR, 'legacy_archive', 'livescore.html')
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        self.assertEqual(
+            LivescoreCzScraper(parser='stream').parse_html(html),
+            LivescoreCzScraper(parser='soup').parse_html(html)
+        )
+
+    def test_parser_setting(self):
+        with self.settings(LIVESCORE_PARSER='soup'):
+            self.assertEqual(LivescoreCzScraper().parser, 'soup')
+        with self.assertRaises(ValueError):
+            LivescoreCzScraper(parser='regex')
+
+    def _response(self, status_code=200, body=SCORE_DATA_PAGE, headers=None):
+        response = MagicMock(status_code=status_code, content=body.encode('utf-8'), headers=headers or {})
+        response.raise_for_status.return_value = None
+        return response
+
+    @patch('apps.tips.services.livescore_cz_scraper.get_session')
+    def test_conditional_fetch_reuses_parsed_page(self, mock_get_session):
+        from apps.tips.services import livescore_cz_scraper
+
+        session = mock_get_session.return_value
+        session.get.side_effect = [
+            self._response(headers={'ETag': '"v1"'}),
+            self._response(status_code=304, body=''),
+        ]
+        scraper = LivescoreCzScraper(parser='stream')
+
+        with patch.dict(livescore_cz_scraper._responses, clear=True), \
+                patch.object(scraper, 'parse_html', wraps=scraper.parse_html) as parse:
+            first = scraper.fetch_scores(day_offset=-1, status_filter='finished')
+            expected = [dict(match) for match in first]
+            first[0]['home_team'] = 'Changed by the caller'
+            second = scraper.fetch_scores(day_offset=-1, status_filter='finished')
+
+        self.assertEqual(len(first), 6)
+        # Callers get copies: the cached page is untouched
+        self.assertEqual(second, expected)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+    @patch('apps.tips.services.livescore_cz_scraper.get_session')
+    def test_fetch_changes_emits_only_changed_rows(self, mock_get_session):
+        from apps.tips.services import livescore_cz_scraper
+
+        updated_page = SCORE_DATA_PAGE.replace('class="live">0-0', 'class="live">1-0')
+        mock_get_session.return_value.get.side_effect = [
+            self._response(),
+            self._response(),
+            self._response(body=updated_page),
+            self._response(body=updated_page),
+            Exception("timeout"),
+        ]
+
+        # Snapshots are shared: each call may come from a new scraper
+        with patch.dict(livescore_cz_scraper._responses, clear=True), \
+                patch.dict(livescore_cz_scraper._snapshots, clear=True):
+            self.assertEqual(len(LivescoreCzScraper(parser='stream').fetch_changes()), 6)
+            self.assertEqual(LivescoreCzScraper(parser='stream').fetch_changes(), [])
+            changed = LivescoreCzScraper(parser='stream').fetch_changes()
+            # Another consumer still gets every row it hasn't seen
+            self.assertEqual(len(LivescoreCzScraper(parser='stream').fetch_changes(consumer='other')), 6)
+            self.assertEqual(LivescoreCzScraper(parser='stream').fetch_changes(), [])
+
+        self.assertEqual([(m['home_team'], m['score']) for m in changed], [('Brighton & Hove', '1-0')])
+
+    @patch('apps.tips.services.livescore_cz_scraper.get_session')
+    def test_fetch_many_fetches_each_day(self, mock_get_session):
+        from apps.tips.services import livescore_cz_scraper
+
+        mock_get_session.return_value.get.side_effect = lambda url, **kwargs: self._response()
+        scraper = LivescoreCzScraper(parser='stream')
+
+        with patch.dict(livescore_cz_scraper._responses, clear=True):
+            results = scraper.fetch_many([-1, 0, 1], status_filter='finished')
+
+        self.assertEqual(sorted(results), [-1, 0, 1])
+        self.assertTrue(all(len(matches) == 6 for matches in results.values()))
+
+
+class AsyncBetslipSubmissionTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.user = get_user_model().objects.create_user(
+            username='asynctipster', phone_number='+254700000077', password='password'
+        )
+        self.client.force_login(self.user)
+
+    def _submit(self, bet_code='ASYNC1'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        image = io.BytesIO()
+        Image.new('RGB', (40, 80), 'white').save(image, format='PNG')
+        with patch('apps.tips.task_queue.enqueue_task') as mock_enqueue:
+            response = self.client.post('/tips/create/', {
+                'bookmaker': 'sportpesa',
+                'bet_code': bet_code,
+                'screenshot': SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png'),
+            })
+        return response, mock_enqueue
+
+    def _extraction(self, match_date='23/07/30'):
+        return {
+            'success': True,
+            'confidence': 95.0,
+            'data': {
+                'total_odds': 3.0,
+                'matches': [
+                    {'home_team': 'Team A', 'away_team': 'Team B', 'market': '1X2', 'selection': 'Home',
+                     'odds': 1.5, 'match_date': match_date, 'match_time': '18:00'},
+                    {'home_team': 'Team C', 'away_team': 'Team D', 'market': '1X2', 'selection': 'Away',
+                     'odds': 2.0, 'match_date': match_date, 'match_time': '20:00'},
+                ],
+            },
+        }
+
+    def test_submission_queues_extraction_and_returns_immediately(self):
+        from apps.tips.background_tasks import process_betslip_async
+
+        response, mock_enqueue = self._submit()
+
+        tip = Tip.objects.get(bet_code='ASYNC1')
+        self.assertRedirects(response, f'/tips/processing/{tip.id}/', fetch_redirect_response=False)
+        self.assertEqual(tip.processing_status, 'pending')
+        self.assertEqual(tip.status, 'draft')
+        self.assertFalse(tip.matches.exists())
+        mock_enqueue.assert_called_once_with(process_betslip_async, tip.id, enrich=False, task_type='extraction')
+
+        # Polls get just the progress fragment while extraction is pending
+        response = self.client.get(f'/tips/processing/{tip.id}/', HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'tips/partials/processing_progress.html')
+        self.assertTemplateNotUsed(response, 'tips/processing_status.html')
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+        with patch('apps.tips.background_tasks.process_betslip_image', return_value=self._extraction()) as mock_extract:
+            process_betslip_async(tip.id, enrich=False)
+
+        # The task compressed the raw upload and handed the model input over from the same decode
+        self.assertTrue(mock_extract.call_args.kwargs['model_input'][0].startswith(b'\xff\xd8'))
+
+        tip.refresh_from_db()
+        self.assertTrue(tip.screenshot.name.endswith('.webp'))
+        self.assertEqual(tip.processing_status, 'completed')
+        self.assertTrue(tip.ocr_processed)
+        self.assertEqual(tip.odds, Decimal('3.00'))
+        self.assertEqual(tip.matches.count(), 2)
+        self.assertEqual(tip.preview_data['total_matches'], 2)
+
+        response = self.client.get(f'/tips/processing/{tip.id}/', HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['HX-Redirect'], f'/tips/verify/{tip.id}/')
+
+    def test_rejected_slip_fails_and_frees_bet_code(self):
+        from apps.tips.background_tasks import INVALID_DATES_MESSAGE, process_betslip_async
+
+        self._submit()
+        tip = Tip.objects.get(bet_code='ASYNC1')
+
+        with patch('apps.tips.background_tasks.process_betslip_image', return_value=self._extraction(match_date='')):
+            process_betslip_async(tip.id, enrich=False)
+
+        tip.refresh_from_db()
+        self.assertEqual(tip.processing_status, 'failed')
+        self.assertEqual(tip.processing_error, INVALID_DATES_MESSAGE)
+        self.assertFalse(tip.matches.exists())
+
+        response = self.client.get(f'/tips/processing/{tip.id}/', HTTP_HX_REQUEST='true')
+        self.assertNotContains(response, 'hx-trigger')
+        self.assertContains(response, 'missing match kickoff dates')
+
+        # Resubmitting the same code replaces the failed draft
+        response, mock_enqueue = self._submit()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Tip.objects.filter(id=tip.id).exists())
+        self.assertEqual(Tip.objects.filter(bet_code='ASYNC1').count(), 1)
+
+    @override_settings(GEMINI_RPM=60000)
+    def test_transient_errors_are_retried_by_the_queue(self):
+        import httpx
+        from apps.tips.background_tasks import process_betslip_async
+        from apps.tips.models import QueuedTask
+        from apps.tips.task_queue import DatabaseTaskQueue
+
+        self._submit()
+        tip = Tip.objects.get(bet_code='ASYNC1')
+        task_queue = DatabaseTaskQueue(max_attempts=2)
+        task_queue.enqueue(process_betslip_async, tip.id, enrich=False, task_type='extraction')
+
+        # Every Gemini model unreachable: the extractor reports it as retryable
+        with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+            mock_get_client.return_value.models.generate_content.side_effect = httpx.ConnectError('Gemini unreachable')
+            task_queue.run_pending()
+
+        # Left to the retry: the tip isn't failed, but keeps its compressed screenshot
+        task = QueuedTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('queued', 1))
+        self.assertIn('Gemini unreachable', task.last_error)
+        tip.refresh_from_db()
+        self.assertEqual(tip.processing_status, 'processing')
+        self.assertTrue(tip.screenshot_compressed)
+        self.assertTrue(tip.screenshot.storage.exists(tip.screenshot.name))
+
+        # The last attempt reports the failure on the tip instead of raising
+        QueuedTask.objects.update(run_after=timezone.now())
+        with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+            mock_get_client.return_value.models.generate_content.side_effect = httpx.ConnectError('Gemini unreachable')
+            task_queue.run_pending()
+        task.refresh_from_db()
+        tip.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('succeeded', 2))
+        self.assertEqual(tip.processing_status, 'failed')
+        self.assertIn('Gemini unreachable', tip.processing_error)
+
+    def test_extractor_flags_passing_failures_as_retryable(self):
+        from google.genai import errors
+        from apps.tips.betslip_extractor import RATE_LIMIT_MESSAGE, extract_betslip_turbo
+
+        def extract(error):
+            with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+                mock_get_client.return_value.models.generate_content.side_effect = error
+                return extract_betslip_turbo(b'', model_input=b'jpeg')
+
+        with override_settings(GEMINI_RPM=60000):
+            # A response the schema can't parse won't parse any better later
+            self.assertFalse(extract(ValueError('Expecting value'))['retryable'])
+            self.assertEqual(
+                extract(Exception('429 RESOURCE_EXHAUSTED')),
+                {'success': False, 'error': RATE_LIMIT_MESSAGE, 'retryable': True}
+            )
+            self.assertTrue(extract(errors.ServerError(503, {'error': {'message': 'overloaded'}}))['retryable'])
+            self.assertTrue(extract(TimeoutError('read timed out'))['retryable'])
+
+    def test_rejected_slip_is_not_retried(self):
+        from apps.tips.background_tasks import INVALID_DATES_MESSAGE, process_betslip_async
+        from apps.tips.models import QueuedTask
+        from apps.tips.task_queue import DatabaseTaskQueue
+
+        self._submit()
+        tip = Tip.objects.get(bet_code='ASYNC1')
+        task_queue = DatabaseTaskQueue(max_attempts=3)
+        task_queue.enqueue(process_betslip_async, tip.id, enrich=False, task_type='extraction')
+
+        with patch('apps.tips.background_tasks.process_betslip_image', return_value=self._extraction(match_date='')):
+            task_queue.run_pending()
+
+        self.assertEqual(QueuedTask.objects.get().status, 'succeeded')
+        tip.refresh_from_db()
+        self.assertEqual((tip.processing_status, tip.processing_error), ('failed', INVALID_DATES_MESSAGE))
+
+    def test_failed_draft_of_another_tipster_is_left_alone(self):
+        from django.contrib.auth import get_user_model
+
+        other = get_user_model().objects.create_user(
+            username='othertipster', phone_number='+254700000083', password='password'
+        )
+        draft = Tip.objects.create(
+            tipster=other, bet_code='ASYNC1', odds=Decimal('1.00'), expires_at=timezone.now(),
+            status='draft', processing_status='failed'
+        )
+
+        response, mock_enqueue = self._submit()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'A tip with this bet code already exists')
+        mock_enqueue.assert_not_called()
+        self.assertTrue(Tip.objects.filter(id=draft.id).exists())
+
+        # An invalid submission doesn't release the tipster's own failed draft either
+        draft.tipster = self.user
+        draft.save(update_fields=['tipster'])
+        self.client.post('/tips/create/', {'bookmaker': 'sportpesa', 'bet_code': 'ASYNC1'})
+        self.assertTrue(Tip.objects.filter(id=draft.id).exists())
+
+
+class DatabaseTaskQueueTests(TestCase):
+    def setUp(self):
+        from apps.tips.task_queue import DatabaseTaskQueue
+        EXECUTED_TASKS.clear()
+        self.queue = DatabaseTaskQueue(visibility_timeout=60, max_attempts=2, retry_backoff=10)
+
+    def test_enqueued_task_is_persisted_and_executed_by_worker(self):
+        from apps.tips.models import QueuedTask
+
+        task_id = self.queue.enqueue(record_task, 7, label='slip', callback=record_task_outcome)
+
+        task = QueuedTask.objects.get()
+        self.assertEqual(task_id, f'task_{task.id}')
+        self.assertEqual(task.func_path, 'apps.tips.tests.record_task')
+        self.assertEqual((task.args, task.kwargs), ([7], {'label': 'slip'}))
+        self.assertEqual(EXECUTED_TASKS, [])
+
+        self.assertEqual(self.queue.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'succeeded')
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNone(task.locked_until)
+        self.assertEqual(EXECUTED_TASKS, [(7, 'slip'), (task_id, 7, None)])
+        self.assertTrue(self.queue.is_empty())
+
+    def test_failed_task_backs_off_then_is_dead_lettered(self):
+        from apps.tips.models import QueuedTask
+
+        task_id = self.queue.enqueue(failing_task, callback=record_task_outcome)
+        before = timezone.now()
+        self.queue.run_pending()
+
+        task = QueuedTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('queued', 1))
+        self.assertIn('upstream unavailable', task.last_error)
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=10))
+
+        # Not due again until the backoff has elapsed
+        self.assertEqual(self.queue.run_pending(), 0)
+
+        QueuedTask.objects.update(run_after=timezone.now())
+        self.queue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('dead', 2))
+        self.assertIsNotNone(task.finished_at)
+        self.assertEqual(EXECUTED_TASKS, [(task_id, None, 'upstream unavailable')])
+        self.assertEqual(self.queue.run_pending(), 0)
+
+    def test_expired_lease_backs_off_then_is_dead_lettered(self):
+        from apps.tips.models import QueuedTask
+
+        task_id = self.queue.enqueue(record_task, 1, callback=record_task_outcome)
+        task = self.queue.claim('crashed-worker')
+        self.assertIsNone(self.queue.claim('other-worker'))
+
+        # The first worker died mid-task: its lease runs out and the attempt counts as failed
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        before = timezone.now()
+        self.assertIsNone(self.queue.claim('other-worker'))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.locked_by), ('queued', 1, ''))
+        self.assertIn('crashed-worker', task.last_error)
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=10))
+
+        QueuedTask.objects.update(run_after=timezone.now())
+        reclaimed = self.queue.claim('other-worker')
+        self.assertEqual((reclaimed.id, reclaimed.attempts, reclaimed.locked_by), (task.id, 2, 'other-worker'))
+
+        # Killed again on its last attempt: dead-lettered instead of run a third time
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(self.queue.claim('third-worker'))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('dead', 2))
+        self.assertIsNotNone(task.finished_at)
+        self.assertEqual(len(EXECUTED_TASKS), 1)
+        self.assertEqual(EXECUTED_TASKS[0][:2], (task_id, None))
+        self.assertIn('expired', EXECUTED_TASKS[0][2])
+
+    def test_lease_is_renewed_while_the_task_runs(self):
+        from apps.tips.models import QueuedTask
+
+        self.queue.enqueue(record_task, 1)
+        task = self.queue.claim('busy-worker')
+        QueuedTask.objects.update(locked_until=timezone.now() + timedelta(seconds=5))
+
+        # Two heartbeats, then the task finishes
+        stop = MagicMock()
+        stop.wait.side_effect = [False, False, True]
+        with patch('django.db.connection'):
+            self.queue._renew_lease(task, stop)
+
+        stop.wait.assert_called_with(20)
+        task.refresh_from_db()
+        self.assertGreater(task.locked_until, timezone.now() + timedelta(seconds=55))
+
+        # A lease another worker took over isn't renewed
+        QueuedTask.objects.update(locked_by='other-worker', locked_until=timezone.now())
+        stop.wait.side_effect = [False, False, True]
+        with patch('django.db.connection'):
+            self.queue._renew_lease(task, stop)
+        self.assertLess(QueuedTask.objects.get().locked_until, timezone.now())
+        self.assertEqual(stop.wait.call_count, 4)
+
+    def test_only_importable_functions_can_be_queued(self):
+        with self.assertRaises(ValueError):
+            self.queue.enqueue(lambda: None)
+
+    @override_settings(TASK_QUEUE_TYPES={
+        'extraction': {'priority': 30, 'concurrency': 1},
+        'default': {'priority': 10, 'concurrency': None},
+    })
+    def test_claims_follow_priority_and_type_caps(self):
+        self.queue.enqueue(record_task, 'background')
+        self.queue.enqueue(record_task, 'slip-1', task_type='extraction')
+        self.queue.enqueue(record_task, 'slip-2', task_type='extraction')
+
+        first = self.queue.claim('worker-1')
+        self.assertEqual(first.args, ['slip-1'])
+
+        # Extraction is at its cap of 1, so the next worker gets the lower priority task
+        second = self.queue.claim('worker-2')
+        self.assertEqual(second.args, ['background'])
+        self.assertIsNone(self.queue.claim('worker-3'))
+
+        self.queue.execute(first)
+        self.assertEqual(self.queue.claim('worker-3').args, ['slip-2'])
+
+        with self.assertRaises(ValueError):
+            self.queue.enqueue(record_task, 1, task_type='unknown')
+
+    def test_metrics_per_task_type(self):
+        from django.contrib.auth import get_user_model
+
+        self.queue.enqueue(record_task, 1, task_type='grading')
+        self.queue.enqueue(failing_task, task_type='grading')
+        self.queue.enqueue(record_task, 2, task_type='extraction')
+        self.queue.run_pending()
+
+        metrics = self.queue.metrics(window_minutes=60)
+        by_type = {row['type']: row for row in metrics['types']}
+        self.assertEqual(by_type['extraction']['succeeded'], 1)
+        self.assertEqual(by_type['grading']['succeeded'], 1)
+        self.assertEqual((by_type['grading']['queued'], by_type['grading']['retrying']), (1, 1))
+        self.assertIsNotNone(by_type['grading']['run_seconds']['avg'])
+        self.assertEqual(by_type['notifications']['queued'], 0)
+
+        staff = get_user_model().objects.create_user(
+            username='queuestaff', phone_number='+254700000088', password='password', is_staff=True, is_superuser=True
+        )
+        self.client.force_login(staff)
+        with patch('apps.tips.task_queue.get_task_queue', return_value=self.queue):
+            response = self.client.get('/tips/task-queue/metrics/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['backend'], 'database')
+
+            response = self.client.get('/admin/tips/queuedtask/metrics/')
+            self.assertContains(response, 'extraction')
+
+
+@override_settings(IMAGE_PROCESS_WORKERS=0)
+class ImageProcessingTests(TemporaryMediaRootMixin, TestCase):
+    def _encode(self, image, fmt):
+        buffer = io.BytesIO()
+        image.save(buffer, format=fmt)
+        return buffer.getvalue()
+
+    def test_screenshot_yields_archive_and_model_input_from_one_decode(self):
+        from PIL import Image
+        from apps.tips.image_processing import _decode, process_screenshot
+
+        data = self._encode(Image.new('RGB', (4320, 2160), 'white'), 'JPEG')
+
+        # JPEGs are decoded at reduced size, just large enough for the archive
+        decoded, target = _decode(data, 'RGB', max_width=1080)
+        self.assertEqual(decoded.size, (1080, 540))
+        self.assertEqual(target, (1080, 540))
+
+        result = process_screenshot(data)
+        archive = Image.open(io.BytesIO(result['archive']))
+        model_input = Image.open(io.BytesIO(result['model_input'][0]))
+        self.assertEqual((archive.format, archive.size), ('WEBP', (1080, 540)))
+        self.assertEqual((model_input.format, model_input.mode, model_input.size), ('JPEG', 'L', (800, 400)))
+
+    def test_transparent_screenshot_is_flattened_onto_white(self):
+        from PIL import Image
+        from apps.tips.image_processing import model_input_jpeg, process_screenshot
+
+        data = self._encode(Image.new('RGBA', (300, 600), (0, 0, 0, 0)), 'PNG')
+
+        archive = Image.open(io.BytesIO(process_screenshot(data)['archive']))
+        self.assertEqual((archive.size, archive.convert('RGB').getpixel((10, 10))), ((300, 600), (255, 255, 255)))
+        self.assertGreater(Image.open(io.BytesIO(model_input_jpeg(data))).getpixel((10, 10)), 250)
+
+    def _create_tip(self, width=800, height=1600):
+        from PIL import Image
+        from django.contrib.auth import get_user_model
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        tipster = get_user_model().objects.create_user(
+            username='imagetipster', phone_number='+254700000099', password='password'
+        )
+        upload = SimpleUploadedFile('slip.png', self._encode(Image.new('RGB', (width, height), 'white'), 'PNG'))
+        return Tip.objects.create(
+            tipster=tipster, bookmaker='sportpesa', bet_code='IMG1', odds=Decimal('2.00'),
+            expires_at=timezone.now() + timedelta(days=1), screenshot=upload
+        )
+
+    def test_compression_is_persisted_and_happens_once(self):
+        tip = self._create_tip()
+
+        self.assertTrue(tip.screenshot_compressed)
+        self.assertTrue(tip.screenshot.name.endswith('.webp'))
+        self.assertEqual(sorted(tip.screenshot_variants, key=int), ['320', '640', '800'])
+        self.assertIn('320w', tip.screenshot_srcset)
+        self.assertTrue(tip.screenshot_card_url.endswith('_320w.webp'))
+
+        # Fresh loads and saves (approve_tip, admin edits, auto-archiving) don't re-encode
+        fresh = Tip.objects.get(id=tip.id)
+        with patch('apps.tips.image_processing.process_screenshot') as mock_process:
+            fresh.status = 'active'
+            fresh.save()
+            fresh.auto_archive_if_expired()
+        mock_process.assert_not_called()
+        self.assertEqual(Tip.objects.get(id=tip.id).screenshot.name, tip.screenshot.name)
+
+    @override_settings(IMAGE_PROCESS_WORKERS=1)
+    def test_image_jobs_use_the_pool_only_in_the_task_worker(self):
+        from apps.tips import image_processing
+
+        pool = MagicMock()
+        pool.submit.return_value.result.return_value = 'from the pool'
+        with patch.object(image_processing, '_get_pool', return_value=pool):
+            self.assertEqual(image_processing.run_image_job(str.upper, 'inline'), 'INLINE')
+            pool.submit.assert_not_called()
+
+            with patch.object(image_processing, '_pool_enabled', True):
+                self.assertEqual(image_processing.run_image_job(str.upper, 'inline'), 'from the pool')
+
+    @override_settings(IMAGE_PROCESS_WORKERS=1)
+    def test_timed_out_image_job_is_cancelled_and_run_inline(self):
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        from apps.tips import image_processing
+
+        pool = MagicMock()
+        future = pool.submit.return_value
+        future.result.side_effect = FutureTimeoutError()
+        with patch.object(image_processing, '_pool_enabled', True), \
+                patch.object(image_processing, '_get_pool', return_value=pool), \
+                patch.object(image_processing, 'shutdown_pool') as mock_shutdown:
+            self.assertEqual(image_processing.run_image_job(str.upper, 'slow'), 'SLOW')
+
+        future.cancel.assert_called_once()
+        mock_shutdown.assert_called_once()
+
+    def test_backfill_adds_variants_without_reencoding_archive(self):
+        from django.core.management import call_command
+
+        tip = self._create_tip(width=500)
+        Tip.objects.filter(id=tip.id).update(screenshot_variants={})
+
+        call_command('backfill_screenshot_variants', stdout=io.StringIO())
+
+        backfilled = Tip.objects.get(id=tip.id)
+        self.assertEqual(backfilled.screenshot.name, tip.screenshot.name)
+        self.assertEqual(sorted(backfilled.screenshot_variants, key=int), ['320', '500'])
+
+
+    def _phone_slip(self, legs=12):
+        """A 1080px wide phone screenshot: status bar, slip legs, blank space below"""
+        from PIL import Image, ImageDraw
+
+        image = Image.new('RGB', (1080, 400 + legs * 220), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, 1080, 70), fill=(20, 20, 20))
+        draw.rectangle((40, 20, 140, 50), fill='white')
+        for leg in range(legs):
+            top = 120 + leg * 220
+            for line, width in enumerate((700, 300, 500)):
+                draw.rectangle((30, top + line * 50, 30 + width, top + line * 50 + 30), fill=(40, 40, 40))
+            draw.rectangle((950, top + 100, 1040, top + 130), fill=(40, 40, 40))
+        return image
+
+    def test_model_input_is_cropped_to_content_and_tall_slips_tiled(self):
+        from PIL import Image
+        from apps.tips.image_processing import MODEL_TILE_WIDTH, content_box, model_input_tiles
+
+        slip = self._phone_slip()
+        left, top, right, bottom = content_box(slip.convert('L'))
+        # Status bar and the blank space under the last leg are dropped
+        # (within the 2px precision of detecting at half resolution)
+        self.assertAlmostEqual(top, 120 - 8, delta=2)
+        self.assertAlmostEqual(bottom, 120 + 11 * 220 + 130 + 8, delta=4)
+        self.assertAlmostEqual(left, 30 - 8, delta=2)
+        self.assertAlmostEqual(right, 1040 + 8, delta=4)
+
+        tiles = [Image.open(io.BytesIO(tile)) for tile in model_input_tiles(self._encode(slip, 'PNG'))]
+        self.assertEqual(len(tiles), 2)
+        self.assertTrue(all(tile.width == MODEL_TILE_WIDTH and tile.height <= 800 for tile in tiles))
+        # Cuts fall between legs, not through their text
+        for tile in tiles[:-1]:
+            self.assertGreater(min(tile.crop((0, tile.height - 2, tile.width, tile.height)).getdata()), 200)
+
+        # Short slips stay a single image
+        self.assertEqual(len(model_input_tiles(self._encode(self._phone_slip(legs=2), 'PNG'))), 1)
+
+    def test_tiles_are_sent_in_one_request(self):
+        from apps.tips.betslip_extractor import extract_betslip_turbo
+
+        response = MagicMock(parsed=None)
+        response.text = json.dumps({'is_placed_slip': True, 'matches': [], 'summary': {'total_odds': 1.0}})
+        with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+            mock_client = mock_get_client.return_value
+            mock_client.models.generate_content.return_value = response
+            extract_betslip_turbo(b'', model_input=[b'top', b'bottom'])
+
+        contents = mock_client.models.generate_content.call_args.kwargs['contents']
+        self.assertEqual(len(contents), 3)
+        self.assertIn('split into 2 images', contents[0])
+
+
+@override_settings(IMAGE_PROCESS_WORKERS=0, BETSLIP_ASYNC_EXTRACTION=False)
+class ExtractionCacheTests(TemporaryMediaRootMixin, TestCase):
+    def _slip(self, seed, size=(540, 1080)):
+        """A slip-like screenshot: text-ish bars on a white background"""
+        import random
+        from PIL import Image, ImageDraw
+
+        rng = random.Random(seed)
+        image = Image.new('RGB', (540, 1080), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, 540, 120), fill=(0, 120, 60))
+        for top in range(150, 1050, 45):
+            left = 20
+            while left < 500:
+                width = rng.randint(10, 60)
+                draw.rectangle((left, top, left + width, top + 20), fill=(30, 30, 30))
+                left += width + rng.randint(8, 20)
+        if size != image.size:
+            image = image.resize(size)
+        return image
+
+    def _png(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def _user(self, suffix):
+        from django.contrib.auth import get_user_model
+        return get_user_model().objects.create_user(
+            username=f'cachetipster{suffix}', phone_number=f'+2547000001{suffix}', password='password'
+        )
+
+    def _submit(self, user, bet_code, image):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.force_login(user)
+        return self.client.post('/tips/create/', {
+            'bookmaker': 'sportpesa',
+            'bet_code': bet_code,
+            'screenshot': SimpleUploadedFile('slip.png', self._png(image), content_type='image/png'),
+        })
+
+    def _extraction(self, match_date='23/07/30'):
+        return {
+            'success': True,
+            'confidence': 95.0,
+            'data': {
+                'total_odds': 1.5,
+                'matches': [
+                    {'home_team': 'Team A', 'away_team': 'Team B', 'market': '1X2', 'selection': 'Home',
+                     'odds': 1.5, 'match_date': match_date, 'match_time': '18:00'},
+                ],
+            },
+        }
+
+    def test_perceptual_hash_tolerates_reencoding_not_other_slips(self):
+        from apps.tips.image_processing import hash_distance, perceptual_hash
+
+        original = perceptual_hash(self._png(self._slip(1)))
+        buffer = io.BytesIO()
+        self._slip(1, size=(720, 1440)).save(buffer, format='JPEG', quality=60)
+
+        self.assertEqual(len(original), 512)
+        self.assertLess(hash_distance(original, perceptual_hash(buffer.getvalue())), 0.05)
+        self.assertGreater(hash_distance(original, perceptual_hash(self._png(self._slip(2)))), 0.15)
+
+    def test_synchronous_resubmission_skips_gemini(self):
+        first, second = self._user('01'), self._user('02')
+
+        with patch('apps.tips.background_tasks.process_betslip_image',
+                   return_value=self._extraction(match_date='')) as mock_extract:
+            response = self._submit(first, 'CACHE1', self._slip(1))
+            self.assertContains(response, 'missing match kickoff dates')
+
+        # A rejected extraction isn't cached: the re-upload is extracted again and accepted
+        with patch('apps.tips.background_tasks.process_betslip_image', return_value=self._extraction()) as mock_extract:
+            response = self._submit(first, 'CACHE1', self._slip(1, size=(720, 1440)))
+        self.assertEqual(mock_extract.call_count, 1)
+        self.assertTrue(Tip.objects.filter(bet_code='CACHE1', processing_status='completed').exists())
+
+        with patch('apps.tips.background_tasks.process_betslip_image', return_value=self._extraction()) as mock_extract:
+            self._submit(first, 'CACHE2', self._slip(2))
+
+            # Identical bytes match for anyone; a lookalike needs the same tipster and bet code
+            self._submit(second, 'CACHE3', self._slip(2))
+            self._submit(second, 'CACHE4', self._slip(2, size=(720, 1440)))
+        self.assertEqual(mock_extract.call_count, 2)
+        self.assertEqual(Tip.objects.filter(bet_code__in=['CACHE2', 'CACHE3', 'CACHE4']).count(), 3)
+        self.assertTrue(Tip.objects.get(bet_code='CACHE3').screenshot_hash)
+
+    def test_expired_entries_are_ignored_and_purged(self):
+        from apps.tips.models import ExtractionCacheEntry
+        from apps.tips.services import ExtractionCache
+
+        cache = ExtractionCache(ttl_days=7)
+        cache.store(self._extraction(), content_md5='a' * 32)
+        ExtractionCacheEntry.objects.update(created_at=timezone.now() - timedelta(days=8))
+
+        self.assertIsNone(cache.lookup('a' * 32))
+        cache.store({'success': False}, content_md5='b' * 32)
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 1)
+        cache.store(self._extraction(), content_md5='b' * 32)
+        self.assertEqual(list(ExtractionCacheEntry.objects.values_list('content_md5', flat=True)), ['b' * 32])
+        self.assertEqual(cache.lookup('b' * 32)['cache_match'], 'exact')
+
+
+@override_settings(GEMINI_RPM=60000)
+class ModelHealthTests(TestCase):
+    SLIP = {'is_placed_slip': True, 'matches': [], 'summary': {'total_odds': 2.0}}
+
+    def setUp(self):
+        from apps.tips.betslip_extractor import FALLBACK_MODELS
+        self.primary, self.backup = FALLBACK_MODELS[:2]
+
+    def _response(self):
+        response = MagicMock(parsed=None)
+        response.text = json.dumps(self.SLIP)
+        return response
+
+    def _extract(self, behaviour):
+        """Run an extraction where behaviour[model] is an exception to raise or seconds to take"""
+        import time
+        from apps.tips.betslip_extractor import extract_betslip_turbo
+
+        called = []
+
+        def generate_content(model, **kwargs):
+            called.append(model)
+            outcome = behaviour.get(model, 0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            time.sleep(outcome)
+            return self._response()
+
+        with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+            mock_client = mock_get_client.return_value
+            mock_client.models.generate_content.side_effect = generate_content
+            result = extract_betslip_turbo(b'', model_input=b'jpeg')
+        return result, called
+
+    def test_exhausted_model_is_skipped_until_quota_resets(self):
+        from apps.tips.model_health import ModelHealth
+
+        quota_error = Exception("429 RESOURCE_EXHAUSTED. Please retry in 37.5s.")
+        result, called = self._extract({self.primary: quota_error})
+        self.assertTrue(result['success'])
+        self.assertEqual(called, [self.primary, self.backup])
+
+        # Later uploads go straight to the healthy model
+        result, called = self._extract({self.primary: quota_error})
+        self.assertEqual(called, [self.backup])
+
+        snapshot = {row['model']: row for row in ModelHealth().snapshot([self.primary])}
+        self.assertEqual(snapshot[self.primary]['status'], 'open')
+        self.assertEqual(snapshot[self.primary]['reason'], 'quota')
+        self.assertAlmostEqual(snapshot[self.primary]['reopens_in'], 37, delta=2)
+
+    def test_breaker_opens_after_errors_and_half_open_probe_closes_it(self):
+        from apps.tips.model_health import ModelHealth
+
+        health = ModelHealth(failure_threshold=2, cooldown=30)
+        health.record_failure(self.primary, '500 INTERNAL')
+        self.assertEqual(health.status(self.primary), 'closed')
+        health.record_failure(self.primary, '500 INTERNAL')
+        self.assertEqual(health.available_models([self.primary, self.backup]), [self.backup])
+
+        # Once the cooldown is over a single caller gets to probe the model
+        state = health.state(self.primary)
+        state['open_until'] -= 60
+        health._set_state(self.primary, state)
+        self.assertEqual(health.available_models([self.primary, self.backup]), [self.primary, self.backup])
+        self.assertEqual(health.available_models([self.primary, self.backup]), [self.backup])
+
+        health.record_success(self.primary, 1.2)
+        self.assertEqual(health.status(self.primary), 'closed')
+        self.assertEqual(health.available_models([self.primary]), [self.primary])
+
+    def test_daily_quota_resets_at_midnight_pacific(self):
+        from datetime import datetime
+        from zoneinfo import ZoneInfo
+        from apps.tips.model_health import quota_reset_delay
+
+        now = datetime(2025, 3, 1, 22, 30, tzinfo=ZoneInfo('America/Los_Angeles')).timestamp()
+        error = "429 RESOURCE_EXHAUSTED quotaId: GenerateRequestsPerDayPerProjectPerModel-FreeTier"
+        self.assertEqual(quota_reset_delay(error, now), 90 * 60)
+        self.assertEqual(quota_reset_delay("'retryDelay': '12s'"), 12)
+
+    @override_settings(GEMINI_HEDGE_REQUESTS=True)
+    def test_slow_request_is_hedged_after_p95(self):
+        from apps.tips.model_health import ModelHealth
+
+        health = ModelHealth()
+        for _ in range(20):
+            health.record_success(self.primary, 0.05)
+        self.assertEqual(health.p95_latency(self.primary), 0.05)
+
+        result, called = self._extract({self.primary: 0.5})
+        self.assertTrue(result['success'])
+        self.assertEqual(called, [self.primary, self.backup])
+
+
+class GeminiLimiterTests(TestCase):
+    def test_slots_are_spaced_at_the_configured_rate_in_arrival_order(self):
+        import time
+        from apps.tips.rate_limit import GeminiLimiter, RateLimitTimeout
+
+        limiter = GeminiLimiter(rpm=600, max_wait=0.35)  # a slot every 0.1s
+        deadline = time.monotonic() + limiter.max_wait
+        starts = []
+        for _ in range(3):
+            _, delay = limiter._reserve_slot('model-a', deadline)
+            starts.append(time.time() + delay)
+
+        # The first caller goes now (its slot had already started), the next
+        # ones one slot apart
+        self.assertLess(starts[1] - starts[0], 0.11)
+        self.assertAlmostEqual(starts[2] - starts[1], 0.1, delta=0.02)
+        # Quotas are per model
+        self.assertLess(limiter._reserve_slot('model-b', deadline)[1], 0.1)
+        with self.assertRaises(RateLimitTimeout):
+            for _ in range(3):
+                limiter._reserve_slot('model-a', deadline)
+
+        with limiter.admit('model-c') as waited:
+            self.assertLess(waited, 0.1)
+        self.assertIsNotNone(limiter.stats('model-c')['wait_seconds']['avg'])
+
+    def test_concurrency_is_capped_and_permits_released(self):
+        from apps.tips.rate_limit import GeminiLimiter, RateLimitTimeout
+
+        limiter = GeminiLimiter(rpm=60000, concurrency=1, max_wait=0.2)
+        with limiter.admit('model-a'):
+            with self.assertRaises(RateLimitTimeout):
+                with limiter.admit('model-b'):
+                    pass
+        with limiter.admit('model-b'):
+            pass
+
+    @override_settings(GEMINI_RPM=60000, GEMINI_MAX_CONCURRENCY=1, GEMINI_MAX_QUEUE_WAIT=0.3)
+    def test_out_of_permits_stops_the_fallback_chain(self):
+        import time
+        from apps.tips.betslip_extractor import BUSY_MESSAGE, FALLBACK_MODELS, extract_betslip_turbo
+        from apps.tips.rate_limit import GeminiLimiter, PermitTimeout
+
+        self.assertGreater(len(FALLBACK_MODELS), 1)
+        limiter = GeminiLimiter()
+        acquire = GeminiLimiter._acquire_permit
+
+        with limiter.admit('other-call'), \
+                patch.object(GeminiLimiter, '_acquire_permit', autospec=True, side_effect=acquire) as mock_acquire, \
+                patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+            started = time.monotonic()
+            result = extract_betslip_turbo(b'', model_input=b'jpeg')
+            elapsed = time.monotonic() - started
+
+        # One wait for the shared permits, not one per fallback model
+        self.assertEqual(result, {'success': False, 'error': BUSY_MESSAGE, 'retryable': True})
+        self.assertEqual(mock_acquire.call_count, 1)
+        self.assertLess(elapsed, 0.3 * 2)
+        mock_get_client.return_value.models.generate_content.assert_not_called()
+
+        # Callers trying several models pass one deadline for all of them
+        with self.assertRaises(PermitTimeout):
+            with limiter.admit('other-call'):
+                with limiter.admit('model-b', deadline=time.monotonic() - 1):
+                    pass
+
+    def test_permit_timeout_gives_the_slot_back(self):
+        from apps.tips.rate_limit import GeminiLimiter, PermitTimeout
+
+        # One slot a minute: a lost slot would leave model-b waiting 60s
+        limiter = GeminiLimiter(rpm=1, concurrency=1, max_wait=0.2)
+        with limiter.admit('model-a'):
+            with self.assertRaises(PermitTimeout):
+                with limiter.admit('model-b'):
+                    pass
+        with limiter.admit('model-b') as waited:
+            self.assertLess(waited, 0.2)
+
+    def test_wait_samples_of_interleaved_calls_are_all_kept(self):
+        from django.core.cache import cache
+        from apps.tips.rate_limit import WAIT_SAMPLES, GeminiLimiter
+
+        limiter = GeminiLimiter(rpm=60000)
+        # Another caller records its wait while this one is writing
+        real_set = cache.set
+        interleaved = []
+
+        def set_after_another_caller(*args, **kwargs):
+            if not interleaved:
+                interleaved.append(True)
+                limiter._record_wait('model-a', 1, 0.5)
+            return real_set(*args, **kwargs)
+
+        with patch('apps.tips.rate_limit.cache.set', side_effect=set_after_another_caller):
+            limiter._record_wait('model-a', 2, 1.5)
+        self.assertEqual(sorted(limiter._recent_waits('model-a')), [0.5, 1.5])
+
+        # Only the latest WAIT_SAMPLES slots count
+        for slot in range(3, WAIT_SAMPLES + 10):
+            limiter._record_wait('model-a', slot, 2.0)
+        self.assertEqual(limiter._recent_waits('model-a'), [2.0] * WAIT_SAMPLES)
+
+    def test_falls_back_to_a_local_limiter_when_the_cache_fails(self):
+        from apps.tips.rate_limit import GeminiLimiter
+
+        limiter = GeminiLimiter(rpm=60000, concurrency=1, max_wait=1)
+        with patch('apps.tips.rate_limit.cache') as mock_cache:
+            mock_cache.get.side_effect = ConnectionError('redis down')
+            with limiter.admit('model-a') as waited:
+                self.assertLess(waited, 1)
+
+    @override_settings(GEMINI_MAX_QUEUE_WAIT=0)
+    def test_full_queue_reports_busy_without_opening_breakers(self):
+        import time
+        from apps.tips.betslip_extractor import BUSY_MESSAGE, FALLBACK_MODELS, extract_betslip_turbo
+        from apps.tips.model_health import ModelHealth
+        from apps.tips.rate_limit import GeminiLimiter
+
+        # Another worker holds every slot until the wait limit; the clock is
+        # frozen so no new slot opens while the test runs
+        with patch('time.time', return_value=time.time()):
+            limiter = GeminiLimiter()
+            for model in FALLBACK_MODELS:
+                with limiter.admit(model):
+                    pass
+
+            with patch('apps.tips.betslip_extractor.get_client') as mock_get_client:
+                mock_client = mock_get_client.return_value
+                result = extract_betslip_turbo(b'', model_input=b'jpeg')
+
+        mock_client.models.generate_content.assert_not_called()
+        self.assertEqual(result, {'success': False, 'error': BUSY_MESSAGE, 'retryable': True})
+        self.assertEqual(ModelHealth().available_models(FALLBACK_MODELS), FALLBACK_MODELS)
+
+
+class SlipExtractorTests(TemporaryMediaRootMixin, TestCase):
+    ARCHIVE = os.path.join(settings.BASE_DIR, 'legacy_archive')
+
+    def _archive(self, name):
+        with open(os.path.join(self.ARCHIVE, name), encoding='utf-8') as f:
+            return f.read()
+
+    def _placed(self, name, unplaced_selector):
+        """The archived betslip as the bookmaker's bet history shows it once placed: a bet id, no editing controls"""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(self._archive(name), 'html.parser')
+        for control in soup.select(unplaced_selector):
+            control.decompose()
+        for note in soup.find_all(string=lambda text: 'Odds have changed' in text):
+            note.extract()
+        return f'<div class="bet-history"><span>Bet ID: 4821337</span>{soup}</div>'
+
+    def _response(self, body, status_code=200, is_redirect=False, headers=None):
+        response = MagicMock(status_code=status_code, is_redirect=is_redirect, encoding='utf-8', headers=headers or {})
+        response.iter_content.return_value = [body[i:i + 1000].encode() for i in range(0, len(body), 1000)]
+        return response
+
+    def _extract(self, bookmaker, page, link='https://www.betika.com/en-ke/share/1'):
+        from apps.tips.services import extract_slip
+
+        with patch('requests.get', return_value=self._response(page)):
+            return extract_slip(bookmaker, link=link)
+
+    def test_placed_slip_pages_parse_without_gemini(self):
+        betika = self._extract('betika', self._placed('Betika.html', '.stacked__remove'))
+        self.assertTrue(betika['success'])
+        self.assertEqual(betika['extractor'], 'betika')
+        self.assertEqual(betika['data']['num_matches'], 5)
+        first = betika['data']['matches'][0]
+        self.assertEqual((first['home_team'], first['away_team']), ('Chelsea', 'Wolves'))
+        self.assertEqual((first['market'], first['selection'], first['odds']), ('1x2', 'Chelsea', 1.43))
+        self.assertEqual(first['match_time'], '23:00')
+        self.assertTrue(first['match_date'].startswith('08/11/'))
+
+        odibets = self._extract(
+            'odibets', self._placed('Odibets.html', '.bet-close'), link='https://odibets.com/share/1'
+        )
+        self.assertEqual(odibets['data']['num_matches'], 6)
+        first = odibets['data']['matches'][0]
+        self.assertEqual((first['home_team'], first['away_team']), ('Nomme Kalju FC', 'Paide Linnameeskond'))
+        self.assertEqual((first['market'], first['odds'], first['match_time']), ('1X2', 1.65, '13:30'))
+
+        # Markup of another bookmaker, or an unknown bookmaker, goes to Gemini
+        self.assertIsNone(self._extract(
+            'odibets', self._placed('Betika.html', '.stacked__remove'), link='https://odibets.com/share/1'
+        ))
+        self.assertIsNone(self._extract('sportpesa', self._placed('Betika.html', '.stacked__remove')))
+
+    def test_slip_pages_must_be_placed_with_dates(self):
+        # The archived pages are betslips still being built (remove buttons, changed odds)
+        self.assertIsNone(self._extract('betika', self._archive('Betika.html')))
+        self.assertIsNone(self._extract('odibets', self._archive('Odibets.html'), link='https://odibets.com/share/1'))
+
+        # Markup without a bet id
+        self.assertIsNone(self._extract('betika', (
+            '<div class="stacked"><a class="stacked__link">Chelsea Vs. Wolves</a>'
+            '<div class="stacked__market"><span>1x2</span><span class="stacked__market--odd">Chelsea</span></div>'
+            '<span class="stacked__marker--starttime">Starts 08/11, 23:00</span>'
+            '<span class="stacked__odd__value">41.00</span></div>'
+        )))
+
+        # Every leg needs its kickoff date
+        placed = self._placed('Betika.html', '.stacked__remove')
+        self.assertIsNone(self._extract('betika', placed.replace('Starts 08/11, 23:00', 'Live', 1)))
+
+    def test_kickoff_year_is_the_next_occurrence(self):
+        from datetime import date
+        from apps.tips.services.slip_extractors import kickoff
+
+        today = date(2026, 10, 19)
+        self.assertEqual(kickoff('Starts 08/11, 23:00', today), ('08/11/2026', '23:00'))
+        self.assertEqual(kickoff('02/01 18:00', today), ('02/01/2027', '18:00'))
+        self.assertEqual(kickoff('12/10 15:00', today), ('12/10/2026', '15:00'))
+        self.assertEqual(kickoff('12/10/25 15:00', today), ('12/10/2025', '15:00'))
+        self.assertEqual(kickoff('Live', today), ('', ''))
+
+    def test_registry_is_keyed_by_bookmaker_choices(self):
+        from apps.tips.services import SLIP_EXTRACTORS
+
+        self.assertEqual(set(SLIP_EXTRACTORS), {'betika', 'odibets'})
+        self.assertTrue(set(SLIP_EXTRACTORS) <= {key for key, _ in Tip.BOOKMAKER_CHOICES})
+
+    def test_links_are_only_fetched_from_bookmaker_hosts(self):
+        from apps.tips.services import extract_slip
+
+        placed = self._placed('Betika.html', '.stacked__remove')
+        with patch('requests.get', return_value=self._response(placed)) as mock_get:
+            self.assertIsNone(extract_slip('betika', link='https://betika.com.example.org/share/1'))
+            self.assertIsNone(extract_slip('betika', link='http://www.betika.com/share/1'))
+            mock_get.assert_not_called()
+
+            result = extract_slip('betika', link='https://www.betika.com/en-ke/share/1')
+
+        mock_get.assert_called_once()
+        self.assertFalse(mock_get.call_args.kwargs['allow_redirects'])
+        self.assertEqual(result['data']['num_matches'], 5)
+
+        # A share page that only ships the app shell has no legs to parse
+        self.assertIsNone(self._extract('betika', '<div id="app"><span>Bet ID: 4821337</span></div>'))
+
+        # Redirects aren't followed off the declared host, and pages are size-capped
+        redirect = self._response('', status_code=302, is_redirect=True,
+                                  headers={'Location': 'https://attacker.example.org/slip'})
+        with patch('requests.get', return_value=redirect):
+            self.assertIsNone(extract_slip('betika', link='https://www.betika.com/en-ke/share/1'))
+        with patch('apps.tips.services.slip_extractors.MAX_FETCH_BYTES', 5000):
+            self.assertIsNone(self._extract('betika', placed))
+
+    def test_submission_with_share_link_skips_gemini(self):
+        from django.contrib.auth import get_user_model
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        user = get_user_model().objects.create_user(
+            username='sliptipster', phone_number='+254700000078', password='password'
+        )
+        self.client.force_login(user)
+
+        image = io.BytesIO()
+        Image.new('RGB', (40, 80), 'white').save(image, format='PNG')
+        placed = self._response(self._placed('Betika.html', '.stacked__remove'))
+        with patch('requests.get', return_value=placed), \
+                patch('apps.tips.background_tasks.process_betslip_image') as mock_gemini, \
+                patch('apps.tips.task_queue.enqueue_task') as mock_enqueue:
+            response = self.client.post('/tips/create/', {
+                'bookmaker': 'betika',
+                'bet_code': 'BETIKA1',
+                'bet_sharing_link': 'https://www.betika.com/en-ke/share/1',
+                'screenshot': SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png'),
+            })
+
+        tip = Tip.objects.get(bet_code='BETIKA1')
+        self.assertRedirects(response, f'/tips/verify/{tip.id}/', fetch_redirect_response=False)
+        mock_gemini.assert_not_called()
+        mock_enqueue.assert_not_called()
+        self.assertEqual(tip.processing_status, 'completed')
+        self.assertEqual(tip.matches.count(), 5)
+        self.assertTrue(tip.screenshot.name.endswith('.webp'))
+
+        # An unplaced betslip is read from the screenshot by Gemini instead,
+        # and pasted markup isn't accepted at all
+        unplaced = self._response(self._archive('Betika.html'))
+        with patch('requests.get', return_value=unplaced), \
+                patch('apps.tips.task_queue.enqueue_task') as mock_enqueue:
+            self.client.post('/tips/create/', {
+                'bookmaker': 'betika',
+                'bet_code': 'BETIKA2',
+                'bet_sharing_link': 'https://www.betika.com/en-ke/share/2',
+                'slip_html': self._placed('Betika.html', '.stacked__remove'),
+                'screenshot': SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png'),
+            })
+
+        tip = Tip.objects.get(bet_code='BETIKA2')
+        mock_enqueue.assert_called_once()
+        self.assertEqual(tip.processing_status, 'pending')
+        self.assertFalse(tip.matches.exists())
+
+
+class BatchUploadTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.user = get_user_model().objects.create_user(
+            username='batchtipster', phone_number='+254700000079', password='password'
+        )
+        self.client.force_login(self.user)
+
+    def _upload(self, name):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        image = io.BytesIO()
+        Image.new('RGB', (40, 80), 'white').save(image, format='PNG')
+        return SimpleUploadedFile(name, image.getvalue(), content_type='image/png')
+
+    def _submit(self, names, bet_codes):
+        with patch('apps.tips.task_queue.enqueue_task') as mock_enqueue:
+            response = self.client.post('/tips/create/batch/', {
+                'bookmaker': 'sportpesa',
+                'bet_codes': '\n'.join(bet_codes),
+                'screenshots': [self._upload(name) for name in names],
+            })
+        return response, mock_enqueue
+
+    def _extraction(self, screenshot, model_input=None):
+        if 'unreadable' in getattr(screenshot, 'name', ''):
+            return {'success': False, 'error': 'Could not read the prediction slip'}
+        return {
+            'success': True,
+            'confidence': 95.0,
+            'data': {
+                'total_odds': 3.0,
+                'matches': [
+                    {'home_team': 'Team A', 'away_team': 'Team B', 'market': '1X2', 'selection': 'Home',
+                     'odds': 1.5, 'match_date': '23/07/30', 'match_time': '18:00'},
+                    {'home_team': 'Team C', 'away_team': 'Team D', 'market': 'Over/Under 2.5', 'selection': 'Over',
+                     'odds': 2.0, 'match_date': '23/07/30', 'match_time': '20:00'},
+                ],
+            },
+        }
+
+    @override_settings(GEMINI_MAX_CONCURRENCY=1)
+    def test_batch_is_extracted_and_written_in_bulk(self):
+        from apps.tips.background_tasks import process_betslip_batch
+
+        response, mock_enqueue = self._submit(
+            ['first.png', 'second.png', 'unreadable.png'], ['batch1', 'BATCH2', 'BATCH3']
+        )
+
+        tips = list(Tip.objects.filter(tipster=self.user).order_by('id'))
+        self.assertEqual([tip.bet_code for tip in tips], ['BATCH1', 'BATCH2', 'BATCH3'])
+        batch = tips[0].upload_batch
+        self.assertTrue(batch)
+        self.assertTrue(all(tip.upload_batch == batch and tip.processing_status == 'pending' for tip in tips))
+        self.assertRedirects(response, f'/tips/batch/{batch}/', fetch_redirect_response=False)
+        mock_enqueue.assert_called_once_with(
+            process_betslip_batch, [tip.id for tip in tips], task_type='extraction'
+        )
+
+        response = self.client.get(f'/tips/batch/{batch}/', HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(response, 'tips/partials/batch_progress.html')
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+        with patch('apps.tips.background_tasks.process_betslip_image', side_effect=self._extraction):
+            process_betslip_batch([tip.id for tip in tips])
+
+        first, second, unreadable = [Tip.objects.get(id=tip.id) for tip in tips]
+        for tip in (first, second):
+            self.assertEqual(tip.processing_status, 'completed')
+            self.assertEqual(tip.odds, Decimal('3.00'))
+            self.assertEqual(tip.preview_data['total_matches'], 2)
+            self.assertTrue(tip.screenshot.name.endswith('.webp'))
+            self.assertEqual(tip.matches.count(), 2)
+        # Legs written with bulk_create still get their grading spec
+        self.assertTrue(all(match.market_spec for match in first.matches.all()))
+        self.assertEqual(unreadable.processing_status, 'failed')
+        self.assertEqual(unreadable.processing_error, 'Could not read the prediction slip')
+        self.assertFalse(unreadable.matches.exists())
+
+        response = self.client.get(f'/tips/batch/{batch}/', HTTP_HX_REQUEST='true')
+        self.assertNotContains(response, 'hx-trigger')
+        self.assertContains(response, '2 of 3 prediction slips ready to verify')
+        self.assertContains(response, f'/tips/verify/{first.id}/')
+        self.assertContains(response, 'Could not read the prediction slip')
+
+    @override_settings(GEMINI_MAX_CONCURRENCY=1)
+    def test_retry_resumes_slips_left_processing(self):
+        from apps.tips.background_tasks import process_betslip_batch
+
+        self._submit(['first.png', 'second.png'], ['RESUME1', 'RESUME2'])
+        tips = list(Tip.objects.filter(tipster=self.user).order_by('id'))
+
+        # The first attempt extracted one slip, then its worker died on the other
+        # (the uploads are identical, so the cache would otherwise answer the second)
+        with patch('apps.tips.services.ExtractionCache.lookup', return_value=None), \
+                patch('apps.tips.background_tasks.process_betslip_image',
+                      side_effect=[self._extraction(tips[0].screenshot), SystemExit]):
+            with self.assertRaises(SystemExit):
+                process_betslip_batch([tip.id for tip in tips])
+
+        for tip in tips:
+            tip.refresh_from_db()
+            self.assertEqual(tip.processing_status, 'processing')
+            # The compressed screenshot replaced the deleted upload in the row
+            self.assertTrue(tip.screenshot.name.endswith('.webp'))
+            self.assertTrue(tip.screenshot.storage.exists(tip.screenshot.name))
+
+        with patch('apps.tips.background_tasks.process_betslip_image', side_effect=self._extraction):
+            process_betslip_batch([tip.id for tip in tips])
+
+        for tip in tips:
+            tip.refresh_from_db()
+            self.assertEqual(tip.processing_status, 'completed')
+            self.assertEqual(tip.matches.count(), 2)
+
+    @override_settings(GEMINI_MAX_CONCURRENCY=1)
+    def test_slips_gemini_could_not_take_are_left_to_the_retry(self):
+        from apps.tips.background_tasks import process_betslip_batch
+        from apps.tips.betslip_extractor import BUSY_MESSAGE
+        from apps.tips.services import ExtractionUnavailable
+
+        self._submit(['first.png', 'busy.png'], ['BUSY1', 'BUSY2'])
+        first, busy = list(Tip.objects.filter(tipster=self.user).order_by('id'))
+
+        def extraction(screenshot, model_input=None):
+            if 'busy' in screenshot.name:
+                return {'success': False, 'error': BUSY_MESSAGE, 'retryable': True}
+            return self._extraction(screenshot)
+
+        with patch('apps.tips.task_queue.is_final_attempt', return_value=False), \
+                patch('apps.tips.services.ExtractionCache.lookup', return_value=None), \
+                patch('apps.tips.background_tasks.process_betslip_image', side_effect=extraction):
+            with self.assertRaises(ExtractionUnavailable):
+                process_betslip_batch([first.id, busy.id])
+
+        first.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual(first.processing_status, 'completed')
+        self.assertEqual((busy.processing_status, busy.processing_error), ('processing', None))
+
+        # The final attempt fails what Gemini still couldn't take
+        with patch('apps.tips.services.ExtractionCache.lookup', return_value=None), \
+                patch('apps.tips.background_tasks.process_betslip_image',
+                      return_value={'success': False, 'error': BUSY_MESSAGE, 'retryable': True}):
+            process_betslip_batch([first.id, busy.id])
+        busy.refresh_from_db()
+        self.assertEqual((busy.processing_status, busy.processing_error), ('failed', BUSY_MESSAGE))
+        self.assertEqual(Tip.objects.get(id=first.id).matches.count(), 2)
+
+    @override_settings(GEMINI_MAX_CONCURRENCY=1)
+    def test_failed_batch_keeps_the_compressed_screenshots(self):
+        from apps.tips.background_tasks import process_betslip_batch
+
+        self._submit(['first.png'], ['WRITEFAIL'])
+        tip = Tip.objects.get(bet_code='WRITEFAIL')
+
+        with patch('apps.tips.background_tasks.process_betslip_image', side_effect=self._extraction), \
+                patch('apps.tips.background_tasks.IngestionBatch.flush', side_effect=RuntimeError('database is locked')):
+            process_betslip_batch([tip.id])
+
+        tip.refresh_from_db()
+        self.assertEqual((tip.processing_status, tip.processing_error), ('failed', 'database is locked'))
+        self.assertTrue(tip.screenshot_compressed)
+        self.assertTrue(tip.screenshot.name.endswith('.webp'))
+        self.assertTrue(tip.screenshot.storage.exists(tip.screenshot.name))
+
+    def test_bet_codes_must_match_the_screenshots(self):
+        Tip.objects.create(
+            tipster=self.user, bet_code='TAKEN', odds=Decimal('2.00'), expires_at=timezone.now()
+        )
+
+        response, mock_enqueue = self._submit(['one.png', 'two.png'], ['CODE1'])
+        self.assertContains(response, '2 screenshots but 1 bet codes')
+
+        response, _ = self._submit(['one.png', 'two.png'], ['CODE1', 'code1'])
+        self.assertContains(response, 'Bet codes listed more than once: CODE1')
+
+        response, _ = self._submit(['one.png', 'two.png'], ['CODE1', 'TAKEN'])
+        self.assertContains(response, 'Tips with these bet codes already exist: TAKEN')
+
+        with override_settings(BATCH_UPLOAD_MAX_SLIPS=1):
+            response, _ = self._submit(['one.png', 'two.png'], ['CODE1', 'CODE2'])
+        self.assertContains(response, 'Upload at most 1 prediction slips at once.')
+
+        mock_enqueue.assert_not_called()
+        self.assertEqual(Tip.objects.count(), 1)
+
+    def test_resubmission_replaces_only_own_failed_drafts(self):
+        from django.contrib.auth import get_user_model
+
+        other = get_user_model().objects.create_user(
+            username='otherbatchtipster', phone_number='+254700000084', password='password'
+        )
+        own, others = [
+            Tip.objects.create(
+                tipster=tipster, bet_code=bet_code, odds=Decimal('1.00'), expires_at=timezone.now(),
+                status='draft', processing_status='failed'
+            )
+            for tipster, bet_code in ((self.user, 'OWNFAIL'), (other, 'OTHERFAIL'))
+        ]
+
+        response, _ = self._submit(['one.png', 'two.png'], ['OWNFAIL', 'OTHERFAIL'])
+        self.assertContains(response, 'Tips with these bet codes already exist: OTHERFAIL')
+
+        # Nothing is released before the form validates
+        response, _ = self._submit(['one.png', 'two.png'], ['OWNFAIL'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Tip.objects.filter(id__in=[own.id, others.id]).count(), 2)
+
+        response, mock_enqueue = self._submit(['one.png'], ['OWNFAIL'])
+        self.assertEqual(response.status_code, 302)
+        mock_enqueue.assert_called_once()
+        self.assertFalse(Tip.objects.filter(id=own.id).exists())
+        self.assertTrue(Tip.objects.filter(id=others.id).exists())
+        self.assertEqual(Tip.objects.get(bet_code='OWNFAIL').processing_status, 'pending')
+
+    def test_run_bounded_caps_concurrency(self):
+        import threading
+        import time
+        from apps.tips.task_queue import run_bounded
+
+        lock = threading.Lock()
+        running = {'now': 0, 'max': 0}
+
+        def work(item):
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.05)
+            with lock:
+                running['now'] -= 1
+            if item == 3:
+                raise ValueError('bad slip')
+            return item * 10
+
+        outcomes = {item: (result, error) for item, result, error in run_bounded(work, list(range(6)), 2)}
+
+        self.assertEqual(running['max'], 2)
+        self.assertEqual(outcomes[5], (50, None))
+        self.assertIsInstance(outcomes[3][1], ValueError)
+
+
+class TipIngestionTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.user = get_user_model().objects.create_user(
+            username='ingesttipster', phone_number='+254700000080', password='password'
+        )
+
+    def _tip(self, bet_code='INGEST1'):
+        return Tip(tipster=self.user, bookmaker='sportpesa', bet_code=bet_code)
+
+    def _extraction(self, legs=3, match_date='23/07/30'):
+        return {
+            'success': True,
+            'confidence': 90.0,
+            'data': {
+                'total_odds': 4.5,
+                'matches': [
+                    {'home_team': f'Home {i}', 'away_team': f'Away {i}', 'market': 'Both Teams To Score',
+                     'selection': 'Yes', 'odds': 1.5, 'match_date': match_date, 'match_time': f'1{i}:00'}
+                    for i in range(legs)
+                ],
+            },
+        }
+
+    def test_new_tip_and_legs_are_written_with_one_insert_each(self):
+        from apps.tips.services import ingest_tip
+
+        tip = self._tip()
+        # Savepoint, tip INSERT, legs bulk INSERT, release
+        with self.assertNumQueries(4):
+            ingest_tip(tip, self._extraction(legs=3))
+
+        tip.refresh_from_db()
+        self.assertEqual(tip.status, 'draft')
+        self.assertEqual(tip.processing_status, 'completed')
+        self.assertEqual(tip.odds, Decimal('4.50'))
+        self.assertEqual(tip.preview_data['total_matches'], 3)
+        legs = list(tip.matches.order_by('match_date'))
+        self.assertEqual(len(legs), 3)
+        self.assertEqual(tip.expires_at, legs[-1].match_date)
+        self.assertTrue(all(leg.market_spec for leg in legs))
+
+    def test_failed_write_leaves_no_partial_tip(self):
+        from apps.tips.services import BetslipRejected, ingest_tip
+
+        with patch('apps.tips.models.TipMatch.objects.bulk_create', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                ingest_tip(self._tip(), self._extraction())
+        self.assertFalse(Tip.objects.filter(bet_code='INGEST1').exists())
+
+        with self.assertRaises(BetslipRejected):
+            ingest_tip(self._tip(), self._extraction(match_date=''))
+        self.assertFalse(Tip.objects.exists())
+        self.assertFalse(TipMatch.objects.exists())
+
+    @override_settings(IMAGE_PROCESS_WORKERS=0, BETSLIP_ASYNC_EXTRACTION=False)
+    def test_new_tip_screenshot_files_are_removed_with_the_tip(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+        from apps.tips.services import ingest_tip
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        image = io.BytesIO()
+        Image.new('RGB', (40, 80), 'white').save(image, format='PNG')
+
+        def stored_files():
+            return [name for _, _, names in os.walk(media_root) for name in names]
+
+        with override_settings(MEDIA_ROOT=media_root):
+            # Compressed before the transaction, deleted when it rolls back
+            tip = self._tip()
+            tip.screenshot = SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png')
+            with patch('apps.tips.models.TipMatch.objects.bulk_create', side_effect=RuntimeError('disk full')):
+                with self.assertRaises(RuntimeError):
+                    ingest_tip(tip, self._extraction())
+            self.assertTrue(tip.screenshot_compressed)
+            self.assertEqual(stored_files(), [])
+
+            # The synchronous view compresses before extracting; a rejected slip keeps nothing
+            self.client.force_login(self.user)
+            with patch('apps.tips.background_tasks.process_betslip_image',
+                       return_value=self._extraction(match_date='')):
+                response = self.client.post('/tips/create/', {
+                    'bookmaker': 'sportpesa',
+                    'bet_code': 'INGEST2',
+                    'screenshot': SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png'),
+                })
+            self.assertContains(response, 'missing match kickoff dates')
+            self.assertEqual(stored_files(), [])
+
+            tip = self._tip('INGEST3')
+            tip.screenshot = SimpleUploadedFile('slip.png', image.getvalue(), content_type='image/png')
+            ingest_tip(tip, self._extraction())
+            self.assertEqual(len(stored_files()), len(tip.screenshot_variants))
+
+    def test_existing_tip_is_updated_and_stale_legs_replaced(self):
+        from apps.tips.services import ingest_tip
+
+        tip = self._tip()
+        tip.odds = Decimal('1.00')
+        tip.expires_at = timezone.now()
+        tip.processing_status = 'processing'
+        tip.save()
+        TipMatch.objects.create(tip=tip, home_team='Old', away_team='Leg', match_date=timezone.now(),
+                                market='1X2', selection='Home', odds=2.0)
+
+        ingest_tip(Tip.objects.get(id=tip.id), self._extraction(legs=2))
+
+        tip.refresh_from_db()
+        self.assertEqual(tip.processing_status, 'completed')
+        self.assertEqual(list(tip.matches.values_list('home_team', flat=True).order_by('id')), ['Home 0', 'Home 1'])
+
+
+class StartupImportTests(TestCase):
+    """Cold-start import budget (see scripts/benchmark_startup.py)"""
+
+    # Cumulative import time of django.setup() plus the URLconf, about 0.5s
+    # here; override with STARTUP_IMPORT_BUDGET_MS on slow machines
+    IMPORT_BUDGET_MS = int(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 1500))
+    DEFERRED_MODULES = ('google.genai', 'pydantic', 'PIL', 'fuzzywuzzy', 'bs4')
+
+    def _cold_start(self, code):
+        """Run code in a fresh interpreter; (import time in ms, heavy modules it loaded)"""
+        import re
+        import subprocess
+        import sys
+
+        modules = self.DEFERRED_MODULES + ('requests',)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings.development')
+        env.setdefault('SECRET_KEY', 'startup-test')
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             f"import django; django.setup()\n{code}\n"
+             f"import sys; print(' '.join(m for m in {modules!r} if m in sys.modules))"],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        # Top-level imports are the unindented lines of the -X importtime report
+        total_us = sum(int(us) for us in re.findall(r'^import time:\s+\d+ \|\s+(\d+) \| \S', proc.stderr, re.M))
+        return total_us / 1000, set(proc.stdout.split())
+
+    def test_web_startup_within_budget_without_heavy_dependencies(self):
+        import_ms, loaded = self._cold_start("from django.urls import get_resolver; get_resolver().url_patterns")
+
+        self.assertFalse(loaded & set(self.DEFERRED_MODULES), f"Imported at startup: {loaded}")
+        self.assertLess(import_ms, self.IMPORT_BUDGET_MS)
+
+    def test_worker_startup_defers_extraction_and_http_clients(self):
+        _, loaded = self._cold_start("import apps.tips.background_tasks, apps.tips.task_queue, apps.fixtures.services")
+
+        self.assertEqual(loaded, set(), f"Imported at startup: {loaded}")
+
+
+class PreforkTests(TestCase):
+    """Preloaded gunicorn master: warm-up, post-fork reset and memory report (config/prefork.py)"""
+
+    def test_warm_up_compiles_templates_and_url_patterns(self):
+        from config import prefork
+
+        stats = prefork.warm_up()
+
+        self.assertGreater(stats['url_patterns'], 0)
+        self.assertGreater(stats['templates'], 0)
+
+    def test_reset_after_fork_drops_process_wide_clients(self):
+        from config import prefork
+        from apps.tips import betslip_extractor, image_processing, rate_limit, task_queue
+        from apps.tips.services import livescore_cz_scraper
+
+        hedge_pool, local_limiter = betslip_extractor._hedge_pool, rate_limit._local
+        self.addCleanup(setattr, betslip_extractor, '_hedge_pool', hedge_pool)
+        self.addCleanup(setattr, rate_limit, '_local', local_limiter)
+        self.addCleanup(setattr, task_queue, '_task_queue', task_queue._task_queue)
+
+        with patch.object(betslip_extractor, '_client', MagicMock()), \
+             patch.object(livescore_cz_scraper, '_session', MagicMock()), \
+             patch.object(image_processing, '_pool', MagicMock()), \
+             patch.object(task_queue, '_task_queue', MagicMock()):
+            prefork.reset_after_fork()
+
+            self.assertIsNone(betslip_extractor._client)
+            self.assertIsNone(livescore_cz_scraper._session)
+            self.assertIsNone(image_processing._pool)
+            self.assertIsNone(task_queue._task_queue)
+            self.assertIsNot(betslip_extractor._hedge_pool, hedge_pool)
+            self.assertIsNot(rate_limit._local, local_limiter)
+        betslip_extractor._hedge_pool.shutdown()
+
+    def test_process_memory_splits_unique_and_shared_pages(self):
+        from config import prefork
+
+        memory = prefork.process_memory()
+        if memory is None:
+            self.skipTest('/proc/<pid>/smaps_rollup not available')
+
+        self.assertGreater(memory['rss'], 0)
+        self.assertLessEqual(memory['unique'], memory['rss'])
+        self.assertAlmostEqual(memory['unique'] + memory['shared'], memory['rss'], delta=1)
+        self.assertIn('unique', prefork.format_memory(memory))
+        self.assertIsNone(prefork.process_memory(pid=2 ** 22 + 1))
+
+
+class MemoryDiagnosticsTests(TestCase):
+    """Staff-started tracemalloc runs followed by every worker (memory_diagnostics)"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from apps.tips import memory_diagnostics
+
+        self.staff = get_user_model().objects.create_user(
+            username='memstaff', phone_number='+254700000081', password='pass', is_staff=True
+        )
+        self.client.force_login(self.staff)
+        self.addCleanup(setattr, memory_diagnostics, '_run', None)
+
+    def test_run_reports_allocation_sites_and_object_counts_after_n_requests(self):
+        import tracemalloc
+        from django.urls import reverse
+        from apps.tips import memory_diagnostics
+
+        response = self.client.post(reverse('admin:tips_queuedtask_memory'), {'requests': 2, 'top': 5})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(tracemalloc.is_tracing())
+
+        for _ in range(2):
+            self.client.get(reverse('tips:memory_diagnostics'))
+        status = memory_diagnostics.status()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertTrue(status['control']['active'])
+        self.assertEqual(status['control']['started_by'], 'memstaff')
+        [report] = status['reports']
+        self.assertEqual((report['reason'], report['requests']), ('completed', 2))
+        self.assertLessEqual(len(report['top']), 5)
+        self.assertTrue(all(site['file'] and site['line'] for site in report['top']))
+        self.assertIn('User', {row['type'] for row in report['objects']})
+        self.assertIn('QuerySet', {row['type'] for row in report['objects']})
+
+        page = self.client.get(reverse('admin:tips_queuedtask_memory'))
+        self.assertContains(page, f"Worker {report['pid']}")
+
+    def test_stop_reports_what_was_traced_so_far(self):
+        import tracemalloc
+        from django.urls import reverse
+
+        self.client.post(reverse('tips:memory_diagnostics'), {'action': 'start', 'requests': 100})
+        self.assertTrue(tracemalloc.is_tracing())
+        status = self.client.post(reverse('tips:memory_diagnostics'), {'action': 'stop'}).json()
+        self.assertFalse(status['control']['active'])
+
+        self.assertFalse(tracemalloc.is_tracing())
+        [report] = self.client.get(reverse('tips:memory_diagnostics')).json()['reports']
+        self.assertEqual(report['reason'], 'stopped')
+
+    def test_staff_only(self):
+        from django.urls import reverse
+        from apps.tips import memory_diagnostics
+
+        self.client.logout()
+        response = self.client.post(reverse('tips:memory_diagnostics'), {'action': 'start'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(memory_diagnostics.status()['control'])
+
+
+class RequestTimingTests(TestCase):
+    """Server-Timing header, timing log line and slow request sampling (request_timing)"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.staff = get_user_model().objects.create_user(
+            username='timingstaff', phone_number='+254700000082', password='pass', is_staff=True
+        )
+
+    def test_staff_get_server_timing_header(self):
+        from django.urls import reverse
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin:tips_queuedtask_slow_requests'))
+
+        header = response['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(header, r'cache;dur=[\d.]+;desc="\d+ hits, \d+ misses"')
+        self.assertRegex(header, r'tpl;dur=[\d.]+')
+        self.assertRegex(header, r'app;dur=[\d.]+;desc="total"')
+
+        self.client.logout()
+        self.assertFalse(self.client.get(reverse('admin:login')).has_header('Server-Timing'))
+
+    def test_cache_reads_sql_and_external_calls_are_counted(self):
+        import time
+        from django.core.cache import cache
+        from apps.tips.request_timing import external_call, track
+
+        with track() as timing:
+            cache.set('timing-key', 1)
+            cache.get('timing-key')
+            cache.get('timing-missing')
+            cache.get_many(['timing-key', 'timing-other'])
+            with external_call('gemini'):
+                time.sleep(0.01)
+            Tip.objects.count()
+
+        self.assertEqual((timing.cache_hits, timing.cache_misses), (2, 2))
+        self.assertGreater(timing.durations['cache'], 0)
+        self.assertGreaterEqual(timing.sql_count, 1)
+        self.assertTrue(any('tips_tip' in query['sql'] for query in timing.queries))
+        self.assertGreaterEqual(timing.fields()['ext_gemini_ms'], 10)
+        self.assertIn('ext-gemini;dur=', timing.server_timing())
+
+        # Outside a request nothing is recorded
+        self.assertIsNone(cache.get('timing-missing'))
+        self.assertEqual(timing.cache_misses, 2)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_and_sampled_with_their_queries(self):
+        from django.urls import reverse
+        from apps.tips.request_timing import slow_requests
+
+        self.client.force_login(self.staff)
+        with self.assertLogs('apps.tips.middleware', 'WARNING') as logs:
+            self.client.get(reverse('tips:task_queue_metrics'))
+
+        self.assertIn(f"path={reverse('tips:task_queue_metrics')}", logs.output[0])
+        self.assertIn('sql_count=', logs.output[0])
+        self.assertEqual(logs.records[0].request_timing['status'], 200)
+
+        sample = slow_requests()[0]
+        self.assertEqual((sample['path'], sample['user']), (reverse('tips:task_queue_metrics'), 'timingstaff'))
+        self.assertEqual(len(sample['queries']), sample['sql_count'])
+
+        page = self.client.get(reverse('admin:tips_queuedtask_slow_requests'))
+        self.assertContains(page, reverse('tips:task_queue_metrics'))
@@ -12,6 +12,8 @@ urlpatterns = [
     # Tipster views
     path('my-tips/', views.my_tips, name='my_tips'),
     path('create/', views.create_tip, name='create_tip'),
+    path('create/batch/', views.batch_create_tips, name='batch_create_tips'),
+    path('batch/<str:batch>/', views.batch_status, name='batch_status'),
     path('verify/<int:tip_id>/', views.verify_tip, name='verify_tip'),
     path('approve/<int:tip_id>/', views.approve_tip, name='approve_tip'),
     path('cancel/<int:tip_id>/', views.cancel_tip, name='cancel_tip'),
@@ -25,6 +27,8 @@ urlpatterns = [
     
     # Moderation / Admin
     path('resolution/', views.manual_resolution, name='manual_resolution'),
+    path('task-queue/metrics/', views.task_queue_metrics, name='task_queue_metrics'),
+    path('diagnostics/memory/', views.memory_diagnostics, name='memory_diagnostics'),
     
     # AJAX Endpoints
     path('<int:tip_id>/live-scores/', views.tip_live_scores, name='tip_live_scores'),
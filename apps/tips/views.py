@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
@@ -8,7 +9,7 @@ from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from .models import Tip, TipMatch
-from .forms import TipSubmissionForm, TipVerificationForm, TipSearchForm
+from .forms import BatchTipSubmissionForm, TipSubmissionForm, failed_drafts, TipVerificationForm, TipSearchForm
 
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -152,110 +153,84 @@ def my_tips(request):
 
 @login_required
 def create_tip(request):
-    """Create a new tip - Process betslip synchronously"""
+    """
+    Create a new tip.
+
+    With BETSLIP_ASYNC_EXTRACTION the upload is saved and extraction runs in the
+    background task queue while the tipster watches the processing page;
+    otherwise the betslip is processed synchronously.
+    """
     if request.method == 'POST':
-        form = TipSubmissionForm(request.POST, request.FILES)
+        form = TipSubmissionForm(request.POST, request.FILES, tipster=request.user)
         if form.is_valid():
-            try:
-                # Process betslip synchronously
-                from .betslip_extractor import process_betslip_image
-                from .utils import parse_match_date
-                from django.core.cache import cache
-                import hashlib
-                import copy
-
-                screenshot = form.cleaned_data['screenshot']
-                bet_code = form.cleaned_data['bet_code']  # From user input
-
-                logger.info("Processing betslip image with Gemini...")
-                extraction_result = process_betslip_image(screenshot)
-
-                if not extraction_result.get('success'):
-                    error_msg = extraction_result.get('error', 'Failed to extract prediction slip data')
-                    form.add_error(None, error_msg)
-                    return render(request, 'tips/create_tip.html', {'form': form})
-
-                # Extract data
-                betslip_data = extraction_result['data']
-                matches = betslip_data.get('matches', [])
-
-                if not matches:
-                    error_msg = 'No matches found in the prediction slip. Please upload a clear image.'
-                    form.add_error(None, error_msg)
+            from django.conf import settings
+            from .background_tasks import extract_betslip
+            from .services import BetslipRejected, ingest_tip
+
+            bet_code = form.cleaned_data['bet_code']  # From user input
+
+            tip = form.save(commit=False)
+            tip.tipster = request.user
+            tip.bet_code = bet_code  # Use user-provided bet code
+
+            # The tipster's drafts whose extraction failed don't hold on to their bet code
+            failed_drafts(request.user, [bet_code]).delete()
+
+            # Share links are parsed directly when the bookmaker has an
+            # extractor; Gemini only sees the rest
+            from .services import extract_slip
+            parsed = extract_slip(tip.bookmaker, link=tip.bet_sharing_link)
+            if parsed:
+                try:
+                    ingest_tip(tip, parsed)
+                    messages.success(request, 'Prediction slip processed successfully! Please verify the extracted data.')
+                    return redirect('tips:verify_tip', tip_id=tip.id)
+                except BetslipRejected as e:
+                    form.add_error(None, str(e))
                     return render(request, 'tips/create_tip.html', {'form': form})
 
-                # Create tip with extracted data
-                tip = form.save(commit=False)
-                tip.tipster = request.user
-                tip.bet_code = bet_code  # Use user-provided bet code
-                tip.odds = betslip_data.get('total_odds', 1.0)
-                tip.match_details = betslip_data
-                tip.ocr_processed = True
-                tip.ocr_confidence = extraction_result.get('confidence', 95.0)
-
-                # Calculate expires_at from latest match date
-                latest_match_date = None
-                has_invalid_dates = False
-
-                for match_data in matches:
-                    parsed_date = parse_match_date(
-                        match_data.get('match_date'),
-                        match_data.get('match_time')
-                    )
-                    if not parsed_date:
-                        has_invalid_dates = True
-                        break
-                    if latest_match_date is None or parsed_date > latest_match_date:
-                        latest_match_date = parsed_date
-
-                if has_invalid_dates or not latest_match_date:
-                    error_msg = 'Invalid Prediction Slip: The uploaded image is missing match kickoff dates and times. Please upload a prediction slip screenshot from your account history that clearly displays match dates and kickoff times.'
-                    form.add_error(None, error_msg)
+            if getattr(settings, 'BETSLIP_ASYNC_EXTRACTION', True):
+                try:
+                    from .background_tasks import process_betslip_async
+                    from .task_queue import enqueue_task
+
+                    # Placeholders until extraction fills in odds and the last kickoff
+                    tip.odds = Decimal('1.00')
+                    tip.expires_at = timezone.now()
+                    tip.status = 'draft'
+                    tip.ocr_processed = False
+                    tip.processing_status = 'pending'
+                    # The upload is compressed by the extraction task, not on the request thread
+                    tip.save(compress_screenshot=False)
+
+                    enqueue_task(process_betslip_async, tip.id, enrich=False, task_type='extraction')
+                    return redirect('tips:tip_processing_status', tip_id=tip.id)
+
+                except Exception as e:
+                    logger.error(f"Error queueing tip: {str(e)}", exc_info=True)
+                    messages.error(request, f'Error creating tip: {str(e)}')
                     return render(request, 'tips/create_tip.html', {'form': form})
 
-                tip.expires_at = latest_match_date
-                tip.status = 'draft'  # Draft status for verification step
-                tip.save()
-
-                # Create TipMatch records
-                for match_data in matches:
-                    match_date = parse_match_date(
-                        match_data.get('match_date'),
-                        match_data.get('match_time')
-                    ) or timezone.now()
-
-                    TipMatch.objects.create(
-                        tip=tip,
-                        home_team=match_data.get('home_team', 'Unknown'),
-                        away_team=match_data.get('away_team', 'Unknown'),
-                        league='Unknown League',
-                        match_date=match_date,
-                        market=match_data.get('market', 'Unknown'),
-                        selection=match_data.get('selection', 'Unknown'),
-                        odds=float(match_data.get('odds', 1.0))
-                    )
-
-                # Create preview data
-                preview_matches = matches[:2]
-                tip.preview_data = {
-                    'matches': [
-                        {
-                            'home_team': match.get('home_team'),
-                            'away_team': match.get('away_team'),
-                            'league': 'Unknown League',
-                            'market': match.get('market'),
-                        }
-                        for match in preview_matches
-                    ],
-                    'total_matches': len(matches)
-                }
-                tip.save()
+            try:
+                # Process betslip synchronously
+                # One decode gives both the archival WebP and the model input
+                model_input = tip.compress_screenshot()
+                extraction_result = extract_betslip(tip, model_input=model_input)
+                ingest_tip(tip, extraction_result)
 
                 # Redirect to verification step
                 messages.success(request, 'Prediction slip processed successfully! Please verify the extracted data.')
                 return redirect('tips:verify_tip', tip_id=tip.id)
 
+            except BetslipRejected as e:
+                # No row references the compressed screenshot and its variants
+                tip.delete_screenshot_files()
+                form.add_error(None, str(e))
+                return render(request, 'tips/create_tip.html', {'form': form})
+
             except Exception as e:
+                if tip._state.adding:
+                    tip.delete_screenshot_files()
                 logger.error(f"Error creating tip: {str(e)}", exc_info=True)
                 messages.error(request, f'Error creating tip: {str(e)}')
                 return render(request, 'tips/create_tip.html', {'form': form})
@@ -267,6 +242,104 @@ def create_tip(request):
     })
 
 
+@login_required
+def batch_create_tips(request):
+    """
+    Submit several prediction slips at once.
+
+    The slips are saved as pending drafts in one bulk insert and extracted by
+    a single background task (process_betslip_batch); the batch page shows
+    each slip's result as it completes.
+    """
+    from django.conf import settings
+
+    if request.method == 'POST':
+        form = BatchTipSubmissionForm(request.POST, request.FILES, tipster=request.user)
+        if form.is_valid():
+            import uuid
+            from .background_tasks import process_betslip_batch
+            from .task_queue import enqueue_task
+
+            batch = uuid.uuid4().hex
+            # Placeholders until extraction fills in odds and the last kickoff
+            tips = [
+                Tip(
+                    tipster=request.user,
+                    bookmaker=form.cleaned_data['bookmaker'],
+                    bet_code=bet_code,
+                    screenshot=screenshot,
+                    odds=Decimal('1.00'),
+                    expires_at=timezone.now(),
+                    status='draft',
+                    ocr_processed=False,
+                    processing_status='pending',
+                    upload_batch=batch,
+                )
+                for bet_code, screenshot in form.cleaned_data['slips']
+            ]
+
+            try:
+                # The tipster's drafts whose extraction failed don't hold on to their bet codes
+                failed_drafts(request.user, [tip.bet_code for tip in tips]).delete()
+                # Uploads are stored raw; the batch task compresses them
+                Tip.objects.bulk_create(tips)
+                enqueue_task(process_betslip_batch, [tip.id for tip in tips], task_type='extraction')
+                return redirect('tips:batch_status', batch=batch)
+
+            except Exception as e:
+                logger.error(f"Error queueing batch upload: {str(e)}", exc_info=True)
+                messages.error(request, f'Error uploading prediction slips: {str(e)}')
+    else:
+        form = BatchTipSubmissionForm()
+
+    return render(request, 'tips/batch_create.html', {
+        'form': form,
+        'max_slips': getattr(settings, 'BATCH_UPLOAD_MAX_SLIPS', 20),
+    })
+
+
+@login_required
+def batch_status(request, batch):
+    """
+    Show the extraction results of a batch upload.
+
+    The page polls itself with htmx while slips are still being extracted;
+    polls get just the results fragment.
+    """
+    from .background_tasks import batch_progress
+
+    tips = list(Tip.objects.filter(upload_batch=batch, tipster=request.user).order_by('id'))
+    if not tips:
+        messages.error(request, 'Batch upload not found.')
+        return redirect('tips:my_tips')
+
+    progress = batch_progress(batch)
+    slips = []
+    for tip in tips:
+        result = progress.get(str(tip.id), {})
+        # The tip row is authoritative once the batch has been written
+        status = tip.processing_status
+        if status not in ('completed', 'failed'):
+            status = result.get('status', status)
+        slips.append({
+            'tip': tip,
+            'status': status,
+            'legs': result.get('legs') or tip.preview_data.get('total_matches'),
+            'error': tip.processing_error or result.get('error', ''),
+        })
+
+    context = {
+        'batch': batch,
+        'slips': slips,
+        'done': all(slip['status'] in ('completed', 'failed') for slip in slips),
+        'completed': sum(slip['status'] == 'completed' for slip in slips),
+    }
+
+    if request.htmx:
+        return render(request, 'tips/partials/batch_progress.html', context)
+    return render(request, 'tips/batch_status.html', context)
+
+
 @login_required
 def verify_tip(request, tip_id):
     """Verify extracted betslip data - Step 2"""
@@ -348,7 +421,12 @@ def tip_published(request, tip_id):
 
 @login_required
 def tip_processing_status(request, tip_id):
-    """Show processing status (legacy page for old background-processed tips)"""
+    """
+    Show betslip processing progress.
+
+    The page polls itself with htmx; polls get just the progress fragment, and
+    an HX-Redirect to the verification step once extraction has completed.
+    """
     tip = get_object_or_404(Tip, id=tip_id)
 
     # Only tipster who created the tip can view this
@@ -356,30 +434,28 @@ def tip_processing_status(request, tip_id):
         messages.error(request, 'You do not have permission to view this tip.')
         return redirect('tips:my_tips')
 
-    # If tip was processed synchronously (new flow), redirect immediately
-    if tip.ocr_processed and tip.matches.exists():
-        messages.success(request, 'Your tip is ready!')
-        return redirect('tips:my_tips')
-
-    # If processing failed, show error and options
-    if getattr(tip, 'processing_status', None) == 'failed':
-        context = {
-            'tip': tip,
-            'error': getattr(tip, 'processing_error', 'Unknown error occurred during processing'),
-            'failed': True
-        }
-        return render(request, 'tips/processing_status.html', context)
+    if tip.processing_status == 'completed' and tip.ocr_processed:
+        if tip.status == 'draft':
+            target = reverse('tips:verify_tip', kwargs={'tip_id': tip.id})
+            messages.success(request, 'Prediction slip processed successfully! Please verify the extracted data.')
+        else:
+            target = reverse('tips:my_tips')
+            messages.success(request, 'Your tip is ready!')
 
-    # If processing is complete from old background task, redirect to verify
-    if getattr(tip, 'processing_status', None) == 'completed' and tip.ocr_processed:
-        return redirect('tips:verify_tip', tip_id=tip.id)
+        if request.htmx:
+            response = HttpResponse(status=204)
+            response['HX-Redirect'] = target
+            return response
+        return redirect(target)
 
-    # Still processing (old background tasks) or pending
     context = {
         'tip': tip,
-        'failed': False
+        'failed': tip.processing_status == 'failed',
+        'error': tip.processing_error or 'Unknown error occurred during processing',
     }
 
+    if request.htmx:
+        return render(request, 'tips/partials/processing_progress.html', context)
     return render(request, 'tips/processing_status.html', context)
 
 
@@ -581,39 +657,26 @@ def manual_resolution(request):
         match_id = request.POST.get('match_id')
         
         if match_id and action in ['won', 'lost', 'void']:
-            match = get_object_or_404(TipMatch, id=match_id)
-            match.is_resulted = True
-            
-            if action == 'won':
-                match.is_won = True
-                match.actual_result = 'Manual Win'
-            elif action == 'lost':
-                match.is_won = False
-                match.actual_result = 'Manual Loss'
-            elif action == 'void':
-                match.is_won = True  # Treat void as won so accumulator continues
-                match.actual_result = 'Void / Push'
-                match.odds = Decimal('1.00')  # Reset odds to 1.0
-                
-            match.save()
-            
-            # Check if all matches in tip are resulted
+            from .services.grading import GradingBatch, apply_leg_result, rollup_tip
+
+            match = get_object_or_404(TipMatch.objects.select_related('tip'), id=match_id)
             tip = match.tip
-            if tip.matches.filter(is_resulted=False).count() == 0:
-                tip_won = not tip.matches.filter(is_won=False).exists()
-                tip.is_resulted = True
-                tip.is_won = tip_won
-                tip.status = 'archived'
-                tip.result_verified_at = timezone.now()
-                
-                # Recalculate tip odds if voided
-                total_odds = Decimal('1.00')
-                for m in tip.matches.all():
-                    total_odds *= m.odds
-                tip.odds = round(total_odds, 2)
-                tip.save()
-                
-                messages.success(request, f"Tip {tip.bet_code or tip.id} fully graded as {'WON' if tip_won else 'LOST'}")
+            # Grade against the tip's loaded legs so the rollup needs no re-query
+            legs = [match if m.id == match.id else m for m in tip.matches.all()]
+
+            outcome = {'won': True, 'lost': False, 'void': 'void'}[action]
+            actual_result = {'won': 'Manual Win', 'lost': 'Manual Loss', 'void': 'Void / Push'}[action]
+            apply_leg_result(match, outcome, actual_result)
+
+            batch = GradingBatch()
+            batch.add_leg(match)
+            tip_resulted = rollup_tip(tip, legs)
+            if tip_resulted:
+                batch.add_tip(tip)
+            batch.flush()
+
+            if tip_resulted:
+                messages.success(request, f"Tip {tip.bet_code or tip.id} fully graded as {'WON' if tip.is_won else 'LOST'}")
             else:
                 messages.success(request, f"Match manually graded as {action.upper()}")
                 
@@ -631,24 +694,78 @@ def manual_resolution(request):
         'stuck_tips': stuck_tips
     })
 
+
+@staff_member_required
+def task_queue_metrics(request):
+    """Staff JSON endpoint: queue depth, wait and run times per task type, Gemini model health and queue wait"""
+    from .betslip_extractor import model_status
+    from .task_queue import get_queue_metrics
+
+    try:
+        window = int(request.GET.get('window', 60))
+    except ValueError:
+        return JsonResponse({'error': 'window must be a number of minutes'}, status=400)
+
+    metrics = get_queue_metrics(window)
+    metrics['models'] = model_status()
+    return JsonResponse(metrics)
+
+
+@staff_member_required
+def memory_diagnostics(request):
+    """
+    Staff JSON endpoint: the current tracemalloc run and its worker reports
+
+    POST action=start (requests, frames, top) or action=stop controls the run.
+    """
+    from . import memory_diagnostics as diagnostics
+
+    if request.method == 'POST':
+        if request.POST.get('action') == 'stop':
+            diagnostics.stop()
+        else:
+            try:
+                options = {name: int(request.POST[name]) for name in ('requests', 'frames', 'top') if name in request.POST}
+            except ValueError:
+                return JsonResponse({'error': 'requests, frames and top must be numbers'}, status=400)
+            diagnostics.start(user=request.user, **options)
+    return JsonResponse(diagnostics.status())
+
+
 def tip_live_scores(request, tip_id):
     """AJAX endpoint to get live scores for a tip"""
     tip = get_object_or_404(Tip, id=tip_id)
     
     live_matches = []
-    for match in tip.matches.all():
-        if not match.is_resulted:
-            data = match.live_data
-            if data:
-                live_matches.append({
-                    'id': match.id,
-                    'is_live': data.get('is_live', data.get('status') not in ['FT', 'PST', 'CANC', 'SCHED']),
-                    'is_finished': data.get('is_finished', data.get('status') in ['FT', 'AET', 'PEN']),
-                    'score': data.get('score', f"{data.get('home_goals')}-{data.get('away_goals')}"),
-                    'elapsed': data.get('elapsed'),
-                    'status_short': data.get('status'),
-                    'source': data.get('source', 'api_football')
-                })
-                
+    if tip.is_resulted:
+        # Decided slips (including early losses) are off the live watchlist
+        return JsonResponse({'matches': live_matches})
+
+    from .services.livescore_cz_scraper import LivescoreCzScraper, day_offset
+
+    legs = [match for match in tip.matches.all() if not match.is_resulted]
+    leg_data = {match.id: match.fixture_live_data() for match in legs}
+
+    # The livescore.cz pages the remaining legs fall back to, fetched together
+    fallback = [match for match in legs if not leg_data[match.id]]
+    if fallback:
+        offsets = {match.id: day_offset(match.match_date) for match in fallback}
+        pages = LivescoreCzScraper().fetch_many(set(offsets.values()), status_filter='all')
+        for match in fallback:
+            leg_data[match.id] = match.livescore_live_data(pages[offsets[match.id]])
+
+    for match in legs:
+        data = leg_data[match.id]
+        if data:
+            live_matches.append({
+                'id': match.id,
+                'is_live': data.get('is_live', data.get('status') not in ['FT', 'PST', 'CANC', 'SCHED']),
+                'is_finished': data.get('is_finished', data.get('status') in ['FT', 'AET', 'PEN']),
+                'score': data.get('score', f"{data.get('home_goals')}-{data.get('away_goals')}"),
+                'elapsed': data.get('elapsed'),
+                'status_short': data.get('status'),
+                'source': data.get('source', 'api_football')
+            })
+
     return JsonResponse({'matches': live_matches})
 
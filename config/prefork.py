@@ -0,0 +1,176 @@
+"""
+Copy-on-write friendly gunicorn preloading
+
+With preload_app the master imports the project once and forks every worker
+from it, so the pages holding code, the URL resolver, compiled templates and
+translation catalogs are shared instead of loaded again per worker. Two
+things would otherwise undo that or break the workers:
+
+- Refcount and GC bookkeeping writes dirty shared pages. warm_up collects the
+  import garbage once and prepare_fork moves everything the master holds into
+  the permanent generation (gc.freeze) just before each fork, so the
+  collector never touches those objects in a worker.
+- Connections, clients, locks and thread pools created in the master don't
+  survive fork. prepare_fork closes the database connections in the master
+  and reset_after_fork drops every process-wide client in the new worker, so
+  each is recreated on first use.
+
+Hooked up in deploy/gunicorn.conf.py. Django is only imported inside the
+functions because gunicorn loads that file before the app.
+"""
+
+import gc
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def warm_up() -> Dict[str, int]:
+    """
+    Load what every worker would otherwise build on its first requests, in
+    the master (preload only)
+
+    Returns:
+        Counts of what was loaded, for the startup log
+    """
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hashers
+    from django.template import engines
+    from django.urls import get_resolver
+    from django.utils import translation
+
+    stats = {'url_patterns': 0, 'templates': 0, 'template_errors': 0}
+
+    # URL resolver with its reverse lookup tables
+    resolver = get_resolver()
+    resolver.reverse_dict
+    stats['url_patterns'] = len(resolver.url_patterns)
+
+    # Compiled templates (kept by the cached loader when DEBUG is off)
+    for engine in engines.all():
+        for template_dir in getattr(engine, 'template_dirs', ()):
+            root = Path(template_dir)
+            for path in root.rglob('*.html'):
+                try:
+                    engine.get_template(path.relative_to(root).as_posix())
+                    stats['templates'] += 1
+                except Exception:
+                    # Templates of apps or tag libraries that aren't installed
+                    stats['template_errors'] += 1
+
+    # Settings-derived singletons built lazily on first use
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('')
+    translation.deactivate()
+    get_hashers()
+    try:
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        staticfiles_storage.url  # loads the manifest of ManifestStaticFilesStorage
+    except Exception:
+        pass
+
+    # Import and warm-up garbage, before the heap is frozen
+    gc.collect()
+    return stats
+
+
+def prepare_fork():
+    """
+    Run in the master right before forking a worker: no open database
+    connections to inherit, and the heap frozen out of the collector's reach
+    """
+    from django.db import connections
+
+    connections.close_all()
+    gc.freeze()
+
+
+def reset_after_fork():
+    """
+    Run in a new worker: drop every process-wide client, pool and lock
+    inherited from the master so it is recreated on first use
+
+    Modules the master never imported are left alone (and not imported).
+    """
+    from django.core.cache import caches
+    from django.db import connections
+
+    # prepare_fork closed the master's connections; reset the handlers' state
+    connections.close_all()
+
+    for cache in caches.all(initialized_only=True):
+        # Redis connection pools (RedisCache keeps them on its client)
+        for pool in getattr(cache.__dict__.get('_cache'), '_pools', {}).values():
+            pool.reset()
+
+    module = sys.modules.get('apps.tips.betslip_extractor')
+    if module is not None:
+        module._client = None
+        module._client_lock = threading.Lock()
+        # Threads the master started are gone, and a pool never replaces them
+        module._hedge_pool = ThreadPoolExecutor(max_workers=module.HEDGE_WORKERS, thread_name_prefix='gemini-hedge')
+
+    module = sys.modules.get('apps.tips.rate_limit')
+    if module is not None:
+        module._local = module.LocalLimiter()
+
+    module = sys.modules.get('apps.tips.services.livescore_cz_scraper')
+    if module is not None:
+        module._session = None
+        module._session_lock = threading.Lock()
+        module._responses_lock = threading.Lock()
+        module._snapshots_lock = threading.Lock()
+
+    module = sys.modules.get('apps.tips.image_processing')
+    if module is not None:
+        # The pool's manager thread and forkserver belong to the master
+        module._pool = None
+        module._pool_lock = threading.Lock()
+
+    module = sys.modules.get('apps.tips.task_queue')
+    if module is not None:
+        # The in-memory queue's worker threads didn't survive the fork
+        module._task_queue = None
+
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """
+    Memory of a process in MB, from /proc/<pid>/smaps_rollup (Linux)
+
+    Returns:
+        dict with 'rss', 'pss' (RSS with shared pages split between the
+        processes sharing them), 'unique' (private pages: what the process
+        costs on its own, i.e. what one more worker adds) and 'shared';
+        None where smaps_rollup is unavailable
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0])
+    except OSError:
+        return None
+
+    def mb(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+
+    return {
+        'rss': mb('Rss'),
+        'pss': mb('Pss'),
+        'unique': mb('Private_Clean', 'Private_Dirty'),
+        'shared': mb('Shared_Clean', 'Shared_Dirty'),
+    }
+
+
+def format_memory(memory: Optional[Dict[str, float]]) -> str:
+    if not memory:
+        return 'memory unavailable'
+    return (
+        f"rss {memory['rss']:.0f} MB, unique {memory['unique']:.0f} MB, "
+        f"shared {memory['shared']:.0f} MB, pss {memory['pss']:.0f} MB"
+    )
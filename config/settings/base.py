@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Server-Timing header, timing log line and slow request sampling (apps.tips.request_timing)
+    'apps.tips.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,13 +66,17 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Follows staff-started tracemalloc runs (admin: Queued tasks > Memory diagnostics)
+    'apps.tips.middleware.MemoryDiagnosticsMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates timing renders for the Server-Timing header
+        'BACKEND': 'apps.tips.request_timing.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -181,10 +187,91 @@ AWS_S3_REGION_NAME = config('AWS_REGION_NAME', default='us-east-1')
 API_FOOTBALL_KEY = config('API_FOOTBALL_KEY', default='')
 API_FOOTBALL_DAILY_LIMIT = config('API_FOOTBALL_DAILY_LIMIT', default=100, cast=int)
 
+# Result Verification
+# Incremental runs only revisit legs whose fixture changed; legs without a fixture
+# (or long overdue) are swept at this slower interval.
+RESULT_VERIFICATION_SWEEP_MINUTES = config('RESULT_VERIFICATION_SWEEP_MINUTES', default=120, cast=int)
+# Worker threads claiming tip batches (SELECT ... FOR UPDATE SKIP LOCKED, so
+# concurrent schedulers never grade the same tip twice). Ignored on SQLite.
+RESULT_VERIFICATION_WORKERS = config('RESULT_VERIFICATION_WORKERS', default=1, cast=int)
+
+# livescore.cz parser backend: 'stream' (single-pass tokenizer over #score-data)
+# or 'soup' (full BeautifulSoup tree, kept as the reference implementation)
+LIVESCORE_PARSER = config('LIVESCORE_PARSER', default='stream')
+
+# Extract uploaded betslips in the background task queue and poll progress
+# with htmx, instead of holding the request open for the Gemini call
+BETSLIP_ASYNC_EXTRACTION = config('BETSLIP_ASYNC_EXTRACTION', default=True, cast=bool)
+
+# Most screenshots accepted by one batch upload (extracted GEMINI_MAX_CONCURRENCY at a time)
+BATCH_UPLOAD_MAX_SLIPS = config('BATCH_UPLOAD_MAX_SLIPS', default=20, cast=int)
+
+# Gemini circuit breaker, shared across workers through the cache: a model
+# is skipped after this many consecutive errors for GEMINI_BREAKER_COOLDOWN
+# seconds (quota errors: until the quota resets), then probed once
+GEMINI_BREAKER_FAILURES = config('GEMINI_BREAKER_FAILURES', default=3, cast=int)
+GEMINI_BREAKER_COOLDOWN = config('GEMINI_BREAKER_COOLDOWN', default=30, cast=int)
+# Also send the request to the next model when the first one is slower than
+# its p95 latency. Cuts tail latency, can double quota use for slow slips.
+GEMINI_HEDGE_REQUESTS = config('GEMINI_HEDGE_REQUESTS', default=False, cast=bool)
+
+# Cluster-wide Gemini admission: calls per minute per model (the API key's
+# quota), calls in flight across all processes, and the longest a call may
+# queue before the upload is told to retry
+GEMINI_RPM = config('GEMINI_RPM', default=15, cast=int)
+GEMINI_MAX_CONCURRENCY = config('GEMINI_MAX_CONCURRENCY', default=4, cast=int)
+GEMINI_MAX_QUEUE_WAIT = config('GEMINI_MAX_QUEUE_WAIT', default=60, cast=int)
+
+# Extraction cache: identical screenshots reuse a prior extraction for any
+# tipster; a re-upload by the same tipster with the same bet code also matches
+# when its perceptual hash differs by at most this share of bits (recropped,
+# rescaled or re-encoded copies). Entries expire after EXTRACTION_CACHE_DAYS.
+EXTRACTION_CACHE_DAYS = config('EXTRACTION_CACHE_DAYS', default=7, cast=int)
+EXTRACTION_CACHE_MAX_DISTANCE = config('EXTRACTION_CACHE_MAX_DISTANCE', default=0.1, cast=float)
+
+# Processes decoding/encoding betslip screenshots off the task worker's threads
+# (0: process inline). Each worker process holds ~30 MB. Only the task worker
+# starts them; web workers always process inline.
+IMAGE_PROCESS_WORKERS = config('IMAGE_PROCESS_WORKERS', default=1, cast=int)
+
+# Server-Timing response header (apps.tips.request_timing): 'staff', 'all' or
+# 'off'; everyone gets it when DEBUG is on
+SERVER_TIMING = config('SERVER_TIMING', default='staff')
+# Requests slower than this (ms) are logged as warnings and sampled with their
+# queries into a ring buffer of SLOW_REQUEST_BUFFER entries (admin: Slow requests)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=1000, cast=int)
+SLOW_REQUEST_BUFFER = config('SLOW_REQUEST_BUFFER', default=50, cast=int)
+
+# Background task queue: 'database' persists tasks (executed by the
+# run_task_worker command, survives gunicorn worker recycling) or 'memory'
+# (per-process threads, tasks lost on restart)
+TASK_QUEUE_BACKEND = config('TASK_QUEUE_BACKEND', default='database')
+TASK_QUEUE_WORKERS = config('TASK_QUEUE_WORKERS', default=3, cast=int)
+# Seconds a claimed task stays invisible to other workers. The worker renews
+# the lease while the task runs; once it lapses (the worker died) the attempt
+# counts as failed and is retried with backoff or dead-lettered
+TASK_QUEUE_VISIBILITY_TIMEOUT = config('TASK_QUEUE_VISIBILITY_TIMEOUT', default=300, cast=int)
+TASK_QUEUE_MAX_ATTEMPTS = config('TASK_QUEUE_MAX_ATTEMPTS', default=5, cast=int)
+# Retry delay doubles per attempt from this base, capped at TASK_QUEUE_MAX_RETRY_DELAY
+TASK_QUEUE_RETRY_BACKOFF = config('TASK_QUEUE_RETRY_BACKOFF', default=10, cast=int)
+TASK_QUEUE_MAX_RETRY_DELAY = config('TASK_QUEUE_MAX_RETRY_DELAY', default=3600, cast=int)
+TASK_QUEUE_RETENTION_DAYS = config('TASK_QUEUE_RETENTION_DAYS', default=7, cast=int)
+# Task types: higher priority is served first; concurrency caps how many tasks
+# of the type run at once (None: uncapped). Extraction is capped to the number
+# of concurrent Gemini calls the API key's quota allows.
+TASK_QUEUE_TYPES = {
+    'extraction': {'priority': 30, 'concurrency': config('TASK_QUEUE_EXTRACTION_CONCURRENCY', default=2, cast=int)},
+    'notifications': {'priority': 20, 'concurrency': 2},
+    'grading': {'priority': 10, 'concurrency': 2},
+    'images': {'priority': 0, 'concurrency': 1},
+    'default': {'priority': 10, 'concurrency': None},
+}
+
 # Cache Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        # DatabaseCache counting hits and misses per request (apps.tips.request_timing)
+        'BACKEND': 'apps.tips.request_timing.TimedDatabaseCache',
         'LOCATION': 'api_cache_table',
         'OPTIONS': {
             'MAX_ENTRIES': 10000,
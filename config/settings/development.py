@@ -12,6 +12,9 @@ DATABASES = {
     }
 }
 
+# Run background tasks in-process, no separate worker needed
+TASK_QUEUE_BACKEND = config('TASK_QUEUE_BACKEND', default='memory')
+
 # Email backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
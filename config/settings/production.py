@@ -96,7 +96,8 @@ LOGGING = {
 # Cache configuration (using Redis in-memory cache for high performance)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # RedisCache counting hits and misses per request (apps.tips.request_timing)
+        'BACKEND': 'apps.tips.request_timing.TimedRedisCache',
         'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
     }
 }
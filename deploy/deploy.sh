@@ -123,8 +123,13 @@ do_update() {
 
     do_django_setup
 
-    info "Reloading Gunicorn (zero-downtime)..."
-    sudo systemctl reload ligisoo || sudo systemctl restart ligisoo
+    # The app is preloaded in the master (gunicorn.conf.py), so a HUP reload
+    # would fork workers from the old code
+    info "Restarting Gunicorn..."
+    sudo systemctl restart ligisoo
+
+    info "Restarting background task worker..."
+    sudo systemctl restart task-worker
 
     success "Update complete."
 }
@@ -174,10 +179,14 @@ do_systemd() {
     # Tip scheduler
     cp "${APP_DIR}/tip-scheduler.service"              /etc/systemd/system/tip-scheduler.service
 
+    # Background task worker (database task queue)
+    cp "${APP_DIR}/task-worker.service"                /etc/systemd/system/task-worker.service
+
     systemctl daemon-reload
 
     systemctl enable --now ligisoo
     systemctl enable --now tip-scheduler
+    systemctl enable --now task-worker
 
     success "Systemd services enabled and started."
 }
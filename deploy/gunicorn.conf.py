@@ -6,6 +6,14 @@ Reference: https://docs.gunicorn.org/en/stable/configure.html
 """
 
 import multiprocessing
+import os
+import sys
+
+# The config file is loaded before the app; make the project importable for
+# the hooks below
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import prefork  # noqa: E402  (imports nothing from Django itself)
 
 # ---------------------------------------------------------------------------
 # Server socket
@@ -18,11 +26,19 @@ backlog = 64
 # Worker processes
 # ---------------------------------------------------------------------------
 # Formula: (2 * CPU cores) + 1  →  on e2-micro use 2 to stay within RAM budget.
-# Each sync worker on this Django app uses ~80–120 MB.
-# 2 workers = ~200 MB peak, leaving headroom for nginx + postgres + redis.
-workers = 2
+# Each sync worker on this Django app uses ~80–120 MB of RSS, but with
+# preload_app most of it is shared with the master: size the pool by the
+# workers' *unique* memory (logged at boot and recycle, or run
+# scripts/worker_memory.py) and raise GUNICORN_WORKERS while it fits.
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
 worker_class = "sync"
 
+# Import the app and warm the URL resolver, templates and translations once in
+# the master, then fork workers that share those pages copy-on-write (see
+# config/prefork.py). A code change then needs a restart, not a HUP reload.
+# Set GUNICORN_PRELOAD=0 to load the app in each worker instead.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
 # Recycle workers after this many requests to prevent memory leaks
 max_requests = 500
 max_requests_jitter = 50  # add randomness to avoid all workers restarting simultaneously
@@ -57,3 +73,34 @@ proc_name = "ligisoo"
 limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
+
+# ---------------------------------------------------------------------------
+# Server hooks (preload, copy-on-write and per-worker memory)
+# ---------------------------------------------------------------------------
+def when_ready(server):
+    """Master, after the app is loaded and before the first workers fork"""
+    if server.cfg.preload_app:
+        stats = prefork.warm_up()
+        server.log.info(
+            f"Preloaded app: {stats['url_patterns']} URL patterns, {stats['templates']} templates "
+            f"({stats['template_errors']} skipped); master {prefork.format_memory(prefork.process_memory())}"
+        )
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        prefork.prepare_fork()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        prefork.reset_after_fork()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} booted: {prefork.format_memory(prefork.process_memory())}")
+
+
+def worker_exit(server, worker):
+    # Unique memory at recycle (max_requests) shows how much a worker grows
+    server.log.info(f"Worker {worker.pid} exiting: {prefork.format_memory(prefork.process_memory(worker.pid))}")
@@ -3,6 +3,8 @@ import base64
 from datetime import datetime
 from django.conf import settings
 
+from apps.tips.request_timing import external_call
+
 
 class MpesaService:
     """M-Pesa API integration service for Pro subscriptions"""
@@ -43,7 +45,8 @@ class MpesaService:
                 'Authorization': f'Basic {auth_base64}'
             }
             
-            response = requests.get(self.auth_url, headers=headers)
+            with external_call('mpesa'):
+                response = requests.get(self.auth_url, headers=headers)
             response_data = response.json()
             
             if response.status_code == 200:
@@ -116,7 +119,8 @@ class MpesaService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(self.stk_push_url, json=payload, headers=headers)
+            with external_call('mpesa'):
+                response = requests.post(self.stk_push_url, json=payload, headers=headers)
             response_data = response.json()
             
             if response.status_code == 200 and response_data.get('ResponseCode') == '0':
@@ -173,7 +177,8 @@ class MpesaService:
                 'Content-Type': 'application/json'
             }
 
-            response = requests.post(self.stk_query_url, json=payload, headers=headers)
+            with external_call('mpesa'):
+                response = requests.post(self.stk_query_url, json=payload, headers=headers)
             response_data = response.json()
 
             if response.status_code == 200:
@@ -63,11 +63,11 @@ def run_result_verification():
     logger.info("=" * 60)
 
     try:
-        # Verify today's tips
+        # Only revisit legs whose fixture changed since the last run
         verifier = ResultVerifier()
-        stats = verifier.verify_tips()
+        stats = verifier.verify_tips(incremental=True)
 
-        logger.info("VERIFICATION STATS:")
+        logger.info(f"VERIFICATION STATS (sweep: {stats['sweep']}):")
         logger.info(f"  Tips checked: {stats['tips_checked']}")
         logger.info(f"  Tips verified: {stats['tips_verified']}")
         logger.info(f"  Tips WON: {stats['tips_won']}")
@@ -75,6 +75,11 @@ def run_result_verification():
         logger.info(f"  Tips pending: {stats['tips_pending']}")
         logger.info(f"  Matches verified: {stats['matches_verified']}")
         logger.info(f"  Matches not found: {stats['matches_not_found']}")
+        for worker in stats['workers']:
+            logger.info(
+                f"  {worker['worker']}: {worker['tips_checked']} tips, "
+                f"{worker['tips_per_second']} tips/s"
+            )
 
         if stats['tips_verified'] > 0:
             logger.info(
@@ -209,9 +214,12 @@ def fetch_live_fixtures():
         from datetime import timedelta
         
         now = timezone.now()
-        # Check if any active tip has matches that kicked off in the last 3.5 hours, or start in next 15 mins
+        # Check if any active tip has matches that kicked off in the last 3.5 hours, or start in next 15 mins.
+        # Slips already decided by a lost leg no longer need live scores.
         has_active_matches = TipMatch.objects.filter(
             tip__status='active',
+            tip__is_resulted=False,
+            is_resulted=False,
             match_date__gte=now - timedelta(hours=3, minutes=30),
             match_date__lte=now + timedelta(minutes=15)
         ).exists()
@@ -379,6 +387,8 @@ def schedule_jobs():
 
 
     # Job 4: Run result verification every 15 minutes (without API fetch, use DB only)
+    # Tips are normally graded as soon as ingestion sees their fixtures conclude;
+    # this run is the safety net for missed events and legs without a fixture.
     schedule.every(15).minutes.do(run_result_verification)
 
     # Job 5: Clean up temporary tips every hour
@@ -0,0 +1,102 @@
+"""
+Benchmark the livescore.cz parser backends.
+
+Parses a synthetic matchday page (and the saved legacy_archive/livescore.html)
+with both backends, checks they return identical matches and reports time and
+peak allocated memory per parse.
+
+Usage:
+    python scripts/benchmark_livescore_parser.py
+    python scripts/benchmark_livescore_parser.py --matches 2000 --runs 20
+    python scripts/benchmark_livescore_parser.py --html saved_page.html
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+django.setup()
+
+from apps.tips.services.livescore_cz_scraper import LivescoreCzScraper, PARSERS
+
+LEGACY_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'legacy_archive', 'livescore.html')
+
+
+def build_matchday(matches: int, leagues: int = 60) -> str:
+    """A livescore.cz-shaped page with navigation/ads around the #score-data block"""
+    statuses = [('fin', '{h}-{a}'), ('live', '{h}-{a}'), ('sched', '-')]
+    rows = []
+    for i in range(matches):
+        if i % max(1, matches // leagues) == 0:
+            rows.append(f'<h4>Country {i} - League {i}<a href="/standings/{i}">Standings</a></h4>')
+        status, score = statuses[i % 3]
+        rows.append(
+            f'<span>{"FT" if status == "fin" else "18:00"}</span> Home Team {i} - Away Team {i} '
+            f'<a href="/match/{i}" class="{status}">{score.format(h=i % 5, a=i % 3)}</a><br>'
+        )
+    chrome = ''.join(f'<div class="nav"><a href="/c/{i}">Competition {i}</a></div>' for i in range(2000))
+    return (
+        f'<html><head><title>Livescore</title></head><body>{chrome}'
+        f'<div id="score-data">{"".join(rows)}</div>'
+        f'<div class="footer">{chrome}</div></body></html>'
+    )
+
+
+def measure(parser: str, html: str, runs: int):
+    scraper = LivescoreCzScraper(parser=parser)
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        matches = scraper.parse_html(html)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / runs
+
+    tracemalloc.start()
+    scraper.parse_html(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return matches, elapsed_ms, peak / (1024 * 1024)
+
+
+def run(label: str, html: str, runs: int) -> bool:
+    print(f"\n{label} ({len(html) / 1024:.0f} KB)")
+    results = {}
+    for parser in PARSERS:
+        matches, elapsed_ms, peak_mb = measure(parser, html, runs)
+        results[parser] = matches
+        print(f"  {parser:<7} {len(matches):>5} matches  {elapsed_ms:8.1f} ms/parse  {peak_mb:7.2f} MB peak")
+
+    identical = results['stream'] == results['soup']
+    print(f"  parity: {'OK' if identical else 'MISMATCH'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matches', type=int, default=1500, help='Rows in the synthetic matchday page')
+    parser.add_argument('--runs', type=int, default=10, help='Timed parses per backend')
+    parser.add_argument('--html', help='Also benchmark a saved livescore.cz page')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    ok = run(f"Synthetic matchday, {args.matches} matches", build_matchday(args.matches), args.runs)
+    pages = [LEGACY_PAGE] + ([args.html] if args.html else [])
+    for path in pages:
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                ok = run(os.path.relpath(path), f.read(), args.runs) and ok
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
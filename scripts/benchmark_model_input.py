@@ -0,0 +1,137 @@
+"""
+Benchmark the Gemini model input preprocessing.
+
+Compares the previous input (whole screenshot, grayscale, longest side
+capped at 800px) with the content-cropped and tiled input on the slip
+screenshots in legacy_archive/. Each slip is also rendered as a tall phone
+screenshot (status bar, repeated legs, blank space below), the case cropping
+and tiling are for. Reports payload bytes, pixels sent, the width the slip
+text ends up at and preprocessing time.
+
+With --extract, also runs both inputs through Gemini (needs GEMINI_API_KEY)
+and reports end-to-end extraction latency and the number of legs found.
+
+Usage:
+    python scripts/benchmark_model_input.py
+    python scripts/benchmark_model_input.py --image slip.jpg --runs 20
+    python scripts/benchmark_model_input.py --extract
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+django.setup()
+
+from PIL import Image, ImageDraw
+
+from apps.tips.image_processing import _to_rgb, model_input_jpeg, model_input_tiles
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'legacy_archive')
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.webp')
+
+PIPELINES = {
+    'squash': lambda data: [model_input_jpeg(data)],
+    'crop+tile': model_input_tiles,
+}
+
+
+def phone_screenshot(data: bytes, width: int = 1080, repeat: int = 3) -> bytes:
+    """The slip at phone width with a status bar, its middle repeated and blank space below"""
+    slip = _to_rgb(Image.open(io.BytesIO(data)))
+    slip = slip.resize((width, round(slip.height * width / slip.width)), Image.Resampling.LANCZOS)
+    head, middle, tail = slip.height // 4, slip.height * 3 // 4 - slip.height // 4, slip.height - slip.height * 3 // 4
+
+    status_bar, gap, blank = 80, 40, 400
+    canvas = Image.new('RGB', (width, status_bar + gap + head + middle * repeat + tail + blank), 'white')
+    draw = ImageDraw.Draw(canvas)
+    draw.rectangle((0, 0, width, status_bar), fill=(20, 20, 20))
+    for x in (40, 130, width - 200, width - 130, width - 70):
+        draw.rectangle((x, 25, x + 45, 55), fill='white')
+
+    top = status_bar + gap
+    canvas.paste(slip.crop((0, 0, width, head)), (0, top))
+    top += head
+    for _ in range(repeat):
+        canvas.paste(slip.crop((0, head, width, head + middle)), (0, top))
+        top += middle
+    canvas.paste(slip.crop((0, head + middle, width, slip.height)), (0, top))
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def measure(pipeline, data: bytes, runs: int):
+    started = time.perf_counter()
+    for _ in range(runs):
+        tiles = pipeline(data)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / runs
+    sizes = [Image.open(io.BytesIO(tile)).size for tile in tiles]
+    return tiles, sizes, elapsed_ms
+
+
+def extract(tiles):
+    from apps.tips.betslip_extractor import extract_betslip_turbo
+
+    started = time.perf_counter()
+    result = extract_betslip_turbo(None, model_input=tiles)
+    elapsed = time.perf_counter() - started
+    legs = len(result['data'].get('matches', [])) if result.get('success') else 0
+    return elapsed, legs, result.get('error', '')
+
+
+def run(label: str, data: bytes, runs: int, with_extraction: bool):
+    width, height = Image.open(io.BytesIO(data)).size
+    print(f"\n{label} ({width}x{height}, {len(data) / 1024:.0f} KB)")
+    for name, pipeline in PIPELINES.items():
+        tiles, sizes, elapsed_ms = measure(pipeline, data, runs)
+        payload = sum(len(tile) for tile in tiles)
+        pixels = sum(w * h for w, h in sizes)
+        dims = ' + '.join(f"{w}x{h}" for w, h in sizes)
+        # How wide the screenshot's text ends up, relative to the upload
+        text_scale = sizes[0][0] / width
+        line = (
+            f"  {name:<10} {payload / 1024:7.1f} KB  {pixels / 1000:6.0f}k px  "
+            f"text at {text_scale:4.0%}  {elapsed_ms:6.1f} ms  [{dims}]"
+        )
+        if with_extraction:
+            seconds, legs, error = extract(tiles)
+            line += f"  extraction {seconds:5.2f}s, {legs} legs{f' ({error[:60]})' if error else ''}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Timed preprocessing runs per input')
+    parser.add_argument('--image', action='append', default=[], help='Also benchmark this screenshot (repeatable)')
+    parser.add_argument('--extract', action='store_true', help='Also call Gemini with each input (uses quota)')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(ARCHIVE_DIR, pattern)))
+    paths += args.image
+    if not paths:
+        print(f"No screenshots found in {ARCHIVE_DIR}")
+        sys.exit(1)
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        name = os.path.relpath(path)
+        run(name, data, args.runs, args.extract)
+        run(f"{name} as a tall phone screenshot", phone_screenshot(data), args.runs, args.extract)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark cold startup imports.
+
+Starts a fresh interpreter per run with `python -X importtime` and measures
+the startup paths:
+
+    web         django.setup() and loading the URLconf (every gunicorn worker)
+    worker      django.setup() and the background task modules (task worker,
+                scheduler, management commands)
+    extraction  the worker path plus what the first Gemini extraction imports
+                on demand (google.genai, the response schema, Pillow)
+
+Reports wall time (median of the runs), total import time, the heaviest
+modules by cumulative import time and which of the heavy optional
+dependencies (google.genai, pydantic, Pillow, requests, fuzzywuzzy, bs4)
+each path loads.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --path worker --runs 10 --top 25
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('google.genai', 'pydantic', 'PIL', 'requests', 'fuzzywuzzy', 'bs4')
+
+SETUP = "import django; django.setup()\n"
+PATHS = {
+    'web': SETUP + "from django.urls import get_resolver; get_resolver().url_patterns\n",
+    'worker': SETUP + "import apps.tips.background_tasks, apps.tips.task_queue\n",
+    'extraction': SETUP + "import apps.tips.background_tasks, apps.tips.betslip_schema, google.genai.types, PIL.Image\n",
+}
+REPORT_LOADED = (
+    "import sys; print('LOADED', ' '.join(m for m in {modules!r} if m in sys.modules))\n"
+)
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def run_path(code: str, settings: str):
+    """
+    Run a startup path in a fresh interpreter.
+
+    Returns:
+        (wall seconds, [(module, self_us, cumulative_us, depth)], heavy modules loaded)
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings)
+    env.setdefault('SECRET_KEY', 'benchmark')
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code + REPORT_LOADED.format(modules=HEAVY_MODULES)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    loaded = proc.stdout.split('LOADED', 1)[1].split()
+    return elapsed, imports, loaded
+
+
+def report(name: str, code: str, settings: str, runs: int, top: int):
+    walls, totals = [], []
+    for _ in range(runs):
+        elapsed, imports, loaded = run_path(code, settings)
+        walls.append(elapsed)
+        totals.append(sum(cumulative for _, _, cumulative, depth in imports if depth == 0))
+
+    print(f"\n{name}: {statistics.median(walls) * 1000:.0f} ms wall, "
+          f"{statistics.median(totals) / 1000:.0f} ms importing, {len(imports)} modules")
+    print(f"  heavy dependencies loaded: {', '.join(loaded) or 'none'}")
+    # Slowest modules of the last run, skipping a package's own submodules
+    # listed under it so each line is a separate cost
+    heaviest = sorted(imports, key=lambda entry: -entry[2])
+    shown = []
+    for module, self_us, cumulative_us, _ in heaviest:
+        if any(module.startswith(f"{parent}.") for parent in shown):
+            continue
+        shown.append(module)
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+        if len(shown) == top:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', choices=sorted(PATHS), action='append', help='Startup path (repeatable, default all)')
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts per path')
+    parser.add_argument('--top', type=int, default=15, help='Heaviest modules to list')
+    parser.add_argument('--settings', default='config.settings.development', help='DJANGO_SETTINGS_MODULE')
+    args = parser.parse_args()
+
+    for name in args.path or PATHS:
+        report(name, PATHS[name], args.settings, args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Report the memory of the running gunicorn master and workers.
+
+RSS counts pages shared with the master (code, preloaded modules, compiled
+templates) in every worker, so it overstates what a worker costs. The
+unique column (private pages, from /proc/<pid>/smaps_rollup) is what each
+additional worker adds: with the RAM left after the master, the database,
+Redis and nginx, it says how many workers fit (GUNICORN_WORKERS).
+
+Usage:
+    python scripts/worker_memory.py
+    python scripts/worker_memory.py --master 1234 --free-mb 450
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from config.prefork import process_memory
+
+
+def find_master() -> int:
+    """pid of the gunicorn master serving config.wsgi: the parent of its workers"""
+    gunicorn = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except OSError:
+            continue
+        if 'gunicorn' in cmdline and 'config.wsgi' in cmdline:
+            gunicorn[int(entry)] = parent
+    # Workers have no children; wrappers such as timeout or sudo match too
+    workers = [pid for pid in gunicorn if pid not in gunicorn.values()]
+    masters = sorted({gunicorn[pid] for pid in workers if gunicorn[pid] in gunicorn})
+    if len(masters) != 1:
+        sys.exit(f"Found {len(masters)} gunicorn masters, pass --master")
+    return masters[0]
+
+
+def children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--master', type=int, help='gunicorn master pid (default: find it)')
+    parser.add_argument('--free-mb', type=float, help='RAM available to gunicorn, to estimate how many workers fit')
+    args = parser.parse_args()
+
+    master = args.master or find_master()
+    workers = children(master)
+
+    print(f"{'pid':>8}  {'role':<7} {'rss':>7} {'unique':>7} {'shared':>7} {'pss':>7}  (MB)")
+    rows = [(master, 'master')] + [(pid, 'worker') for pid in workers]
+    memory = {}
+    for pid, role in rows:
+        memory[pid] = process_memory(pid)
+        if memory[pid] is None:
+            print(f"{pid:>8}  {role:<7} unavailable")
+            continue
+        m = memory[pid]
+        print(f"{pid:>8}  {role:<7} {m['rss']:7.1f} {m['unique']:7.1f} {m['shared']:7.1f} {m['pss']:7.1f}")
+
+    uniques = [memory[pid]['unique'] for pid in workers if memory[pid]]
+    if not uniques:
+        return
+    per_worker = max(uniques)
+    total = sum(m['pss'] for m in memory.values() if m)
+    print(f"\n{len(uniques)} workers, up to {per_worker:.1f} MB unique each; all processes {total:.1f} MB (PSS)")
+    if args.free_mb and memory[master]:
+        fit = int((args.free_mb - memory[master]['rss']) // per_worker)
+        print(f"With {args.free_mb:.0f} MB for gunicorn, about {fit} workers of this size fit "
+              f"(unique memory grows until max_requests recycles a worker)")
+
+
+if __name__ == '__main__':
+    main()